@@ -0,0 +1,297 @@
+"""
+非同期ジョブ API エンドポイント
+
+画像・音声分析をジョブとして投入し、ポーリングまたはWebhookで結果を受け取ります。
+ジョブはSQLiteに永続化され、ワーカーがクラッシュしても visibility timeout 経過後に再実行されます。
+"""
+import asyncio
+import logging
+from types import SimpleNamespace
+from typing import Optional
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+
+from apps.meal_analysis_api.endpoints.meal_analysis import _run_complete_analysis, _validate_complete_request
+from apps.meal_analysis_api.endpoints.voice_analysis import (
+    _build_unified_response,
+    _validate_audio_input,
+    _validate_voice_parameters
+)
+from apps.meal_analysis_api.models.job_models import JobStatusResponse, JobSubmissionResponse
+from shared.config.settings import get_settings
+from shared.jobs import JobRecord, JobWorkerPool, PermanentJobError, SQLiteJobStore, check_webhook_url
+from shared.pipeline import VoiceAnalysisPipeline
+from shared.utils.audio_normalization import probe_audio_format
+from shared.utils.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+JOBS_PATH_PREFIX = "/api/v1/meal-analyses/jobs"
+
+# グローバルなワーカープール（アプリ起動時に開始）
+_worker_pool: Optional[JobWorkerPool] = None
+
+
+def _permanent_error(e: HTTPException) -> PermanentJobError:
+    """投入時と同じ検証のエラー（400）を再試行しないジョブエラーに変換"""
+    detail = e.detail.get("message", e.detail) if isinstance(e.detail, dict) else e.detail
+    return PermanentJobError(f"Invalid job input: {detail}")
+
+
+async def _handle_complete_job(job: JobRecord) -> dict:
+    """画像分析ジョブの実行（入力不正は再試行せずに失敗させる）"""
+    params = job.params
+    try:
+        # 投入後に設定（対応モデル等）が変わった場合に備えて実行時にも検証する
+        _validate_complete_request(params.get("ai_model_id"), params.get("temperature"),
+                                   SimpleNamespace(content_type=params.get("image_mime_type")),
+                                   params.get("latency_budget_ms"))
+    except HTTPException as e:
+        raise _permanent_error(e) from e
+    if not job.payload:
+        raise PermanentJobError("Invalid job input: image payload is empty")
+
+    try:
+        response = await _run_complete_analysis(
+            image_data=job.payload,
+            image_mime_type=params.get("image_mime_type", "image/jpeg"),
+            ai_model_id=params.get("ai_model_id"),
+            optional_text=params.get("optional_text"),
+            temperature=params.get("temperature"),
+            seed=params.get("seed"),
+            save_detailed_logs=params.get("save_detailed_logs", True),
+            latency_budget_ms=params.get("latency_budget_ms")
+        )
+    except ValueError as e:
+        raise PermanentJobError(f"Invalid job input: {e}") from e
+    return response.model_dump()
+
+
+async def _handle_voice_job(job: JobRecord) -> dict:
+    """音声分析ジョブの実行（入力不正・非対応の音声形式は再試行せずに失敗させる）"""
+    params = job.params
+    speech_service = params.get("speech_service", "deepinfra_whisper")
+    try:
+        _validate_voice_parameters(params.get("temperature"), speech_service)
+    except HTTPException as e:
+        raise _permanent_error(e) from e
+    if not job.payload:
+        raise PermanentJobError("Invalid job input: audio payload is empty")
+    audio_format, sample_rate, _ = probe_audio_format(job.payload)
+    if audio_format == "unknown":
+        raise PermanentJobError("Invalid job input: unsupported audio format")
+    if audio_format == "wav" and sample_rate is None:
+        raise PermanentJobError("Invalid job input: WAV header is truncated or has no fmt chunk")
+
+    try:
+        pipeline = VoiceAnalysisPipeline(
+            speech_service=speech_service,
+            whisper_model=params.get("whisper_model", "openai/whisper-large-v3-turbo")
+        )
+        result = await pipeline.execute_complete_analysis(
+            audio_bytes=job.payload,
+            audio_mime_type=params.get("audio_mime_type", "audio/wav"),
+            language_code=params.get("language_code", "en-US"),
+            llm_model_id=params.get("llm_model_id"),
+            optional_text=params.get("optional_text"),
+            temperature=params.get("temperature"),
+            seed=params.get("seed"),
+            save_detailed_logs=params.get("save_detailed_logs", True)
+        )
+    except ValueError as e:
+        raise PermanentJobError(f"Invalid job input: {e}") from e
+    return _build_unified_response(result).model_dump()
+
+
+JOB_HANDLERS = {
+    "complete": _handle_complete_job,
+    "voice": _handle_voice_job,
+}
+
+
+def get_job_worker_pool() -> JobWorkerPool:
+    """ジョブワーカープールを取得（未作成なら設定から作成）"""
+    global _worker_pool
+    if _worker_pool is None:
+        settings = get_settings()
+        store = SQLiteJobStore(
+            db_path=settings.JOB_QUEUE_DB_PATH,
+            visibility_timeout_seconds=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+            max_attempts=settings.JOB_MAX_ATTEMPTS
+        )
+        _worker_pool = JobWorkerPool(
+            store=store,
+            handlers=JOB_HANDLERS,
+            concurrency=settings.JOB_WORKER_CONCURRENCY,
+            poll_interval_seconds=settings.JOB_POLL_INTERVAL_SECONDS,
+            retry_backoff_seconds=settings.JOB_RETRY_BACKOFF_SECONDS,
+            result_retention_seconds=settings.JOB_RESULT_RETENTION_SECONDS,
+            webhook_timeout_seconds=settings.JOB_WEBHOOK_TIMEOUT_SECONDS,
+            webhook_max_retries=settings.JOB_WEBHOOK_MAX_RETRIES,
+            webhook_allowed_hosts=settings.JOB_WEBHOOK_ALLOWED_HOSTS
+        )
+        _register_job_metrics(_worker_pool)
+    return _worker_pool
+
+
+def _register_job_metrics(pool: JobWorkerPool) -> None:
+    """ジョブキューの深さ・実行中数をメトリクスに公開（オートスケーリング用）"""
+    metrics = get_metrics_registry()
+    metrics.gauge("job_queue_jobs", "Async jobs by status").set_callback(
+        lambda: [({"status": status}, count) for status, count in pool.store.count_by_status().items()]
+    )
+    metrics.gauge("job_workers_in_flight", "Async jobs currently executing in this process").set_callback(
+        lambda: [({}, pool.in_flight)]
+    )
+
+
+async def start_job_workers() -> None:
+    """アプリ起動時にジョブワーカーを開始"""
+    if not get_settings().JOB_QUEUE_ENABLED:
+        logger.info("Job queue disabled (JOB_QUEUE_ENABLED=false)")
+        return
+    await get_job_worker_pool().start()
+
+
+async def stop_job_workers() -> None:
+    """アプリ停止時にジョブワーカーを停止"""
+    if _worker_pool is not None:
+        await _worker_pool.stop()
+
+
+async def _validate_webhook_url(webhook_url: Optional[str]) -> None:
+    """Webhookの送信先を検証（内部ネットワーク宛ては JOB_WEBHOOK_ALLOWED_HOSTS のホストのみ許可）"""
+    if webhook_url is None:
+        return
+    try:
+        await asyncio.to_thread(check_webhook_url, webhook_url, get_settings().JOB_WEBHOOK_ALLOWED_HOSTS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+async def _submit(kind: str, params: dict, payload: bytes, webhook_url: Optional[str]) -> JobSubmissionResponse:
+    if not get_settings().JOB_QUEUE_ENABLED:
+        raise HTTPException(status_code=503, detail="Job queue is disabled")
+
+    job = await get_job_worker_pool().submit(kind, params, payload, webhook_url)
+    return JobSubmissionResponse(
+        job_id=job.job_id,
+        kind=job.kind,
+        status=job.status.value,
+        status_url=f"{JOBS_PATH_PREFIX}/{job.job_id}",
+        created_at=job.created_at
+    )
+
+
+@router.post("/jobs/complete", response_model=JobSubmissionResponse, status_code=202)
+async def submit_complete_analysis_job(
+    image: UploadFile = File(...),
+    save_detailed_logs: bool = Form(True),
+    ai_model_id: Optional[str] = Form(None),
+    optional_text: Optional[str] = Form(None),
+    temperature: Optional[float] = Form(0.0),
+    seed: Optional[int] = Form(123456),
+    latency_budget_ms: Optional[int] = Form(None),
+    webhook_url: Optional[str] = Form(None)
+) -> JobSubmissionResponse:
+    """
+    画像分析ジョブを投入（/complete の非同期版）
+
+    Args:
+        image: 分析対象の食事画像
+        save_detailed_logs: 分析ログを保存するかどうか
+        ai_model_id: 使用する画像分析モデルID
+        optional_text: 追加のテキスト情報
+        temperature: AI推論のランダム性制御 (0.0-1.0)
+        seed: 再現性のためのシード値
+        latency_budget_ms: ai_model_id="auto" の場合のレイテンシ予算（ミリ秒）
+        webhook_url: 完了時に結果をPOSTするURL（オプション）
+
+    Returns:
+        ジョブIDと状態確認URL（202 Accepted）
+    """
+    _validate_complete_request(ai_model_id, temperature, image, latency_budget_ms)
+    await _validate_webhook_url(webhook_url)
+
+    image_data = await image.read()
+    if not image_data:
+        raise HTTPException(status_code=400, detail="Image file is empty")
+
+    params = {
+        "image_mime_type": image.content_type or "image/jpeg",
+        "ai_model_id": ai_model_id,
+        "optional_text": optional_text,
+        "temperature": temperature,
+        "seed": seed,
+        "save_detailed_logs": save_detailed_logs,
+        "latency_budget_ms": latency_budget_ms
+    }
+    return await _submit("complete", params, image_data, webhook_url)
+
+
+@router.post("/jobs/voice", response_model=JobSubmissionResponse, status_code=202)
+async def submit_voice_analysis_job(
+    audio: UploadFile = File(...),
+    llm_model_id: Optional[str] = Form(None),
+    language_code: str = Form("en-US"),
+    optional_text: Optional[str] = Form(None),
+    temperature: Optional[float] = Form(0.0),
+    seed: Optional[int] = Form(123456),
+    save_detailed_logs: bool = Form(True),
+    speech_service: str = Form("deepinfra_whisper"),
+    whisper_model: str = Form("openai/whisper-large-v3-turbo"),
+    webhook_url: Optional[str] = Form(None)
+) -> JobSubmissionResponse:
+    """
+    音声分析ジョブを投入（/voice の非同期版）
+
+    パラメータは /voice と同一で、webhook_url を追加で指定できます。
+
+    Returns:
+        ジョブIDと状態確認URL（202 Accepted）
+    """
+    await _validate_audio_input(audio)
+    _validate_voice_parameters(temperature, speech_service)
+    await _validate_webhook_url(webhook_url)
+
+    audio_data = await audio.read()
+    if not audio_data:
+        raise HTTPException(status_code=400, detail="Audio file is empty")
+
+    params = {
+        "audio_mime_type": audio.content_type or "audio/wav",
+        "llm_model_id": llm_model_id,
+        "language_code": language_code,
+        "optional_text": optional_text,
+        "temperature": temperature,
+        "seed": seed,
+        "save_detailed_logs": save_detailed_logs,
+        "speech_service": speech_service,
+        "whisper_model": whisper_model
+    }
+    return await _submit("voice", params, audio_data, webhook_url)
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str) -> JobStatusResponse:
+    """ジョブ状態と結果を取得"""
+    job = await get_job_worker_pool().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    return JobStatusResponse(
+        job_id=job.job_id,
+        kind=job.kind,
+        status=job.status.value,
+        attempts=job.attempts,
+        max_attempts=job.max_attempts,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        started_at=job.started_at,
+        completed_at=job.completed_at,
+        result=job.result,
+        error=job.error,
+        webhook_status=job.webhook_status
+    )
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Optional
 import logging
 
 from shared.pipeline import MealAnalysisPipeline
+from shared.pipeline.events import PipelineEventCallback
+from shared.services.model_router import AUTO_MODEL_ID
+from shared.utils.sse import AnalysisEventStream, SSE_HEADERS, SSE_MEDIA_TYPE
 from apps.meal_analysis_api.models.meal_analysis_models import (
     SimplifiedCompleteAnalysisResponse,
     HealthCheckResponse,
@@ -24,7 +27,9 @@ async def complete_meal_analysis(
     ai_model_id: Optional[str] = Form(None),
     optional_text: Optional[str] = Form(None),
     temperature: Optional[float] = Form(0.0),
-    seed: Optional[int] = Form(123456)
+    seed: Optional[int] = Form(123456),
+    latency_budget_ms: Optional[int] = Form(None),
+    stream_phase1: Optional[bool] = Form(None)
 ) -> SimplifiedCompleteAnalysisResponse:
     """
     完全な食事分析を実行（v2.0 コンポーネント化版）
@@ -40,85 +45,41 @@ async def complete_meal_analysis(
         test_results_dir: テスト結果保存先ディレクトリ (テスト実行時のみ)
         ai_model_id: 使用する画像分析モデルID (オプション)
                  指定可能: "Qwen/Qwen2.5-VL-32B-Instruct", "google/gemma-3-27b-it", 
-                          "meta-llama/Llama-3.2-90B-Vision-Instruct"
+                          "meta-llama/Llama-3.2-90B-Vision-Instruct",
+                          "auto"（観測レイテンシに基づき latency_budget_ms 内で最も高精度なモデルを選択）
                  未指定: 設定ファイルのデフォルトモデルを使用
         optional_text: 追加のテキスト情報 (英語想定) - 画像と併せて分析に使用
                       例: "This is homemade low-sodium pasta", "Restaurant meal with extra vegetables"
         temperature: AI推論のランダム性制御 (0.0-1.0, デフォルト: 0.0 - 決定的)
         seed: 再現性のためのシード値 (デフォルト: 123456)
+        latency_budget_ms: ai_model_id="auto" の場合のレイテンシ予算（ミリ秒、未指定: 設定ファイルのデフォルト）
+        stream_phase1: Phase1をストリーミングで受信し、確定した食材から栄養検索を開始する（未指定: 設定ファイルに従う）
     
     Returns:
         完全な分析結果と栄養価計算、分析ログファイルパス
     """
     
     try:
-        # モデル検証
-        from shared.config.settings import get_settings
-        settings = get_settings()
+        # 入力検証（モデル・temperature・画像）
+        _validate_complete_request(ai_model_id, temperature, image, latency_budget_ms)
 
-        if ai_model_id and not settings.validate_model_id(ai_model_id):
-            available_models = ", ".join(settings.SUPPORTED_VISION_MODELS)
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported ai_model_id: {ai_model_id}. Available models: {available_models}"
-            )
-
-        # temperatureパラメータの範囲検証
-        if temperature is not None and (temperature < 0.0 or temperature > 1.0):
-            raise HTTPException(
-                status_code=400,
-                detail="temperature must be between 0.0 and 1.0"
-            )
-        
-        # 画像の検証
-        if image.content_type and not image.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="アップロードされたファイルは画像である必要があります")
-        
         # 画像データの読み込み
         image_data = await image.read()
-        
-        # モデル情報をログに出力
-        effective_model = ai_model_id or settings.DEEPINFRA_MODEL_ID
-        model_config = settings.get_model_config(effective_model)
-        
-        # ログ出力（パラメータ情報を含む）
-        log_info = f"Starting complete meal analysis pipeline v2.0 (model: {effective_model}, detailed_logs: {save_detailed_logs}, temperature: {temperature}, seed: {seed}"
-        if optional_text:
-            log_info += f", optional_text: '{optional_text[:50]}{'...' if len(optional_text) > 50 else ''}'"
-        log_info += ")"
-        logger.info(log_info)
-        
-        if model_config:
-            logger.info(f"Model characteristics: {model_config}")
-        
-        # パイプラインの実行（全パラメータ付き）
-        pipeline = MealAnalysisPipeline(model_id=ai_model_id)
-        result = await pipeline.execute_complete_analysis(
-            image_bytes=image_data,
+
+        return await _run_complete_analysis(
+            image_data=image_data,
             image_mime_type=image.content_type or 'image/jpeg',  # Default to image/jpeg if None
+            ai_model_id=ai_model_id,
             optional_text=optional_text,
-            temperature=temperature,  # NEW: Temperature parameter
-            seed=seed,  # NEW: Seed parameter
+            temperature=temperature,
+            seed=seed,
             save_detailed_logs=save_detailed_logs,
             test_execution=test_execution,
-            test_results_dir=test_results_dir
+            test_results_dir=test_results_dir,
+            latency_budget_ms=latency_budget_ms,
+            stream_phase1=stream_phase1
         )
         
-        # 使用されたモデル情報を結果に追加
-        result["model_used"] = effective_model
-        if model_config:
-            result["model_config"] = model_config
-        
-        # optional_text情報も結果に含める
-        if optional_text:
-            result["optional_text_used"] = optional_text
-        
-        logger.info(f"Complete analysis pipeline v2.0 finished successfully with model: {effective_model}")
-        
-        # Convert complex result to simplified model
-        simplified_response = _convert_to_simplified_response(result)
-        return simplified_response
-        
     except HTTPException:
         raise
     except Exception as e:
@@ -129,6 +90,166 @@ async def complete_meal_analysis(
         )
 
 
+@router.post("/complete/stream")
+async def complete_meal_analysis_stream(
+    image: UploadFile = File(...),
+    save_detailed_logs: bool = Form(True),
+    ai_model_id: Optional[str] = Form(None),
+    optional_text: Optional[str] = Form(None),
+    temperature: Optional[float] = Form(0.0),
+    seed: Optional[int] = Form(123456),
+    latency_budget_ms: Optional[int] = Form(None),
+    stream_phase1: Optional[bool] = Form(None)
+) -> StreamingResponse:
+    """
+    完全な食事分析のストリーミング版（Server-Sent Events）
+
+    /complete と同じパイプラインを実行し、各段階の完了時にイベントを送信します。
+    - phase1_detected: 検出された料理と食材
+    - ingredient_matched: 食材ごとの栄養データベース照合結果（検索完了順）
+    - nutrition_calculated: 料理ごと・食事全体の栄養価
+    - final: /complete と同一形式の最終レスポンス
+    - error: 分析失敗（status_code, detail）
+
+    パラメータは /complete と同じです（テスト実行用パラメータを除く）。
+    入力検証エラーはストリーム開始前に通常のHTTPエラーとして返します。
+    """
+    from shared.config.settings import get_settings
+
+    stream = AnalysisEventStream("complete", keepalive_seconds=get_settings().SSE_KEEPALIVE_SECONDS)
+
+    _validate_complete_request(ai_model_id, temperature, image, latency_budget_ms)
+    image_data = await image.read()
+    image_mime_type = image.content_type or 'image/jpeg'
+
+    return StreamingResponse(
+        stream.run(lambda event_callback: _run_complete_analysis(
+            image_data=image_data,
+            image_mime_type=image_mime_type,
+            ai_model_id=ai_model_id,
+            optional_text=optional_text,
+            temperature=temperature,
+            seed=seed,
+            save_detailed_logs=save_detailed_logs,
+            latency_budget_ms=latency_budget_ms,
+            stream_phase1=stream_phase1,
+            event_callback=event_callback
+        )),
+        media_type=SSE_MEDIA_TYPE,
+        headers=SSE_HEADERS
+    )
+
+
+async def _run_complete_analysis(
+    image_data: bytes,
+    image_mime_type: str,
+    ai_model_id: Optional[str] = None,
+    optional_text: Optional[str] = None,
+    temperature: Optional[float] = 0.0,
+    seed: Optional[int] = 123456,
+    save_detailed_logs: bool = True,
+    test_execution: bool = False,
+    test_results_dir: Optional[str] = None,
+    latency_budget_ms: Optional[float] = None,
+    stream_phase1: Optional[bool] = None,
+    event_callback: Optional[PipelineEventCallback] = None
+) -> SimplifiedCompleteAnalysisResponse:
+    """画像分析パイプラインを実行して簡略化レスポンスを返す（同期・ストリーミングエンドポイント・ジョブ共通）"""
+    from shared.config.settings import get_settings
+    settings = get_settings()
+
+    # モデル情報をログに出力
+    effective_model = ai_model_id or settings.DEEPINFRA_MODEL_ID
+    model_config = settings.get_model_config(effective_model)
+    
+    # ログ出力（パラメータ情報を含む）
+    log_info = f"Starting complete meal analysis pipeline v2.0 (model: {effective_model}, detailed_logs: {save_detailed_logs}, temperature: {temperature}, seed: {seed}"
+    if optional_text:
+        log_info += f", optional_text: '{optional_text[:50]}{'...' if len(optional_text) > 50 else ''}'"
+    log_info += ")"
+    logger.info(log_info)
+    
+    if model_config:
+        logger.info(f"Model characteristics: {model_config}")
+    
+    # パイプラインの実行（全パラメータ付き）
+    pipeline = MealAnalysisPipeline(model_id=ai_model_id, latency_budget_ms=latency_budget_ms)
+    result = await pipeline.execute_complete_analysis(
+        image_bytes=image_data,
+        image_mime_type=image_mime_type,
+        optional_text=optional_text,
+        temperature=temperature,
+        seed=seed,
+        save_detailed_logs=save_detailed_logs,
+        test_execution=test_execution,
+        test_results_dir=test_results_dir,
+        stream_phase1=stream_phase1,
+        event_callback=event_callback
+    )
+    
+    # 自動ルーティングの場合は実際に応答したモデルを使用モデルとする
+    if ai_model_id == AUTO_MODEL_ID:
+        effective_model = pipeline.vision_service.model_id
+        model_config = settings.get_model_config(effective_model)
+
+    # 使用されたモデル情報を結果に追加
+    result["model_used"] = effective_model
+    if model_config:
+        result["model_config"] = model_config
+    
+    # optional_text情報も結果に含める
+    if optional_text:
+        result["optional_text_used"] = optional_text
+    
+    logger.info(f"Complete analysis pipeline v2.0 finished successfully with model: {effective_model}")
+    
+    # Convert complex result to simplified model
+    return _convert_to_simplified_response(result)
+
+
+def _validate_complete_request(
+    ai_model_id: Optional[str],
+    temperature: Optional[float],
+    image: UploadFile,
+    latency_budget_ms: Optional[float] = None
+) -> None:
+    """画像分析リクエストのパラメータ検証"""
+    from shared.config.settings import get_settings
+    settings = get_settings()
+
+    # モデル検証
+    if ai_model_id and ai_model_id != AUTO_MODEL_ID and not settings.validate_model_id(ai_model_id):
+        available_models = ", ".join(settings.SUPPORTED_VISION_MODELS + [AUTO_MODEL_ID])
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported ai_model_id: {ai_model_id}. Available models: {available_models}"
+        )
+
+    # レイテンシ予算の検証
+    if latency_budget_ms is not None:
+        if ai_model_id != AUTO_MODEL_ID:
+            raise HTTPException(
+                status_code=400,
+                detail="latency_budget_ms can only be used with ai_model_id=auto"
+            )
+        if latency_budget_ms <= 0:
+            raise HTTPException(
+                status_code=400,
+                detail="latency_budget_ms must be positive"
+            )
+
+    # temperatureパラメータの範囲検証
+    if temperature is not None and (temperature < 0.0 or temperature > 1.0):
+        raise HTTPException(
+            status_code=400,
+            detail="temperature must be between 0.0 and 1.0"
+        )
+
+    # 画像の検証
+    if image.content_type and not image.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="アップロードされたファイルは画像である必要があります")
+
+
 def _convert_to_simplified_response(result: dict) -> SimplifiedCompleteAnalysisResponse:
     """Convert complex API result to simplified response model"""
     from apps.meal_analysis_api.models.meal_analysis_models import SimplifiedCompleteAnalysisResponse, DishSummary, SimplifiedNutritionInfo, IngredientSummary
@@ -218,7 +339,8 @@ def _convert_to_simplified_response(result: dict) -> SimplifiedCompleteAnalysisR
         dishes=dishes,
         total_nutrition=total_nutrition,
         ai_model_used=result.get("model_used", "unknown"),
-        match_rate_percent=match_rate
+        match_rate_percent=match_rate,
+        model_routing=result.get("metadata", {}).get("model_routing")
     )
 
 
@@ -3,27 +3,25 @@
 
 音声データから食事分析を行うAPIエンドポイントを定義します。
 """
+import json
 import logging
 import uuid
 from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from apps.meal_analysis_api.models.voice_analysis_models import (
-    VoiceAnalysisInput,
     VoiceCompleteAnalysisResponse,
     VoiceAnalysisErrorResponse,
     VoiceAnalysisErrorCodes
 )
 from apps.meal_analysis_api.models.meal_analysis_models import SimplifiedCompleteAnalysisResponse
-from shared.components.phase1_speech_component import Phase1SpeechComponent
-from shared.components.advanced_nutrition_search_component import AdvancedNutritionSearchComponent
-from shared.components.nutrition_calculation_component import NutritionCalculationComponent
-from shared.models.nutrition_search_models import NutritionQueryInput
-from shared.models.nutrition_calculation_models import NutritionCalculationInput
-from shared.pipeline.result_manager import ResultManager
+from shared.pipeline.voice_orchestrator import VoiceAnalysisPipeline
+from shared.pipeline.events import ERROR, PipelineEventCallback
+from shared.pipeline.streaming_voice_session import StreamingVoiceSession
+from shared.utils.sse import AnalysisEventStream, SSE_HEADERS, SSE_MEDIA_TYPE
 
 logger = logging.getLogger(__name__)
 
@@ -62,7 +60,7 @@ async def analyze_meal_from_voice(
         test_execution: テスト実行モード（デフォルト: False）
         test_results_dir: テスト結果保存先ディレクトリ（テスト実行時のみ）
         save_detailed_logs: 詳細ログ保存（デフォルト: True）
-        speech_service: 音声認識サービス ("google" | "deepinfra_whisper", デフォルト: "deepinfra_whisper")
+        speech_service: 音声認識サービス ("google" | "deepinfra_whisper" | "local_whisper", デフォルト: "deepinfra_whisper")
         whisper_model: DeepInfra Whisperモデル ("openai/whisper-large-v3-turbo" | "openai/whisper-large-v3" | "openai/whisper-base")
 
     Returns:
@@ -77,6 +75,8 @@ async def analyze_meal_from_voice(
     logger.info(f"[{analysis_id}] Starting voice meal analysis (language: {language_code}, temperature: {temperature}, seed: {seed}, speech_service: {speech_service})")
     if speech_service == "deepinfra_whisper":
         logger.info(f"[{analysis_id}] Using DeepInfra Whisper model: {whisper_model}")
+    elif speech_service == "local_whisper":
+        logger.info(f"[{analysis_id}] Using local Whisper model: {whisper_model}")
     else:
         logger.info(f"[{analysis_id}] Using Google Speech-to-Text")
     
@@ -84,342 +84,239 @@ async def analyze_meal_from_voice(
         logger.info(f"[{analysis_id}] Optional text provided: '{optional_text[:50]}{'...' if len(optional_text) > 50 else ''}'")
 
     try:
-        # Step 1: 入力検証
-        await _validate_audio_input(audio)
+        # Step 1: 入力検証・音声データ読み込み
+        audio_data = await _read_validated_audio(audio, temperature, speech_service)
 
-        # temperature パラメータの範囲検証
-        if temperature is not None and (temperature < 0.0 or temperature > 1.0):
-            raise HTTPException(
-                status_code=400,
-                detail={"code": VoiceAnalysisErrorCodes.INVALID_PARAMETERS, "message": "temperature must be between 0.0 and 1.0"}
-            )
-
-        # speech_service パラメータ検証
-        valid_services = ["google", "deepinfra_whisper"]
-        if speech_service not in valid_services:
-            raise HTTPException(
-                status_code=400,
-                detail={"code": VoiceAnalysisErrorCodes.INVALID_PARAMETERS, "message": f"Invalid speech_service. Must be one of: {valid_services}"}
-            )
-
-        # 音声データ読み込み
-        audio_data = await audio.read()
-        if not audio_data:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "code": VoiceAnalysisErrorCodes.EMPTY_AUDIO_FILE,
-                    "message": "Audio file is empty"
-                }
-            )
-
-        # Step 2: 音声分析（Phase1Speech）
-        logger.info(f"[{analysis_id}] Phase 1: Voice analysis (Speech-to-Text + NLU)")
-
-        # ResultManagerの初期化
-        if save_detailed_logs:
-            result_manager = ResultManager()
-            if test_execution and test_results_dir:
-                result_manager.initialize_session(analysis_id, test_results_dir)
-            else:
-                result_manager.initialize_session(analysis_id)
-        else:
-            result_manager = None
-
-        # Phase1Speechコンポーネントを音声認識サービス設定で初期化
-        phase1_speech_component = Phase1SpeechComponent(
-            speech_service_type=speech_service,
-            whisper_model=whisper_model
-        )
-        
-        voice_input = VoiceAnalysisInput(
-            audio_bytes=audio_data,
+        # Step 2: 音声分析パイプライン実行（音声認識→NLU→栄養検索→栄養計算）
+        # Step 3: 画像分析と同一フォーマットのレスポンスを生成
+        response = await _run_voice_analysis(
+            audio_data=audio_data,
             audio_mime_type=audio.content_type or "audio/wav",
-            llm_model_id=llm_model_id,
-            language_code=language_code,
-            optional_text=optional_text,  # 追加テキスト情報
-            temperature=temperature,       # ランダム性制御
-            seed=seed                     # 再現性制御
-        )
-
-        # Phase1の詳細ログを作成
-        phase1_log = result_manager.create_execution_log("Phase1SpeechComponent", f"{analysis_id}_phase1_speech") if result_manager else None
-
-        # 音声分析実行
-        phase1_result = await phase1_speech_component.execute(
-            input_data=voice_input,
-            execution_log=phase1_log,
             language_code=language_code,
             llm_model_id=llm_model_id,
+            optional_text=optional_text,
             temperature=temperature,
-            seed=seed
+            seed=seed,
+            save_detailed_logs=save_detailed_logs,
+            test_execution=test_execution,
+            test_results_dir=test_results_dir,
+            speech_service=speech_service,
+            whisper_model=whisper_model
         )
 
-        logger.info(f"[{analysis_id}] Phase 1 completed - Detected {len(phase1_result.dishes)} dishes")
-
-        # ResultManagerにPhase1結果を追加（音声データを含む）
-        if result_manager:
-            # 音声テキスト変換データを含むPhase1結果を構築
-            phase1_data = {
-                "detected_food_items": [
-                    {
-                        "item_name": item.item_name,
-                        "confidence": item.confidence,
-                        "attributes": [
-                            {
-                                "type": attr.type.value if hasattr(attr.type, 'value') else str(attr.type),
-                                "value": attr.value,
-                                "confidence": attr.confidence
-                            }
-                            for attr in item.attributes
-                        ],
-                        "brand": item.brand or "",
-                        "category_hints": item.category_hints,
-                        "negative_cues": item.negative_cues
-                    }
-                    for item in phase1_result.detected_food_items
-                ],
-                "dishes": [
-                    {
-                        "dish_name": dish.dish_name,
-                        "confidence": dish.confidence,
-                        "ingredients": [
-                            {
-                                "ingredient_name": ing.ingredient_name,
-                                "confidence": ing.confidence,
-                                "weight_g": ing.weight_g
-                            }
-                            for ing in dish.ingredients
-                        ],
-                        "attributes": [
-                            {
-                                "type": attr.type.value if hasattr(attr.type, 'value') else str(attr.type),
-                                "value": attr.value,
-                                "confidence": attr.confidence
-                            }
-                            for attr in dish.detected_attributes
-                        ]
-                    }
-                    for dish in phase1_result.dishes
-                ],
-                "analysis_confidence": phase1_result.analysis_confidence,
-                "processing_notes": phase1_result.processing_notes,
-                # 音声入力データを追加
-                "input_data": {
-                    "audio_bytes": len(audio_data),  # バイト数のみ保存（実際のデータは大きすぎるため）
-                    "audio_mime_type": audio.content_type or "audio/wav",
-                    "language_code": language_code,
-                    "llm_model_id": llm_model_id,
-                    "optional_text": optional_text,
-                    "temperature": temperature,
-                    "seed": seed,
-                    "speech_service": speech_service,
-                    "whisper_model": whisper_model if speech_service == "deepinfra_whisper" else None
-                },
-                # 音声テキスト変換結果を追加（Phase1Speechから取得）
-                "processing_details": {}
+        processing_time = (datetime.now() - start_time).total_seconds()
+        logger.info(f"[{analysis_id}] Voice meal analysis completed successfully in {processing_time:.2f}s")
+        return response
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[{analysis_id}] Voice meal analysis failed: {str(e)}", exc_info=True)
+
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "code": VoiceAnalysisErrorCodes.INTERNAL_ERROR,
+                "message": f"Voice meal analysis failed: {str(e)}"
             }
-            
-            # Phase1SpeechComponentから音声認識結果を取得
-            if hasattr(phase1_log, 'get_speech_transcription'):
-                speech_transcription = phase1_log.get_speech_transcription()
-                if speech_transcription:
-                    phase1_data["processing_details"]["speech_recognition_result"] = speech_transcription
-            
-            # 代替手段：Phase1Speechの実行ログから音声認識結果を抽出
-            if phase1_log and hasattr(phase1_log, 'logs'):
-                for log_entry in phase1_log.logs:
-                    if "Speech recognition successful:" in log_entry.get("message", ""):
-                        # ログメッセージから音声認識結果を抽出
-                        message = log_entry["message"]
-                        if "'" in message:
-                            transcription = message.split("'")[1]
-                            phase1_data["processing_details"]["speech_recognition_result"] = transcription
-                            break
-            
-            result_manager.add_phase_result("Phase1SpeechComponent", phase1_data)
-
-        # Step 3: 栄養検索（既存コンポーネント再利用）
-        logger.info(f"[{analysis_id}] Phase 2: Nutrition database search")
-
-        nutrition_search_component = AdvancedNutritionSearchComponent()
-        nutrition_search_input = NutritionQueryInput(
-            ingredient_names=phase1_result.get_all_ingredient_names(),
-            dish_names=phase1_result.get_all_dish_names(),
-            preferred_source="advanced_search"
         )
 
-        # 栄養検索の詳細ログを作成
-        search_log = result_manager.create_execution_log("AdvancedNutritionSearchComponent", f"{analysis_id}_nutrition_search") if result_manager else None
-
-        nutrition_search_result = await nutrition_search_component.process(nutrition_search_input)
-
-        logger.info(f"[{analysis_id}] Phase 2 completed - {nutrition_search_result.get_match_rate():.1%} match rate")
-
-        # ResultManagerに栄養検索結果を追加
-        if result_manager:
-            # 安全な方式でmatchesを処理
-            matches_data = []
-            try:
-                for match in nutrition_search_result.matches:
-                    if hasattr(match, 'query_term'):
-                        # 正常なオブジェクトの場合
-                        match_data = {
-                            "query_term": match.query_term,
-                            "matched_food": getattr(match, 'matched_food', str(match)),
-                            "confidence_score": getattr(match, 'confidence_score', 0.0),
-                            "source_database": getattr(match, 'source_database', 'unknown'),
-                            "nutrition_per_100g": getattr(match, 'nutrition_per_100g', {})
-                        }
-                    else:
-                        # 文字列または他の形式の場合
-                        match_data = {
-                            "query_term": str(match),
-                            "matched_food": str(match),
-                            "confidence_score": 1.0,
-                            "source_database": "elasticsearch",
-                            "nutrition_per_100g": {}
-                        }
-                    matches_data.append(match_data)
-            except Exception as e:
-                logger.warning(f"Error processing matches: {e}, using simplified format")
-                matches_data = [{"query_term": str(match), "matched_food": str(match)} for match in nutrition_search_result.matches]
-            
-            nutrition_search_data = {
-                "matches_count": len(nutrition_search_result.matches),
-                "match_rate": nutrition_search_result.get_match_rate(),
-                "search_summary": nutrition_search_result.search_summary,
-                "matches": matches_data
-            }
-            result_manager.add_phase_result("AdvancedNutritionSearchComponent", nutrition_search_data)
 
-        # Step 4: 栄養計算（既存コンポーネント再利用）
-        logger.info(f"[{analysis_id}] Phase 3: Nutrition calculation")
+@router.post("/voice/stream")
+async def analyze_meal_from_voice_stream(
+    audio: UploadFile = File(...),
+    llm_model_id: Optional[str] = Form(None),
+    language_code: str = Form("en-US"),
+    optional_text: Optional[str] = Form(None),
+    temperature: Optional[float] = Form(0.0),
+    seed: Optional[int] = Form(123456),
+    save_detailed_logs: bool = Form(True),
+    speech_service: str = Form("deepinfra_whisper"),
+    whisper_model: str = Form("openai/whisper-large-v3-turbo")
+) -> StreamingResponse:
+    """
+    音声からの完全食事分析のストリーミング版（Server-Sent Events）
 
-        nutrition_calculation_component = NutritionCalculationComponent()
-        nutrition_calculation_input = NutritionCalculationInput(
-            phase1_result=phase1_result,
-            nutrition_search_result=nutrition_search_result
-        )
+    /voice と同じパイプラインを実行し、/complete/stream と同じ種類のイベント
+    （phase1_detected, ingredient_matched, nutrition_calculated, final, error）を送信します。
+    パラメータは /voice と同じです（テスト実行用パラメータを除く）。
+    入力検証エラーはストリーム開始前に通常のHTTPエラーとして返します。
+    """
+    from shared.config.settings import get_settings
 
-        # 栄養計算の詳細ログを作成
-        calculation_log = result_manager.create_execution_log("NutritionCalculationComponent", f"{analysis_id}_nutrition_calculation") if result_manager else None
-
-        nutrition_calculation_result = await nutrition_calculation_component.execute(nutrition_calculation_input, calculation_log)
-
-        logger.info(f"[{analysis_id}] Phase 3 completed - {nutrition_calculation_result.meal_nutrition.total_nutrition.calories:.1f} kcal total")
-
-        # ResultManagerに栄養計算結果を追加
-        if result_manager:
-            nutrition_calculation_data = {
-                "dishes": [
-                    {
-                        "dish_name": dish.dish_name,
-                        "confidence": dish.confidence,
-                        "ingredients": [
-                            {
-                                "ingredient_name": ing.ingredient_name,
-                                "weight_g": ing.weight_g,
-                                "nutrition_per_100g": ing.nutrition_per_100g,
-                                "calculated_nutrition": {
-                                    "calories": ing.calculated_nutrition.calories,
-                                    "protein": ing.calculated_nutrition.protein,
-                                    "fat": ing.calculated_nutrition.fat,
-                                    "carbs": ing.calculated_nutrition.carbs,
-                                    "fiber": ing.calculated_nutrition.fiber,
-                                    "sugar": ing.calculated_nutrition.sugar,
-                                    "sodium": ing.calculated_nutrition.sodium
-                                },
-                                "source_db": ing.source_db,
-                                "calculation_notes": ing.calculation_notes
-                            }
-                            for ing in dish.ingredients
-                        ],
-                        "total_nutrition": {
-                            "calories": dish.total_nutrition.calories,
-                            "protein": dish.total_nutrition.protein,
-                            "fat": dish.total_nutrition.fat,
-                            "carbs": dish.total_nutrition.carbs,
-                            "fiber": dish.total_nutrition.fiber,
-                            "sugar": dish.total_nutrition.sugar,
-                            "sodium": dish.total_nutrition.sodium
-                        },
-                        "calculation_metadata": dish.calculation_metadata
-                    }
-                    for dish in nutrition_calculation_result.meal_nutrition.dishes
-                ],
-                "total_nutrition": {
-                    "calories": nutrition_calculation_result.meal_nutrition.total_nutrition.calories,
-                    "protein": nutrition_calculation_result.meal_nutrition.total_nutrition.protein,
-                    "fat": nutrition_calculation_result.meal_nutrition.total_nutrition.fat,
-                    "carbs": nutrition_calculation_result.meal_nutrition.total_nutrition.carbs,
-                    "fiber": nutrition_calculation_result.meal_nutrition.total_nutrition.fiber,
-                    "sugar": nutrition_calculation_result.meal_nutrition.total_nutrition.sugar,
-                    "sodium": nutrition_calculation_result.meal_nutrition.total_nutrition.sodium
-                },
-                "calculation_summary": nutrition_calculation_result.meal_nutrition.calculation_summary,
-                "warnings": nutrition_calculation_result.meal_nutrition.warnings,
-                "match_rate_percent": nutrition_search_result.get_match_rate() * 100
-            }
-            result_manager.add_phase_result("NutritionCalculationComponent", nutrition_calculation_data)
-
-        # Step 5: レスポンス構築
-        end_time = datetime.now()
-        processing_time = (end_time - start_time).total_seconds()
-
-        # 画像分析と同一フォーマットのレスポンスを生成
-        response = _build_unified_response(
-            analysis_id=analysis_id,
-            phase1_result=phase1_result,
-            nutrition_calculation_result=nutrition_calculation_result,
-            nutrition_search_result=nutrition_search_result,
-            processing_time=processing_time,
-            llm_model_id=llm_model_id
-        )
+    stream = AnalysisEventStream("voice", keepalive_seconds=get_settings().SSE_KEEPALIVE_SECONDS)
 
-        # 詳細ログの保存
-        if result_manager:
-            result_manager.set_final_result({
-                "analysis_id": analysis_id,
-                "input_type": "voice",
-                "processing_time_seconds": processing_time,
-                "total_dishes": len(phase1_result.dishes),
-                "total_calories": nutrition_calculation_result.meal_nutrition.total_nutrition.calories,
-                "optional_text_used": optional_text,
-                "temperature": temperature,
-                "seed": seed,
-                "speech_service": speech_service,
-                "whisper_model": whisper_model if speech_service == "deepinfra_whisper" else None
-            })
-            result_manager.finalize_pipeline()
-            saved_files = result_manager.save_phase_results()
-            logger.info(f"[{analysis_id}] Analysis logs saved to folder: {result_manager.get_analysis_folder_path()}")
+    audio_data = await _read_validated_audio(audio, temperature, speech_service)
+    audio_mime_type = audio.content_type or "audio/wav"
 
-        logger.info(f"[{analysis_id}] Voice meal analysis completed successfully in {processing_time:.2f}s")
-        return response
+    return StreamingResponse(
+        stream.run(lambda event_callback: _run_voice_analysis(
+            audio_data=audio_data,
+            audio_mime_type=audio_mime_type,
+            language_code=language_code,
+            llm_model_id=llm_model_id,
+            optional_text=optional_text,
+            temperature=temperature,
+            seed=seed,
+            save_detailed_logs=save_detailed_logs,
+            speech_service=speech_service,
+            whisper_model=whisper_model,
+            event_callback=event_callback
+        )),
+        media_type=SSE_MEDIA_TYPE,
+        headers=SSE_HEADERS
+    )
+
+
+@router.websocket("/voice/ws")
+async def analyze_meal_from_voice_websocket(
+    websocket: WebSocket,
+    sample_rate: int = 16000,
+    llm_model_id: Optional[str] = None,
+    language_code: str = "en-US",
+    temperature: Optional[float] = 0.0,
+    seed: Optional[int] = 123456,
+    save_detailed_logs: bool = True,
+    speech_service: str = "deepinfra_whisper",
+    whisper_model: str = "openai/whisper-large-v3-turbo"
+):
+    """
+    話しながら音声を送信できるストリーミング音声分析（WebSocket）
+
+    クライアントは16bit little-endian・モノラルのPCM（sample_rate Hz）をバイナリメッセージで送信します。
+    サーバーは無音で区切られた発話区間ごとに文字起こしを行い、発話終了（一定時間の無音、
+    またはクライアントからの {"type": "end"}）を検出した時点でNLU→栄養検索→栄養計算を開始します。
+
+    サーバーからは {"event": イベント名, "data": ペイロード} 形式のJSONを送信します:
+        partial_transcript: 発話区間の文字起こし結果（transcript はそれまでの全文）
+        end_of_speech: 発話終了の検出
+        phase1_detected / ingredient_matched / nutrition_calculated: /voice/stream と同じ段階イベント
+        final: {"result": /voice と同じ形式の結果, "end_of_speech_to_result_ms": 発話終了から結果までの時間}
+        error: {"status_code", "detail"}
+    final または error の送信後にサーバーから接続を閉じます。
+    パラメータはクエリ文字列で指定します（/voice と同じ、sample_rate を除く）。
+    """
+    try:
+        _validate_voice_parameters(temperature, speech_service)
+        if not 8000 <= sample_rate <= 48000:
+            raise HTTPException(
+                status_code=400,
+                detail={"code": VoiceAnalysisErrorCodes.INVALID_PARAMETERS, "message": "sample_rate must be between 8000 and 48000"}
+            )
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail["message"])
+        return
 
-    except HTTPException:
-        raise
+    await websocket.accept()
+
+    async def send(event: str, data: dict) -> None:
+        await websocket.send_json({"event": event, "data": data})
+
+    session = None
+    try:
+        session = StreamingVoiceSession(
+            VoiceAnalysisPipeline(speech_service=speech_service, whisper_model=whisper_model),
+            send,
+            sample_rate=sample_rate,
+            language_code=language_code,
+            llm_model_id=llm_model_id,
+            temperature=temperature,
+            seed=seed,
+            save_detailed_logs=save_detailed_logs
+        )
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                if await session.feed(message["bytes"]):
+                    break
+            elif message.get("text") and _is_end_message(message["text"]):
+                break
+
+        await session.finish(_build_unified_response)
+    except WebSocketDisconnect:
+        logger.info("Voice WebSocket client disconnected before the analysis completed")
+        if session:
+            session.cancel()
+        return
     except Exception as e:
-        logger.error(f"[{analysis_id}] Voice meal analysis failed: {str(e)}", exc_info=True)
+        logger.error(f"Streaming voice analysis failed: {e}", exc_info=True)
+        if session:
+            session.cancel()
+        status_code = 400 if isinstance(e, ValueError) else 500
+        await send(ERROR, {"status_code": status_code, "detail": str(e)})
 
-        # エラー時もResultManagerを保存
-        if 'result_manager' in locals() and result_manager:
-            result_manager.set_final_result({
-                "error": str(e),
-                "timestamp": datetime.now().isoformat(),
-                "analysis_id": analysis_id
-            })
-            result_manager.finalize_pipeline()
-            result_manager.save_phase_results()
+    await websocket.close()
 
+
+def _is_end_message(text: str) -> bool:
+    """
+    WebSocketのテキストメッセージが発話終了（{"type": "end"}）かどうか
+
+    Raises:
+        ValueError: JSONオブジェクトでないメッセージの場合（クライアントのエラーとして400を返す）
+    """
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Text messages must be JSON objects such as {{\"type\": \"end\"}}: {e}") from e
+    if not isinstance(payload, dict):
+        raise ValueError('Text messages must be JSON objects such as {"type": "end"}')
+    return payload.get("type") == "end"
+
+
+async def _run_voice_analysis(
+    audio_data: bytes,
+    audio_mime_type: str,
+    language_code: str = "en-US",
+    llm_model_id: Optional[str] = None,
+    optional_text: Optional[str] = None,
+    temperature: Optional[float] = 0.0,
+    seed: Optional[int] = 123456,
+    save_detailed_logs: bool = True,
+    test_execution: bool = False,
+    test_results_dir: Optional[str] = None,
+    speech_service: str = "deepinfra_whisper",
+    whisper_model: str = "openai/whisper-large-v3-turbo",
+    event_callback: Optional[PipelineEventCallback] = None
+) -> SimplifiedCompleteAnalysisResponse:
+    """音声分析パイプラインを実行して画像分析と同一形式のレスポンスを返す（同期・ストリーミングエンドポイント共通）"""
+    pipeline = VoiceAnalysisPipeline(
+        speech_service=speech_service,
+        whisper_model=whisper_model
+    )
+    result = await pipeline.execute_complete_analysis(
+        audio_bytes=audio_data,
+        audio_mime_type=audio_mime_type,
+        language_code=language_code,
+        llm_model_id=llm_model_id,
+        optional_text=optional_text,
+        temperature=temperature,
+        seed=seed,
+        save_detailed_logs=save_detailed_logs,
+        test_execution=test_execution,
+        test_results_dir=test_results_dir,
+        event_callback=event_callback
+    )
+    return _build_unified_response(result)
+
+
+async def _read_validated_audio(audio: UploadFile, temperature: Optional[float], speech_service: str) -> bytes:
+    """音声入力とパラメータを検証して音声データを読み込む"""
+    await _validate_audio_input(audio)
+    _validate_voice_parameters(temperature, speech_service)
+
+    audio_data = await audio.read()
+    if not audio_data:
         raise HTTPException(
-            status_code=500,
+            status_code=400,
             detail={
-                "code": VoiceAnalysisErrorCodes.INTERNAL_ERROR,
-                "message": f"Voice meal analysis failed: {str(e)}"
+                "code": VoiceAnalysisErrorCodes.EMPTY_AUDIO_FILE,
+                "message": "Audio file is empty"
             }
         )
+    return audio_data
 
 
 async def _validate_audio_input(audio: UploadFile) -> None:
@@ -460,81 +357,38 @@ async def _validate_audio_input(audio: UploadFile) -> None:
             )
 
 
-def _build_unified_response(
-    analysis_id: str,
-    phase1_result,
-    nutrition_calculation_result,
-    nutrition_search_result,
-    processing_time: float,
-    llm_model_id: Optional[str]
-) -> SimplifiedCompleteAnalysisResponse:
-    """画像分析と同一フォーマットのレスポンスを構築"""
+def _validate_voice_parameters(temperature: Optional[float], speech_service: str) -> None:
+    """音声分析パラメータの検証"""
+    # temperature パラメータの範囲検証
+    if temperature is not None and (temperature < 0.0 or temperature > 1.0):
+        raise HTTPException(
+            status_code=400,
+            detail={"code": VoiceAnalysisErrorCodes.INVALID_PARAMETERS, "message": "temperature must be between 0.0 and 1.0"}
+        )
 
-    # 料理情報を構築（実際のレスポンス構造に合わせて修正）
-    dishes = []
-    for dish in nutrition_calculation_result.meal_nutrition.dishes:
-        # 食材詳細リストを構築
-        ingredients = []
-        for ing in dish.ingredients:
-            ingredient_data = {
-                "ingredient_name": ing.ingredient_name,
-                "weight_g": ing.weight_g,
-                "nutrition_per_100g": ing.nutrition_per_100g,
-                "calculated_nutrition": {
-                    "calories": ing.calculated_nutrition.calories,
-                    "protein": ing.calculated_nutrition.protein,
-                    "fat": ing.calculated_nutrition.fat,
-                    "carbs": ing.calculated_nutrition.carbs,
-                    "fiber": ing.calculated_nutrition.fiber,
-                    "sugar": ing.calculated_nutrition.sugar,
-                    "sodium": ing.calculated_nutrition.sodium
-                },
-                "source_db": ing.source_db,
-                "calculation_notes": ing.calculation_notes
-            }
-            ingredients.append(ingredient_data)
-
-        dish_data = {
-            "dish_name": dish.dish_name,
-            "confidence": dish.confidence,
-            "ingredients": ingredients,
-            "total_nutrition": {
-                "calories": dish.total_nutrition.calories,
-                "protein": dish.total_nutrition.protein,
-                "fat": dish.total_nutrition.fat,
-                "carbs": dish.total_nutrition.carbs,
-                "fiber": dish.total_nutrition.fiber,
-                "sugar": dish.total_nutrition.sugar,
-                "sodium": dish.total_nutrition.sodium
-            },
-            "calculation_metadata": dish.calculation_metadata
-        }
-        dishes.append(dish_data)
-
-    # 総栄養価
-    total_nutrition = {
-        "calories": nutrition_calculation_result.meal_nutrition.total_nutrition.calories,
-        "protein": nutrition_calculation_result.meal_nutrition.total_nutrition.protein,
-        "fat": nutrition_calculation_result.meal_nutrition.total_nutrition.fat,
-        "carbs": nutrition_calculation_result.meal_nutrition.total_nutrition.carbs,
-        "fiber": nutrition_calculation_result.meal_nutrition.total_nutrition.fiber,
-        "sugar": nutrition_calculation_result.meal_nutrition.total_nutrition.sugar,
-        "sodium": nutrition_calculation_result.meal_nutrition.total_nutrition.sodium
-    }
-
-    # 使用モデル決定（音声分析ではNLUでLLMを使用）
-    from shared.config.settings import get_settings
-    settings = get_settings()
-    ai_model_used = llm_model_id or settings.DEEPINFRA_MODEL_ID
+    # speech_service パラメータ検証
+    valid_services = ["google", "deepinfra_whisper", "local_whisper"]
+    if speech_service not in valid_services:
+        raise HTTPException(
+            status_code=400,
+            detail={"code": VoiceAnalysisErrorCodes.INVALID_PARAMETERS, "message": f"Invalid speech_service. Must be one of: {valid_services}"}
+        )
+
+
+def _build_unified_response(result: dict) -> SimplifiedCompleteAnalysisResponse:
+    """画像分析と同一フォーマットのレスポンスを構築"""
+    final_nutrition_result = result.get("final_nutrition_result", {})
+    dishes = final_nutrition_result.get("dishes", [])
+    processing_summary = result.get("processing_summary", {})
 
     return SimplifiedCompleteAnalysisResponse(
-        analysis_id=analysis_id,
+        analysis_id=result.get("analysis_id", "unknown"),
         input_type="voice",  # 音声分析特有のフィールド
         total_dishes=len(dishes),
         total_ingredients=sum(len(dish["ingredients"]) for dish in dishes),
-        processing_time_seconds=processing_time,
+        processing_time_seconds=processing_summary.get("processing_time_seconds", 0.0),
         dishes=dishes,
-        total_nutrition=total_nutrition,
-        ai_model_used=ai_model_used,
-        match_rate_percent=nutrition_search_result.get_match_rate() * 100
-    )
\ No newline at end of file
+        total_nutrition=final_nutrition_result.get("total_nutrition", {}),
+        ai_model_used=result.get("ai_model_used", "unknown"),
+        match_rate_percent=result.get("nutrition_search_result", {}).get("match_rate", 0.0) * 100
+    )
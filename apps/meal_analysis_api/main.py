@@ -8,13 +8,19 @@ import sys
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 # PYTHONPATHを設定して共通ライブラリにアクセス
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from apps.meal_analysis_api.endpoints.meal_analysis import router as meal_router
 from apps.meal_analysis_api.endpoints.voice_analysis import router as voice_router
+from apps.meal_analysis_api.endpoints.jobs import router as jobs_router, start_job_workers, stop_job_workers
 from shared.models.phase1_models import RootResponse
+from shared.config.settings import get_settings
+from shared.middleware import AdmissionControlMiddleware, AdmissionRule
+from shared.services.whisper_inference_pool import preload_whisper_models, shutdown_whisper_inference_pool
+from shared.utils.metrics import get_metrics_registry
 
 # ログ設定
 logging.basicConfig(level=logging.INFO)
@@ -38,6 +44,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# アドミッション制御（Vision / 音声パイプラインの同時実行数を制限）
+settings = get_settings()
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        rules=[
+            AdmissionRule(
+                name="complete",
+                path_prefix="/api/v1/meal-analyses/complete",
+                methods=["POST"],
+                max_concurrency=settings.ADMISSION_COMPLETE_MAX_CONCURRENCY,
+                max_queue=settings.ADMISSION_COMPLETE_MAX_QUEUE,
+                queue_timeout_seconds=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+            ),
+            AdmissionRule(
+                name="voice",
+                path_prefix="/api/v1/meal-analyses/voice",
+                methods=["POST"],
+                websocket=True,  # /voice/ws も同じパイプラインを実行する
+                max_concurrency=settings.ADMISSION_VOICE_MAX_CONCURRENCY,
+                max_queue=settings.ADMISSION_VOICE_MAX_QUEUE,
+                queue_timeout_seconds=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+            ),
+        ]
+    )
+
 # ルーター登録 - app_v2と同じパス構造に
 app.include_router(
     meal_router,
@@ -51,6 +83,25 @@ app.include_router(
     tags=["Voice Meal Analysis v2.0"]
 )
 
+app.include_router(
+    jobs_router,
+    prefix="/api/v1/meal-analyses",
+    tags=["Async Analysis Jobs"]
+)
+
+@app.on_event("startup")
+async def startup_event():
+    """非同期ジョブワーカーの起動・ローカルWhisperモデルの事前ロード"""
+    await start_job_workers()
+    if settings.LOCAL_WHISPER_PRELOAD_MODELS:
+        await preload_whisper_models(settings.LOCAL_WHISPER_PRELOAD_MODELS, settings.LOCAL_WHISPER_DEVICE)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """非同期ジョブワーカーの停止（実行中ジョブのリースを返却）・ローカルWhisper推論プールの停止"""
+    await stop_job_workers()
+    await shutdown_whisper_inference_pool()
+
 @app.get("/", response_model=RootResponse)
 async def root() -> RootResponse:
     """ルートエンドポイント"""
@@ -71,6 +122,11 @@ async def health():
         "components": ["Phase1Component", "Phase1SpeechComponent", "AdvancedNutritionSearchComponent", "NutritionCalculationComponent"]
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus形式のメトリクス（キュー深さ・同時実行数など）"""
+    return get_metrics_registry().render_prometheus()
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8001))
@@ -0,0 +1,34 @@
+"""
+非同期ジョブAPI用のPydanticモデル
+"""
+from typing import Any, Dict, Optional
+from pydantic import BaseModel, Field
+
+
+class JobSubmissionResponse(BaseModel):
+    """ジョブ投入レスポンス"""
+    job_id: str = Field(..., description="ジョブID", example="3f1c9a0e5b2d4c7e8a6f1b2c3d4e5f60")
+    kind: str = Field(..., description="ジョブ種別", example="complete")
+    status: str = Field(..., description="ジョブ状態", example="queued")
+    status_url: str = Field(..., description="状態確認URL", example="/api/v1/meal-analyses/jobs/3f1c9a0e5b2d4c7e8a6f1b2c3d4e5f60")
+    created_at: float = Field(..., description="投入時刻（UNIX秒）")
+
+    model_config = {"protected_namespaces": ()}
+
+
+class JobStatusResponse(BaseModel):
+    """ジョブ状態レスポンス"""
+    job_id: str = Field(..., description="ジョブID")
+    kind: str = Field(..., description="ジョブ種別", example="voice")
+    status: str = Field(..., description="ジョブ状態 (queued | running | succeeded | failed)", example="succeeded")
+    attempts: int = Field(..., description="試行回数", example=1)
+    max_attempts: int = Field(..., description="最大試行回数", example=3)
+    created_at: float = Field(..., description="投入時刻（UNIX秒）")
+    updated_at: float = Field(..., description="最終更新時刻（UNIX秒）")
+    started_at: Optional[float] = Field(None, description="初回実行開始時刻（UNIX秒）")
+    completed_at: Optional[float] = Field(None, description="完了時刻（UNIX秒）")
+    result: Optional[Dict[str, Any]] = Field(None, description="分析結果（SimplifiedCompleteAnalysisResponseと同一構造）")
+    error: Optional[str] = Field(None, description="最後のエラーメッセージ")
+    webhook_status: Optional[str] = Field(None, description="Webhook配信結果", example="delivered:200")
+
+    model_config = {"protected_namespaces": ()}
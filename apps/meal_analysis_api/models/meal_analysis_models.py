@@ -65,6 +65,7 @@ class SimplifiedCompleteAnalysisResponse(BaseModel):
     # デバッグ・メタデータ（重要な部分のみ）
     ai_model_used: Optional[str] = Field(None, description="使用AIモデル", example="google/gemma-3-27b-it")
     match_rate_percent: float = Field(..., description="栄養検索マッチ率（%）", example=100.0)
+    model_routing: Optional[Dict[str, Any]] = Field(None, description="自動モデルルーティングの判断（ai_model_id=auto の場合のみ）")
 
     model_config = {"protected_namespaces": ()}
 
@@ -109,6 +109,7 @@ class VoiceAnalysisErrorCodes:
     INVALID_AUDIO_FILE = "INVALID_AUDIO_FILE"
     EMPTY_AUDIO_FILE = "EMPTY_AUDIO_FILE"
     UNSUPPORTED_AUDIO_FORMAT = "UNSUPPORTED_AUDIO_FORMAT"
+    INVALID_PARAMETERS = "INVALID_PARAMETERS"
     SPEECH_TO_TEXT_FAILED = "SPEECH_TO_TEXT_FAILED"
     NO_SPEECH_DETECTED = "NO_SPEECH_DETECTED"
     LLM_EXTRACTION_FAILED = "LLM_EXTRACTION_FAILED"
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query
 from fastapi.responses import JSONResponse
+from collections import deque
+import hmac
 from typing import Optional
 import logging
+import os
 import time
 import requests
 import json
 from datetime import datetime
 
+from shared.cassette import cassette_session
+from shared.config.settings import get_settings
 # レスポンスモデルをインポート
 from shared.models.nutrition_search_models import (
     SuggestionResponse, SuggestionErrorResponse, QueryInfo, Suggestion,
@@ -51,8 +56,20 @@ def stem_query(query: str) -> str:
 router = APIRouter()
 
 # Production Elasticsearch VM configuration
-ELASTICSEARCH_URL = "http://35.193.16.212:9200"
-INDEX_NAME = "mynetdiary_converted_tool_calls_list_stemmed"
+# Override with ELASTICSEARCH_URL environment variable (e.g. the bundled elasticsearch-8.10.4 at http://localhost:9200)
+ELASTICSEARCH_URL = os.environ.get("ELASTICSEARCH_URL", "http://35.193.16.212:9200")
+# 読み取り用エイリアス（物理インデックスは {alias}_v<日時>、scripts/es_versioned_index.py が切り替える）
+INDEX_ALIAS = "mynetdiary_converted_tool_calls_list_stemmed"
+
+# 直近の検索クエリ（再インデックス時のウォームアップで再生する）
+RECENT_QUERY_LOG_SIZE = 1000
+recent_queries = deque(maxlen=RECENT_QUERY_LOG_SIZE)
+
+
+def _es_http():
+    """Elasticsearchへの送信に使うHTTPクライアント（CASSETTE_MODE=record | replay の場合はカセットを経由）"""
+    return cassette_session() or requests
+
 
 def elasticsearch_exact_match_first(query: str, size: int = 10) -> dict:
     """
@@ -80,8 +97,8 @@ def elasticsearch_exact_match_first(query: str, size: int = 10) -> dict:
     }
     
     try:
-        response = requests.post(
-            f"{ELASTICSEARCH_URL}/{INDEX_NAME}/_search",
+        response = _es_http().post(
+            f"{ELASTICSEARCH_URL}/{INDEX_ALIAS}/_search",
             headers={"Content-Type": "application/json"},
             data=json.dumps(exact_match_body),
             timeout=5
@@ -134,7 +151,8 @@ def elasticsearch_exact_match_first(query: str, size: int = 10) -> dict:
     
     return result
 
-def elasticsearch_exact_match_only(query: str, size: int = 10, exclude_uncooked: bool = False) -> dict:
+def elasticsearch_exact_match_only(query: str, size: int = 10, exclude_uncooked: bool = False,
+                                   index_url: Optional[str] = None) -> dict:
     """
     Exact Matchのみ実行（フォールバックなし）
     
@@ -142,6 +160,7 @@ def elasticsearch_exact_match_only(query: str, size: int = 10, exclude_uncooked:
         query: 検索クエリ
         size: 結果数
         exclude_uncooked: uncookedを含む食材を除外
+        index_url: 検索するインデックスのURL（省略時はエイリアス、ウォームアップでは切り替え前の物理インデックス）
     """
     
     import time
@@ -170,8 +189,8 @@ def elasticsearch_exact_match_only(query: str, size: int = 10, exclude_uncooked:
         }]
     
     try:
-        response = requests.post(
-            f"{ELASTICSEARCH_URL}/{INDEX_NAME}/_search",
+        response = _es_http().post(
+            f"{index_url or f'{ELASTICSEARCH_URL}/{INDEX_ALIAS}'}/_search",
             headers={"Content-Type": "application/json"},
             data=json.dumps(exact_match_body),
             timeout=5
@@ -288,8 +307,9 @@ def determine_match_type(query: str, explanation: str, original_name: str,
     return "tier_7_fuzzy"
 
 
-def elasticsearch_search_optimized_fallback(query: str, size: int = 10, exclude_uncooked: bool = False) -> dict:
-    """語幹化フィールドを使用するTierアルゴリズム"""
+def elasticsearch_search_optimized_fallback(query: str, size: int = 10, exclude_uncooked: bool = False,
+                                            index_url: Optional[str] = None) -> dict:
+    """語幹化フィールドを使用するTierアルゴリズム（index_url はウォームアップ時に物理インデックスを指定）"""
     
     # クエリを語幹化
     stemmed_query = stem_query(query)
@@ -339,8 +359,8 @@ def elasticsearch_search_optimized_fallback(query: str, size: int = 10, exclude_
         }]
 
     try:
-        response = requests.post(
-            f"{ELASTICSEARCH_URL}/{INDEX_NAME}/_search",
+        response = _es_http().post(
+            f"{index_url or f'{ELASTICSEARCH_URL}/{INDEX_ALIAS}'}/_search",
             headers={"Content-Type": "application/json"},
             data=json.dumps(search_body),
             timeout=5
@@ -503,7 +523,7 @@ async def suggest_foods(
                 "total_hits": total_hits,
                 "search_time_ms": es_time,
                 "processing_time_ms": processing_time,
-                "elasticsearch_index": INDEX_NAME
+                "elasticsearch_index": INDEX_ALIAS
             },
             "status": {
                 "success": True,
@@ -532,6 +552,7 @@ async def suggest_foods(
             }
 
         logger.info(f"Suggestion completed: {len(suggestions)} results in {processing_time}ms using {search_strategy}")
+        recent_queries.append({"q": q.strip(), "search_context": search_context, "exclude_uncooked": exclude_uncooked})
 
         # Pydanticモデルとして返す
         return SuggestionResponse(**response_data)
@@ -554,7 +575,7 @@ async def suggest_foods(
                 total_hits=0,
                 search_time_ms=0,
                 processing_time_ms=processing_time,
-                elasticsearch_index=INDEX_NAME
+                elasticsearch_index=INDEX_ALIAS
             ),
             status=SearchStatus(
                 success=False,
@@ -563,6 +584,25 @@ async def suggest_foods(
         )
         return JSONResponse(status_code=500, content=error_response.dict())
 
+@router.get("/suggest/recent-queries", include_in_schema=False)
+async def get_recent_queries(
+    limit: int = Query(200, ge=1, le=RECENT_QUERY_LOG_SIZE, description="返すクエリ数"),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    直近の検索クエリ（新しい順、再インデックス時のウォームアップ用）
+
+    ユーザーの検索語をそのまま返すため、RECENT_QUERIES_TOKEN を設定した場合のみ有効で、
+    Authorization: Bearer <RECENT_QUERIES_TOKEN> が必要です（未設定の場合は404）。
+    """
+    token = get_settings().RECENT_QUERIES_TOKEN
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not authorization or not hmac.compare_digest(authorization.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid or missing bearer token",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return {"queries": list(recent_queries)[::-1][:limit]}
+
 @router.get("/suggest/health")
 async def suggestion_health_check():
     """検索予測APIのヘルスチェック"""
@@ -573,7 +613,7 @@ async def suggestion_health_check():
         return {
             "status": "healthy" if "error" not in test_result else "unhealthy",
             "service": "nutrition_suggestion_api",
-            "elasticsearch_index": INDEX_NAME,
+            "elasticsearch_index": INDEX_ALIAS,
             "algorithm": "7_tier_optimized",
             "test_query_success": "error" not in test_result
         }
@@ -8,11 +8,15 @@ import sys
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 # PYTHONPATHを設定して共通ライブラリにアクセス
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from apps.word_query_api.endpoints.nutrition_search import router as nutrition_router
+from shared.config.settings import get_settings
+from shared.middleware import AdmissionControlMiddleware, AdmissionRule, search_context_priority
+from shared.utils.metrics import get_metrics_registry
 
 # ログ設定
 logging.basicConfig(level=logging.INFO)
@@ -36,6 +40,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# アドミッション制御（meal_analysis由来の検索をword_search補完より優先）
+settings = get_settings()
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        rules=[
+            AdmissionRule(
+                name="suggest",
+                path_prefix="/api/v1/nutrition/suggest",
+                methods=["GET"],
+                exact_path=True,
+                max_concurrency=settings.ADMISSION_SUGGEST_MAX_CONCURRENCY,
+                max_queue=settings.ADMISSION_SUGGEST_MAX_QUEUE,
+                queue_timeout_seconds=settings.ADMISSION_SUGGEST_QUEUE_TIMEOUT_SECONDS,
+                priority_resolver=search_context_priority
+            ),
+        ]
+    )
+
 # ルーター登録
 app.include_router(
     nutrition_router,
@@ -66,6 +89,11 @@ async def health_check():
         "architecture": "unified"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse, tags=["health"])
+async def metrics():
+    """Prometheus形式のメトリクス（キュー深さ・同時実行数など）"""
+    return get_metrics_registry().render_prometheus()
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8002))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+栄養データベース検索ハンドラー（nutrition_db_experiment/search_service/api/search_handler.py）のスループット測定
+
+同梱の elasticsearch-8.10.4 を起動した状態（./elasticsearch-8.10.4/bin/elasticsearch -d）で、
+MyNetDiary 食材名をドキュメントとした一時インデックスを作成し、同じクエリ列を次の方法で検索します。
+
+- 同期: NutritionSearchHandler.search() を1件ずつ
+- 非同期（個別）: AsyncNutritionSearchHandler.search() を --concurrency 件ずつ並行実行
+- 非同期（一括）: AsyncNutritionSearchHandler.search_many() で --batch-size 件ずつ1回の _msearch
+
+使用例:
+    python benchmarks/bench_async_search_handler.py
+    ELASTICSEARCH_URL=http://localhost:9200 python benchmarks/bench_async_search_handler.py --queries 5000 --batch-size 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+SEARCH_SERVICE = ROOT / "nutrition_db_experiment" / "search_service"
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(SEARCH_SERVICE))
+
+from elasticsearch import Elasticsearch, helpers  # noqa: E402
+
+from api.search_handler import AsyncNutritionSearchHandler, NutritionSearchHandler, SearchRequest  # noqa: E402
+from shared.utils.mynetdiary_utils import load_mynetdiary_ingredient_names  # noqa: E402
+
+DB_TYPES = ["dish", "ingredient", "branded"]
+
+INDEX_BODY = {
+    "settings": {"number_of_shards": 1, "number_of_replicas": 0},
+    "mappings": {
+        "properties": {
+            "db_type": {"type": "keyword"},
+            "id": {"type": "integer"},
+            "search_name": {"type": "text", "fields": {"exact": {"type": "keyword", "normalizer": "lowercase"}}},
+            "nutrition": {"type": "object", "enabled": False},
+            "weight": {"type": "float"}
+        }
+    }
+}
+
+
+def create_index(es: Elasticsearch, index: str, names: List[str]):
+    """食材名を db_type を順に割り当てたドキュメントとして一時インデックスに登録"""
+    es.options(ignore_status=404).indices.delete(index=index)
+    es.indices.create(index=index, **INDEX_BODY)
+    helpers.bulk(es, (
+        {"_index": index, "_id": i, "db_type": DB_TYPES[i % len(DB_TYPES)], "id": i, "search_name": name,
+         "nutrition": {"calories": 100.0}, "weight": 100.0}
+        for i, name in enumerate(names)
+    ), refresh=True)
+
+
+def bench_sync(es_url: str, index: str, requests: List[SearchRequest]) -> float:
+    handler = NutritionSearchHandler(es_url, index)
+    started = time.perf_counter()
+    for request in requests:
+        handler.search(request)
+    return time.perf_counter() - started
+
+
+async def bench_async_single(es_url: str, index: str, requests: List[SearchRequest], concurrency: int) -> float:
+    async with AsyncNutritionSearchHandler(es_url, index) as handler:
+        await handler.search(requests[0])  # 接続の確立
+        started = time.perf_counter()
+        for i in range(0, len(requests), concurrency):
+            await asyncio.gather(*(handler.search(request) for request in requests[i:i + concurrency]))
+        return time.perf_counter() - started
+
+
+async def bench_async_batch(es_url: str, index: str, requests: List[SearchRequest], batch_size: int) -> float:
+    async with AsyncNutritionSearchHandler(es_url, index) as handler:
+        await handler.search(requests[0])  # 接続の確立
+        started = time.perf_counter()
+        for i in range(0, len(requests), batch_size):
+            responses = await handler.search_many(requests[i:i + batch_size])
+            errors = [response for response in responses if "error" in response.query_info]
+            if errors:
+                raise RuntimeError(errors[0].query_info["error"])
+        return time.perf_counter() - started
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Benchmark sync search, concurrent async search and _msearch batches")
+    parser.add_argument("--es-url", default=os.environ.get("ELASTICSEARCH_URL", "http://localhost:9200"))
+    parser.add_argument("--index", default="nutrition_db_search_bench")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=50, help="Requests per search_many() call")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent search() calls")
+    parser.add_argument("--keep-index", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    es = Elasticsearch(args.es_url)
+    if not es.ping():
+        print(f"❌ Elasticsearch に接続できません: {args.es_url}"
+              "（./elasticsearch-8.10.4/bin/elasticsearch -d で起動してください）")
+        return False
+
+    names = load_mynetdiary_ingredient_names()
+    rng = random.Random(args.seed)
+    requests = [SearchRequest(rng.choice(names), db_type_filter=rng.choice([None] + DB_TYPES), size=10)
+                for _ in range(args.queries)]
+
+    create_index(es, args.index, names)
+    try:
+        print(f"🚀 Search handler benchmark ({len(names)} docs, {len(requests)} queries, {args.es_url})")
+        print(f"   {'method':<40}{'queries/sec':>13}")
+        for label, run in [
+            ("sync search()", lambda: bench_sync(args.es_url, args.index, requests)),
+            (f"async search() x{args.concurrency} concurrent",
+             lambda: asyncio.run(bench_async_single(args.es_url, args.index, requests, args.concurrency))),
+            (f"async search_many() batch {args.batch_size}",
+             lambda: asyncio.run(bench_async_batch(args.es_url, args.index, requests, args.batch_size))),
+        ]:
+            seconds = run()
+            print(f"   {label:<40}{len(requests) / seconds:>13.0f}")
+    finally:
+        if not args.keep_index:
+            es.options(ignore_status=404).indices.delete(index=args.index)
+
+    print("\n✅ Benchmark completed")
+    return True
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+音声NLUプロンプトの食材名リスト絞り込みのベンチマーク（全リスト vs 言及ごとの上位K件）
+
+ラベル付きの文字起こしごとに、プロンプトのトークン数（概算）・候補の検索時間と、
+正解の食材名が候補に残っているか（再現率）を比較します。
+--live を指定するとDeepInfraのNLUを実際に呼び出し、全リストと絞り込み後のNLU処理時間を計測します
+（DEEPINFRA_API_KEY が必要です）。
+
+使用例:
+    python benchmarks/bench_catalogue_retrieval.py
+    python benchmarks/bench_catalogue_retrieval.py --top-k 4 8 16
+    python benchmarks/bench_catalogue_retrieval.py --live --repeat 3
+"""
+import argparse
+import asyncio
+import logging
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from shared.config.prompts import VoicePrompts  # noqa: E402
+from shared.config.settings import get_settings  # noqa: E402
+from shared.utils.mynetdiary_retrieval import get_catalogue_index  # noqa: E402
+
+# (文字起こし, プロンプトに残っているべき食材名)
+LABELLED_TRANSCRIPTS: List[Tuple[str, List[str]]] = [
+    ("I had scrambled eggs and toast with butter for breakfast",
+     ["Egg scrambled, with salt", "Toasted white bread", "Butter salted"]),
+    ("I had brown rice with steamed broccoli",
+     ["Rice brown long grain cooked without salt", "Broccoli steamed"]),
+    ("For lunch I ate ramen with pork and a glass of orange juice",
+     ["Noodles egg cooked without salt", "Pork loin top roast boneless raw", "Orange juice raw"]),
+    ("A bowl of oatmeal with bananas and honey, and a black coffee",
+     ["Oatmeal or rolled oats cooked without salt", "Bananas raw", "Honey", "Coffee black no sugar"]),
+    ("grilled chiken brest with a side of brocoli and a baked potato",
+     ["Chicken breast grilled boneless skinless", "Broccoli raw", "Potatoes baked with skin without salt"]),
+    ("Two slices of pizza and a coke",
+     ["Mozzarella cheese whole milk", "Marinara or spaghetti sauce", "Carbonated cola regular"]),
+    ("Greek yogurt with strawberries and some granola",
+     ["Greek yogurt plain nonfat", "Strawberries raw"]),
+    ("a salmon fillet with white rice and an avocado",
+     ["Salmon Atlantic wild cooked dry heat", "Rice white cooked without salt", "Avocados raw"]),
+    ("spaghetti with tomato sauce and parmesan cheese",
+     ["Pasta white cooked without salt", "Marinara or spaghetti sauce", "Parmesan cheese grated"]),
+    ("I drank a glass of whole milk and ate an apple",
+     ["Milk whole 3.25% milkfat", "Apples with skin raw"]),
+]
+
+
+def approximate_tokens(text: str) -> int:
+    """単語・記号単位のトークン数の概算（BPEトークナイザーのおおよその下限）"""
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def evaluate(top_k: int) -> Tuple[List[int], List[float], int, int, List[str]]:
+    """絞り込み後のプロンプトのトークン数・検索時間と、正解の食材名の再現数を集計する"""
+    index = get_catalogue_index()
+    tokens, retrieval_ms, found, total, missing = [], [], 0, 0, []
+    for transcript, expected in LABELLED_TRANSCRIPTS:
+        started = time.perf_counter()
+        names = index.candidate_names(transcript, top_k)
+        retrieval_ms.append((time.perf_counter() - started) * 1000)
+        tokens.append(approximate_tokens(VoicePrompts.get_complete_prompt(candidate_names=names or None)))
+        for name in expected:
+            total += 1
+            if name in names:
+                found += 1
+            else:
+                missing.append(f"{transcript[:40]}... → {name}")
+    return tokens, retrieval_ms, found, total, missing
+
+
+async def measure_live_nlu(retrieval: bool, top_k: int, repeat: int) -> Tuple[float, float]:
+    """DeepInfraのNLUを呼び出して処理時間の中央値と、出力した食材名のリスト内一致率を返す"""
+    from shared.services.nlu_service import NLUService, _retrieve_catalogue_candidates
+
+    settings = get_settings()
+    settings.VOICE_NLU_CATALOGUE_RETRIEVAL_ENABLED = retrieval
+    settings.VOICE_NLU_CATALOGUE_TOP_K = top_k
+    _retrieve_catalogue_candidates.cache_clear()
+    catalogue = set(get_catalogue_index().names)
+    service = NLUService()
+
+    latencies, valid, produced = [], 0, 0
+    for _ in range(repeat):
+        for transcript, _expected in LABELLED_TRANSCRIPTS:
+            started = time.perf_counter()
+            result = await service.extract_foods_from_text(transcript, temperature=0.0, seed=123456)
+            latencies.append((time.perf_counter() - started) * 1000)
+            for dish in result.get("dishes", []):
+                for ingredient in dish.get("ingredients", []):
+                    produced += 1
+                    valid += ingredient.get("ingredient_name") in catalogue
+    return statistics.median(latencies), valid / produced if produced else 0.0
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Benchmark catalogue retrieval for the voice NLU prompt")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--live", action="store_true", help="Also call the DeepInfra NLU with both prompts")
+    parser.add_argument("--repeat", type=int, default=1, help="--live: repetitions per transcript")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    full_tokens = approximate_tokens(VoicePrompts.get_complete_prompt())
+    print(f"🚀 Catalogue retrieval benchmark ({len(LABELLED_TRANSCRIPTS)} labelled transcripts, "
+          f"{len(get_catalogue_index().names)} catalogue names)")
+    print(f"{'prompt':<16}{'~tokens (median)':>18}{'reduction':>11}{'retrieval ms':>14}{'recall':>10}")
+    print("-" * 70)
+    print(f"{'full list':<16}{full_tokens:>18}{'-':>11}{'-':>14}{'100.0%':>10}")
+
+    missing_by_k = {}
+    for top_k in args.top_k:
+        tokens, retrieval_ms, found, total, missing = evaluate(top_k)
+        median_tokens = statistics.median(tokens)
+        print(f"{f'top-{top_k}':<16}{median_tokens:>18.0f}{1 - median_tokens / full_tokens:>10.1%}"
+              f"{statistics.mean(retrieval_ms):>14.2f}{found / total:>10.1%}")
+        missing_by_k[top_k] = missing
+
+    for top_k, missing in missing_by_k.items():
+        for item in missing:
+            print(f"  top-{top_k} missing: {item}")
+
+    if args.live:
+        print(f"\n{'NLU (live)':<16}{'median ms':>12}{'names in catalogue':>20}")
+        print("-" * 48)
+        for label, retrieval, top_k in [("full list", False, 0)] + [(f"top-{k}", True, k) for k in args.top_k]:
+            latency_ms, valid_ratio = asyncio.run(measure_live_nlu(retrieval, top_k or 8, args.repeat))
+            print(f"{label:<16}{latency_ms:>12.0f}{valid_ratio:>20.1%}")
+
+    print("\n✅ Benchmark completed")
+    return True
+
+
+if __name__ == "__main__":
+    main()
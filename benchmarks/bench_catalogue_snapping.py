@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+LLM食材名のMyNetDiary食材名への補正（catalogue snapping）のベンチマーク
+
+MyNetDiary食材名にLLMが出しがちな揺れ（複数形・語順・大文字小文字・"cooked" の欠落）を加えた名前と、
+リストにない食品名を使い、1食分（--meal-size 件）と1万件あたりの補正時間、補正の正解率、
+リストにない名前の誤補正率を測定します。1回の cdist による一括補正と、1件ずつ
+rapidfuzz.process.extractOne を呼ぶ方式を比較します。
+
+使用例:
+    python benchmarks/bench_catalogue_snapping.py
+    python benchmarks/bench_catalogue_snapping.py --meal-size 12 --bulk 20000 --workers -1
+"""
+import argparse
+import logging
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from rapidfuzz import fuzz, process
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from shared.utils.catalogue_snapping import (  # noqa: E402
+    UNMATCHED, CatalogueSnapper, normalize_and_sort
+)
+from shared.utils.mynetdiary_utils import load_mynetdiary_ingredient_names  # noqa: E402
+
+# リストにない食品名（補正されないことが正解）
+OUT_OF_CATALOGUE = [
+    "Dragon fruit smoothie", "Kimchi fried rice", "Matcha latte", "Beef bulgogi", "Pad thai",
+    "Acai bowl", "Chicken tikka masala", "Miso soup", "Tteokbokki", "Falafel wrap",
+]
+
+
+def perturb(name: str, rng: random.Random) -> str:
+    """LLMの出力に見られる揺れを1つ加える"""
+    words = name.split()
+    choice = rng.randrange(4)
+    if choice == 0 and "cooked" in words:
+        words.remove("cooked")
+    elif choice == 1 and len(words) > 1:
+        words = [words[-1]] + words[:-1]
+    elif choice == 2:
+        words = [word[:-1] if len(word) > 4 and word.endswith("s") else word + "s" if word.isalpha() else word
+                 for word in words[:1]] + words[1:]
+    else:
+        words = [word.lower() for word in words]
+    return " ".join(words)
+
+
+def build_queries(names: List[str], count: int, seed: int) -> List[Tuple[str, str]]:
+    """(クエリ, 正解の食材名) の一覧。正解がリスト外の場合は空文字列"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        if rng.random() < 0.1:
+            queries.append((rng.choice(OUT_OF_CATALOGUE), ""))
+        else:
+            name = rng.choice(names)
+            queries.append((perturb(name, rng), name))
+    return queries
+
+
+def snap_one_by_one(snapper: CatalogueSnapper, names: List[str]) -> List[str]:
+    """比較用: 1件ずつ extractOne で最良候補を探す（token-sort比率のみ）"""
+    choices = [normalize_and_sort(name) for name in snapper.names]
+    snapped = []
+    for name in names:
+        match = process.extractOne(normalize_and_sort(name), choices, scorer=fuzz.token_sort_ratio,
+                                   score_cutoff=snapper.min_token_sort)
+        snapped.append(snapper.names[match[2]] if match else name)
+    return snapped
+
+
+def accuracy(queries: List[Tuple[str, str]], snapped: List[str]) -> Tuple[float, float]:
+    """リスト内の名前の正解率と、リスト外の名前の誤補正率"""
+    in_catalogue = [(expected, name) for (_, expected), name in zip(queries, snapped) if expected]
+    out_of_catalogue = [(query, name) for (query, expected), name in zip(queries, snapped) if not expected]
+    correct = sum(expected == name for expected, name in in_catalogue) / len(in_catalogue)
+    false_snaps = sum(query != name for query, name in out_of_catalogue) / max(len(out_of_catalogue), 1)
+    return correct, false_snaps
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Benchmark catalogue snapping of LLM ingredient names")
+    parser.add_argument("--meal-size", type=int, default=8, help="Ingredient names per meal")
+    parser.add_argument("--meals", type=int, default=200, help="Meals to time")
+    parser.add_argument("--bulk", type=int, default=10000, help="Names for the bulk timing")
+    parser.add_argument("--workers", type=int, default=1, help="cdist threads (-1: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    catalogue = load_mynetdiary_ingredient_names()
+    started = time.perf_counter()
+    snapper = CatalogueSnapper(catalogue, workers=args.workers)
+    init_ms = (time.perf_counter() - started) * 1000
+    print(f"🚀 Catalogue snapping benchmark ({len(catalogue)} catalogue names, init {init_ms:.1f} ms)")
+
+    meal_queries = build_queries(catalogue, args.meal_size * args.meals, args.seed)
+    meals = [meal_queries[i:i + args.meal_size] for i in range(0, len(meal_queries), args.meal_size)]
+    bulk_queries = build_queries(catalogue, args.bulk, args.seed + 1)
+
+    print(f"{'method':<22}{'per meal ms (p50)':>19}{'per meal ms (p95)':>19}{f'per {args.bulk} ms':>16}"
+          f"{'correct':>10}{'false snaps':>13}")
+    print("-" * 99)
+    for label, snap in [
+        ("cdist (snap_many)", lambda names: [result.name for result in snapper.snap_many(names)]),
+        ("extractOne per name", lambda names: snap_one_by_one(snapper, names)),
+    ]:
+        meal_ms = []
+        for meal in meals:
+            started = time.perf_counter()
+            snap([query for query, _ in meal])
+            meal_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        snapped = snap([query for query, _ in bulk_queries])
+        bulk_ms = (time.perf_counter() - started) * 1000
+        correct, false_snaps = accuracy(bulk_queries, snapped)
+        p95 = statistics.quantiles(meal_ms, n=20)[-1]
+        print(f"{label:<22}{statistics.median(meal_ms):>19.2f}{p95:>19.2f}{bulk_ms:>16.0f}"
+              f"{correct:>10.1%}{false_snaps:>13.1%}")
+
+    methods = [result.method for result in snapper.snap_many([query for query, _ in bulk_queries])]
+    print("\nsnap_many outcome: " + ", ".join(
+        f"{method} {methods.count(method) / len(methods):.1%}" for method in dict.fromkeys(methods)
+    ) + f" ({UNMATCHED}: name kept as-is)")
+    print("\n✅ Benchmark completed")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+長時間音声の分割並列文字起こしのベンチマーク（1リクエスト vs 無音分割 + 並列）
+
+test_audio/ の *_detailed.wav を間に無音を挟んで繰り返し連結し、数分の音声を作成して比較します。
+デフォルトの simulated バックエンドは「固定遅延 + 音声長 × 実時間係数」で応答する代替で、
+各クリップの位置に置いた擬似単語を返すため、結合結果の重複・欠落も検証できます。
+--backend deepinfra / local_whisper を指定すると実際の音声認識サービスで計測します。
+
+使用例:
+    python benchmarks/bench_chunked_transcription.py
+    python benchmarks/bench_chunked_transcription.py --minutes 5 --concurrency 1 2 4 8
+    python benchmarks/bench_chunked_transcription.py --backend deepinfra --minutes 2
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from shared.services.chunked_transcription import transcribe_in_chunks  # noqa: E402
+from shared.utils.audio_chunking import AudioChunk, split_audio_on_silence  # noqa: E402
+from shared.utils.audio_normalization import decode_audio, downmix_to_mono, encode_audio  # noqa: E402
+from shared.utils.metrics import MetricsRegistry  # noqa: E402
+
+AUDIO_DIR = Path(__file__).resolve().parent.parent / "test_audio"
+# 擬似単語の間隔（秒）
+_WORD_SECONDS = 0.4
+
+
+def build_long_recording(minutes: float, gap_seconds: float) -> Tuple[bytes, List[Tuple[float, str]]]:
+    """
+    *_detailed.wav を無音を挟んで連結した音声と、擬似単語の (時刻, 単語) 一覧を作成
+
+    擬似単語は各クリップ内に等間隔で配置します（simulatedバックエンドの応答用）。
+    """
+    clips = []
+    sample_rate = None
+    for path in sorted(AUDIO_DIR.glob("*_detailed.wav")):
+        samples, rate = decode_audio(path.read_bytes())
+        if sample_rate not in (None, rate):
+            raise ValueError(f"Sample rate mismatch: {path.name}")
+        sample_rate = rate
+        clips.append((path.stem, downmix_to_mono(samples)))
+    if not clips:
+        raise FileNotFoundError(f"No *_detailed.wav files in {AUDIO_DIR}")
+
+    gap = np.zeros(int(gap_seconds * sample_rate), dtype=np.float32)
+    parts, words = [], []
+    position = 0.0
+    repetition = 0
+    while position < minutes * 60:
+        for name, samples in clips:
+            duration = len(samples) / sample_rate
+            for i in range(int(duration / _WORD_SECONDS)):
+                words.append((position + (i + 0.5) * _WORD_SECONDS, f"{name}{repetition}w{i}"))
+            parts.extend([samples, gap])
+            position += duration + gap_seconds
+        repetition += 1
+
+    audio, _ = encode_audio(np.concatenate(parts), sample_rate, "wav")
+    return audio, words
+
+
+def simulated_backend(words: List[Tuple[float, str]], base_latency: float, rtf: float) -> Callable:
+    """音声長に比例した遅延で、区間内の擬似単語を返す代替バックエンド"""
+    async def transcribe(chunk: AudioChunk) -> str:
+        await asyncio.sleep(base_latency + chunk.duration_seconds * rtf)
+        return " ".join(word for at, word in words if chunk.start_seconds <= at < chunk.end_seconds)
+    return transcribe
+
+
+def service_backend(backend: str, language_code: str) -> Callable:
+    """実際の音声認識サービスでチャンクを文字起こしする"""
+    from shared.services.whisper_speech_service import WhisperBackend, WhisperModel, WhisperSpeechService
+
+    if backend == "deepinfra":
+        service = WhisperSpeechService(backend=WhisperBackend.DEEPINFRA_API)
+        model = WhisperModel.DEEPINFRA_LARGE_V3_TURBO
+    else:
+        service = WhisperSpeechService(backend=WhisperBackend.LOCAL_WHISPER)
+        model = WhisperModel.LARGE_V3_TURBO
+
+    async def transcribe(chunk: AudioChunk) -> str:
+        return await service.transcribe_audio(
+            chunk.audio_bytes, language_code=language_code, model=model, audio_format=chunk.file_extension
+        )
+    return transcribe
+
+
+async def run_single(audio: bytes, transcribe: Callable) -> Tuple[float, str]:
+    samples, rate = decode_audio(audio)
+    chunk = AudioChunk(0, 0.0, len(samples) / rate, audio, "wav")
+    started = time.perf_counter()
+    transcript = await transcribe(chunk)
+    return (time.perf_counter() - started) * 1000, transcript
+
+
+async def run_chunked(audio: bytes, transcribe: Callable, args, concurrency: int) -> Tuple[float, float, int, str]:
+    started = time.perf_counter()
+    chunks = await asyncio.to_thread(
+        split_audio_on_silence, audio, max_chunk_seconds=args.chunk_seconds,
+        overlap_seconds=args.overlap_seconds, codec=args.codec
+    )
+    split_ms = (time.perf_counter() - started) * 1000
+    result = await transcribe_in_chunks(chunks, transcribe, max_concurrency=concurrency, metrics=MetricsRegistry())
+    return (time.perf_counter() - started) * 1000, split_ms, len(chunks), result.transcript
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Benchmark chunked parallel transcription of long recordings")
+    parser.add_argument("--backend", choices=["simulated", "deepinfra", "local_whisper"], default="simulated")
+    parser.add_argument("--minutes", type=float, default=3.0, help="Length of the synthesized recording")
+    parser.add_argument("--gap-seconds", type=float, default=0.8, help="Silence inserted between clips")
+    parser.add_argument("--chunk-seconds", type=float, default=30.0, help="Maximum chunk length")
+    parser.add_argument("--overlap-seconds", type=float, default=1.0, help="Overlap between chunks")
+    parser.add_argument("--codec", choices=["flac", "opus", "wav"], default="flac")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--base-latency", type=float, default=0.3, help="simulated: fixed latency per request (s)")
+    parser.add_argument("--rtf", type=float, default=0.05, help="simulated: latency per second of audio")
+    parser.add_argument("--language", default="ja-JP")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    audio, words = build_long_recording(args.minutes, args.gap_seconds)
+    expected = " ".join(word for _, word in words)
+    if args.backend == "simulated":
+        transcribe = simulated_backend(words, args.base_latency, args.rtf)
+    else:
+        transcribe = service_backend(args.backend, args.language)
+
+    print(f"🚀 Chunked transcription benchmark ({args.backend}, {args.minutes:.1f} min, "
+          f"{args.chunk_seconds:.0f}s chunks, {args.overlap_seconds:.1f}s overlap)")
+    print(f"{'mode':<22}{'chunks':>8}{'split ms':>10}{'total ms':>12}{'speedup':>10}  transcript")
+    print("-" * 90)
+
+    single_ms, single_transcript = asyncio.run(run_single(audio, transcribe))
+    print(f"{'single request':<22}{1:>8}{0:>10.0f}{single_ms:>12.0f}{1:>9.1f}x  {_describe(single_transcript, expected, args)}")
+
+    for concurrency in args.concurrency:
+        total_ms, split_ms, chunk_count, transcript = asyncio.run(run_chunked(audio, transcribe, args, concurrency))
+        print(f"{f'chunked x{concurrency}':<22}{chunk_count:>8}{split_ms:>10.0f}{total_ms:>12.0f}"
+              f"{single_ms / total_ms:>9.1f}x  {_describe(transcript, expected, args)}")
+
+    print("\n✅ Benchmark completed")
+    return True
+
+
+def _describe(transcript: str, expected: str, args) -> str:
+    """simulatedでは期待する単語列との一致、実サービスでは文字数を表示"""
+    if args.backend != "simulated":
+        return f"{len(transcript)} chars"
+    if transcript == expected:
+        return f"{len(expected.split())} words, exact match"
+    produced, wanted = transcript.split(), expected.split()
+    return f"{len(produced)}/{len(wanted)} words, {len(set(wanted) - set(produced))} missing, " \
+           f"{len(produced) - len(set(produced))} duplicated"
+
+
+if __name__ == "__main__":
+    main()
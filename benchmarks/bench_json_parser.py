@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+JSON抽出のベンチマーク（旧実装 vs 単一パススキャナー）
+
+旧実装（正規表現3種 + 行単位の括弧カウント）をこのファイル内に保持し、
+大きな入力・敵対的な入力で shared.utils.json_parser.parse_json_from_string と比較します。
+
+使用例:
+    python benchmarks/bench_json_parser.py
+    python benchmarks/bench_json_parser.py --scale 2 --repeat 5
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from shared.utils.json_parser import parse_json_from_string  # noqa: E402
+
+
+def legacy_parse_json_from_string(text: str) -> Dict[str, Any]:
+    """旧実装（比較用にそのまま保持）"""
+    if not text or not isinstance(text, str):
+        raise ValueError("Invalid input: text must be a non-empty string")
+
+    try:
+        return json.loads(text.strip())
+    except json.JSONDecodeError:
+        pass
+
+    json_patterns = [
+        r'```json\s*(\{.*?\})\s*```',
+        r'```\s*(\{.*?\})\s*```',
+        r'(\{.*\})',
+    ]
+
+    for pattern in json_patterns:
+        matches = re.findall(pattern, text, re.DOTALL)
+        for match in matches:
+            try:
+                return json.loads(match.strip())
+            except json.JSONDecodeError:
+                continue
+
+    lines = text.split('\n')
+    json_lines = []
+    in_json = False
+    brace_count = 0
+
+    for line in lines:
+        if '{' in line and not in_json:
+            in_json = True
+            json_lines = [line]
+            brace_count = line.count('{') - line.count('}')
+        elif in_json:
+            json_lines.append(line)
+            brace_count += line.count('{') - line.count('}')
+            if brace_count <= 0:
+                json_text = '\n'.join(json_lines)
+                try:
+                    return json.loads(json_text)
+                except json.JSONDecodeError:
+                    pass
+                in_json = False
+                json_lines = []
+                brace_count = 0
+
+    raise ValueError("No valid JSON found in the provided text")
+
+
+def _meal_json(dish_count: int) -> str:
+    dishes = [
+        {
+            "dish_name": f"Dish {i} {{with braces}}",
+            "confidence": 0.9,
+            "ingredients": [
+                {"ingredient_name": f"Ingredient {i}-{j} \"quoted\" }}", "weight_g": 10 + j}
+                for j in range(8)
+            ]
+        }
+        for i in range(dish_count)
+    ]
+    return json.dumps({"dishes": dishes}, indent=2)
+
+
+def build_cases(scale: float) -> List[Tuple[str, str]]:
+    """(ケース名, 入力テキスト) の一覧"""
+    dish_count = max(1, int(400 * scale))
+    payload = _meal_json(dish_count)
+    brace_count = max(1000, int(20000 * scale))
+
+    return [
+        # 大きな正常出力（コードフェンス + 前後の説明文）
+        ("fenced_large", f"Sure! Here is the result:\n```json\n{payload}\n```\nHope this helps."),
+        # 文字列内に括弧を含み、前後に括弧付きの説明文がある出力
+        ("prose_braces", "Format: {dish_name} and {weight_g}\n" + payload + "\nNote: {end}"),
+        # max_tokensで途中終了した出力（正常なJSONはない）
+        ("truncated_large", "```json\n" + payload[: len(payload) * 2 // 3]),
+        # 閉じ括弧のない大量の "{"（貪欲な正規表現が二乗時間になる）
+        ("unclosed_braces", "{" * brace_count),
+        # 閉じられないコードフェンスの繰り返し（遅延一致が各フェンスから末尾まで走査）
+        ("unclosed_fences", '```json {"a": } x ' * (brace_count // 10)),
+    ]
+
+
+def _time(func: Callable[[str], Any], text: str, repeat: int) -> Tuple[float, str]:
+    outcome = "ok"
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            func(text)
+        except ValueError:
+            outcome = "no json"
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, outcome
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Benchmark JSON extraction from LLM output")
+    parser.add_argument("--scale", type=float, default=1.0, help="Input size multiplier")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case (best time is reported)")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)  # パース失敗時のエラーログを計測に含めない
+
+    print("🚀 JSON extraction benchmark (legacy vs single-pass scanner)")
+    print(f"{'case':<18}{'size':>12}{'legacy ms':>14}{'scanner ms':>14}{'speedup':>10}  result (legacy / scanner / scanner+repair)")
+    print("-" * 110)
+
+    for name, text in build_cases(args.scale):
+        legacy_ms, legacy_outcome = _time(legacy_parse_json_from_string, text, args.repeat)
+        new_ms, new_outcome = _time(parse_json_from_string, text, args.repeat)
+        _, repair_outcome = _time(lambda t: parse_json_from_string(t, repair_truncated=True), text, 1)
+        speedup = legacy_ms / new_ms if new_ms > 0 else float("inf")
+        print(f"{name:<18}{len(text):>12,}{legacy_ms:>14.2f}{new_ms:>14.2f}{speedup:>9.1f}x  "
+              f"{legacy_outcome} / {new_outcome} / {repair_outcome}")
+
+    print("\n✅ Benchmark completed")
+    return True
+
+
+if __name__ == "__main__":
+    main()
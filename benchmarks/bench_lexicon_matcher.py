@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+食品レキシコン照合（nutrition_db_experiment/search_service/nlp/lexicon_matcher.py）のベンチマーク
+
+lexicon_data の4ファイルを --scale 倍（既定100倍）に拡大した合成レキシコンで、次を比較します。
+
+- Aho-Corasick（TokenAutomaton）: クエリのトークン列を1回走査して全一致を取得
+- n-gram辞書: 各位置で最大語句長までのn-gramを辞書で引く
+- 語句の線形走査: レキシコンの全語句についてクエリ中の出現を調べる（レキシコンの大きさに比例）
+
+あわせてコンパイル時間と、JSON キャッシュからの読み込み時間を測定します。
+クエリは MyNetDiary 食材名に、レキシコンの語句（複数語を含む）を混ぜたものです。
+
+使用例:
+    python benchmarks/bench_lexicon_matcher.py
+    python benchmarks/bench_lexicon_matcher.py --scale 10 --queries 5000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+SEARCH_SERVICE = ROOT / "nutrition_db_experiment" / "search_service"
+LEXICON_DIR = SEARCH_SERVICE / "nlp" / "lexicon_data"
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(SEARCH_SERVICE))
+
+from nlp.lexicon_matcher import LexiconMatcher, load_lexicon_matcher, read_lexicon  # noqa: E402
+from shared.utils.mynetdiary_utils import load_mynetdiary_ingredient_names  # noqa: E402
+
+
+def scaled_lexicon(target_dir: Path, scale: int, seed: int = 0):
+    """各ファイルの語句を scale 倍に増やした合成レキシコンを書き出す（元の語句も含む）"""
+    rng = random.Random(seed)
+    names = [name.lower() for name in load_mynetdiary_ingredient_names()]
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    def variant(index: int) -> str:
+        # 食材名の一部（1〜3語）に番号を付けた語句
+        words = rng.choice(names).split()
+        start = rng.randrange(len(words))
+        return " ".join(words[start:start + rng.randint(1, 3)]) + f" v{index}"
+
+    for name in ("protected_food_terms.txt", "custom_food_stopwords.txt", "food_lemma_overrides.txt",
+                 "food_synonyms.txt"):
+        lines = [line.rstrip("\n") for line in open(LEXICON_DIR / name, encoding="utf-8")]
+        entries = [line for line in lines if line.strip() and not line.startswith("#")]
+        extra = []
+        for index in range(len(entries) * (scale - 1)):
+            if name == "food_lemma_overrides.txt":
+                extra.append(f"{variant(index)} => {variant(index)}")
+            elif name == "food_synonyms.txt":
+                extra.append(", ".join(variant(index) for _ in range(rng.randint(2, 3))))
+            else:
+                extra.append(variant(index))
+        (target_dir / name).write_text("\n".join(lines + extra) + "\n", encoding="utf-8")
+
+
+def ngram_matcher(matcher: LexiconMatcher) -> Callable[[Sequence[str]], List[Tuple[int, int]]]:
+    phrases = set(matcher.protected_terms) | set(matcher.lemma_overrides) | set(matcher.custom_stopwords) \
+        | set(matcher.food_synonyms)
+    max_length = max(len(phrase.split()) for phrase in phrases)
+
+    def match(tokens: Sequence[str]) -> List[Tuple[int, int]]:
+        return [(start, end) for start in range(len(tokens))
+                for end in range(start + 1, min(len(tokens), start + max_length) + 1)
+                if " ".join(tokens[start:end]) in phrases]
+    return match
+
+
+def linear_matcher(matcher: LexiconMatcher) -> Callable[[Sequence[str]], List[Tuple[int, int]]]:
+    phrases = [tuple(phrase.split()) for phrase in
+               set(matcher.protected_terms) | set(matcher.lemma_overrides) | set(matcher.custom_stopwords)
+               | set(matcher.food_synonyms)]
+
+    def match(tokens: Sequence[str]) -> List[Tuple[int, int]]:
+        found = []
+        for phrase in phrases:
+            if phrase[0] not in tokens:
+                continue
+            for start in range(len(tokens) - len(phrase) + 1):
+                if tuple(tokens[start:start + len(phrase)]) == phrase:
+                    found.append((start, start + len(phrase)))
+        return found
+    return match
+
+
+def build_queries(matcher: LexiconMatcher, count: int, seed: int) -> List[List[str]]:
+    rng = random.Random(seed)
+    names = [name.lower().split() for name in load_mynetdiary_ingredient_names()]
+    phrases = [phrase.split() for phrase in list(matcher.food_synonyms) + list(matcher.lemma_overrides)]
+    queries = []
+    for _ in range(count):
+        tokens = list(rng.choice(names))
+        for _ in range(rng.randint(0, 2)):
+            position = rng.randint(0, len(tokens))
+            tokens[position:position] = rng.choice(phrases)
+        queries.append(tokens)
+    return queries
+
+
+def time_queries(match: Callable, queries: List[List[str]]) -> Tuple[float, int]:
+    started = time.perf_counter()
+    matches = sum(len(match(tokens)) for tokens in queries)
+    return time.perf_counter() - started, matches
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Benchmark the Aho-Corasick food lexicon matcher")
+    parser.add_argument("--scale", type=int, default=100, help="Lexicon size multiplier")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="lexicon_bench_"))
+    try:
+        print("🚀 Lexicon matcher benchmark")
+        for scale in sorted({1, args.scale}):
+            lexicon_dir = workdir / f"lexicon_x{scale}"
+            if scale == 1:
+                shutil.copytree(LEXICON_DIR, lexicon_dir, ignore=shutil.ignore_patterns(".cache"))
+            else:
+                scaled_lexicon(lexicon_dir, scale, args.seed)
+            cache_dir = str(workdir / f"cache_x{scale}")
+
+            started = time.perf_counter()
+            raw = read_lexicon(str(lexicon_dir))
+            read_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            load_lexicon_matcher(str(lexicon_dir), cache_dir)
+            compile_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            matcher = load_lexicon_matcher(str(lexicon_dir), cache_dir)
+            cached_ms = (time.perf_counter() - started) * 1000
+            cache_kb = sum(os.path.getsize(path) for path in Path(cache_dir).iterdir()) / 1024
+
+            phrases = len(set(raw.protected_terms) | set(raw.lemma_overrides) | set(raw.custom_stopwords)
+                          | set(raw.food_synonyms))
+            print(f"\nx{scale}: {phrases} phrases, {matcher.terms.size + matcher.synonyms.size} automaton patterns")
+            print(f"   parse {read_ms:.0f} ms, parse+compile+cache {compile_ms:.0f} ms, "
+                  f"load from JSON cache {cached_ms:.0f} ms ({cache_kb:.0f} KB)")
+
+            queries = build_queries(matcher, args.queries, args.seed)
+            print(f"   {'method':<30}{'queries/sec':>13}{'matches':>10}")
+            for label, match in [
+                ("Aho-Corasick (one pass)", lambda tokens: list(matcher.terms.find_all(tokens))
+                 + list(matcher.synonyms.find_all(tokens))),
+                ("n-gram dict lookup", ngram_matcher(matcher)),
+                ("linear scan of phrases", linear_matcher(matcher)),
+            ]:
+                seconds, matches = time_queries(match, queries)
+                print(f"   {label:<30}{len(queries) / seconds:>13.0f}{matches:>10}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\n✅ Benchmark completed")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+栄養データベース構築（nutrition_db_experiment/build_nutrition_db.py）のベンチマーク
+
+raw/{recipe,food,branded}/<id>/processed/<id>.json 形式の合成データを作成し、次の構築の処理時間と
+最大RSS（メインプロセス・ワーカープロセス）を測定します。各構築は別プロセスで実行します。
+
+- legacy: 従来の build()（全件をメモリに保持して eatthismuch_db.json に書き出し）
+- sharded: build_sharded() の全件構築（--full 相当）
+- incremental (no change): 元ファイルに変更がない状態での再構築
+- incremental (1% changed): 1%の元ファイルを書き換えた後の再構築
+
+使用例:
+    python benchmarks/bench_nutrition_db_build.py
+    python benchmarks/bench_nutrition_db_build.py --records 200000 --workers 4 --skip-legacy
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+CATEGORY_SHARE = {"recipe": 0.2, "food": 0.3, "branded": 0.5}
+
+
+def synthetic_item(category: str, item_id: int, rng: random.Random) -> dict:
+    """カテゴリごとの元データ（process_*_item が変換できる形式）"""
+    calories, protein, fat, carbs = (round(rng.uniform(0, 600), 1), round(rng.uniform(0, 40), 1),
+                                     round(rng.uniform(0, 40), 1), round(rng.uniform(0, 80), 1))
+    if category == "recipe":
+        return {"id": item_id, "title": f"Synthetic dish {item_id}", "nutrients": {
+            "calories": calories, "proteinContent": protein, "fatContent": fat, "carbohydrateContent": carbs,
+            "servingSize": f"{rng.randint(100, 500)} grams"}}
+    units = [{"description": "serving", "amount": 1}, {"description": "grams", "amount": rng.randint(30, 300)}]
+    if category == "food":
+        return {"id": item_id, "name": f"Synthetic food {item_id}", "description": "raw",
+                "nutrition": {"calories": calories, "proteinContent": protein, "fatContent": fat,
+                              "carbohydrateContent": carbs}, "units": units}
+    return {"data": {"id": item_id, "food_name": f"Synthetic brand {item_id}", "description": "Brand Co.",
+                     "calories": calories, "proteins": protein, "fats": fat, "carbs": carbs, "unit_weights": units}}
+
+
+def write_item(raw: Path, category: str, item_id: int, item: dict):
+    processed_dir = raw / category / str(item_id) / "processed"
+    processed_dir.mkdir(parents=True, exist_ok=True)
+    (processed_dir / f"{item_id}.json").write_text(json.dumps(item), encoding="utf-8")
+
+
+def generate_raw_tree(raw: Path, records: int, seed: int = 0) -> list:
+    """合成データを作成し、(category, id) の一覧を返す"""
+    rng = random.Random(seed)
+    items = []
+    item_id = 0
+    for category, share in CATEGORY_SHARE.items():
+        for _ in range(int(records * share)):
+            item_id += 1
+            write_item(raw, category, item_id, synthetic_item(category, item_id, rng))
+            items.append((category, item_id))
+    return items
+
+
+def run_child(raw: Path, output: Path, mode: str, workers: int, shards: int) -> dict:
+    """1回の構築を別プロセスで実行し、処理時間と最大RSSを返す"""
+    code = f"""
+import contextlib, io, json, resource, sys, time
+sys.path.insert(0, {str(Path(__file__).resolve().parent.parent)!r})
+from nutrition_db_experiment.build_nutrition_db import NutritionDBBuilder
+builder = NutritionDBBuilder({str(raw)!r}, {str(output)!r})
+started = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    if {mode!r} == "legacy":
+        result = builder.build()
+    else:
+        result = builder.build_sharded(workers={workers}, num_shards={shards}, incremental={mode != "full"})
+print(json.dumps({{
+    "seconds": time.perf_counter() - started,
+    "items": sum(builder.database_counts.values()),
+    "result": result,
+    "main_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "workers_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+}}))
+"""
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def report(label: str, row: dict):
+    extra = f"  {row['result']}" if row["result"] else ""
+    print(f"{label:<26} {row['seconds']:8.1f} s  {row['items']:>9} items  "
+          f"RSS main {row['main_mb']:6.0f} MB / workers {row['workers_mb']:5.0f} MB{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shards", type=int, default=64)
+    parser.add_argument("--changed", type=float, default=0.01, help="Share of raw files rewritten before the last run")
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--workdir", default=None, help="Keep the synthetic tree here instead of a temp dir")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="nutrition_db_bench_"))
+    raw = workdir / "raw"
+    try:
+        started = time.perf_counter()
+        items = generate_raw_tree(raw, args.records)
+        print(f"Generated {len(items)} raw items in {time.perf_counter() - started:.1f} s "
+              f"(workers={args.workers}, shards={args.shards}/category)")
+
+        if not args.skip_legacy:
+            report("legacy build()", run_child(raw, workdir / "legacy", "legacy", args.workers, args.shards))
+        report("sharded (full)", run_child(raw, workdir / "sharded", "full", args.workers, args.shards))
+        report("incremental (no change)", run_child(raw, workdir / "sharded", "incremental", args.workers, args.shards))
+
+        rng = random.Random(1)
+        for category, item_id in rng.sample(items, int(len(items) * args.changed)):
+            write_item(raw, category, item_id, synthetic_item(category, item_id, rng))
+        report(f"incremental ({args.changed:.0%} changed)",
+               run_child(raw, workdir / "sharded", "incremental", args.workers, args.shards))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
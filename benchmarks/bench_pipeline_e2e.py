@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+オフラインのエンドツーエンド・ベンチマーク（MealAnalysisPipeline・VoiceAnalysisPipeline）
+
+すべての上流サービスをローカルの代替に置き換え、APIと同じくリクエストごとにパイプラインを作成して計測します。
+
+- Deep Infra: scripts/fake_deepinfra_server.py（画像分析・Whisper・NLU。応答開始までの待ち時間は分布で指定）
+- Word Query API: scripts/fake_word_query_api.py（MyNetDiary食材名リストのローカル検索）。
+  --word-query real の場合は apps/word_query_api を同梱の elasticsearch-8.10.4（ELASTICSEARCH_URL）に対して起動
+  （インデックスは事前に scripts/es_bulk_indexer.py で作成しておく）
+
+代替サーバーは別プロセスで動かすため、メモリ使用量はパイプライン側のプロセスだけを計測します。
+入力は test_images/ の画像（ない場合は合成したPNG）と test_audio/ の録音です。
+パイプラインごとに p50/p95/p99 レイテンシ・スループット・最大RSSを出力し、保存済みのベースライン
+（benchmarks/baselines/pipeline_e2e.json）と比較して劣化があれば終了コード1で終了します。
+
+使用例:
+    python benchmarks/bench_pipeline_e2e.py
+    python benchmarks/bench_pipeline_e2e.py --requests 60 --concurrency 8 --no-baseline
+    python benchmarks/bench_pipeline_e2e.py --update-baseline
+    ELASTICSEARCH_URL=http://localhost:9200 python benchmarks/bench_pipeline_e2e.py --word-query real --no-baseline
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.fake_deepinfra_server import ROUTES, LatencyDistribution, start_fake_server  # noqa: E402
+
+IMAGE_DIR = ROOT / "test_images"
+AUDIO_DIR = ROOT / "test_audio"
+FIXTURE_DIR = ROOT / "test_fixtures" / "deepinfra"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "pipeline_e2e.json"
+
+PIPELINES = ("meal", "voice")
+IMAGE_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+
+# 上流サービスの応答開始までの待ち時間（ミリ秒、LatencyDistribution.parse の形式）
+DEFAULT_LATENCY = {
+    "chat": "lognormal:800:0.35",            # 画像分析（Gemma 3 27B）
+    "transcription": "lognormal:400:0.3",    # Whisper large-v3-turbo
+    "text_generation": "lognormal:600:0.3",  # NLU
+    "word_query": "normal:20:5",             # Word Query API（Elasticsearch検索）
+}
+
+
+# === 入力 ===
+
+def synthetic_png(width: int, height: int, seed: int) -> bytes:
+    """グラデーションの合成PNG（test_images/ に画像がない場合の入力）"""
+    rows = []
+    for y in range(height):
+        row = bytearray([0])  # フィルタなし
+        for x in range(width):
+            row += bytes(((x * 255 // width + seed * 40) % 256, (y * 255 // height) % 256, (x + y + seed * 70) % 256))
+        rows.append(bytes(row))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(b"".join(rows)))
+            + chunk(b"IEND", b""))
+
+
+def load_images() -> Tuple[List[Tuple[bytes, str]], str]:
+    """test_images/ の画像（ない場合は合成PNG 3枚）と入力の説明"""
+    paths = sorted(path for path in IMAGE_DIR.glob("*") if path.suffix.lower() in IMAGE_TYPES)
+    if paths:
+        return [(path.read_bytes(), IMAGE_TYPES[path.suffix.lower()]) for path in paths], f"{len(paths)} images from test_images/"
+    return [(synthetic_png(640, 480, seed), "image/png") for seed in range(3)], "3 synthetic 640x480 PNGs (test_images/ is empty)"
+
+
+def load_recordings() -> Tuple[List[Tuple[bytes, str]], str]:
+    """test_audio/ の録音と入力の説明"""
+    paths = sorted(AUDIO_DIR.glob("*.wav"))
+    if not paths:
+        raise FileNotFoundError(f"No recordings in {AUDIO_DIR}")
+    return [(path.read_bytes(), "audio/wav") for path in paths], f"{len(paths)} recordings from test_audio/"
+
+
+# === 代替サーバー（別プロセス） ===
+
+def _start_real_word_query_api(es_url: str) -> str:
+    """apps/word_query_api を es_url のElasticsearchに対してこのプロセス内で起動"""
+    import requests
+    import uvicorn
+
+    requests.get(es_url, timeout=5).raise_for_status()
+    os.environ["ELASTICSEARCH_URL"] = es_url
+    from apps.word_query_api.main import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="word-query-api", daemon=True).start()
+    deadline = time.monotonic() + 60
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise TimeoutError("Word Query API did not start within 60s")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def _serve_stand_ins(config: Dict[str, Any], conn) -> None:
+    """代替サーバーを起動してURLを conn で返し、停止の合図を待つ（子プロセス）"""
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        latency = {route: LatencyDistribution.parse(config["latency"][route], seed=config["seed"] + i)
+                   for i, route in enumerate(ROUTES)}
+        deepinfra = start_fake_server(
+            FIXTURE_DIR / "phase1_two_dishes.json",
+            transcription_fixture_path=FIXTURE_DIR / "whisper_meal_transcripts.json",
+            text_generation_fixture_path=FIXTURE_DIR / "nlu_meal_extraction.json",
+            latency=latency,
+            record_requests=False
+        )
+        if config["word_query"] == "real":
+            word_query_url = _start_real_word_query_api(config["elasticsearch_url"])
+        else:
+            from scripts.fake_word_query_api import start_fake_word_query_api
+            word_query = start_fake_word_query_api(
+                latency=LatencyDistribution.parse(config["latency"]["word_query"], seed=config["seed"] + len(ROUTES))
+            )
+            word_query_url = word_query.base_url
+        conn.send({"deepinfra_base_url": deepinfra.base_url, "deepinfra_inference_url": deepinfra.inference_url,
+                   "word_query_url": word_query_url})
+    except Exception as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+        return
+    conn.recv()
+
+
+class StandIns:
+    """代替サーバーを別プロセスで起動・停止するコンテキストマネージャ"""
+
+    def __init__(self, config: Dict[str, Any], startup_timeout: float = 120.0):
+        self.config = config
+        self.startup_timeout = startup_timeout
+        self.urls: Dict[str, str] = {}
+        self._process = None
+        self._conn = None
+
+    def __enter__(self) -> Dict[str, str]:
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=_serve_stand_ins, args=(self.config, child_conn),
+                                        name="stand-ins", daemon=True)
+        self._process.start()
+        deadline = time.monotonic() + self.startup_timeout
+        while not self._conn.poll(0.1):
+            if not self._process.is_alive():
+                raise RuntimeError(f"Stand-in servers exited with code {self._process.exitcode}")
+            if time.monotonic() > deadline:
+                self.__exit__()
+                raise TimeoutError(f"Stand-in servers did not start within {self.startup_timeout:.0f}s")
+        message = self._conn.recv()
+        if "error" in message:
+            self.__exit__()
+            raise RuntimeError(f"Stand-in servers failed to start: {message['error']}")
+        self.urls = message
+        return message
+
+    def __exit__(self, *exc_info) -> None:
+        try:
+            self._conn.send("stop")
+        except (OSError, EOFError):
+            pass
+        self._process.join(10)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+
+
+def configure_environment(urls: Dict[str, str], stream_phase1: bool) -> None:
+    """パイプラインの接続先を代替サーバーにする（設定キャッシュもクリア）"""
+    from shared.config.settings import get_settings
+
+    os.environ.update({
+        "DEEPINFRA_API_KEY": "offline-benchmark",  # 実際のAPIキーは使わない
+        "DEEPINFRA_BASE_URL": urls["deepinfra_base_url"],
+        "DEEPINFRA_INFERENCE_URL": urls["deepinfra_inference_url"],
+        "WORD_QUERY_API_URL": urls["word_query_url"],
+        "SPEECH_CACHE_ENABLED": "false",  # 同じ録音の繰り返しをキャッシュで省略しない
+        "PHASE1_STREAMING_ENABLED": "true" if stream_phase1 else "false",
+    })
+    get_settings.cache_clear()
+
+
+# === 計測 ===
+
+def current_rss_mb() -> float:
+    """現在のRSS（MB）。/proc がない場合は最大RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+
+
+async def _sample_peak_rss(peak: List[float], interval: float = 0.02) -> None:
+    while True:
+        peak[0] = max(peak[0], current_rss_mb())
+        await asyncio.sleep(interval)
+
+
+async def run_load(execute: Callable[[Any], Awaitable[Any]], inputs: Sequence[Any], requests: int,
+                   concurrency: int) -> Dict[str, Any]:
+    """
+    inputs を順に使って requests 回実行し（同時実行数 concurrency）、レイテンシ・スループット・RSSを集計
+
+    Returns:
+        requests, errors, p50_ms, p95_ms, p99_ms, mean_ms, throughput_rps, peak_rss_mb, rss_growth_mb, error_samples
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await execute(inputs[i % len(inputs)])
+                latencies.append((time.perf_counter() - started) * 1000)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    rss_before = current_rss_mb()
+    peak = [rss_before]
+    sampler = asyncio.create_task(_sample_peak_rss(peak))
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    finally:
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+    peak[0] = max(peak[0], current_rss_mb())
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0.0, 0.0, 0.0)
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "p99_ms": round(float(p99), 1),
+        "mean_ms": round(float(np.mean(latencies)), 1) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "peak_rss_mb": round(peak[0], 1),
+        "rss_growth_mb": round(current_rss_mb() - rss_before, 1),
+        "error_samples": errors[:3]
+    }
+
+
+def meal_executor(stream_phase1: bool, word_query_url: str) -> Callable[[Tuple[bytes, str]], Awaitable[Any]]:
+    """画像1枚を分析する関数（APIと同じくリクエストごとにパイプラインを作成）"""
+    from shared.pipeline.orchestrator import MealAnalysisPipeline
+
+    async def execute(image: Tuple[bytes, str]) -> Dict[str, Any]:
+        pipeline = MealAnalysisPipeline()
+        pipeline.nutrition_search_component.api_base_url = word_query_url
+        return await pipeline.execute_complete_analysis(
+            image_bytes=image[0], image_mime_type=image[1], save_detailed_logs=False, stream_phase1=stream_phase1
+        )
+    return execute
+
+
+def voice_executor(word_query_url: str) -> Callable[[Tuple[bytes, str]], Awaitable[Any]]:
+    """録音1件を分析する関数（APIと同じくリクエストごとにパイプラインを作成）"""
+    from shared.pipeline.voice_orchestrator import VoiceAnalysisPipeline
+
+    async def execute(recording: Tuple[bytes, str]) -> Dict[str, Any]:
+        pipeline = VoiceAnalysisPipeline(speech_service="deepinfra_whisper")
+        pipeline.nutrition_search_component.api_base_url = word_query_url
+        return await pipeline.execute_complete_analysis(
+            audio_bytes=recording[0], audio_mime_type=recording[1], save_detailed_logs=False
+        )
+    return execute
+
+
+async def run_suite(config: Dict[str, Any], urls: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """設定されたパイプラインを順に計測（各パイプラインは計測前に1回実行してウォームアップ）"""
+    results = {}
+    for name in config["pipelines"]:
+        if name == "meal":
+            inputs, _ = load_images()
+            execute = meal_executor(config["stream_phase1"], urls["word_query_url"])
+        else:
+            inputs, _ = load_recordings()
+            execute = voice_executor(urls["word_query_url"])
+        await execute(inputs[0])
+        results[name] = await run_load(execute, inputs, config["requests"], config["concurrency"])
+    return results
+
+
+# === ベースライン ===
+
+def compare_to_baseline(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], config: Dict[str, Any],
+                        tolerance: float = 0.25, memory_tolerance: float = 0.3,
+                        latency_slack_ms: float = 25.0) -> List[str]:
+    """
+    ベースラインに対する劣化の一覧（空なら合格）
+
+    Args:
+        tolerance: レイテンシの増加・スループットの低下の許容割合
+        memory_tolerance: 最大RSSの増加の許容割合
+        latency_slack_ms: レイテンシの増加の許容量の下限（短いレイテンシの揺らぎで失敗しないため）
+    """
+    if baseline.get("config") != config:
+        return ["baseline was recorded with a different configuration; rerun with --update-baseline "
+                f"(baseline: {baseline.get('config')}, current: {config})"]
+
+    problems = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            problems.append(f"{name}: no baseline")
+            continue
+        if result["errors"] > base["errors"]:
+            problems.append(f"{name}: {result['errors']} errors (baseline {base['errors']})")
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            limit = max(base[metric] * (1 + tolerance), base[metric] + latency_slack_ms)
+            if result[metric] > limit:
+                problems.append(f"{name}: {metric} {result[metric]:.0f} > {limit:.0f} (baseline {base[metric]:.0f})")
+        limit = base["throughput_rps"] * (1 - tolerance)
+        if result["throughput_rps"] < limit:
+            problems.append(f"{name}: throughput {result['throughput_rps']:.2f} req/s < {limit:.2f} "
+                            f"(baseline {base['throughput_rps']:.2f})")
+        limit = base["peak_rss_mb"] * (1 + memory_tolerance)
+        if result["peak_rss_mb"] > limit:
+            problems.append(f"{name}: peak RSS {result['peak_rss_mb']:.0f} MB > {limit:.0f} MB "
+                            f"(baseline {base['peak_rss_mb']:.0f} MB)")
+    return problems
+
+
+def write_baseline(path: Path, config: Dict[str, Any], results: Dict[str, Dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    baseline = {
+        "config": config,
+        "results": {name: {key: value for key, value in result.items() if key != "error_samples"}
+                    for name, result in results.items()},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "recorded_at": datetime.now().isoformat(timespec="seconds")
+    }
+    path.write_text(json.dumps(baseline, indent=2) + "\n", encoding="utf-8")
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the meal and voice pipelines")
+    parser.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=list(PIPELINES))
+    parser.add_argument("--requests", type=int, default=24, help="Measured requests per pipeline")
+    parser.add_argument("--concurrency", type=int, default=4)
+    for route, spec in DEFAULT_LATENCY.items():
+        parser.add_argument(f"--{route.replace('_', '-')}-latency", default=spec, metavar="SPEC",
+                            help=f"Latency distribution of the {route} stand-in (default {spec})")
+    parser.add_argument("--word-query", choices=["fake", "real"], default="fake",
+                        help="fake: local stand-in; real: apps/word_query_api against ELASTICSEARCH_URL")
+    parser.add_argument("--stream-phase1", action="store_true", help="Stream Phase1 and start searches early")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--no-baseline", action="store_true", help="Only report, do not compare")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed latency/throughput regression")
+    parser.add_argument("--memory-tolerance", type=float, default=0.3, help="Allowed peak RSS regression")
+    parser.add_argument("--json-output", type=Path, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    config = {
+        "pipelines": args.pipelines,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "latency": {route: getattr(args, f"{route}_latency") for route in DEFAULT_LATENCY},
+        "word_query": args.word_query,
+        "stream_phase1": args.stream_phase1,
+        "seed": args.seed,
+    }
+    stand_in_config = {**config, "elasticsearch_url": os.environ.get("ELASTICSEARCH_URL", "http://localhost:9200")}
+
+    print("🚀 Offline end-to-end pipeline benchmark")
+    print(f"   inputs: {load_images()[1]}; {load_recordings()[1]}")
+    print(f"   {args.requests} requests per pipeline, concurrency {args.concurrency}, Word Query API: {args.word_query}")
+    print("   latency: " + ", ".join(f"{route}={spec}" for route, spec in config["latency"].items()))
+
+    with StandIns(stand_in_config) as urls:
+        configure_environment(urls, args.stream_phase1)
+        results = asyncio.run(run_suite(config, urls))
+
+    print(f"\n   {'pipeline':<10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>8}{'peak RSS':>10}{'growth':>8}{'errors':>8}")
+    for name, result in results.items():
+        print(f"   {name:<10}{result['p50_ms']:>9.0f}{result['p95_ms']:>9.0f}{result['p99_ms']:>9.0f}"
+              f"{result['throughput_rps']:>8.2f}{result['peak_rss_mb']:>7.0f} MB{result['rss_growth_mb']:>5.0f} MB"
+              f"{result['errors']:>8}")
+        for sample in result["error_samples"]:
+            print(f"      ❌ {sample}")
+    if args.json_output:
+        args.json_output.write_text(json.dumps({"config": config, "results": results}, indent=2) + "\n", encoding="utf-8")
+
+    if args.update_baseline:
+        write_baseline(args.baseline, config, results)
+        print(f"\n💾 Baseline written to {args.baseline}")
+        return True
+    if args.no_baseline:
+        return True
+    if not args.baseline.exists():
+        print(f"\n⚠️ No baseline at {args.baseline}; run with --update-baseline to record one")
+        return False
+
+    problems = compare_to_baseline(results, json.loads(args.baseline.read_text(encoding="utf-8")), config,
+                                   tolerance=args.tolerance, memory_tolerance=args.memory_tolerance)
+    if problems:
+        print("\n❌ Regressions against the baseline:")
+        for problem in problems:
+            print(f"   - {problem}")
+        return False
+    print(f"\n✅ Within {args.tolerance:.0%} of the baseline ({args.baseline.name})")
+    return True
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)
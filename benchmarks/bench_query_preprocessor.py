@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+search_service のクエリ前処理（FoodQueryPreprocessor）のベンチマーク
+
+1. 起動時間: モジュールのimport、パイプラインの読み込み、最初のクエリまでの時間を別プロセスで測定
+   （全コンポーネント / lean、同期読み込み / バックグラウンド読み込み）
+2. スループット: MyNetDiary食材名のクエリを 1件ずつ処理 / nlp.pipe で一括処理 / LRUキャッシュあり
+   （繰り返しの多い実際の検索を模して、Zipf分布で選んだクエリ列）で処理した queries/sec
+
+--stand-in は en_core_web_sm の代わりに spacy.blank("en") と簡易レンマ化で測定します
+（モデルをインストールできない環境でのバッチ処理・キャッシュの比較用。lean の比較は意味を持ちません）。
+
+使用例:
+    python benchmarks/bench_query_preprocessor.py
+    python benchmarks/bench_query_preprocessor.py --queries 20000 --batch-size 512
+    python benchmarks/bench_query_preprocessor.py --stand-in
+"""
+import argparse
+import inspect
+import json
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+SEARCH_SERVICE = ROOT / "nutrition_db_experiment" / "search_service"
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(SEARCH_SERVICE))
+
+import spacy  # noqa: E402
+from spacy.language import Language  # noqa: E402
+
+from shared.utils.mynetdiary_utils import load_mynetdiary_ingredient_names  # noqa: E402
+
+
+@Language.component("bench_suffix_lemmatizer")
+def bench_suffix_lemmatizer(doc):
+    for token in doc:
+        token.lemma_ = token.lower_[:-1] if token.lower_.endswith("s") and len(token) > 3 else token.lower_
+    return doc
+
+
+def stand_in_pipeline():
+    nlp = spacy.blank("en")
+    nlp.add_pipe("bench_suffix_lemmatizer")
+    return nlp
+
+
+# 起動時間の測定用プロセスに渡す定義（このモジュールのimportを測定に含めない）
+STAND_IN = "\n".join([
+    "import spacy",
+    "from spacy.language import Language",
+    inspect.getsource(bench_suffix_lemmatizer),
+    inspect.getsource(stand_in_pipeline),
+])
+
+
+def cold_start(lean: bool, background: bool, stand_in: bool) -> dict:
+    """別プロセスで import → 読み込み → 最初のクエリ までの時間を測定"""
+    code = f"""
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {str(SEARCH_SERVICE)!r})
+from nlp.query_preprocessor import FoodQueryPreprocessor
+{STAND_IN if stand_in else ""}
+imported = time.perf_counter()
+preprocessor = FoodQueryPreprocessor(lean={lean}, background={background}, strict=True,
+                                     nlp={"stand_in_pipeline()" if stand_in else "None"})
+constructed = time.perf_counter()
+preprocessor.preprocess_query("grilled chicken breasts")
+first = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - started) * 1000, "construct_ms": (constructed - imported) * 1000,
+                   "first_query_ms": (first - started) * 1000,
+                   "components": preprocessor.nlp.pipe_names}}))
+"""
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def zipf_queries(names: List[str], count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(names))]
+    return rng.choices(names, weights=weights, k=count)
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Benchmark FoodQueryPreprocessor cold start and throughput")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--runs", type=int, default=3, help="Cold-start runs per configuration (median)")
+    parser.add_argument("--stand-in", action="store_true", help="Use spacy.blank('en') instead of en_core_web_sm")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from nlp.query_preprocessor import FoodQueryPreprocessor, SpacyModelUnavailableError
+
+    print(f"🚀 Query preprocessor benchmark ({'stand-in pipeline' if args.stand_in else 'en_core_web_sm'})")
+    print(f"\n{'cold start':<34}{'import ms':>11}{'construct ms':>14}{'first query ms':>16}  components")
+    print("-" * 100)
+    configs = [("full, synchronous", False, False), ("lean, synchronous", True, False),
+               ("lean, background", True, True)]
+    try:
+        for label, lean, background in configs:
+            runs = sorted((cold_start(lean, background, args.stand_in) for _ in range(args.runs)),
+                          key=lambda run: run["first_query_ms"])
+            run = runs[len(runs) // 2]
+            print(f"{label:<34}{run['import_ms']:>11.0f}{run['construct_ms']:>14.0f}{run['first_query_ms']:>16.0f}"
+                  f"  {','.join(run['components'])}")
+    except RuntimeError as e:
+        print(f"❌ {e}\n   (use --stand-in to benchmark without the model)")
+        return False
+
+    names = load_mynetdiary_ingredient_names()
+    unique = names[:args.queries]
+    repeated = zipf_queries(names, args.queries, args.seed)
+
+    def make(cache_size: int):
+        try:
+            return FoodQueryPreprocessor(cache_size=cache_size, strict=True,
+                                         nlp=stand_in_pipeline() if args.stand_in else None)
+        except SpacyModelUnavailableError as e:
+            raise SystemExit(f"❌ {e}")
+
+    print(f"\n{'throughput':<34}{'queries':>9}{'seconds':>10}{'queries/sec':>13}")
+    print("-" * 66)
+    for label, queries, run in [
+        ("one by one, no cache", unique, lambda p, q: [p.preprocess_query(text) for text in q]),
+        ("nlp.pipe batch, no cache", unique, lambda p, q: p.preprocess_queries(q, batch_size=args.batch_size)),
+        ("one by one, no cache (zipf)", repeated, lambda p, q: [p.preprocess_query(text) for text in q]),
+        ("one by one, LRU cache (zipf)", repeated, lambda p, q: [p.preprocess_query(text) for text in q]),
+        ("nlp.pipe batch, LRU cache (zipf)", repeated,
+         lambda p, q: p.preprocess_queries(q, batch_size=args.batch_size)),
+    ]:
+        preprocessor = make(0 if "no cache" in label else 4096)
+        started = time.perf_counter()
+        run(preprocessor, queries)
+        seconds = time.perf_counter() - started
+        print(f"{label:<34}{len(queries):>9}{seconds:>10.2f}{len(queries) / seconds:>13.0f}")
+
+    print("\n✅ Benchmark completed")
+    return True
+
+
+if __name__ == "__main__":
+    main()
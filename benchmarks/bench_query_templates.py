@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+検索クエリ構築（nutrition_db_experiment/search_service/api/query_builder.py）のベンチマーク
+
+MyNetDiary 食材名をクエリとして、1クエリあたりのクエリ作成時間を比較します。
+
+- 従来: ビルダーを作成して build_search_query() で辞書を組み立て、json.dumps でシリアライズ
+- 辞書の組み立てのみ: 共有ビルダーの build_search_query() + json.dumps
+- テンプレート: build_search_query_bytes()（キャッシュしたテンプレートにパラメータを埋め込む）
+
+使用例:
+    python benchmarks/bench_query_templates.py
+    python benchmarks/bench_query_templates.py --queries 20000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+ROOT = Path(__file__).resolve().parent.parent
+SEARCH_SERVICE = ROOT / "nutrition_db_experiment" / "search_service"
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(SEARCH_SERVICE))
+
+from api.query_builder import NutritionSearchQueryBuilder  # noqa: E402
+from shared.utils.mynetdiary_utils import load_mynetdiary_ingredient_names  # noqa: E402
+
+DB_TYPE_FILTERS = [None, "dish", "ingredient", "branded"]
+
+
+def time_per_query(build: Callable[[str, str, str], bytes], queries: List[str], filters: List[str]) -> float:
+    """1クエリあたりの時間（マイクロ秒）"""
+    started = time.perf_counter()
+    for query, db_type in zip(queries, filters):
+        build(query.lower(), query, db_type)
+    return (time.perf_counter() - started) / len(queries) * 1e6
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Benchmark cached query templates against building the query dict")
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = load_mynetdiary_ingredient_names()
+    queries = [rng.choice(names) for _ in range(args.queries)]
+    filters = [rng.choice(DB_TYPE_FILTERS) for _ in range(args.queries)]
+    builder = NutritionSearchQueryBuilder()
+
+    def legacy(processed, original, db_type):
+        query = NutritionSearchQueryBuilder().build_search_query(processed, original, db_type)
+        return json.dumps(query).encode("utf-8")
+
+    def shared_dict(processed, original, db_type):
+        return json.dumps(builder.build_search_query(processed, original, db_type)).encode("utf-8")
+
+    def template(processed, original, db_type):
+        return builder.build_search_query_bytes(processed, original, db_type)
+
+    mismatches = sum(json.loads(template(q.lower(), q, f)) != builder.build_search_query(q.lower(), q, f)
+                     for q, f in zip(queries[:500], filters[:500]))
+
+    print(f"🚀 Query template benchmark ({len(queries)} queries, {len(DB_TYPE_FILTERS)} db_type filters)")
+    print(f"   {'method':<40}{'µs/query':>10}")
+    results = {}
+    for label, build in [("new builder + dict + json.dumps", legacy),
+                         ("shared builder + dict + json.dumps", shared_dict),
+                         ("compiled template render", template)]:
+        results[label] = time_per_query(build, queries, filters)
+        print(f"   {label:<40}{results[label]:>10.1f}")
+    speedup = results["new builder + dict + json.dumps"] / results["compiled template render"]
+    print(f"\n   speedup {speedup:.1f}x, templates cached: {len(builder._templates)}, "
+          f"mismatches in first 500: {mismatches}")
+
+    print("\n✅ Benchmark completed")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)
@@ -11,13 +11,58 @@ v3.0 変更点:
 - unified_nutrition_db.jsonのみを出力
 - search_nameは元データの名称そのまま、descriptionは別フィールド
 - 100gあたりに正規化
+
+v3.1 変更点:
+- build_sharded(): IDディレクトリをシャードに分けてプロセスプールで処理し、
+  正規化したレコードを shards/<category>-<NNNN>.jsonl に逐次書き出す（メモリ使用量がカタログの大きさに依存しない）
+- シャードごとのマニフェストに元ファイルの内容ハッシュを記録し、再構築時は変更のないレコードを再利用
 """
 
+import argparse
+import hashlib
 import json
 import os
+import textwrap
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 import re
+import sys
+
+CATEGORIES = ["recipe", "food", "branded"]
+MANIFEST_VERSION = 1
+
+
+def plan_id_shards(raw_data_path: Path, num_shards: int) -> List[Dict]:
+    """
+    IDディレクトリ名の crc32 でシャードに振り分ける（IDが増減しても他のシャードは変わらない）
+    
+    Returns:
+        シャードごとの {"category", "shard_name": <category>-<NNNN>, "id_names": ソート済みのID}
+    """
+    tasks = []
+    for category in CATEGORIES:
+        category_path = Path(raw_data_path) / category
+        if not category_path.exists():
+            print(f"❌ Category directory not found: {category_path}")
+            continue
+        
+        buckets: List[List[str]] = [[] for _ in range(num_shards)]
+        with os.scandir(category_path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    buckets[zlib.crc32(entry.name.encode("utf-8")) % num_shards].append(entry.name)
+        for index, id_names in enumerate(buckets):
+            if id_names:
+                tasks.append({
+                    "category": category,
+                    "shard_name": f"{category}-{index:04d}",
+                    "id_names": sorted(id_names)
+                })
+    return tasks
+
 
 class NutritionDBBuilder:
     def __init__(self, raw_data_path: str, output_path: str):
@@ -32,8 +77,9 @@ class NutritionDBBuilder:
             "branded": {"processed": 0, "errors": 0}
         }
         
-        # 構築されたデータベース
+        # 構築されたデータベース（build() のみ。build_sharded() はシャードに書き出す）
         self.db_items = []
+        self.database_counts = {"dish": 0, "ingredient": 0, "branded": 0}
     
     def extract_serving_size_grams(self, serving_size: str) -> Optional[float]:
         """servingSizeから数値を抽出してfloatに変換"""
@@ -232,6 +278,31 @@ class NutritionDBBuilder:
         except (KeyError, ValueError, TypeError) as e:
             return None
     
+    def process_item(self, category: str, data: Dict) -> Optional[Dict]:
+        """カテゴリに応じた変換（変換できない場合はNone）"""
+        if category == "recipe":
+            return self.process_recipe_item(data)
+        elif category == "food":
+            return self.process_food_item(data)
+        elif category == "branded":
+            return self.process_branded_item(data)
+        return None
+    
+    @staticmethod
+    def latest_json_file(id_dir: Path) -> Optional[Path]:
+        """IDディレクトリの processed 内の最新のJSONファイル（なければNone）"""
+        processed_dir = id_dir / "processed"
+        if not processed_dir.exists():
+            return None
+        
+        # processedディレクトリ内のJSONファイルを確認
+        json_files = list(processed_dir.glob("*.json"))
+        if not json_files:
+            return None
+        
+        # 最新のJSONファイルを使用
+        return max(json_files, key=lambda x: x.stat().st_mtime)
+    
     def process_category(self, category: str):
         """指定されたカテゴリのデータを処理"""
         print(f"\n🔄 Processing {category} data...")
@@ -249,30 +320,16 @@ class NutritionDBBuilder:
             if not id_dir.is_dir():
                 continue
             
-            processed_dir = id_dir / "processed"
-            if not processed_dir.exists():
-                continue
-            
-            # processedディレクトリ内のJSONファイルを確認
-            json_files = list(processed_dir.glob("*.json"))
-            if not json_files:
+            json_file = self.latest_json_file(id_dir)
+            if json_file is None:
                 continue
             
-            # 最新のJSONファイルを使用
-            json_file = max(json_files, key=lambda x: x.stat().st_mtime)
-            
             try:
                 with open(json_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                 
                 # カテゴリ別の処理
-                processed_item = None
-                if category == "recipe":
-                    processed_item = self.process_recipe_item(data)
-                elif category == "food":
-                    processed_item = self.process_food_item(data)
-                elif category == "branded":
-                    processed_item = self.process_branded_item(data)
+                processed_item = self.process_item(category, data)
                 
                 if processed_item:
                     self.db_items.append(processed_item)
@@ -303,16 +360,21 @@ class NutritionDBBuilder:
             json.dump(self.db_items, f, indent=2, ensure_ascii=False)
         print(f"   ✅ Saved {len(self.db_items)} total items to {eatthismuch_db_path}")
         
-        # 統計情報保存
-        stats_path = self.output_path / "build_stats.json"
-        
         # カテゴリ別アイテム数
-        db_by_type = {"dish": 0, "ingredient": 0, "branded": 0}
+        self.database_counts = {"dish": 0, "ingredient": 0, "branded": 0}
         for item in self.db_items:
-            db_by_type[item["data_type"]] += 1
+            self.database_counts[item["data_type"]] += 1
+        
+        self.save_build_stats()
+    
+    def save_build_stats(self, build_timestamp: Optional[str] = None):
+        """統計情報（build_stats.json）を保存"""
+        stats_path = self.output_path / "build_stats.json"
+        db_by_type = self.database_counts
+        total = sum(db_by_type.values())
         
         total_stats = {
-            "build_timestamp": None,
+            "build_timestamp": build_timestamp,
             "categories": self.stats,
             "totals": {
                 "total_processed": sum(cat["processed"] for cat in self.stats.values()),
@@ -323,7 +385,7 @@ class NutritionDBBuilder:
                 "dish": db_by_type["dish"],
                 "ingredient": db_by_type["ingredient"],
                 "branded": db_by_type["branded"],
-                "total": len(self.db_items)
+                "total": total
             }
         }
         
@@ -355,14 +417,10 @@ class NutritionDBBuilder:
             print(f"Success Rate: {success_rate:.1f}%")
         
         # カテゴリ別アイテム数
-        db_by_type = {"dish": 0, "ingredient": 0, "branded": 0}
-        for item in self.db_items:
-            db_by_type[item["data_type"]] += 1
-        
         print(f"\nDatabase Items:")
-        for db_type, count in db_by_type.items():
+        for db_type, count in self.database_counts.items():
             print(f"  {db_type.capitalize()}: {count} items")
-        print(f"  Total: {len(self.db_items)} items")
+        print(f"  Total: {sum(self.database_counts.values())} items")
     
     def build(self):
         """データベース構築の実行"""
@@ -370,8 +428,7 @@ class NutritionDBBuilder:
         print("=" * 60)
         
         # カテゴリ別処理
-        categories = ["recipe", "food", "branded"]
-        for category in categories:
+        for category in CATEGORIES:
             self.process_category(category)
         
         # データベース保存
@@ -381,14 +438,312 @@ class NutritionDBBuilder:
         self.print_summary()
         
         print("\n✅ 栄養データベース構築完了")
+    
+    # === シャード単位の並列・差分構築 ===
+    
+    def shard_path(self, shard_name: str) -> Path:
+        return self.output_path / "shards" / f"{shard_name}.jsonl"
+    
+    def shard_manifest_path(self, shard_name: str) -> Path:
+        return self.output_path / "shards" / f"{shard_name}.manifest.json"
+    
+    def load_shard_manifest(self, shard_name: str) -> Dict:
+        """シャードのマニフェスト（前回の構築が完了していなければ空）"""
+        manifest_path = self.shard_manifest_path(shard_name)
+        if not manifest_path.exists() or not self.shard_path(shard_name).exists():
+            return {}
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+    
+    def build_shard(self, category: str, shard_name: str, id_names: List[str], incremental: bool = True) -> Dict:
+        """
+        1シャード分のIDディレクトリを処理し、正規化したレコードをJSONLに書き出す
+        
+        シャードのマニフェスト（shards/<shard>.manifest.json）に元ファイルごとの
+        [sha256, mtime_ns, size, 出力行（変換できなかった場合はNone）] を記録します。
+        incremental の場合、mtime・サイズが前回と同じファイルは読み込まずに前回のハッシュを使い、
+        ハッシュが前回と同じファイルは前回の出力行をそのまま再利用します（JSONの解析・変換を省略）。
+        すべてのファイルが前回と同じならシャードファイルも書き直しません。
+        
+        Args:
+            category: recipe / food / branded
+            shard_name: シャード名（<category>-<NNNN>）
+            id_names: このシャードに属するIDディレクトリ名（ソート済み）
+            incremental: 前回の構築結果を再利用するか
+        
+        Returns:
+            processed, errors, reused（再利用したファイル数）, error_samples, skipped
+        """
+        category_path = self.raw_data_path / category
+        previous = self.load_shard_manifest(shard_name) if incremental else {}
+        previous_files = previous.get("files", {})
+        
+        sources = []
+        unchanged = True
+        for name in id_names:
+            json_file = self.latest_json_file(category_path / name)
+            if json_file is None:
+                continue
+            relative = f"{name}/processed/{json_file.name}"
+            stat = json_file.stat()
+            old = previous_files.get(relative)
+            if old and old[1] == stat.st_mtime_ns and old[2] == stat.st_size:
+                digest, content = old[0], None
+            else:
+                content = json_file.read_bytes()
+                digest = hashlib.sha256(content).hexdigest()
+            unchanged = unchanged and old is not None and old[0] == digest
+            sources.append((name, relative, digest, stat, content))
+        
+        if previous and unchanged and len(sources) == len(previous_files):
+            return {"processed": previous["processed"], "errors": previous["errors"], "reused": len(sources),
+                    "error_samples": [], "skipped": True}
+        
+        previous_lines = []
+        if previous:
+            with open(self.shard_path(shard_name), 'r', encoding='utf-8') as f:
+                previous_lines = f.read().splitlines()
+        
+        files = {}
+        processed_count = 0
+        error_count = 0
+        reused_count = 0
+        error_samples = []
+        path = self.shard_path(shard_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".jsonl.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for name, relative, digest, stat, content in sources:
+                old = previous_files.get(relative)
+                if old and old[0] == digest and (old[3] is None or old[3] < len(previous_lines)):
+                    line = previous_lines[old[3]] if old[3] is not None else None
+                    reused_count += 1
+                else:
+                    try:
+                        if content is None:
+                            content = (category_path / relative).read_bytes()
+                        processed_item = self.process_item(category, json.loads(content))
+                    except Exception as e:
+                        processed_item = None
+                        if len(error_samples) < 5:
+                            error_samples.append(f"{name}: {str(e)}")
+                    line = json.dumps(processed_item, ensure_ascii=False) if processed_item else None
+                
+                if line is not None:
+                    files[relative] = [digest, stat.st_mtime_ns, stat.st_size, processed_count]
+                    f.write(line + "\n")
+                    processed_count += 1
+                else:
+                    files[relative] = [digest, stat.st_mtime_ns, stat.st_size, None]
+                    error_count += 1
+        os.replace(tmp_path, path)
+        
+        manifest = {"version": MANIFEST_VERSION, "processed": processed_count, "errors": error_count, "files": files}
+        with open(self.shard_manifest_path(shard_name), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        
+        return {
+            "processed": processed_count,
+            "errors": error_count,
+            "reused": reused_count,
+            "error_samples": error_samples,
+            "skipped": False
+        }
+    
+    def plan_shards(self, num_shards: int) -> List[Dict]:
+        return plan_id_shards(self.raw_data_path, num_shards)
+    
+    def build_sharded(self, workers: Optional[int] = None, num_shards: int = 64, incremental: bool = True,
+                      merged_json: bool = False) -> Dict:
+        """
+        データベースをシャード単位で並列に構築する
+        
+        正規化したレコードは shards/<category>-<NNNN>.jsonl に書き出し、メモリには保持しません。
+        incremental の場合、元ファイルの内容ハッシュが前回と同じレコードは再利用し（build_shard()）、
+        変更のないシャードは書き直しません。シャード数を変えた場合は全件を再構築します。
+        
+        Args:
+            workers: ワーカープロセス数（Noneの場合はCPU数）
+            num_shards: カテゴリあたりのシャード数
+            incremental: 前回の構築結果を再利用するか
+            merged_json: 従来形式の eatthismuch_db.json もシャードから書き出すか
+        
+        Returns:
+            構築結果（rebuilt / skipped シャード数、reused / converted ファイル数）
+        """
+        print("🔧 栄養データベース構築開始（シャード並列）")
+        print("=" * 60)
+        
+        manifest_path = self.output_path / "build_manifest.json"
+        if incremental and manifest_path.exists():
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+            if previous.get("version") != MANIFEST_VERSION or previous.get("num_shards") != num_shards:
+                print("   ⚠️ Shard layout changed, rebuilding every shard")
+                incremental = False
+        
+        tasks = self.plan_shards(num_shards)
+        for task in tasks:
+            task["incremental"] = incremental
+        print(f"\n🔄 Processing {len(tasks)} shards with {workers or os.cpu_count()} workers...")
+        
+        shards = {}
+        result = {"rebuilt": 0, "skipped": 0, "reused": 0, "converted": 0}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_shard_worker,
+                                 initargs=(str(self.raw_data_path), str(self.output_path))) as executor:
+            for task, entry in zip(tasks, executor.map(_build_shard_task, tasks)):
+                category = task["category"]
+                result["skipped" if entry["skipped"] else "rebuilt"] += 1
+                result["reused"] += entry["reused"]
+                result["converted"] += entry["processed"] + entry["errors"] - entry["reused"]
+                for sample in entry["error_samples"]:
+                    print(f"   ❌ Error processing {sample}")
+                shards[task["shard_name"]] = {"processed": entry["processed"], "errors": entry["errors"]}
+                self.stats[category]["processed"] += entry["processed"]
+                self.stats[category]["errors"] += entry["errors"]
+        
+        # 対応するIDディレクトリがなくなったシャードを削除
+        for path in (self.output_path / "shards").glob("*"):
+            if path.name.split(".", 1)[0] not in shards:
+                path.unlink()
+        
+        data_types = {"recipe": "dish", "food": "ingredient", "branded": "branded"}
+        self.database_counts = {"dish": 0, "ingredient": 0, "branded": 0}
+        for category, stats in self.stats.items():
+            self.database_counts[data_types[category]] += stats["processed"]
+            print(f"   📊 {category}: {stats['processed']} processed, {stats['errors']} errors")
+        print(f"   ♻️ Shards: {result['rebuilt']} rebuilt, {result['skipped']} unchanged "
+              f"({result['reused']} items reused, {result['converted']} converted)")
+        
+        print(f"\n💾 Saving EatThisMuch database to {self.output_path}...")
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_VERSION, "num_shards": num_shards, "shards": shards}, f,
+                      indent=2, ensure_ascii=False)
+        self.save_build_stats(build_timestamp=datetime.now().isoformat())
+        if merged_json:
+            self.write_merged_json(num_shards)
+        
+        self.print_summary()
+        print("\n✅ 栄養データベース構築完了")
+        return result
+    
+    def write_merged_json(self, num_shards: int):
+        """
+        シャードから eatthismuch_db.json（json.dump(indent=2) と同じ形式）を逐次書き出す
+        
+        レコードの順序は build() と同じ（カテゴリ順、カテゴリ内は iterdir() の順）です。
+        IDディレクトリをその順に列挙し、シャードのマニフェストから該当する行を探して読み出すため、
+        メモリに保持するのはIDごとの（シャード名, 行のオフセット）だけでレコード本体は保持しません。
+        """
+        eatthismuch_db_path = self.output_path / "eatthismuch_db.json"
+        count = 0
+        shard_files = {}
+        try:
+            with open(eatthismuch_db_path, 'w', encoding='utf-8') as out:
+                out.write("[")
+                for category in CATEGORIES:
+                    for shard_name, offset in self.merged_json_order(category, num_shards):
+                        if shard_name not in shard_files:
+                            shard_files[shard_name] = open(self.shard_path(shard_name), 'rb')
+                        shard_file = shard_files[shard_name]
+                        shard_file.seek(offset)
+                        item = json.dumps(json.loads(shard_file.readline()), indent=2, ensure_ascii=False)
+                        out.write(("," if count else "") + "\n" + textwrap.indent(item, "  "))
+                        count += 1
+                out.write("\n]" if count else "]")
+        finally:
+            for shard_file in shard_files.values():
+                shard_file.close()
+        print(f"   ✅ Saved {count} total items to {eatthismuch_db_path}")
+    
+    def merged_json_order(self, category: str, num_shards: int) -> List[tuple]:
+        """カテゴリ内のレコードの (シャード名, 行のオフセット) を iterdir() の順に返す"""
+        category_path = self.raw_data_path / category
+        if not category_path.exists():
+            return []
+        
+        shard_ids: Dict[str, Dict[str, int]] = {}
+        for position, id_dir in enumerate(category_path.iterdir()):
+            if id_dir.is_dir():
+                shard_name = f"{category}-{zlib.crc32(id_dir.name.encode('utf-8')) % num_shards:04d}"
+                shard_ids.setdefault(shard_name, {})[id_dir.name] = position
+        
+        order = []
+        for shard_name, positions in shard_ids.items():
+            manifest = self.load_shard_manifest(shard_name)
+            if not manifest:
+                continue
+            offsets = []
+            with open(self.shard_path(shard_name), 'rb') as f:
+                offset = 0
+                for line in f:
+                    offsets.append(offset)
+                    offset += len(line)
+            for relative, entry in manifest["files"].items():
+                name = relative.split("/", 1)[0]
+                if entry[3] is not None and name in positions:
+                    order.append((positions[name], shard_name, offsets[entry[3]]))
+        return [(shard_name, offset) for _, shard_name, offset in sorted(order)]
+
+# === プロセスプール ===
+
+_worker_builder: Optional[NutritionDBBuilder] = None
+
+
+def _init_shard_worker(raw_data_path: str, output_path: str):
+    """ワーカープロセスごとのビルダーを作成"""
+    global _worker_builder
+    _worker_builder = NutritionDBBuilder(raw_data_path, output_path)
+
+
+def _build_shard_task(task: Dict) -> Dict:
+    return _worker_builder.build_shard(**task)
+
 
 def main():
     """メイン実行関数"""
-    raw_data_path = "../raw_nutrition_data"  # ひとつ上のディレクトリ
-    output_path = "nutrition_db"
+    parser = argparse.ArgumentParser(description="Build the EatThisMuch nutrition database")
+    parser.add_argument("--raw-data", default="../raw_nutrition_data", help="Raw data directory (recipe/food/branded)")
+    parser.add_argument("--output", default="nutrition_db")
+    parser.add_argument("--legacy", action="store_true", help="Single-process build into one eatthismuch_db.json")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--shards", type=int, default=64, help="Shards per category")
+    parser.add_argument("--full", action="store_true", help="Rebuild every shard, ignoring build_manifest.json")
+    parser.add_argument("--no-merged-json", dest="merged_json", action="store_false",
+                        help="Only write the JSONL shards (skip eatthismuch_db.json)")
+    parser.add_argument("--check-integrity", action="store_true",
+                        help="Run check_data_integrity.py first (incrementally) and abort on failures")
+    parser.add_argument("--max-error-rate", type=float, default=5.0,
+                        help="Per-category integrity error rate (%%) that aborts the build")
+    args = parser.parse_args()
+    
+    if args.check_integrity:
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+        from nutrition_db_experiment.check_data_integrity import check_integrity, integrity_failures
+        
+        print("🔍 整合性確認中...")
+        summary = check_integrity(args.raw_data, str(Path(args.output) / "integrity"), workers=args.workers,
+                                  num_shards=args.shards)
+        failures = integrity_failures(summary, args.max_error_rate)
+        if failures:
+            for failure in failures:
+                print(f"❌ {failure}")
+            print("❌ 整合性確認に失敗したため構築を中止しました")
+            return False
+        print(f"   ✅ {summary['totals']['total']} files OK "
+              f"({summary['totals']['errors']} errors, {summary['reused']} unchanged)")
     
-    builder = NutritionDBBuilder(raw_data_path, output_path)
-    builder.build()
+    builder = NutritionDBBuilder(args.raw_data, args.output)
+    if args.legacy:
+        builder.build()
+    else:
+        builder.build_sharded(workers=args.workers, num_shards=args.shards, incremental=not args.full,
+                              merged_json=args.merged_json)
+    return True
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    exit(0 if main() else 1)
\ No newline at end of file
@@ -4,12 +4,36 @@
 
 各カテゴリ（recipe, food, branded）のJSONファイルで
 必要な項目が全て存在するかを確認する。
+
+check_integrity() はIDディレクトリを build_nutrition_db.py と同じシャードに分けてプロセスプールで確認し、
+ファイルごとの内容ハッシュと確認結果をシャードごとのマニフェストに記録する（変更のないファイルは再確認しない）。
+結果は integrity_summary.json に出力し、build_nutrition_db.py --check-integrity はこれを見て構築を中止する。
+
+使用例:
+    python check_data_integrity.py
+    python check_data_integrity.py --workers 8 --max-error-rate 1.0
+    python check_data_integrity.py --legacy   # 従来の1ファイルずつの表示
 """
 
+import argparse
+import hashlib
 import json
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
-import re
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from nutrition_db_experiment.build_nutrition_db import (  # noqa: E402
+    CATEGORIES, NutritionDBBuilder, plan_id_shards
+)
+
+INTEGRITY_VERSION = 1
+SUMMARY_FILE = "integrity_summary.json"
+DEFAULT_OUTPUT = "nutrition_db/integrity"
 
 def check_recipe_data(data):
     """レシピデータの必要項目確認"""
@@ -284,19 +308,232 @@ def scan_directory(base_path, category):
         success_rate = (valid_files + warning_files) / total_files * 100
         print(f"   📈 Success rate: {success_rate:.1f}%")
 
+# === シャード単位の並列・差分確認 ===
+
+CHECKS = {"recipe": check_recipe_data, "food": check_food_data, "branded": check_branded_data}
+
+
+def check_file(category: str, content: bytes) -> Tuple[str, List[str]]:
+    """1ファイルの確認結果（status: ok / warning / error と、そのメッセージ）"""
+    try:
+        errors, warnings = CHECKS[category](json.loads(content))
+    except Exception as e:
+        return "error", [f"File read error - {str(e)}"]
+    if errors:
+        return "error", errors
+    if warnings:
+        return "warning", warnings
+    return "ok", []
+
+
+def check_shard(raw_data_path: str, output_path: str, category: str, shard_name: str, id_names: List[str],
+                incremental: bool = True) -> Dict[str, Any]:
+    """
+    1シャード分のIDディレクトリを確認する（ワーカープロセスで実行）
+    
+    マニフェスト（<output>/shards/<shard>.json）にファイルごとの
+    [sha256, mtime_ns, size, status, messages] を記録します。mtime・サイズが前回と同じファイルは読み込まず、
+    内容ハッシュが前回と同じファイルは前回の結果を再利用します。ファイルは1件ずつ読み込み、
+    メインプロセスには件数とエラーの例だけを返します。
+    
+    Returns:
+        counts（total / valid / warnings / errors / missing）, reused, issues（エラーの例）
+    """
+    category_path = Path(raw_data_path) / category
+    manifest_path = Path(output_path) / "shards" / f"{shard_name}.json"
+    previous_files = {}
+    if incremental and manifest_path.exists():
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get("version") == INTEGRITY_VERSION:
+                previous_files = manifest["files"]
+        except (OSError, json.JSONDecodeError, KeyError):
+            previous_files = {}
+    
+    files = {}
+    counts = {"total": 0, "valid": 0, "warnings": 0, "errors": 0, "missing": 0}
+    reused = 0
+    issues = []
+    for name in id_names:
+        json_file = NutritionDBBuilder.latest_json_file(category_path / name)
+        if json_file is None:
+            counts["missing"] += 1
+            continue
+        
+        relative = f"{name}/processed/{json_file.name}"
+        stat = json_file.stat()
+        old = previous_files.get(relative)
+        if old and old[1] == stat.st_mtime_ns and old[2] == stat.st_size:
+            digest, status, messages = old[0], old[3], old[4]
+            reused += 1
+        else:
+            content = json_file.read_bytes()
+            digest = hashlib.sha256(content).hexdigest()
+            if old and old[0] == digest:
+                status, messages = old[3], old[4]
+                reused += 1
+            else:
+                status, messages = check_file(category, content)
+        
+        files[relative] = [digest, stat.st_mtime_ns, stat.st_size, status, messages]
+        counts["total"] += 1
+        counts[{"ok": "valid", "warning": "warnings", "error": "errors"}[status]] += 1
+        if status == "error" and len(issues) < 5:
+            issues.append({"category": category, "id": name, "errors": messages})
+    
+    if files != previous_files:
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": INTEGRITY_VERSION, "files": files}, f, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+    
+    return {"counts": counts, "reused": reused, "issues": issues}
+
+
+def _check_shard_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    return check_shard(**task)
+
+
+def load_integrity_summary(output_path: str = DEFAULT_OUTPUT) -> Optional[Dict[str, Any]]:
+    """integrity_summary.json（なければNone）"""
+    summary_path = Path(output_path) / SUMMARY_FILE
+    if not summary_path.exists():
+        return None
+    with open(summary_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def check_integrity(raw_data_path: str, output_path: str = DEFAULT_OUTPUT, workers: Optional[int] = None,
+                    num_shards: int = 64, incremental: bool = True) -> Dict[str, Any]:
+    """
+    全カテゴリの整合性を並列に確認し、integrity_summary.json に書き出す
+    
+    Args:
+        raw_data_path: 元データのディレクトリ（recipe / food / branded）
+        output_path: マニフェストとサマリーの出力先
+        workers: ワーカープロセス数（Noneの場合はCPU数）
+        num_shards: カテゴリあたりのシャード数（変えた場合は全件を再確認）
+        incremental: 変更のないファイルの結果を再利用するか
+    
+    Returns:
+        サマリー（カテゴリ別の件数・エラー率、再利用した件数、エラーの例）
+    """
+    output = Path(output_path)
+    output.mkdir(parents=True, exist_ok=True)
+    previous = load_integrity_summary(output_path) if incremental else None
+    if not previous or previous.get("version") != INTEGRITY_VERSION or previous.get("num_shards") != num_shards:
+        incremental = False
+    
+    tasks = plan_id_shards(Path(raw_data_path), num_shards)
+    for task in tasks:
+        task.update(raw_data_path=str(raw_data_path), output_path=str(output), incremental=incremental)
+    
+    categories = {category: {"total": 0, "valid": 0, "warnings": 0, "errors": 0, "missing": 0}
+                  for category in CATEGORIES}
+    reused = 0
+    error_samples = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for task, result in zip(tasks, executor.map(_check_shard_task, tasks)):
+            for key, value in result["counts"].items():
+                categories[task["category"]][key] += value
+            reused += result["reused"]
+            error_samples.extend(result["issues"][:max(0, 20 - len(error_samples))])
+    
+    # 対応するIDディレクトリがなくなったシャードのマニフェストを削除
+    shard_names = {task["shard_name"] for task in tasks}
+    for path in (output / "shards").glob("*.json"):
+        if path.stem not in shard_names:
+            path.unlink()
+    
+    totals = {key: sum(counts[key] for counts in categories.values())
+              for key in ("total", "valid", "warnings", "errors", "missing")}
+    for counts in (*categories.values(), totals):
+        counts["success_rate"] = (counts["valid"] + counts["warnings"]) / counts["total"] * 100 if counts["total"] else 0.0
+        counts["error_rate"] = counts["errors"] / counts["total"] * 100 if counts["total"] else 0.0
+    
+    summary = {
+        "version": INTEGRITY_VERSION,
+        "checked_at": datetime.now().isoformat(),
+        "raw_data_path": str(Path(raw_data_path).resolve()),
+        "num_shards": num_shards,
+        "categories": categories,
+        "totals": totals,
+        "reused": reused,
+        "checked": totals["total"] - reused,
+        "error_samples": error_samples
+    }
+    with open(output / SUMMARY_FILE, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    return summary
+
+
+def integrity_failures(summary: Dict[str, Any], max_error_rate: float = 5.0) -> List[str]:
+    """
+    構築を中止すべき問題の一覧（空なら構築してよい）
+    
+    Args:
+        summary: check_integrity() / load_integrity_summary() のサマリー
+        max_error_rate: カテゴリごとのエラー率（%）の上限
+    """
+    if summary["totals"]["total"] == 0:
+        return ["no raw nutrition files found"]
+    return [
+        f"{category}: error rate {counts['error_rate']:.1f}% exceeds {max_error_rate:.1f}% "
+        f"({counts['errors']}/{counts['total']} files)"
+        for category, counts in summary["categories"].items()
+        if counts["total"] and counts["error_rate"] > max_error_rate
+    ]
+
+
+def print_integrity_summary(summary: Dict[str, Any]):
+    """サマリーの表示"""
+    for category, counts in summary["categories"].items():
+        print(f"\n📊 {category} Summary:")
+        print(f"   Total files: {counts['total']}")
+        print(f"   ✅ Valid: {counts['valid']}")
+        print(f"   ⚠️ Warnings: {counts['warnings']}")
+        print(f"   ❌ Errors: {counts['errors']}")
+        if counts["missing"]:
+            print(f"   ⚠️ No processed JSON: {counts['missing']}")
+        if counts["total"] > 0:
+            print(f"   📈 Success rate: {counts['success_rate']:.1f}%")
+    
+    print(f"\n♻️ {summary['reused']} files unchanged since the last check, {summary['checked']} checked")
+    for sample in summary["error_samples"]:
+        print(f"❌ {sample['category']}/{sample['id']}: {'; '.join(sample['errors'])}")
+
+
 def main():
     """メイン実行関数"""
-    base_path = "../raw_nutrition_data"
+    parser = argparse.ArgumentParser(description="Check raw nutrition data before building the database")
+    parser.add_argument("--raw-data", default="../raw_nutrition_data", help="Raw data directory (recipe/food/branded)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Directory for the manifests and integrity_summary.json")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--shards", type=int, default=64, help="Shards per category")
+    parser.add_argument("--full", action="store_true", help="Re-check every file, ignoring the manifests")
+    parser.add_argument("--max-error-rate", type=float, default=5.0, help="Per-category error rate (%%) that fails the check")
+    parser.add_argument("--legacy", action="store_true", help="Sequential check that prints every file")
+    args = parser.parse_args()
     
     print("🔍 栄養データベース整合性確認スクリプト")
     print("=" * 60)
     
-    categories = ["recipe", "food", "branded"]
-    
-    for category in categories:
-        scan_directory(base_path, category)
-    
-    print("\n✅ 整合性確認完了")
+    if args.legacy:
+        for category in CATEGORIES:
+            scan_directory(args.raw_data, category)
+        print("\n✅ 整合性確認完了")
+        return True
+    
+    summary = check_integrity(args.raw_data, args.output, workers=args.workers, num_shards=args.shards,
+                              incremental=not args.full)
+    print_integrity_summary(summary)
+    failures = integrity_failures(summary, args.max_error_rate)
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"\n{'❌ 整合性確認失敗' if failures else '✅ 整合性確認完了'} ({Path(args.output) / SUMMARY_FILE})")
+    return not failures
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    exit(0 if main() else 1) 
\ No newline at end of file
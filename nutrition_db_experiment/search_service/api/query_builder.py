@@ -4,14 +4,95 @@ Query Builder - Elasticsearch JSONクエリ構築モジュール
 
 BM25F + function_scoreを使用した高度な検索クエリを構築
 仕様書に従ったマルチシグナルブースティング戦略を実装
+
+クエリテンプレート:
+(db_type_filter, 重み, ハイライト, 類義語) ごとにクエリ全体を1回だけ組み立ててJSONにシリアライズし、
+クエリ文字列・件数・単語ボーナスの位置をスロットとして残したテンプレート（CompiledQueryTemplate）を
+キャッシュする。リクエストごとの処理はスロットへの値の埋め込みだけで、送信するJSONバイト列を直接作る。
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import json
+import re
+import threading
+
+# テンプレート中のスロット（JSON文字列として埋め込み、シリアライズ後に分割する）
+_SLOT_PATTERN = re.compile(r'(,?)"__slot_(\w+)__"')
+
+
+def _slot(name: str) -> str:
+    return f"__slot_{name}__"
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class CompiledQueryTemplate:
+    """
+    事前にシリアライズした検索クエリのテンプレート
+    
+    render() の結果は、同じ条件の build_search_query() の結果を JSON にしたものと同じ内容になる。
+    """
+    
+    def __init__(self, skeleton: Dict[str, Any], word_function: Dict[str, Any]):
+        """
+        Args:
+            skeleton: スロット（_slot()）を含むクエリ
+            word_function: 単語ボーナス1件分（単語の位置がスロット）
+        """
+        self._segments = self._split(_dumps(skeleton))
+        # 単語ボーナスはスロットが1つだけなので、前後のリテラルで直接組み立てる
+        (self._word_prefix, _, _), (self._word_suffix, _, _) = self._split(_dumps(word_function))
+    
+    @staticmethod
+    def _split(text: str) -> List[Tuple[str, Optional[str], str]]:
+        """(リテラル, スロット名, スロット直前のカンマ) の列に分割（最後はスロットなし）"""
+        segments = []
+        position = 0
+        for match in _SLOT_PATTERN.finditer(text):
+            segments.append((text[position:match.start()], match.group(2), match.group(1)))
+            position = match.end()
+        segments.append((text[position:], None, ""))
+        return segments
+    
+    @staticmethod
+    def _fill(segments: List[Tuple[str, Optional[str], str]], values: Dict[str, str]) -> str:
+        parts = []
+        for literal, slot, comma in segments:
+            parts.append(literal)
+            if slot is not None and values[slot]:
+                parts.append(comma + values[slot])
+        return "".join(parts)
+    
+    def render(self, processed_query: str, original_query: str, size: int = 20) -> bytes:
+        """
+        パラメータを埋め込んだクエリのJSONバイト列
+        
+        Args:
+            processed_query: 前処理済みクエリ文字列
+            original_query: 元のユーザークエリ文字列
+            size: 返却する結果数
+        """
+        prefix, suffix = self._word_prefix, self._word_suffix
+        word_functions = ",".join(
+            prefix + _dumps(word) + suffix
+            for word in processed_query.split() if len(word) > 2  # 短すぎる単語は除外
+        )
+        return self._fill(self._segments, {
+            "processed_query": _dumps(processed_query),
+            "original_query": _dumps(original_query),
+            "size": str(int(size)),
+            "word_functions": word_functions
+        }).encode("utf-8")
+
 
 class NutritionSearchQueryBuilder:
     """栄養データベース検索用のElasticsearchクエリビルダー"""
     
+    # キャッシュするテンプレート数の上限（重みの組み合わせが増え続ける場合の保護）
+    MAX_TEMPLATES = 256
+    
     def __init__(self):
         """クエリビルダーの初期化"""
         # デフォルトのスコアリング重み
@@ -23,6 +104,10 @@ class NutritionSearchQueryBuilder:
             "base_field_boost": 1.0,
             "exact_field_boost": 3.0
         }
+        
+        # コンパイル済みクエリテンプレート
+        self._templates: Dict[Tuple, CompiledQueryTemplate] = {}
+        self._templates_lock = threading.Lock()
     
     def build_search_query(
         self,
@@ -65,6 +150,16 @@ class NutritionSearchQueryBuilder:
             final_weights
         )
         
+        return self._assemble_search_query(function_score_query, db_type_filter, size, enable_highlight)
+    
+    def _assemble_search_query(
+        self,
+        function_score_query: Dict[str, Any],
+        db_type_filter: Optional[str],
+        size: Any,
+        enable_highlight: bool
+    ) -> Dict[str, Any]:
+        """フィルタ・件数・ハイライトを加えて完全なクエリにする"""
         # フィルタ追加（function_scoreクエリ全体に適用）
         if db_type_filter and db_type_filter != "all":
             function_score_query = {
@@ -89,6 +184,69 @@ class NutritionSearchQueryBuilder:
         
         return search_query
     
+    def get_template(
+        self,
+        db_type_filter: Optional[str] = None,
+        weights: Optional[Dict[str, float]] = None,
+        enable_highlight: bool = True,
+        enable_synonyms: bool = True
+    ) -> CompiledQueryTemplate:
+        """
+        条件に対応するコンパイル済みテンプレートを取得（なければ作成してキャッシュ）
+        
+        Args:
+            db_type_filter: データベースタイプフィルタ ("dish", "ingredient", "branded")
+            weights: カスタムスコア重み
+            enable_highlight: ハイライト機能を有効にするか
+            enable_synonyms: 類義語展開を有効にするか（将来拡張用）
+            
+        Returns:
+            CompiledQueryTemplate
+        """
+        final_weights = self.default_weights.copy()
+        if weights:
+            final_weights.update(weights)
+        if db_type_filter == "all":
+            db_type_filter = None
+        key = (db_type_filter, tuple(sorted(final_weights.items())), enable_highlight, enable_synonyms)
+        
+        template = self._templates.get(key)
+        if template is None:
+            # 単語ボーナスなしで組み立て、近接フレーズボーナスの直後に単語ボーナスのスロットを置く
+            base_query = self._build_base_query(_slot("processed_query"), final_weights)
+            function_score_query = self._build_function_score_query(
+                base_query, _slot("original_query"), "", final_weights
+            )
+            function_score_query["function_score"]["functions"].insert(2, _slot("word_functions"))
+            skeleton = self._assemble_search_query(
+                function_score_query, db_type_filter, _slot("size"), enable_highlight
+            )
+            template = CompiledQueryTemplate(skeleton, self._build_word_function(_slot("word"), final_weights))
+            with self._templates_lock:
+                if len(self._templates) >= self.MAX_TEMPLATES:
+                    self._templates.clear()
+                self._templates[key] = template
+        return template
+    
+    def build_search_query_bytes(
+        self,
+        processed_query: str,
+        original_query: str,
+        db_type_filter: Optional[str] = None,
+        size: int = 20,
+        weights: Optional[Dict[str, float]] = None,
+        enable_highlight: bool = True,
+        enable_synonyms: bool = True
+    ) -> bytes:
+        """
+        build_search_query と同じクエリを、キャッシュしたテンプレートからJSONバイト列として作成
+        
+        Elasticsearchクライアントの body にそのまま渡せる（再シリアライズ不要）。
+        引数は build_search_query と同じ。
+        """
+        template = self.get_template(db_type_filter, weights, enable_highlight, enable_synonyms)
+        return template.render(processed_query, original_query, size)
+    
     def _build_base_query(self, processed_query: str, weights: Dict[str, float]) -> Dict[str, Any]:
         """
         BM25Fベースクエリを構築
@@ -186,14 +344,7 @@ class NutritionSearchQueryBuilder:
         # 処理済みクエリの各単語に対して
         for word in processed_query.split():
             if len(word) > 2:  # 短すぎる単語は除外
-                functions.append({
-                    "filter": {
-                        "term": {
-                            "search_name.exact": word
-                        }
-                    },
-                    "weight": weights["exact_word_bonus"] * 0.5  # 単語レベルは少し低めに
-                })
+                functions.append(self._build_word_function(word, weights))
         
         # 4. 前方一致ボーナス（低優先度）
         functions.append({
@@ -218,6 +369,17 @@ class NutritionSearchQueryBuilder:
             }
         }
     
+    def _build_word_function(self, word: str, weights: Dict[str, float]) -> Dict[str, Any]:
+        """完全一致単語ボーナス（1単語分）"""
+        return {
+            "filter": {
+                "term": {
+                    "search_name.exact": word
+                }
+            },
+            "weight": weights["exact_word_bonus"] * 0.5  # 単語レベルは少し低めに
+        }
+    
     def _build_highlight_config(self) -> Dict[str, Any]:
         """
         ハイライト設定を構築
@@ -323,6 +485,18 @@ class NutritionSearchQueryBuilder:
             }
         }
 
+# グローバルインスタンス（テンプレートのキャッシュを共有）
+_builder = None
+_builder_lock = threading.Lock()
+
+def get_query_builder() -> NutritionSearchQueryBuilder:
+    """グローバルクエリビルダーインスタンスを取得"""
+    global _builder
+    with _builder_lock:
+        if _builder is None:
+            _builder = NutritionSearchQueryBuilder()
+    return _builder
+
 # 便利関数
 def build_nutrition_search_query(
     processed_query: str,
@@ -344,11 +518,35 @@ def build_nutrition_search_query(
     Returns:
         Elasticsearchクエリ辞書
     """
-    builder = NutritionSearchQueryBuilder()
-    return builder.build_search_query(
+    return get_query_builder().build_search_query(
         processed_query=processed_query,
         original_query=original_query,
         db_type_filter=db_type_filter,
         size=size,
         weights=custom_weights
+    )
+
+def build_nutrition_search_query_bytes(
+    processed_query: str,
+    original_query: str,
+    db_type_filter: Optional[str] = None,
+    size: int = 20,
+    custom_weights: Optional[Dict[str, float]] = None,
+    enable_highlight: bool = True,
+    enable_synonyms: bool = True
+) -> bytes:
+    """
+    栄養データベース検索クエリのJSONバイト列（キャッシュしたテンプレートから作成する便利関数）
+    
+    Returns:
+        Elasticsearchクエリ（JSONバイト列）
+    """
+    return get_query_builder().build_search_query_bytes(
+        processed_query=processed_query,
+        original_query=original_query,
+        db_type_filter=db_type_filter,
+        size=size,
+        weights=custom_weights,
+        enable_highlight=enable_highlight,
+        enable_synonyms=enable_synonyms
     ) 
\ No newline at end of file
@@ -3,25 +3,30 @@
 Search Handler - 栄養データベース検索APIエンドポイント
 
 HTTPリクエストを処理し、クエリ前処理、クエリ構築、Elasticsearch検索を統合
+
+- NutritionSearchHandler: 同期クライアントで1リクエストずつ検索
+- AsyncNutritionSearchHandler: AsyncElasticsearch を使う非同期版（asyncアプリに組み込み可能）。
+  search_many() は複数リクエストのクエリをまとめて前処理し、1回の _msearch で検索する
 """
 
 import os
 import sys
 import json
+import asyncio
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Sequence
 from dataclasses import dataclass
 from datetime import datetime
 
 # プロジェクトパスを追加
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from nlp.query_preprocessor import preprocess_query, analyze_query
-from api.query_builder import build_nutrition_search_query
+from nlp.query_preprocessor import preprocess_query, preprocess_queries, analyze_query, start_background_loading
+from api.query_builder import build_nutrition_search_query_bytes
 
 # Elasticsearchクライアント（実際の実装では設定から読み込み）
 try:
-    from elasticsearch import Elasticsearch
+    from elasticsearch import AsyncElasticsearch, Elasticsearch
     ELASTICSEARCH_AVAILABLE = True
 except ImportError:
     ELASTICSEARCH_AVAILABLE = False
@@ -46,8 +51,8 @@ class SearchResponse:
     took_ms: int
     max_score: float
 
-class NutritionSearchHandler:
-    """栄養データベース検索ハンドラー"""
+class _SearchHandlerBase:
+    """同期・非同期ハンドラー共通の処理（クエリ構築・レスポンス整形）"""
     
     def __init__(self, elasticsearch_host: str = "localhost:9200", index_name: str = "nutrition_db"):
         """
@@ -61,100 +66,81 @@ class NutritionSearchHandler:
         self.index_name = index_name
         self.es_client = None
         
+        # spaCyモデルの読み込みを開始（最初の検索だけが完了を待つ）
+        self.preprocessor = start_background_loading()
+        
         # ロギング設定
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
-        
-        if ELASTICSEARCH_AVAILABLE:
-            try:
-                self.es_client = Elasticsearch([elasticsearch_host])
-                # 接続テスト
-                if self.es_client.ping():
-                    self.logger.info(f"Elasticsearch接続成功: {elasticsearch_host}")
-                else:
-                    self.logger.warning(f"Elasticsearch接続失敗: {elasticsearch_host}")
-            except Exception as e:
-                self.logger.error(f"Elasticsearch初期化エラー: {e}")
-        else:
-            self.logger.warning("Elasticsearchクライアントが利用できません")
     
-    def search(self, request: SearchRequest) -> SearchResponse:
+    def _build_query(self, request: SearchRequest, processed_query: str) -> bytes:
+        """Elasticsearchクエリ構築（キャッシュしたテンプレートからJSONバイト列を直接作成）"""
+        return build_nutrition_search_query_bytes(
+            processed_query=processed_query,
+            original_query=request.query,
+            db_type_filter=request.db_type_filter,
+            size=request.size,
+            custom_weights=request.custom_weights,
+            enable_highlight=request.enable_highlight,
+            enable_synonyms=request.enable_synonyms
+        )
+    
+    def _build_response(
+        self,
+        request: SearchRequest,
+        processed_query: str,
+        es_query: bytes,
+        es_response: Optional[Dict[str, Any]],
+        took_ms: int,
+        query_analysis: Optional[Dict[str, Any]] = None
+    ) -> SearchResponse:
         """
-        検索を実行
+        検索レスポンスを構築
         
         Args:
-            request: 検索リクエスト
-            
-        Returns:
-            検索レスポンス
+            es_response: Elasticsearchレスポンス（None の場合はモック結果）
+            query_analysis: クエリ分析（デバッグ情報、None の場合は省略）
         """
-        start_time = datetime.now()
+        if es_response is not None:
+            results = self._format_search_results(es_response)
+            total_hits = es_response['hits']['total']['value']
+            max_score = es_response['hits']['max_score'] or 0.0
+        else:
+            # モックレスポンス（Elasticsearch未接続時）
+            results = self._mock_search_results(request.query)
+            total_hits = len(results)
+            max_score = 1.0
         
-        try:
-            # 1. クエリ前処理
-            processed_query = preprocess_query(
-                request.query, 
-                expand_synonyms=request.enable_synonyms
-            )
-            
-            # 2. クエリ分析（デバッグ情報）
-            query_analysis = analyze_query(request.query)
-            
-            # 3. Elasticsearchクエリ構築
-            es_query = build_nutrition_search_query(
-                processed_query=processed_query,
-                original_query=request.query,
-                db_type_filter=request.db_type_filter,
-                size=request.size,
-                custom_weights=request.custom_weights
-            )
-            
-            # 4. Elasticsearch検索実行
-            if self.es_client:
-                response = self.es_client.search(
-                    index=self.index_name,
-                    body=es_query
-                )
-                results = self._format_search_results(response)
-                total_hits = response['hits']['total']['value']
-                max_score = response['hits']['max_score'] or 0.0
-            else:
-                # モックレスポンス（Elasticsearch未接続時）
-                results = self._mock_search_results(request.query)
-                total_hits = len(results)
-                max_score = 1.0
-            
-            # 5. レスポンス構築
-            end_time = datetime.now()
-            took_ms = int((end_time - start_time).total_seconds() * 1000)
-            
-            return SearchResponse(
-                results=results,
-                total_hits=total_hits,
-                query_info={
-                    "original_query": request.query,
-                    "processed_query": processed_query,
-                    "analysis": query_analysis,
-                    "elasticsearch_query": es_query,
-                    "db_type_filter": request.db_type_filter
-                },
-                took_ms=took_ms,
-                max_score=max_score
-            )
-            
-        except Exception as e:
-            self.logger.error(f"検索エラー: {e}")
-            return SearchResponse(
-                results=[],
-                total_hits=0,
-                query_info={
-                    "original_query": request.query,
-                    "error": str(e)
-                },
-                took_ms=0,
-                max_score=0.0
-            )
+        query_info = {
+            "original_query": request.query,
+            "processed_query": processed_query,
+            "elasticsearch_query": es_query.decode("utf-8"),
+            "db_type_filter": request.db_type_filter
+        }
+        if query_analysis is not None:
+            query_info["analysis"] = query_analysis
+        
+        return SearchResponse(
+            results=results,
+            total_hits=total_hits,
+            query_info=query_info,
+            took_ms=took_ms,
+            max_score=max_score
+        )
     
+    def _error_response(self, request: SearchRequest, error: Any) -> SearchResponse:
+        """エラー時の空レスポンス"""
+        self.logger.error(f"検索エラー: {error}")
+        return SearchResponse(
+            results=[],
+            total_hits=0,
+            query_info={
+                "original_query": request.query,
+                "error": str(error)
+            },
+            took_ms=0,
+            max_score=0.0
+        )
     def _format_search_results(self, es_response: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Elasticsearchレスポンスを整形
@@ -223,14 +209,10 @@ class NutritionSearchHandler:
         ]
         
         return mock_results
+
     
-    def health_check(self) -> Dict[str, Any]:
-        """
-        ヘルスチェック
-        
-        Returns:
-            システム状態情報
-        """
+    def _base_status(self) -> Dict[str, Any]:
+        """ヘルスチェックの共通部分（Elasticsearchへの接続確認以外）"""
         status = {
             "service": "nutrition_search",
             "status": "healthy",
@@ -241,10 +223,92 @@ class NutritionSearchHandler:
                 "index": self.index_name
             },
             "components": {
-                "query_preprocessor": True,
+                "query_preprocessor": self.preprocessor.load_error is None,
+                "query_preprocessor_ready": self.preprocessor.is_ready,
                 "query_builder": True
             }
         }
+        if self.preprocessor.load_error:
+            status["components"]["query_preprocessor_error"] = self.preprocessor.load_error
+            status["status"] = "degraded"
+        return status
+
+class NutritionSearchHandler(_SearchHandlerBase):
+    """栄養データベース検索ハンドラー"""
+    
+    def __init__(self, elasticsearch_host: str = "localhost:9200", index_name: str = "nutrition_db"):
+        """
+        検索ハンドラーを初期化
+        
+        Args:
+            elasticsearch_host: Elasticsearchホスト
+            index_name: インデックス名
+        """
+        super().__init__(elasticsearch_host, index_name)
+        
+        if ELASTICSEARCH_AVAILABLE:
+            try:
+                self.es_client = Elasticsearch([elasticsearch_host])
+                # 接続テスト
+                if self.es_client.ping():
+                    self.logger.info(f"Elasticsearch接続成功: {elasticsearch_host}")
+                else:
+                    self.logger.warning(f"Elasticsearch接続失敗: {elasticsearch_host}")
+            except Exception as e:
+                self.logger.error(f"Elasticsearch初期化エラー: {e}")
+        else:
+            self.logger.warning("Elasticsearchクライアントが利用できません")
+    
+    def search(self, request: SearchRequest) -> SearchResponse:
+        """
+        検索を実行
+        
+        Args:
+            request: 検索リクエスト
+            
+        Returns:
+            検索レスポンス
+        """
+        start_time = datetime.now()
+        
+        try:
+            # 1. クエリ前処理
+            processed_query = preprocess_query(
+                request.query, 
+                expand_synonyms=request.enable_synonyms
+            )
+            
+            # 2. クエリ分析（デバッグ情報）
+            query_analysis = analyze_query(request.query)
+            
+            # 3. Elasticsearchクエリ構築
+            es_query = self._build_query(request, processed_query)
+            
+            # 4. Elasticsearch検索実行
+            response = None
+            if self.es_client:
+                response = self.es_client.search(
+                    index=self.index_name,
+                    body=es_query
+                )
+            
+            # 5. レスポンス構築
+            end_time = datetime.now()
+            took_ms = int((end_time - start_time).total_seconds() * 1000)
+            
+            return self._build_response(request, processed_query, es_query, response, took_ms, query_analysis)
+            
+        except Exception as e:
+            return self._error_response(request, e)
+    
+    def health_check(self) -> Dict[str, Any]:
+        """
+        ヘルスチェック
+        
+        Returns:
+            システム状態情報
+        """
+        status = self._base_status()
         
         if self.es_client:
             try:
@@ -259,6 +323,157 @@ class NutritionSearchHandler:
         
         return status
 
+class AsyncNutritionSearchHandler(_SearchHandlerBase):
+    """
+    栄養データベース検索ハンドラー（AsyncElasticsearch を使う非同期版）
+    
+    spaCyによる前処理はスレッドプールで実行するため、イベントループをブロックしない。
+    
+    使用例:
+        async with AsyncNutritionSearchHandler("http://localhost:9200") as handler:
+            responses = await handler.search_many([SearchRequest("chicken breast"), SearchRequest("rice")])
+    """
+    
+    def __init__(self, elasticsearch_host: str = "localhost:9200", index_name: str = "nutrition_db"):
+        """
+        検索ハンドラーを初期化（接続はしない。接続確認は health_check() で行う）
+        
+        Args:
+            elasticsearch_host: Elasticsearchホスト（スキームがない場合は http:// とみなす）
+            index_name: インデックス名
+        """
+        super().__init__(elasticsearch_host, index_name)
+        
+        if ELASTICSEARCH_AVAILABLE:
+            host = elasticsearch_host if "://" in elasticsearch_host else f"http://{elasticsearch_host}"
+            try:
+                self.es_client = AsyncElasticsearch([host])
+            except Exception as e:
+                self.logger.error(f"Elasticsearch初期化エラー: {e}")
+        else:
+            self.logger.warning("Elasticsearchクライアントが利用できません")
+        
+        # _msearch の各検索のヘッダー行
+        self._msearch_header = json.dumps({"index": index_name}).encode("utf-8")
+    
+    async def __aenter__(self) -> "AsyncNutritionSearchHandler":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    
+    async def close(self):
+        """Elasticsearchクライアントの接続を閉じる"""
+        if self.es_client:
+            await self.es_client.close()
+    
+    def _preprocess_batch(self, requests: Sequence[SearchRequest]) -> List[str]:
+        """全リクエストのクエリをまとめて前処理（類義語展開の有無ごとに1回、入力と同じ順序）"""
+        processed_queries: List[Optional[str]] = [None] * len(requests)
+        for expand_synonyms in (False, True):
+            indices = [i for i, request in enumerate(requests) if request.enable_synonyms == expand_synonyms]
+            if indices:
+                processed = preprocess_queries([requests[i].query for i in indices], expand_synonyms=expand_synonyms)
+                for i, processed_query in zip(indices, processed):
+                    processed_queries[i] = processed_query
+        return processed_queries
+    
+    async def search(self, request: SearchRequest) -> SearchResponse:
+        """
+        検索を実行
+        
+        Args:
+            request: 検索リクエスト
+            
+        Returns:
+            検索レスポンス
+        """
+        return (await self.search_many([request]))[0]
+    
+    async def search_many(
+        self,
+        requests: Sequence[SearchRequest],
+        include_analysis: bool = False
+    ) -> List[SearchResponse]:
+        """
+        複数の検索を1回の _msearch で実行
+        
+        Args:
+            requests: 検索リクエストのリスト
+            include_analysis: クエリ分析（デバッグ情報）を含めるか（spaCyの処理がクエリごとに1回増える）
+            
+        Returns:
+            検索レスポンスのリスト（入力と同じ順序。took_ms はバッチ全体の処理時間）。
+            個別の検索が失敗した場合は、そのリクエストだけがエラーレスポンスになる
+        """
+        if not requests:
+            return []
+        start_time = datetime.now()
+        loop = asyncio.get_running_loop()
+        
+        try:
+            # 1. クエリ前処理（nlp.pipe で一括処理）
+            processed_queries = await loop.run_in_executor(None, self._preprocess_batch, requests)
+            
+            # 2. クエリ分析（デバッグ情報）
+            query_analyses: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+            if include_analysis:
+                query_analyses = await loop.run_in_executor(
+                    None, lambda: [analyze_query(request.query) for request in requests]
+                )
+            
+            # 3. Elasticsearchクエリ構築
+            es_queries = [self._build_query(request, processed_query)
+                          for request, processed_query in zip(requests, processed_queries)]
+            
+            # 4. Elasticsearch検索実行（ヘッダー行とクエリ行を交互に並べたNDJSON）
+            es_responses: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+            if self.es_client:
+                searches = []
+                for es_query in es_queries:
+                    searches.append(self._msearch_header)
+                    searches.append(es_query)
+                response = await self.es_client.msearch(searches=searches)
+                es_responses = response["responses"]
+        except Exception as e:
+            return [self._error_response(request, e) for request in requests]
+        
+        # 5. レスポンス構築（全件を1回の走査で整形）
+        took_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+        responses = []
+        for request, processed_query, es_query, es_response, query_analysis in zip(
+            requests, processed_queries, es_queries, es_responses, query_analyses
+        ):
+            if es_response is not None and "error" in es_response:
+                responses.append(self._error_response(request, es_response["error"]))
+            else:
+                responses.append(self._build_response(
+                    request, processed_query, es_query, es_response, took_ms, query_analysis
+                ))
+        return responses
+    
+    async def health_check(self) -> Dict[str, Any]:
+        """
+        ヘルスチェック
+        
+        Returns:
+            システム状態情報
+        """
+        status = self._base_status()
+        
+        if self.es_client:
+            try:
+                status["elasticsearch"]["connected"] = await self.es_client.ping()
+                if status["elasticsearch"]["connected"]:
+                    # インデックス存在確認
+                    index_exists = await self.es_client.indices.exists(index=self.index_name)
+                    status["elasticsearch"]["index_exists"] = bool(index_exists)
+            except Exception as e:
+                status["elasticsearch"]["error"] = str(e)
+                status["status"] = "degraded"
+        
+        return status
+
 # 便利関数
 def create_search_handler(
     elasticsearch_host: str = "localhost:9200",
@@ -267,6 +482,13 @@ def create_search_handler(
     """検索ハンドラーのファクトリ関数"""
     return NutritionSearchHandler(elasticsearch_host, index_name)
 
+def create_async_search_handler(
+    elasticsearch_host: str = "localhost:9200",
+    index_name: str = "nutrition_db"
+) -> AsyncNutritionSearchHandler:
+    """非同期検索ハンドラーのファクトリ関数"""
+    return AsyncNutritionSearchHandler(elasticsearch_host, index_name)
+
 def search_nutrition_db(
     query: str,
     db_type_filter: Optional[str] = None,
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Lexicon Matcher - 食品レキシコンのトークン単位 Aho-Corasick マッチャー
+
+lexicon_data の保護ターム・レンマ上書き・カスタムストップワード・類義語を、トークン列を
+アルファベットとする Aho-Corasick オートマトンにコンパイルし、クエリのトークン列を1回走査するだけで
+複数トークンの語句（"ground beef", "spring onion" など）を含むすべての一致を見つける。
+走査時間はクエリの長さと一致数だけに依存し、レキシコンの大きさには依存しない。
+
+コンパイル結果はレキシコンファイルの内容ハッシュをキーに JSON でキャッシュする（pickle と違い、
+キャッシュディレクトリに書き込めても読み込み時にコードは実行されない）。
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+MATCHER_VERSION = 2
+
+LEXICON_FILES = (
+    "protected_food_terms.txt",
+    "food_lemma_overrides.txt",
+    "custom_food_stopwords.txt",
+    "food_synonyms.txt",
+)
+
+_HYPHEN = re.compile(r"(-)")
+
+
+def phrase_token_variants(phrase: str) -> List[Tuple[str, ...]]:
+    """
+    語句のトークン列（spaCyは英字間のハイフンを分割するため、"coca-cola" は
+    ("coca-cola",) と ("coca", "-", "cola") の両方を登録する）
+    """
+    tokens = tuple(phrase.split())
+    variants = [tokens]
+    if "-" in phrase:
+        split = tuple(part for token in tokens for part in _HYPHEN.split(token) if part)
+        if split != tokens:
+            variants.append(split)
+    return variants
+
+
+class TokenAutomaton:
+    """トークン列を対象とする Aho-Corasick オートマトン"""
+
+    def __init__(self, patterns: Dict[Tuple[str, ...], Any]):
+        """
+        Args:
+            patterns: トークン列 → 一致時に返す値
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        self.size = 0
+
+        for tokens, payload in patterns.items():
+            if not tokens:
+                continue
+            state = 0
+            for token in tokens:
+                next_state = self._goto[state].get(token)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][token] = next_state
+                state = next_state
+            self._out[state].append((len(tokens), payload))
+            self.size += 1
+
+        # 幅優先で失敗遷移を設定し、失敗先の出力を引き継ぐ（長い一致が先）
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(token, 0)
+                self._out[next_state] = sorted(self._out[next_state] + self._out[self._fail[next_state]],
+                                               key=lambda item: -item[0])
+
+    def to_dict(self, encode: Callable[[Any], Any]) -> Dict:
+        """JSONに保存できる形式（encode: 値 → JSONの値）"""
+        return {
+            "goto": self._goto,
+            "fail": self._fail,
+            "out": [[[length, encode(payload)] for length, payload in out] for out in self._out],
+            "size": self.size,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, decode: Callable[[Any], Any]) -> "TokenAutomaton":
+        """to_dict() の出力から復元（decode: JSONの値 → 値）"""
+        automaton = cls({})
+        automaton._goto = [{str(token): int(state) for token, state in goto.items()} for goto in data["goto"]]
+        automaton._fail = [int(state) for state in data["fail"]]
+        automaton._out = [[(int(length), decode(payload)) for length, payload in out] for out in data["out"]]
+        automaton.size = int(data["size"])
+        if not len(automaton._goto) == len(automaton._fail) == len(automaton._out):
+            raise ValueError("inconsistent automaton tables")
+        return automaton
+
+    def find_all(self, tokens: Sequence[str]) -> Iterator[Tuple[int, int, Any]]:
+        """
+        すべての一致を (開始, 終了, 値) で返す（終了位置順、同じ終了位置では長い一致が先）
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, token in enumerate(tokens):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for length, payload in out[state]:
+                yield index - length + 1, index + 1, payload
+
+    def find_longest(self, tokens: Sequence[str]) -> List[Tuple[int, int, Any]]:
+        """重ならない一致を左から順に、同じ開始位置では最長のものを選んで返す"""
+        matches = sorted(self.find_all(tokens), key=lambda match: (match[0], match[0] - match[1]))
+        selected = []
+        position = 0
+        for start, end, payload in matches:
+            if start >= position:
+                selected.append((start, end, payload))
+                position = end
+        return selected
+
+
+@dataclass(frozen=True)
+class LexiconEntry:
+    """語句に対する処理（stopword: 除去する, lemma: 置き換えるレンマ）"""
+    stopword: bool = False
+    lemma: Optional[str] = None
+    protected: bool = False
+
+
+@dataclass
+class LexiconMatcher:
+    """lexicon_data をコンパイルしたマッチャー（to_dict() / from_dict() で JSON にキャッシュ可能）"""
+    protected_terms: Set[str] = field(default_factory=set)
+    lemma_overrides: Dict[str, str] = field(default_factory=dict)
+    custom_stopwords: Set[str] = field(default_factory=set)
+    food_synonyms: Dict[str, List[str]] = field(default_factory=dict)
+    digest: str = ""
+    terms: Optional[TokenAutomaton] = None
+    synonyms: Optional[TokenAutomaton] = None
+
+    def compile(self) -> "LexiconMatcher":
+        """保護ターム・レンマ上書き・ストップワードと、類義語のオートマトンを作成"""
+        entries: Dict[Tuple[str, ...], LexiconEntry] = {}
+        phrases = set(self.protected_terms) | set(self.lemma_overrides) | set(self.custom_stopwords)
+        for phrase in phrases:
+            # 優先順位は従来のトークン単位の処理と同じ: ストップワード > 保護ターム > レンマ上書き
+            if phrase in self.protected_terms:
+                entry = LexiconEntry(stopword=phrase in self.custom_stopwords, lemma=phrase, protected=True)
+            else:
+                entry = LexiconEntry(stopword=phrase in self.custom_stopwords, lemma=self.lemma_overrides.get(phrase))
+            for tokens in phrase_token_variants(phrase):
+                entries[tokens] = entry
+        self.terms = TokenAutomaton(entries)
+
+        synonyms: Dict[Tuple[str, ...], List[str]] = {}
+        for phrase, targets in self.food_synonyms.items():
+            for tokens in phrase_token_variants(phrase):
+                synonyms[tokens] = targets
+        self.synonyms = TokenAutomaton(synonyms)
+        return self
+
+    def to_dict(self) -> Dict:
+        """コンパイル済みのマッチャーをJSONに保存できる形式に変換"""
+        return {
+            "version": MATCHER_VERSION,
+            "digest": self.digest,
+            "protected_terms": sorted(self.protected_terms),
+            "lemma_overrides": self.lemma_overrides,
+            "custom_stopwords": sorted(self.custom_stopwords),
+            "food_synonyms": self.food_synonyms,
+            "terms": self.terms.to_dict(lambda entry: [entry.stopword, entry.lemma, entry.protected]),
+            "synonyms": self.synonyms.to_dict(list),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LexiconMatcher":
+        """to_dict() の出力から復元（形式が違う場合は KeyError / TypeError / ValueError）"""
+        if data["version"] != MATCHER_VERSION:
+            raise ValueError(f"unsupported matcher version: {data['version']}")
+        return cls(
+            protected_terms=set(data["protected_terms"]),
+            lemma_overrides=dict(data["lemma_overrides"]),
+            custom_stopwords=set(data["custom_stopwords"]),
+            food_synonyms={phrase: list(targets) for phrase, targets in data["food_synonyms"].items()},
+            digest=str(data["digest"]),
+            terms=TokenAutomaton.from_dict(data["terms"], lambda entry: LexiconEntry(
+                stopword=bool(entry[0]), lemma=entry[1], protected=bool(entry[2]))),
+            synonyms=TokenAutomaton.from_dict(data["synonyms"], list),
+        )
+
+    def match_terms(self, tokens: Sequence[str]) -> List[Tuple[int, int, LexiconEntry]]:
+        """小文字化したトークン列から、保護ターム・レンマ上書き・ストップワードの語句を1回の走査で探す"""
+        return self.terms.find_longest(tokens)
+
+    def expand_synonyms(self, tokens: Sequence[str]) -> List[str]:
+        """処理済みトークン列に類義語を追加（語句の直後に、その類義語を続ける）"""
+        by_end: Dict[int, List[List[str]]] = {}
+        for _, end, targets in self.synonyms.find_all(tokens):
+            by_end.setdefault(end, []).append(targets)
+        expanded = []
+        for index, token in enumerate(tokens):
+            expanded.append(token)
+            for targets in by_end.get(index + 1, ()):
+                expanded.extend(targets)
+        return expanded
+
+
+# === レキシコンファイルの読み込み ===
+
+def _read_lines(path: str) -> List[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+    except FileNotFoundError:
+        print(f"Warning: {os.path.basename(path)} not found at {path}")
+        return []
+
+
+def read_lexicon(lexicon_dir: str) -> LexiconMatcher:
+    """lexicon_data のファイルを読み込む（コンパイル前）"""
+    matcher = LexiconMatcher()
+
+    # 保護ターム
+    for line in _read_lines(os.path.join(lexicon_dir, "protected_food_terms.txt")):
+        matcher.protected_terms.add(line.lower())
+
+    # レンマ上書きルール: original => override
+    for line in _read_lines(os.path.join(lexicon_dir, "food_lemma_overrides.txt")):
+        parts = line.split("=>")
+        if len(parts) == 2:
+            matcher.lemma_overrides[parts[0].strip().lower()] = parts[1].strip().lower()
+
+    # カスタムストップワード
+    for line in _read_lines(os.path.join(lexicon_dir, "custom_food_stopwords.txt")):
+        matcher.custom_stopwords.add(line.lower())
+
+    # 類義語
+    for line in _read_lines(os.path.join(lexicon_dir, "food_synonyms.txt")):
+        # 双方向類義語: word1, word2, word3
+        if "=>" not in line and "," in line:
+            words = [w.strip().lower() for w in line.split(",")]
+            for word in words:
+                if word not in matcher.food_synonyms:
+                    matcher.food_synonyms[word] = []
+                matcher.food_synonyms[word].extend([w for w in words if w != word])
+
+        # 片方向類義語: source => target1, target2
+        elif "=>" in line:
+            parts = line.split("=>")
+            if len(parts) == 2:
+                source = parts[0].strip().lower()
+                matcher.food_synonyms[source] = [t.strip().lower() for t in parts[1].split(",")]
+    return matcher
+
+
+def lexicon_digest(lexicon_dir: str) -> str:
+    """レキシコンファイルの内容ハッシュ（キャッシュのキー）"""
+    digest = hashlib.sha256(f"v{MATCHER_VERSION}".encode("utf-8"))
+    for name in LEXICON_FILES:
+        digest.update(name.encode("utf-8"))
+        try:
+            with open(os.path.join(lexicon_dir, name), "rb") as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            digest.update(b"\0missing")
+    return digest.hexdigest()
+
+
+def load_lexicon_matcher(lexicon_dir: str, cache_dir: Optional[str] = None) -> LexiconMatcher:
+    """
+    コンパイル済みのマッチャーを取得（キャッシュがあれば JSON から読み込み、なければコンパイルして保存）
+
+    Args:
+        lexicon_dir: lexicon_data のパス
+        cache_dir: キャッシュの保存先（None の場合は環境変数 FOOD_LEXICON_CACHE_DIR、
+            未設定なら lexicon_dir/.cache）。書き込めない場合はキャッシュせずに続行する
+    """
+    digest = lexicon_digest(lexicon_dir)
+    cache_dir = cache_dir or os.environ.get("FOOD_LEXICON_CACHE_DIR") or os.path.join(lexicon_dir, ".cache")
+    cache_path = os.path.join(cache_dir, f"lexicon_matcher_{digest[:16]}.json")
+
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            matcher = LexiconMatcher.from_dict(json.load(f))
+        if matcher.digest == digest:
+            return matcher
+    except (OSError, ValueError, KeyError, TypeError, IndexError, AttributeError):
+        pass
+
+    matcher = read_lexicon(lexicon_dir).compile()
+    matcher.digest = digest
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(matcher.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not cache the lexicon matcher at {cache_path}: {e}")
+    return matcher
@@ -9,24 +9,76 @@ Query Preprocessor - spaCyベースのクエリ前処理パイプライン
 - 保護ターム処理
 - レンマ化（上書きルール適用）
 - 類義語展開（オプション）
+
+高速起動・一括処理:
+- lean（既定）: 使わないコンポーネント（parser, ner）を読み込まない
+  （レンマ化に必要なのは tok2vec, tagger, attribute_ruler, lemmatizer のみ）
+- background=True: モデルをバックグラウンドスレッドで読み込み、最初のクエリだけが読み込み完了を待つ
+- preprocess_queries(): nlp.pipe による複数クエリの一括処理
+- 前処理結果のLRUキャッシュ（類義語展開の前のトークン列を保持）
+- モデルが見つからない場合は実行時にダウンロードせず、インストール方法を示して失敗する
+
+レキシコン（保護ターム・レンマ上書き・ストップワード・類義語）はトークン単位の Aho-Corasick
+オートマトン（nlp/lexicon_matcher.py）にコンパイルし、複数トークンの語句もクエリの1回の走査で照合する。
 """
 
 import os
+import sys
+import threading
+import time
+from collections import OrderedDict
 import spacy
 from spacy.tokens import Token
 from spacy.language import Language
-from typing import List, Dict, Set, Optional
+from typing import List, Dict, Set, Optional, Sequence, Tuple
 import re
 
+# プロジェクトパスを追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlp.lexicon_matcher import LexiconMatcher, load_lexicon_matcher
+
+DEFAULT_MODEL = "en_core_web_sm"
+LEAN_EXCLUDED_COMPONENTS = ("parser", "ner")
+
+
+class SpacyModelUnavailableError(RuntimeError):
+    """spaCyモデルが読み込めない（実行時のダウンロードは行わない）"""
+
+
 class FoodQueryPreprocessor:
-    def __init__(self):
-        """クエリ前処理パイプラインを初期化"""
+    def __init__(self, model_name: str = DEFAULT_MODEL, lean: bool = True, background: bool = False,
+                 cache_size: int = 4096, strict: bool = False, nlp: Optional[Language] = None):
+        """
+        クエリ前処理パイプラインを初期化
+        
+        Args:
+            model_name: spaCyモデル名
+            lean: 使わないコンポーネント（LEAN_EXCLUDED_COMPONENTS）を読み込まない
+            background: モデルをバックグラウンドスレッドで読み込む（wait_until_ready() で完了を待てる）
+            cache_size: 前処理結果のLRUキャッシュの件数（0で無効）
+            strict: モデルが読み込めない場合に SpacyModelUnavailableError を送出する
+                （Falseの場合はエラーを表示し、小文字化のみで処理を続ける）
+            nlp: 読み込み済みのパイプライン（指定した場合は model_name を読み込まない）
+        """
         self.nlp = None
+        self.model_name = model_name
+        self.lean = lean
+        self.strict = strict
+        self.load_error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
         self.protected_terms: Set[str] = set()
         self.lemma_overrides: Dict[str, str] = {}
         self.custom_stopwords: Set[str] = set()
         self.food_synonyms: Dict[str, List[str]] = {}
         
+        # 前処理結果のLRUキャッシュ（クエリ → 類義語展開前のトークン列）
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[str, ...]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
         # レキシコンデータのパス
         self.lexicon_base_path = os.path.join(
             os.path.dirname(os.path.abspath(__file__)), 
@@ -34,133 +86,104 @@ class FoodQueryPreprocessor:
         )
         
         self._load_lexicon_data()
-        self._setup_spacy_pipeline()
+        
+        self._ready = threading.Event()
+        if nlp is not None:
+            self.nlp = nlp
+            self._register_extensions()
+            self._ready.set()
+        elif background:
+            threading.Thread(target=self._setup_spacy_pipeline, name="spacy-loader", daemon=True).start()
+        else:
+            self._setup_spacy_pipeline()
+            if self.load_error and strict:
+                raise SpacyModelUnavailableError(self.load_error)
     
     def _load_lexicon_data(self):
-        """レキシコンファイルからデータを読み込み"""
-        # 保護タームの読み込み
-        protected_file = os.path.join(self.lexicon_base_path, "protected_food_terms.txt")
-        try:
-            with open(protected_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    term = line.strip().lower()
-                    if term and not term.startswith("#"):
-                        self.protected_terms.add(term)
-        except FileNotFoundError:
-            print(f"Warning: protected_food_terms.txt not found at {protected_file}")
-        
-        # レンマ上書きルールの読み込み
-        override_file = os.path.join(self.lexicon_base_path, "food_lemma_overrides.txt")
-        try:
-            with open(override_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith("#"):
-                        parts = line.split("=>")
-                        if len(parts) == 2:
-                            original = parts[0].strip().lower()
-                            override = parts[1].strip().lower()
-                            self.lemma_overrides[original] = override
-        except FileNotFoundError:
-            print(f"Warning: food_lemma_overrides.txt not found at {override_file}")
-        
-        # カスタムストップワードの読み込み
-        stopwords_file = os.path.join(self.lexicon_base_path, "custom_food_stopwords.txt")
-        try:
-            with open(stopwords_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    word = line.strip().lower()
-                    if word and not word.startswith("#"):
-                        self.custom_stopwords.add(word)
-        except FileNotFoundError:
-            print(f"Warning: custom_food_stopwords.txt not found at {stopwords_file}")
-        
-        # 類義語の読み込み（オプション）
-        synonyms_file = os.path.join(self.lexicon_base_path, "food_synonyms.txt")
-        try:
-            with open(synonyms_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith("#"):
-                        # 双方向類義語: word1, word2, word3
-                        if "=>" not in line and "," in line:
-                            words = [w.strip().lower() for w in line.split(",")]
-                            for word in words:
-                                if word not in self.food_synonyms:
-                                    self.food_synonyms[word] = []
-                                self.food_synonyms[word].extend([w for w in words if w != word])
-                        
-                        # 片方向類義語: source => target1, target2
-                        elif "=>" in line:
-                            parts = line.split("=>")
-                            if len(parts) == 2:
-                                source = parts[0].strip().lower()
-                                targets = [t.strip().lower() for t in parts[1].split(",")]
-                                self.food_synonyms[source] = targets
-        except FileNotFoundError:
-            print(f"Warning: food_synonyms.txt not found at {synonyms_file}")
+        """レキシコンファイルからデータを読み込み（コンパイル済みのマッチャーはJSONでキャッシュ）"""
+        self.lexicon: LexiconMatcher = load_lexicon_matcher(self.lexicon_base_path)
+        self.protected_terms = self.lexicon.protected_terms
+        self.lemma_overrides = self.lexicon.lemma_overrides
+        self.custom_stopwords = self.lexicon.custom_stopwords
+        self.food_synonyms = self.lexicon.food_synonyms
     
     def _setup_spacy_pipeline(self):
-        """spaCyパイプラインをセットアップ"""
+        """spaCyパイプラインをセットアップ（モデルが見つからなくてもダウンロードはしない）"""
+        started = time.perf_counter()
         try:
             # 英語の小さいモデルを読み込み（効率性重視）
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            print("Warning: en_core_web_sm model not found. Installing...")
-            try:
-                import subprocess
-                subprocess.run(["python", "-m", "spacy", "download", "en_core_web_sm"], check=True)
-                self.nlp = spacy.load("en_core_web_sm")
-            except Exception as e:
-                print(f"Error: Could not load spaCy model: {e}")
-                return
+            exclude = list(LEAN_EXCLUDED_COMPONENTS) if self.lean else []
+            self.nlp = spacy.load(self.model_name, exclude=exclude)
+            self._register_extensions()
+        except Exception as e:
+            self.load_error = (f"Could not load spaCy model '{self.model_name}': {str(e).rstrip('.')}. "
+                               f"Install it at build time with: python -m spacy download {self.model_name}")
+            print(f"Error: {self.load_error}")
+        finally:
+            self.load_seconds = time.perf_counter() - started
+            self._ready.set()
+    
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        モデルの読み込み完了を待つ
         
-        # カスタム拡張属性を追加
+        Returns:
+            タイムアウトまでに完了したか（読み込みに失敗した場合も完了とみなす）
+        """
+        return self._ready.wait(timeout)
+    
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+    
+    def _require_pipeline(self) -> bool:
+        """読み込み完了を待ち、パイプラインが使えるかを返す（strictで読み込みに失敗していれば例外）"""
+        self._ready.wait()
+        if self.nlp is None and self.strict:
+            raise SpacyModelUnavailableError(self.load_error or f"spaCy model '{self.model_name}' is not loaded")
+        return self.nlp is not None
+    
+    @staticmethod
+    def _register_extensions():
+        """カスタム拡張属性を追加"""
         if not Token.has_extension("is_protected"):
             Token.set_extension("is_protected", default=False)
         if not Token.has_extension("custom_lemma"):
             Token.set_extension("custom_lemma", default=None)
     
     def food_lexicon_processor_component(self, doc):
-        """食品レキシコン処理コンポーネント"""
-        for token in doc:
-            token_lower = token.lower_
-            
-            # 保護タームのチェック
-            if token_lower in self.protected_terms:
-                token._.is_protected = True
-                token._.custom_lemma = token_lower
-            
-            # レンマ上書きのチェック
-            elif token_lower in self.lemma_overrides:
-                token._.is_protected = True  # 上書きターもレンマ化から保護
-                token._.custom_lemma = self.lemma_overrides[token_lower]
-        
+        """食品レキシコン処理コンポーネント（複数トークンの語句を含む一致を doc.user_data に保存）"""
+        matches = self.lexicon.match_terms([token.lower_ for token in doc])
+        for start, end, entry in matches:
+            # 保護ターム・レンマ上書きはレンマ化から保護
+            if entry.lemma:
+                for token in doc[start:end]:
+                    token._.is_protected = True
+                    token._.custom_lemma = entry.lemma
+        doc.user_data["lexicon_matches"] = matches
         return doc
     
-    def preprocess_query(self, query_text: str, expand_synonyms: bool = False) -> str:
-        """
-        クエリテキストを前処理
-        
-        Args:
-            query_text: 生のクエリテキスト
-            expand_synonyms: 類義語展開を行うかどうか
-            
-        Returns:
-            処理済みクエリ文字列
-        """
-        if not self.nlp:
-            return query_text.lower()
-        
-        # spaCyで処理
-        doc = self.nlp(query_text)
-        
+    def _doc_tokens(self, doc) -> Tuple[str, ...]:
+        """処理済みDocから類義語展開前のトークン列を作成"""
         # カスタムコンポーネントを手動で適用
         doc = self.food_lexicon_processor_component(doc)
+        phrases = {start: (end, entry) for start, end, entry in doc.user_data["lexicon_matches"] if end - start > 1}
         
         processed_tokens = []
         
-        for token in doc:
+        index = 0
+        while index < len(doc):
+            # 複数トークンの語句: ストップワードなら除去、それ以外は1つのレンマに置き換え
+            if index in phrases:
+                end, entry = phrases[index]
+                if not entry.stopword and entry.lemma:
+                    processed_tokens.append(entry.lemma)
+                index = end
+                continue
+            
+            token = doc[index]
+            index += 1
+            
             # 句読点、空白、数字のみのトークンをスキップ
             if token.is_punct or token.is_space or (token.is_digit and len(token.text) > 2):
                 continue
@@ -178,20 +201,98 @@ class FoodQueryPreprocessor:
                 lemma = token.lemma_.lower()
                 processed_tokens.append(lemma)
         
-        # 類義語展開（オプション）
+        return tuple(processed_tokens)
+    
+    def _finalize(self, processed_tokens: Sequence[str], expand_synonyms: bool) -> str:
+        """類義語展開（オプション）と重複除去"""
         if expand_synonyms:
-            expanded_tokens = []
-            for token in processed_tokens:
-                expanded_tokens.append(token)
-                if token in self.food_synonyms:
-                    expanded_tokens.extend(self.food_synonyms[token])
-            processed_tokens = expanded_tokens
+            # 複数語の類義語も照合できるよう、単語単位で走査
+            processed_tokens = self.lexicon.expand_synonyms(" ".join(processed_tokens).split())
         
         # 重複除去と結合
         processed_tokens = list(dict.fromkeys(processed_tokens))  # 順序を保持して重複除去
         
         return " ".join(processed_tokens)
     
+    def _cache_get(self, query_text: str) -> Optional[Tuple[str, ...]]:
+        with self._cache_lock:
+            tokens = self._cache.get(query_text)
+            if tokens is None:
+                self.cache_misses += 1
+            else:
+                self.cache_hits += 1
+                self._cache.move_to_end(query_text)
+            return tokens
+    
+    def _cache_put(self, query_text: str, tokens: Tuple[str, ...]):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[query_text] = tokens
+            self._cache.move_to_end(query_text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def cache_info(self) -> Dict[str, int]:
+        """LRUキャッシュの状態"""
+        with self._cache_lock:
+            return {"hits": self.cache_hits, "misses": self.cache_misses,
+                    "size": len(self._cache), "max_size": self.cache_size}
+    
+    def preprocess_query(self, query_text: str, expand_synonyms: bool = False) -> str:
+        """
+        クエリテキストを前処理
+        
+        Args:
+            query_text: 生のクエリテキスト
+            expand_synonyms: 類義語展開を行うかどうか
+            
+        Returns:
+            処理済みクエリ文字列
+        """
+        if not self._require_pipeline():
+            return query_text.lower()
+        
+        tokens = self._cache_get(query_text)
+        if tokens is None:
+            # spaCyで処理
+            tokens = self._doc_tokens(self.nlp(query_text))
+            self._cache_put(query_text, tokens)
+        
+        return self._finalize(tokens, expand_synonyms)
+    
+    def preprocess_queries(self, query_texts: Sequence[str], expand_synonyms: bool = False,
+                           batch_size: int = 256) -> List[str]:
+        """
+        複数のクエリを一括で前処理（キャッシュにないクエリだけを nlp.pipe でまとめて処理）
+        
+        Args:
+            query_texts: 生のクエリテキストのリスト
+            expand_synonyms: 類義語展開を行うかどうか
+            batch_size: nlp.pipe のバッチサイズ
+            
+        Returns:
+            処理済みクエリ文字列のリスト（入力と同じ順序）
+        """
+        if not self._require_pipeline():
+            return [query_text.lower() for query_text in query_texts]
+        
+        tokens_by_query: Dict[str, Tuple[str, ...]] = {}
+        pending = []
+        for query_text in dict.fromkeys(query_texts):
+            tokens = self._cache_get(query_text)
+            if tokens is None:
+                pending.append(query_text)
+            else:
+                tokens_by_query[query_text] = tokens
+        
+        for query_text, doc in zip(pending, self.nlp.pipe(pending, batch_size=batch_size)):
+            tokens = self._doc_tokens(doc)
+            tokens_by_query[query_text] = tokens
+            self._cache_put(query_text, tokens)
+        
+        return [self._finalize(tokens_by_query[query_text], expand_synonyms) for query_text in query_texts]
+    
     def get_processed_tokens(self, query_text: str) -> List[str]:
         """
         処理済みトークンのリストを取得
@@ -215,21 +316,22 @@ class FoodQueryPreprocessor:
         Returns:
             分析結果の辞書
         """
-        if not self.nlp:
-            return {"error": "spaCy model not loaded"}
+        if not self._require_pipeline():
+            return {"error": self.load_error or "spaCy model not loaded"}
         
+        # パイプラインは1回だけ実行し、前処理結果もこのDocから作成
         doc = self.nlp(query_text)
-        
-        # カスタムコンポーネントを手動で適用
-        doc = self.food_lexicon_processor_component(doc)
+        tokens = self._doc_tokens(doc)
+        self._cache_put(query_text, tokens)
+        processed = self._finalize(tokens, expand_synonyms=False)
         
         analysis = {
             "original": query_text,
             "tokens": [],
-            "processed": self.preprocess_query(query_text),
+            "processed": processed,
             "statistics": {
                 "original_tokens": len(doc),
-                "processed_tokens": len(self.get_processed_tokens(query_text)),
+                "processed_tokens": len(processed.split()),
                 "protected_terms": 0,
                 "overridden_terms": 0,
                 "removed_stopwords": 0
@@ -260,18 +362,33 @@ class FoodQueryPreprocessor:
 
 # グローバルインスタンス
 _preprocessor = None
+_preprocessor_lock = threading.Lock()
 
-def get_preprocessor() -> FoodQueryPreprocessor:
-    """グローバルプリプロセッサインスタンスを取得"""
+def get_preprocessor(background: bool = False) -> FoodQueryPreprocessor:
+    """
+    グローバルプリプロセッサインスタンスを取得
+    
+    Args:
+        background: 初回作成時にモデルをバックグラウンドで読み込む（起動時に呼び出す）
+    """
     global _preprocessor
-    if _preprocessor is None:
-        _preprocessor = FoodQueryPreprocessor()
+    with _preprocessor_lock:
+        if _preprocessor is None:
+            _preprocessor = FoodQueryPreprocessor(background=background)
     return _preprocessor
 
+def start_background_loading() -> FoodQueryPreprocessor:
+    """起動時にモデルの読み込みを開始（完了を待たずに戻る）"""
+    return get_preprocessor(background=True)
+
 def preprocess_query(query_text: str, expand_synonyms: bool = False) -> str:
     """便利関数：クエリを前処理"""
     return get_preprocessor().preprocess_query(query_text, expand_synonyms)
 
+def preprocess_queries(query_texts: Sequence[str], expand_synonyms: bool = False) -> List[str]:
+    """便利関数：複数のクエリを一括で前処理"""
+    return get_preprocessor().preprocess_queries(query_texts, expand_synonyms)
+
 def analyze_query(query_text: str) -> Dict:
     """便利関数：クエリを分析"""
     return get_preprocessor().analyze_query(query_text) 
\ No newline at end of file
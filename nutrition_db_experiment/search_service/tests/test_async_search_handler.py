@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Async Search Handler Tests - 非同期検索ハンドラーの一括検索のテスト
+
+_msearch を模したローカルサーバーで、複数リクエストが1回の _msearch にまとめられること、
+レスポンスの順序・整形、個別の検索エラーの扱いを検証する
+"""
+
+import json
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# プロジェクトパスを追加
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'search_service'))
+
+from api.search_handler import AsyncNutritionSearchHandler, SearchRequest
+
+
+class _FakeMsearchHandler(BaseHTTPRequestHandler):
+    """_msearch の最小限のAPI（元のクエリ文字列を search_name として1件返す）"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        lines = [json.loads(line) for line in self.rfile.read(length).splitlines() if line.strip()]
+        self.server.requests.append((self.path, lines))
+
+        responses = []
+        for header, query in zip(lines[::2], lines[1::2]):
+            self.server.indices.append(header["index"])
+            function_score = query["query"]
+            if "bool" in function_score:  # db_type_filter 付き
+                function_score = function_score["bool"]["must"][0]
+            exact_phrase = function_score["function_score"]["functions"][0]["filter"]["match_phrase"]
+            original = exact_phrase["search_name.exact"]["query"]
+            if original == "broken":
+                responses.append({"error": {"type": "query_shard_exception"}, "status": 400})
+                continue
+            hit = {"_id": original, "_score": 2.0, "_source": {"search_name": original},
+                   "highlight": {"search_name": [f"<mark>{original}</mark>"]}}
+            responses.append({"hits": {"total": {"value": 1}, "max_score": 2.0, "hits": [hit]}, "status": 200})
+        self._send_json({"took": 1, "responses": responses})
+
+    def _send_json(self, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class TestAsyncSearchHandler(unittest.IsolatedAsyncioTestCase):
+    """AsyncNutritionSearchHandlerのテストケース"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeMsearchHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.server.indices = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        host, port = self.server.server_address[:2]
+        self.host = f"{host}:{port}"
+
+    async def test_search_many_sends_one_msearch_and_keeps_order(self):
+        requests = [
+            SearchRequest("Chicken Breast", db_type_filter="ingredient"),
+            SearchRequest("broken"),
+            SearchRequest("Brown Rice", enable_synonyms=False, size=5),
+        ]
+        async with AsyncNutritionSearchHandler(self.host, "foods") as handler:
+            responses = await handler.search_many(requests)
+
+        self.assertEqual(len(self.server.requests), 1)
+        path, lines = self.server.requests[0]
+        self.assertTrue(path.startswith("/_msearch"))
+        self.assertEqual(self.server.indices, ["foods"] * 3)
+        self.assertEqual(lines[5]["size"], 5)
+
+        first, broken, rice = responses
+        self.assertEqual(first.results[0]["_id"], "Chicken Breast")
+        self.assertEqual(first.results[0]["_highlight"]["search_name"], ["<mark>Chicken Breast</mark>"])
+        self.assertEqual((first.total_hits, first.max_score), (1, 2.0))
+        self.assertEqual(first.query_info["db_type_filter"], "ingredient")
+        self.assertEqual(json.loads(first.query_info["elasticsearch_query"]), lines[1])
+        self.assertIn("query_shard_exception", broken.query_info["error"])
+        self.assertEqual(broken.results, [])
+        self.assertEqual(rice.results[0]["search_name"], "Brown Rice")
+        self.assertNotIn("analysis", rice.query_info)
+
+    async def test_connection_error_fails_every_request(self):
+        self.server.shutdown()
+        self.server.server_close()
+        async with AsyncNutritionSearchHandler(self.host) as handler:
+            handler.es_client = handler.es_client.options(max_retries=0)
+            responses = await handler.search_many([SearchRequest("apple"), SearchRequest("pear")])
+
+        self.assertEqual([response.query_info["original_query"] for response in responses], ["apple", "pear"])
+        self.assertTrue(all("error" in response.query_info for response in responses))
+
+
+if __name__ == "__main__":
+    unittest.main()
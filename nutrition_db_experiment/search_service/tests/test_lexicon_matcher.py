@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Lexicon Matcher Tests - トークン単位 Aho-Corasick マッチャーのテスト
+
+総当たりの照合との一致、複数トークンの保護ターム・ストップワード・類義語の処理、
+JSON キャッシュの再利用と、レキシコン変更時・キャッシュ破損時の再コンパイルを検証する
+"""
+
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import spacy
+from spacy.language import Language
+
+# プロジェクトパスを追加
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'search_service'))
+
+from nlp import lexicon_matcher
+from nlp.lexicon_matcher import LexiconMatcher, TokenAutomaton, load_lexicon_matcher
+from nlp.query_preprocessor import FoodQueryPreprocessor
+
+LEXICON_DIR = os.path.join(project_root, 'search_service', 'nlp', 'lexicon_data')
+
+
+@Language.component("lowercase_lemmatizer")
+def lowercase_lemmatizer(doc):
+    """小文字化だけの簡易レンマ化"""
+    for token in doc:
+        token.lemma_ = token.lower_
+    return doc
+
+
+class TestTokenAutomaton(unittest.TestCase):
+    """TokenAutomatonのテストケース"""
+
+    def test_find_all_matches_brute_force(self):
+        rng = random.Random(0)
+        vocabulary = ["a", "b", "c", "d"]
+        patterns = {tuple(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))): i for i in range(40)}
+        automaton = TokenAutomaton(patterns)
+
+        for _ in range(200):
+            tokens = [rng.choice(vocabulary) for _ in range(rng.randint(0, 12))]
+            expected = {(start, end, patterns[tuple(tokens[start:end])])
+                        for start in range(len(tokens)) for end in range(start + 1, min(len(tokens), start + 4) + 1)
+                        if tuple(tokens[start:end]) in patterns}
+            self.assertEqual(set(automaton.find_all(tokens)), expected)
+
+    def test_find_longest_prefers_leftmost_longest(self):
+        automaton = TokenAutomaton({("ground",): 1, ("ground", "beef"): 2, ("beef", "stew"): 3})
+
+        self.assertEqual(automaton.find_longest("lean ground beef stew".split()), [(1, 3, 2)])
+
+
+class TestLexiconPreprocessing(unittest.TestCase):
+    """複数トークンの語句を含むクエリ前処理のテストケース"""
+
+    @classmethod
+    def setUpClass(cls):
+        nlp = spacy.blank("en")
+        nlp.add_pipe("lowercase_lemmatizer")
+        cls.preprocessor = FoodQueryPreprocessor(nlp=nlp)
+
+    def test_multi_token_phrases_are_matched_in_one_pass(self):
+        preprocessor = self.preprocessor
+
+        # 複数トークンのレンマ上書き、ハイフンで分割される保護ターム
+        self.assertEqual(preprocessor.preprocess_query("ground beef"), "beef ground")
+        self.assertEqual(preprocessor.preprocess_query("Coca-Cola"), "coca-cola")
+        # 複数語の類義語
+        self.assertEqual(preprocessor.preprocess_query("spring onion", expand_synonyms=True),
+                         "spring onion scallion green onion")
+        # 単一トークンは従来どおり（ストップワード > 保護ターム > レンマ上書き）
+        self.assertEqual(preprocessor.preprocess_query("2 cups of baked tomatoes"), "2 baked tomato")
+
+        analysis = preprocessor.analyze_query("ground pork")
+        self.assertEqual([token["custom_lemma"] for token in analysis["tokens"]], ["pork ground", "pork ground"])
+
+
+class TestLexiconCache(unittest.TestCase):
+    """JSON キャッシュのテストケース"""
+
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.lexicon_dir = os.path.join(tmpdir, "lexicon_data")
+        self.cache_dir = os.path.join(tmpdir, "cache")
+        shutil.copytree(LEXICON_DIR, self.lexicon_dir, ignore=shutil.ignore_patterns(".cache"))
+
+    def test_compiled_matcher_is_reused_until_the_lexicon_changes(self):
+        first = load_lexicon_matcher(self.lexicon_dir, self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        # キャッシュがあればコンパイルしない
+        with mock.patch.object(LexiconMatcher, "compile", side_effect=AssertionError("recompiled")):
+            cached = load_lexicon_matcher(self.lexicon_dir, self.cache_dir)
+        self.assertEqual(cached.digest, first.digest)
+        self.assertEqual(cached.match_terms(["ground", "beef"]), first.match_terms(["ground", "beef"]))
+        tokens = "lean ground beef with spring onion and coca - cola".split()
+        self.assertEqual(cached.match_terms(tokens), first.match_terms(tokens))
+        self.assertEqual(cached.expand_synonyms(tokens), first.expand_synonyms(tokens))
+
+        with open(os.path.join(self.lexicon_dir, "protected_food_terms.txt"), "a", encoding="utf-8") as f:
+            f.write("\nsweet potato fries\n")
+        changed = load_lexicon_matcher(self.lexicon_dir, self.cache_dir)
+        self.assertNotEqual(changed.digest, first.digest)
+        self.assertEqual(changed.match_terms("sweet potato fries".split())[0][:2], (0, 3))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        self.assertEqual(lexicon_matcher.lexicon_digest(self.lexicon_dir), changed.digest)
+
+    def test_cache_is_plain_json_and_a_tampered_cache_is_recompiled(self):
+        first = load_lexicon_matcher(self.lexicon_dir, self.cache_dir)
+        (cache_name,) = os.listdir(self.cache_dir)
+        cache_path = os.path.join(self.cache_dir, cache_name)
+        self.assertTrue(cache_name.endswith(".json"))
+        with open(cache_path, "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["digest"], first.digest)
+
+        # 形式の違うキャッシュ（pickle を含む）は読み込まずにコンパイルし直して上書きする
+        for content in (b"\x80\x04\x95garbage.", json.dumps({"version": lexicon_matcher.MATCHER_VERSION, "digest": first.digest}).encode()):
+            with self.subTest(content=content[:10]):
+                with open(cache_path, "wb") as f:
+                    f.write(content)
+                matcher = load_lexicon_matcher(self.lexicon_dir, self.cache_dir)
+                self.assertEqual(matcher.match_terms(["ground", "beef"]), first.match_terms(["ground", "beef"]))
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    self.assertEqual(json.load(f), first.to_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Query Preprocessor Tests - 一括処理・LRUキャッシュ・モデル読み込みのテスト
+
+en_core_web_sm がなくても実行できるよう、spacy.blank("en") に簡易レンマ化コンポーネントを
+加えたパイプラインを注入して検証する
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+import spacy
+from spacy.language import Language
+
+# プロジェクトパスを追加
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'search_service'))
+
+from nlp.query_preprocessor import FoodQueryPreprocessor, SpacyModelUnavailableError
+
+
+@Language.component("suffix_lemmatizer")
+def suffix_lemmatizer(doc):
+    """末尾の s を除くだけの簡易レンマ化"""
+    for token in doc:
+        token.lemma_ = token.lower_[:-1] if token.lower_.endswith("s") and len(token) > 3 else token.lower_
+    return doc
+
+
+def _stand_in_pipeline():
+    nlp = spacy.blank("en")
+    nlp.add_pipe("suffix_lemmatizer")
+    return nlp
+
+
+class TestBatchedPreprocessing(unittest.TestCase):
+    """preprocess_queries とキャッシュのテストケース"""
+
+    QUERIES = ["Grilled chicken breasts", "2 tbsp of olive oil", "apples, raw", "Grilled chicken breasts",
+               "tomatoes and onions", "mangoes!!"]
+
+    def test_batch_matches_single_queries(self):
+        single = FoodQueryPreprocessor(nlp=_stand_in_pipeline(), cache_size=0)
+        batched = FoodQueryPreprocessor(nlp=_stand_in_pipeline())
+
+        for expand in (False, True):
+            expected = [single.preprocess_query(query, expand_synonyms=expand) for query in self.QUERIES]
+            self.assertEqual(batched.preprocess_queries(self.QUERIES, expand_synonyms=expand), expected)
+        self.assertIn("tomato", batched.preprocess_query("tomatoes and onions").split())
+
+        # 2回目（類義語展開あり）はすべてキャッシュから
+        self.assertEqual(batched.cache_info()["misses"], 5)
+        self.assertEqual(batched.cache_info()["hits"], 6)
+
+    def test_lru_cache_evicts_oldest_and_analysis_reuses_the_doc(self):
+        preprocessor = FoodQueryPreprocessor(nlp=_stand_in_pipeline(), cache_size=2)
+        with mock.patch.object(preprocessor, "nlp", wraps=preprocessor.nlp) as nlp:
+            preprocessor.preprocess_query("apples")
+            preprocessor.preprocess_query("pears")
+            preprocessor.preprocess_query("apples")
+            preprocessor.preprocess_query("plums")  # pears を追い出す
+            preprocessor.preprocess_query("pears")
+            self.assertEqual(nlp.call_count, 4)
+
+            analysis = preprocessor.analyze_query("Grilled chicken breasts")
+            self.assertEqual(nlp.call_count, 5)
+        self.assertEqual(analysis["processed"], preprocessor.preprocess_query("Grilled chicken breasts"))
+        self.assertEqual(preprocessor.cache_info()["size"], 2)
+
+
+class TestModelLoading(unittest.TestCase):
+    """モデル読み込みのテストケース"""
+
+    def test_missing_model_fails_clearly_without_downloading(self):
+        with mock.patch("subprocess.run") as run:
+            with self.assertRaises(SpacyModelUnavailableError) as raised:
+                FoodQueryPreprocessor(model_name="no_such_spacy_model", strict=True)
+            lenient = FoodQueryPreprocessor(model_name="no_such_spacy_model")
+        run.assert_not_called()
+        self.assertIn("python -m spacy download no_such_spacy_model", str(raised.exception))
+        self.assertEqual(lenient.preprocess_queries(["Apples RAW"]), ["apples raw"])
+
+    def test_background_loading_is_awaited_by_the_first_query(self):
+        preprocessor = FoodQueryPreprocessor(model_name="no_such_spacy_model", background=True, strict=True)
+
+        with self.assertRaises(SpacyModelUnavailableError):
+            preprocessor.preprocess_query("apples")
+        self.assertTrue(preprocessor.wait_until_ready(timeout=0))
+        self.assertIsNotNone(preprocessor.load_seconds)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Query Template Tests - コンパイル済みクエリテンプレートのテスト
+
+テンプレートから作成したJSONバイト列が、build_search_query() の結果と同じクエリになること
+（フィルタ・重み・ハイライト・単語ボーナスの有無、引用符やUnicodeを含むクエリ）と、
+テンプレートのキャッシュを検証する
+"""
+
+import json
+import os
+import sys
+import unittest
+
+# プロジェクトパスを追加
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'search_service'))
+
+from api.query_builder import NutritionSearchQueryBuilder
+
+
+class TestQueryTemplates(unittest.TestCase):
+    """クエリテンプレートのテストケース"""
+
+    def setUp(self):
+        self.builder = NutritionSearchQueryBuilder()
+
+    def test_rendered_bytes_match_built_query(self):
+        cases = [
+            ("chicken breast grilled", "Chicken Breast, grilled", None, 20, None, True),
+            ("rice", "rice", "ingredient", 5, {"exact_word_bonus": 4.0}, False),
+            ("a of", "a of", "all", 10, None, True),  # 単語ボーナスなし（2文字以下のみ）
+            ("", "", "branded", 1, None, False),
+            ('tomato "sauce" \\ 味噌 café', 'Tomato "Sauce" \\ 味噌 Café', "dish", 50,
+             {"fuzzy_match": 0.1, "proximity_boost": 1.5}, True),
+        ]
+        for processed, original, db_type, size, weights, highlight in cases:
+            with self.subTest(processed=processed, db_type=db_type):
+                expected = self.builder.build_search_query(processed, original, db_type, size, weights, highlight)
+                rendered = self.builder.build_search_query_bytes(processed, original, db_type, size, weights, highlight)
+                self.assertIsInstance(rendered, bytes)
+                self.assertEqual(json.loads(rendered), expected)
+
+    def test_templates_are_cached_per_configuration(self):
+        first = self.builder.get_template("dish", {"exact_word_bonus": 80.0})
+        self.assertIs(self.builder.get_template("dish", None), first)  # 既定値と同じ重み
+        self.assertIsNot(self.builder.get_template("dish", None, enable_highlight=False), first)
+        self.assertIs(self.builder.get_template("all"), self.builder.get_template(None))
+        self.assertEqual(len(self.builder._templates), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
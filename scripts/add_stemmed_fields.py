@@ -5,13 +5,33 @@
 新しいフィールド:
 - stemmed_search_name: search_nameの語幹化版
 - stemmed_description: descriptionの語幹化版
+
+大きなカタログ（ブランド食品など）にも対応するため、入力（JSON配列またはJSONL）を1件ずつ読み込み、
+チャンク単位でプロセスプールに分散して語幹化し、入力と同じ順序で1件ずつ書き出します。
+各ワーカーはトークン単位の語幹化結果をメモ化します。
+
+使用例:
+    python scripts/add_stemmed_fields.py
+    python scripts/add_stemmed_fields.py --input db/branded_foods.jsonl --output db/branded_foods_stemmed.jsonl --workers 8
 """
 
+import argparse
 import json
 import nltk
-from nltk.stem import PorterStemmer
+import os
 import re
-from typing import List, Dict, Any
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from nltk.stem import PorterStemmer
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.json_stream import JsonDocumentWriter, iter_json_documents  # noqa: E402
 
 # NLTKデータのダウンロード（初回のみ）
 try:
@@ -20,9 +40,30 @@ except LookupError:
     print("Downloading NLTK punkt tokenizer...")
     nltk.download('punkt')
 
+INPUT_FILE = 'db/mynetdiary_converted_tool_calls_list.json'
+OUTPUT_FILE = 'db/mynetdiary_converted_tool_calls_list_stemmed.json'
+
+_NON_ALPHA = re.compile(r'[^a-z\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class MemoStemmer:
+    """トークン単位で結果をメモ化するPorterStemmer（食品名は同じ語が繰り返し出現するため）"""
+
+    def __init__(self):
+        self._stemmer = PorterStemmer()
+        self._memo: Dict[str, str] = {}
+
+    def stem(self, token: str) -> str:
+        stemmed = self._memo.get(token)
+        if stemmed is None:
+            stemmed = self._memo[token] = self._stemmer.stem(token)
+        return stemmed
+
+
 def setup_stemmer():
-    """PorterStemmerの初期化"""
-    return PorterStemmer()
+    """PorterStemmerの初期化（メモ化付き）"""
+    return MemoStemmer()
 
 def clean_and_tokenize_single(text: str) -> List[str]:
     """単一テキストのクリーニングとトークン化"""
@@ -33,21 +74,13 @@ def clean_and_tokenize_single(text: str) -> List[str]:
     if not isinstance(text, str):
         text = str(text)
 
-    # 小文字に変換
-    text = text.lower()
-
-    # 特殊文字を除去（アルファベットとスペースのみ残す）
-    text = re.sub(r'[^a-z\s]', ' ', text)
+    # 小文字に変換し、特殊文字を除去（アルファベットとスペースのみ残す）
+    text = _NON_ALPHA.sub(' ', text.lower())
 
-    # 複数のスペースを単一スペースに
-    text = re.sub(r'\s+', ' ', text).strip()
+    # 複数のスペースを単一スペースにしてトークン化
+    return _WHITESPACE.sub(' ', text).strip().split()
 
-    # トークン化
-    tokens = text.split()
-
-    return tokens
-
-def stem_single_text(text: str, stemmer: PorterStemmer) -> str:
+def stem_single_text(text: str, stemmer) -> str:
     """単一テキストの語幹化"""
     if not text:
         return ""
@@ -57,7 +90,7 @@ def stem_single_text(text: str, stemmer: PorterStemmer) -> str:
 
     return ' '.join(stemmed_tokens)
 
-def stem_text_or_list(text, stemmer: PorterStemmer):
+def stem_text_or_list(text, stemmer):
     """テキストまたはリストの語幹化（型を保持）"""
     if not text:
         return text
@@ -72,7 +105,7 @@ def stem_text_or_list(text, stemmer: PorterStemmer):
     else:
         return stem_single_text(text, stemmer)
 
-def add_stemmed_fields(record: Dict[str, Any], stemmer: PorterStemmer) -> Dict[str, Any]:
+def add_stemmed_fields(record: Dict[str, Any], stemmer) -> Dict[str, Any]:
     """個別レコードに語幹化フィールドを追加"""
 
     # 元のレコードをコピー
@@ -88,61 +121,112 @@ def add_stemmed_fields(record: Dict[str, Any], stemmer: PorterStemmer) -> Dict[s
 
     return new_record
 
-def process_database():
-    """メインの処理関数"""
 
-    print("🔧 MyNetDiary語幹化データベース作成開始...")
+# === プロセスプール ===
 
-    # Stemmerの初期化
-    stemmer = setup_stemmer()
+_worker_stemmer = None
 
-    # 元のデータベースを読み込み
-    input_file = 'db/mynetdiary_converted_tool_calls_list.json'
-    output_file = 'db/mynetdiary_converted_tool_calls_list_stemmed.json'
 
-    print(f"📖 読み込み: {input_file}")
+def _init_worker():
+    """ワーカープロセスごとのメモ化Stemmerを作成"""
+    global _worker_stemmer
+    _worker_stemmer = MemoStemmer()
 
-    try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            original_data = json.load(f)
-    except FileNotFoundError:
-        print(f"❌ エラー: {input_file} が見つかりません")
-        return
-    except json.JSONDecodeError as e:
-        print(f"❌ JSON読み込みエラー: {e}")
+
+def _stem_chunk(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [add_stemmed_fields(record, _worker_stemmer) for record in records]
+
+
+def _chunks(records: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def enrich_records(records: Iterable[Dict[str, Any]], workers: int = 1,
+                   chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """
+    レコードに語幹化フィールドを追加する（入力と同じ順序で1件ずつ返す）
+
+    Args:
+        records: レコードのイテレータ
+        workers: ワーカープロセス数（1の場合はこのプロセスで処理）
+        chunk_size: 1回にワーカーへ渡すレコード数
+
+    処理中のチャンクは最大 workers×2 件のため、メモリ使用量は入力の大きさに依存しません。
+    """
+    if workers <= 1:
+        stemmer = MemoStemmer()
+        for record in records:
+            yield add_stemmed_fields(record, stemmer)
         return
 
-    print(f"📊 処理対象レコード数: {len(original_data)}")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        pending = deque()
+        for chunk in _chunks(records, chunk_size):
+            pending.append(executor.submit(_stem_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
 
-    # 各レコードに語幹化フィールドを追加
-    stemmed_data = []
 
-    for i, record in enumerate(original_data):
-        if i % 100 == 0:
-            print(f"⚡ 処理中... {i}/{len(original_data)} ({i/len(original_data)*100:.1f}%)")
+def peak_rss_mb() -> Dict[str, float]:
+    """このプロセスと終了済みワーカープロセスの最大RSS（MB）"""
+    # Linuxでは KB、macOSでは bytes 単位
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "main": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+        "workers": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+    }
 
-        new_record = add_stemmed_fields(record, stemmer)
-        stemmed_data.append(new_record)
 
+def process_database(input_file: str = INPUT_FILE, output_file: str = OUTPUT_FILE,
+                     workers: int = 1, chunk_size: int = 500) -> bool:
+    """メインの処理関数"""
+
+    print("🔧 MyNetDiary語幹化データベース作成開始...")
+    print(f"📖 読み込み: {input_file}")
     print(f"💾 保存: {output_file}")
+    print(f"⚙️ ワーカー: {workers}プロセス（チャンク {chunk_size}件）")
+
+    if not os.path.exists(input_file):
+        print(f"❌ エラー: {input_file} が見つかりません")
+        return False
+
+    # サンプル結果（文字列形式3件・リスト形式2件）を処理中に収集
+    string_samples, list_samples = [], []
+    started = time.perf_counter()
 
-    # 新しいデータベースを保存
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(stemmed_data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
+        with JsonDocumentWriter(output_file) as writer:
+            for record in enrich_records(iter_json_documents(input_file), workers=workers, chunk_size=chunk_size):
+                writer.write(record)
+                if isinstance(record.get('search_name'), str) and len(string_samples) < 3:
+                    string_samples.append(record)
+                elif isinstance(record.get('search_name'), list) and len(list_samples) < 2:
+                    list_samples.append(record)
+                if writer.count % 10000 == 0:
+                    elapsed = time.perf_counter() - started
+                    print(f"⚡ 処理中... {writer.count}件 ({writer.count / elapsed:.0f} records/sec)")
+    except json.JSONDecodeError as e:
+        print(f"❌ JSON読み込みエラー: {e}")
+        return False
+    except OSError as e:
         print(f"❌ 保存エラー: {e}")
-        return
+        return False
+
+    elapsed = time.perf_counter() - started
+    rss = peak_rss_mb()
 
-    # サンプル結果の表示
     print("\n✨ 語幹化結果サンプル:")
     print("-" * 80)
 
-    # 文字列形式のサンプル
-    string_samples = [r for r in stemmed_data if isinstance(r.get('search_name'), str)][:3]
-    # リスト形式のサンプル
-    list_samples = [r for r in stemmed_data if isinstance(r.get('search_name'), list)][:2]
-
     print("🔤 文字列形式のサンプル:")
     for i, record in enumerate(string_samples):
         print(f"   Record {i+1}:")
@@ -161,7 +245,18 @@ def process_database():
         print()
 
     print(f"✅ 完了! 新しいデータベース: {output_file}")
-    print(f"📊 処理レコード数: {len(stemmed_data)}")
+    print(f"📊 処理レコード数: {writer.count} ({elapsed:.1f}秒、{writer.count / elapsed if elapsed else 0:.0f} records/sec)")
+    print(f"🧠 最大RSS: メイン {rss['main']:.0f} MB、ワーカー {rss['workers']:.0f} MB")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Add stemmed_search_name / stemmed_description to a food database")
+    parser.add_argument("--input", default=INPUT_FILE, help="JSON array or JSONL input")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="Output (.jsonl/.ndjson for JSONL, otherwise a JSON array)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=500, help="Records per worker task")
+    args = parser.parse_args()
+    return process_database(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size)
 
 if __name__ == "__main__":
-    process_database()
\ No newline at end of file
+    exit(0 if main() else 1)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Elasticsearchへのストリーミング並列バルクインデックス
+
+- ドキュメントはJSON配列またはNDJSONのファイルから1件ずつ読み込みます（ファイル全体をメモリに載せない）
+- バッチはバイト数で区切り、_bulk の応答時間に合わせてサイズを調整します（429を受けたら縮小）
+- 複数のワーカーが並列に _bulk を送信します。リクエスト全体の429/502/503/504・接続エラーはバッチごと、
+  項目ごとの429（es_rejected_execution_exception）はその項目だけを指数バックオフで再送します
+- ロード中は refresh_interval=-1・number_of_replicas=0 にし、終了後に元の設定へ戻して refresh します
+
+同梱の elasticsearch-8.10.4（config/elasticsearch.yml: 127.0.0.1:9200、セキュリティ無効）で動作します。
+
+使用例:
+    ./elasticsearch-8.10.4/bin/elasticsearch -d
+    python scripts/es_bulk_indexer.py db/mynetdiary_converted_tool_calls_list_stemmed.json \\
+        --settings elasticsearch_settings.json --workers 4
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.json_stream import iter_json_documents  # noqa: E402
+
+DEFAULT_ELASTICSEARCH_URL = "http://localhost:9200"
+# バッチ全体・項目ごとに再送するステータス
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+class AdaptiveBatchSizer:
+    """
+    _bulk リクエストのバイト数を調整する
+
+    応答が目標時間の半分より速ければ1.5倍に、1.5倍より遅ければ0.75倍に、
+    429（キューあふれ）を受けたら半分にします。
+    """
+
+    def __init__(self, initial_bytes: int = 2 << 20, min_bytes: int = 256 << 10, max_bytes: int = 16 << 20,
+                 target_seconds: float = 1.0):
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self.target_seconds = target_seconds
+        self._batch_bytes = min(max(initial_bytes, min_bytes), max_bytes)
+        self._lock = threading.Lock()
+
+    @property
+    def batch_bytes(self) -> int:
+        return self._batch_bytes
+
+    def record(self, seconds: float, rejected: bool = False) -> None:
+        """1回の _bulk の結果を反映する"""
+        with self._lock:
+            if rejected:
+                size = self._batch_bytes // 2
+            elif seconds < self.target_seconds * 0.5:
+                size = int(self._batch_bytes * 1.5)
+            elif seconds > self.target_seconds * 1.5:
+                size = int(self._batch_bytes * 0.75)
+            else:
+                return
+            self._batch_bytes = min(max(size, self.min_bytes), self.max_bytes)
+
+
+@dataclass
+class BulkIndexStats:
+    """バルクインデックスの集計"""
+    indexed: int = 0
+    failed: int = 0
+    retried: int = 0  # 再送したドキュメント数（延べ）
+    batches: int = 0
+    bytes_sent: int = 0
+    seconds: float = 0.0
+    errors: List[Dict[str, Any]] = field(default_factory=list)  # 再送しないエラーの例（先頭のみ）
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.indexed / self.seconds if self.seconds > 0 else 0.0
+
+    def merge(self, other: "BulkIndexStats", max_errors: int = 20) -> None:
+        self.indexed += other.indexed
+        self.failed += other.failed
+        self.retried += other.retried
+        self.batches += other.batches
+        self.bytes_sent += other.bytes_sent
+        self.errors.extend(other.errors[:max(0, max_errors - len(self.errors))])
+
+
+class StreamingBulkIndexer:
+    """
+    ドキュメントのイテレータを並列の _bulk リクエストでインデックスする
+
+    使用例:
+        indexer = StreamingBulkIndexer("http://localhost:9200", "mynetdiary_converted_tool_calls_list_stemmed")
+        with indexer.bulk_load_settings():
+            stats = indexer.index_documents(iter_json_documents(DATA_FILE))
+        print(f"{stats.docs_per_second:.0f} docs/sec")
+    """
+
+    def __init__(self, es_url: str, index: str, workers: int = 4, id_field: Optional[str] = "id",
+                 sizer: Optional[AdaptiveBatchSizer] = None, max_docs_per_batch: int = 5000,
+                 max_retries: int = 5, backoff_seconds: float = 0.5, max_backoff_seconds: float = 30.0,
+                 timeout: float = 120.0):
+        """
+        Args:
+            es_url: ElasticsearchのURL
+            index: インデックス名
+            workers: 並列に送信する _bulk リクエスト数
+            id_field: ドキュメントIDにするフィールド（None・値が空の場合は自動採番）
+            sizer: バッチサイズの調整（省略時は既定の AdaptiveBatchSizer）
+            max_docs_per_batch: 1バッチの最大ドキュメント数
+            max_retries: 再送の最大回数
+            backoff_seconds: 再送待ちの初期値（再送ごとに2倍、ジッターあり）
+            max_backoff_seconds: 再送待ちの上限
+            timeout: 1リクエストのタイムアウト（秒）
+        """
+        self.es_url = es_url.rstrip("/")
+        self.index = index
+        self.workers = max(1, workers)
+        self.id_field = id_field
+        self.sizer = sizer or AdaptiveBatchSizer()
+        self.max_docs_per_batch = max_docs_per_batch
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        """ワーカースレッドごとのセッション（接続を再利用する）"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    # === インデックス設定 ===
+
+    def ensure_index(self, settings_body: Optional[Dict[str, Any]] = None) -> bool:
+        """インデックスがなければ作成する（作成した場合True）"""
+        response = self._session().head(f"{self.es_url}/{self.index}", timeout=self.timeout)
+        if response.status_code == 200:
+            return False
+        response = self._session().put(f"{self.es_url}/{self.index}", json=settings_body or {}, timeout=self.timeout)
+        response.raise_for_status()
+        return True
+
+    def get_load_settings(self) -> Dict[str, Any]:
+        """refresh_interval（明示的な設定がなければNone）と number_of_replicas を取得"""
+        response = self._session().get(f"{self.es_url}/{self.index}/_settings",
+                                       params={"flat_settings": "true"}, timeout=self.timeout)
+        response.raise_for_status()
+        settings = next(iter(response.json().values()))["settings"]
+        return {
+            "refresh_interval": settings.get("index.refresh_interval"),
+            "number_of_replicas": int(settings.get("index.number_of_replicas", 1))
+        }
+
+    def put_settings(self, settings: Dict[str, Any]) -> None:
+        response = self._session().put(f"{self.es_url}/{self.index}/_settings", json={"index": settings},
+                                       timeout=self.timeout)
+        response.raise_for_status()
+
+    @contextmanager
+    def bulk_load_settings(self):
+        """ロード中は refresh を止めてレプリカを0にし、終了時（失敗時も）に元の設定へ戻して refresh する"""
+        original = self.get_load_settings()
+        self.put_settings({"refresh_interval": "-1", "number_of_replicas": 0})
+        try:
+            yield original
+        finally:
+            # refresh_interval の None は既定値（1s）に戻す指定
+            self.put_settings(original)
+            self._session().post(f"{self.es_url}/{self.index}/_refresh", timeout=self.timeout).raise_for_status()
+
+    # === バルクインデックス ===
+
+    def index_documents(self, documents: Iterable[Dict[str, Any]],
+                        progress: Optional[Callable[[BulkIndexStats], None]] = None) -> BulkIndexStats:
+        """
+        ドキュメントをインデックスする（送信待ちのバッチは最大 workers×2 件）
+
+        Args:
+            documents: ドキュメントのイテレータ（iter_json_documents() など）
+            progress: バッチ完了ごとに累計の集計を受け取るコールバック
+
+        Returns:
+            集計（docs_per_second は全体の経過時間あたり）
+        """
+        stats = BulkIndexStats()
+        started = time.perf_counter()
+
+        def collect(futures):
+            for future in futures:
+                stats.merge(future.result())
+                stats.seconds = time.perf_counter() - started
+                if progress:
+                    progress(stats)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="es-bulk") as executor:
+            in_flight = set()
+            for batch in self._batches(documents):
+                if len(in_flight) >= self.workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight.add(executor.submit(self._send_batch, batch))
+            collect(in_flight)
+
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    def _batches(self, documents: Iterable[Dict[str, Any]]) -> Iterator[List[bytes]]:
+        """アクション行＋ドキュメント行をバイト数（現在の batch_bytes）とドキュメント数で区切る"""
+        batch, size = [], 0
+        for document in documents:
+            item = self._bulk_item(document)
+            batch.append(item)
+            size += len(item)
+            if size >= self.sizer.batch_bytes or len(batch) >= self.max_docs_per_batch:
+                yield batch
+                batch, size = [], 0
+        if batch:
+            yield batch
+
+    def _bulk_item(self, document: Dict[str, Any]) -> bytes:
+        action = {"_index": self.index}
+        if self.id_field and document.get(self.id_field) not in (None, ""):
+            action["_id"] = str(document[self.id_field])
+        return (json.dumps({"index": action}) + "\n" + json.dumps(document, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def _send_batch(self, items: List[bytes]) -> BulkIndexStats:
+        """1バッチを送信し、再送可能な失敗はバックオフして再送する"""
+        stats = BulkIndexStats(batches=1)
+        pending = items
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                stats.retried += len(pending)
+                time.sleep(self._backoff(attempt - 1))
+
+            body = b"".join(pending)
+            stats.bytes_sent += len(body)
+            started = time.perf_counter()
+            try:
+                response = self._session().post(f"{self.es_url}/_bulk", data=body, timeout=self.timeout,
+                                                headers={"Content-Type": "application/x-ndjson"})
+            except requests.RequestException as e:
+                last_error = {"type": type(e).__name__, "reason": str(e)}
+                continue
+            elapsed = time.perf_counter() - started
+
+            if response.status_code in RETRYABLE_STATUS:
+                self.sizer.record(elapsed, rejected=response.status_code == 429)
+                last_error = {"status": response.status_code, "reason": response.text[:200]}
+                continue
+            if response.status_code != 200:
+                # リクエスト自体の誤り（400など）は再送しない
+                stats.failed += len(pending)
+                stats.errors.append({"status": response.status_code, "reason": response.text[:200]})
+                return stats
+
+            retry, rejected = [], False
+            for item, payload in zip(response.json().get("items", []), pending):
+                outcome = next(iter(item.values()))
+                status = outcome.get("status", 500)
+                if status < 300 and "error" not in outcome:
+                    stats.indexed += 1
+                elif status in RETRYABLE_STATUS:
+                    retry.append(payload)
+                    rejected = rejected or status == 429
+                    last_error = {"status": status, **outcome.get("error", {})}
+                else:
+                    stats.failed += 1
+                    stats.errors.append({"_id": outcome.get("_id"), "status": status, **outcome.get("error", {})})
+            self.sizer.record(elapsed, rejected=rejected)
+            pending = retry
+            if not pending:
+                return stats
+
+        stats.failed += len(pending)
+        stats.errors.append({"reason": f"retries exhausted for {len(pending)} documents", "last_error": last_error})
+        return stats
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Stream a JSON/NDJSON file into Elasticsearch with parallel _bulk requests")
+    parser.add_argument("data_file", help="JSON array or NDJSON file")
+    parser.add_argument("--es-url", default=os.environ.get("ELASTICSEARCH_URL", DEFAULT_ELASTICSEARCH_URL))
+    parser.add_argument("--index", help="Index name (default: data file name without extension)")
+    parser.add_argument("--settings", help="Index settings/mappings JSON used when the index does not exist")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-mb", type=float, default=2.0, help="Initial _bulk request size")
+    parser.add_argument("--max-retries", type=int, default=5)
+    args = parser.parse_args()
+
+    index = args.index or Path(args.data_file).stem
+    indexer = StreamingBulkIndexer(args.es_url, index, workers=args.workers, max_retries=args.max_retries,
+                                   sizer=AdaptiveBatchSizer(initial_bytes=int(args.batch_mb * (1 << 20))))
+    settings_body = None
+    if args.settings:
+        with open(args.settings, "r", encoding="utf-8") as f:
+            settings_body = json.load(f)
+
+    print(f"🚀 Bulk indexing {args.data_file} → {args.es_url}/{index} ({args.workers} workers)")
+    if indexer.ensure_index(settings_body):
+        print(f"🏗️ Created index '{index}'")
+
+    def progress(stats: BulkIndexStats):
+        print(f"⚡ {stats.indexed} indexed, {stats.failed} failed, {stats.docs_per_second:.0f} docs/sec "
+              f"(batch {indexer.sizer.batch_bytes >> 10} KiB)", end="\r")
+
+    with indexer.bulk_load_settings():
+        stats = indexer.index_documents(iter_json_documents(args.data_file), progress=progress)
+
+    print(f"\n📊 {stats.indexed} indexed, {stats.failed} failed, {stats.retried} retried, {stats.batches} batches, "
+          f"{stats.bytes_sent / (1 << 20):.1f} MiB in {stats.seconds:.1f}s → {stats.docs_per_second:.0f} docs/sec")
+    for error in stats.errors[:5]:
+        print(f"   ❌ {error}")
+    return stats.failed == 0
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)
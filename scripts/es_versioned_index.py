@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+読み取りエイリアスの背後にある、バージョン付き物理インデックスの管理（無停止の再インデックス）
+
+Word Query API（apps/word_query_api/endpoints/nutrition_search.py）は INDEX_ALIAS だけを検索します。
+再インデックスでは次の手順で新しい物理インデックス {alias}_v<日時> に切り替えます:
+
+1. 新しいバージョンを作成して一括登録（scripts/es_bulk_indexer.py）
+2. 検証: ドキュメント数・先頭ドキュメントのexact match・現行バージョンとの件数比
+3. ウォームアップ: セグメントをマージし、直近の検索クエリを新しいインデックスに対して再生
+4. エイリアスを1回の _aliases リクエストで切り替え（旧来のエイリアスと同名の物理インデックスもここで削除）
+5. 現行＋直前 keep_versions 件を残して古いバージョンを削除（ロールバック用）
+
+使用例:
+    python scripts/es_versioned_index.py --list
+    python scripts/es_versioned_index.py --rollback
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.es_bulk_indexer import DEFAULT_ELASTICSEARCH_URL  # noqa: E402
+
+DEFAULT_ALIAS = "mynetdiary_converted_tool_calls_list_stemmed"
+DEFAULT_WORD_QUERY_API_URL = "http://localhost:8002"
+
+
+def versioned_index_name(alias: str, now: Optional[datetime] = None) -> str:
+    """エイリアス名と日時から物理インデックス名を作成（名前順＝作成順）"""
+    return f"{alias}_v{(now or datetime.now()).strftime('%Y%m%d%H%M%S')}"
+
+
+def fetch_recent_queries(api_url: str = DEFAULT_WORD_QUERY_API_URL, limit: int = 200,
+                         timeout: float = 5.0, token: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Word Query APIから直近の検索クエリを取得（取得できない場合は空リスト）
+
+    Args:
+        token: エンドポイントのBearerトークン（省略時は環境変数 RECENT_QUERIES_TOKEN）
+    """
+    token = token or os.environ.get("RECENT_QUERIES_TOKEN")
+    if not token:
+        print("⚠️ RECENT_QUERIES_TOKEN が未設定のため直近の検索クエリを取得しません")
+        return []
+    try:
+        response = requests.get(f"{api_url.rstrip('/')}/api/v1/nutrition/suggest/recent-queries",
+                                params={"limit": limit}, headers={"Authorization": f"Bearer {token}"},
+                                timeout=timeout)
+        response.raise_for_status()
+        return response.json().get("queries", [])
+    except (requests.RequestException, ValueError) as e:
+        print(f"⚠️ 直近の検索クエリを取得できません（{api_url}）: {e}")
+        return []
+
+
+class VersionedIndexManager:
+    """
+    エイリアスとバージョン付き物理インデックスの操作
+
+    使用例:
+        manager = VersionedIndexManager("http://localhost:9200", "mynetdiary_converted_tool_calls_list_stemmed")
+        new_index = manager.create_version(settings_body)
+        ...  # new_index に一括登録
+        manager.verify(new_index, expected_count=stats.indexed)
+        manager.warm_up(new_index, queries)
+        manager.swap_alias(new_index)
+        manager.prune()
+    """
+
+    def __init__(self, es_url: str = DEFAULT_ELASTICSEARCH_URL, alias: str = DEFAULT_ALIAS, keep_versions: int = 2,
+                 timeout: float = 120.0):
+        """
+        Args:
+            es_url: ElasticsearchのURL
+            alias: 読み取りエイリアス名
+            keep_versions: 現行以外に残す直前のバージョン数（ロールバック用）
+            timeout: 1リクエストのタイムアウト（秒）
+        """
+        self.es_url = es_url.rstrip("/")
+        self.alias = alias
+        self.keep_versions = keep_versions
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        return self.session.request(method, f"{self.es_url}/{path.lstrip('/')}", timeout=self.timeout, **kwargs)
+
+    # === 状態の取得 ===
+
+    def list_versions(self) -> List[str]:
+        """バージョン付き物理インデックスの一覧（古い順）"""
+        response = self._request("GET", f"_cat/indices/{self.alias}_v*", params={"format": "json", "h": "index"})
+        if response.status_code == 404:
+            return []
+        response.raise_for_status()
+        return sorted(row["index"] for row in response.json())
+
+    def aliased_indices(self) -> List[str]:
+        """エイリアスが指す物理インデックスの一覧（通常は1件）"""
+        response = self._request("GET", f"_alias/{self.alias}")
+        if response.status_code == 404:
+            return []
+        response.raise_for_status()
+        return sorted(response.json())
+
+    def current_index(self) -> Optional[str]:
+        """エイリアスが指す物理インデックス（エイリアスがなければNone）"""
+        indices = self.aliased_indices()
+        return indices[-1] if indices else None
+
+    def legacy_index_exists(self) -> bool:
+        """エイリアスと同名の物理インデックス（バージョン管理前の構成）があるか"""
+        return self.current_index() is None and self._request("HEAD", self.alias).status_code == 200
+
+    def count(self, index: str) -> int:
+        response = self._request("GET", f"{index}/_count")
+        response.raise_for_status()
+        return response.json().get("count", 0)
+
+    # === 再インデックス ===
+
+    def create_version(self, settings_body: Optional[Dict[str, Any]] = None) -> str:
+        """新しいバージョンの物理インデックスを作成し、シャードの割り当てを待つ"""
+        index = versioned_index_name(self.alias)
+        while self._request("HEAD", index).status_code == 200:
+            time.sleep(1)
+            index = versioned_index_name(self.alias)
+        self._request("PUT", index, json=settings_body or {}).raise_for_status()
+        self._request("GET", f"_cluster/health/{index}",
+                      params={"wait_for_status": "yellow", "timeout": "60s"}).raise_for_status()
+        return index
+
+    def verify(self, index: str, expected_count: int, min_count_ratio: float = 0.95,
+               sample_name: Optional[str] = None) -> List[str]:
+        """
+        新しいバージョンを検証する
+
+        Args:
+            index: 新しい物理インデックス
+            expected_count: 登録に成功したドキュメント数
+            min_count_ratio: 現行バージョンに対する件数比の下限（データの欠落を検出）
+            sample_name: exact match（original_name.exact）で見つかるべき食材名
+
+        Returns:
+            問題の一覧（空なら切り替え可能）
+        """
+        self._request("POST", f"{index}/_refresh").raise_for_status()
+        problems = []
+        count = self.count(index)
+        if count == 0 or count != expected_count:
+            problems.append(f"document count {count} != indexed {expected_count}")
+
+        current = self.current_index() or (self.alias if self.legacy_index_exists() else None)
+        if current:
+            current_count = self.count(current)
+            if current_count and count < current_count * min_count_ratio:
+                problems.append(f"document count {count} is below {min_count_ratio:.0%} of {current} ({current_count})")
+
+        if sample_name:
+            response = self._request("POST", f"{index}/_search",
+                                     json={"query": {"term": {"original_name.exact": sample_name.lower()}}, "size": 1})
+            response.raise_for_status()
+            if not response.json().get("hits", {}).get("hits"):
+                problems.append(f"exact match for '{sample_name}' returned no hits")
+        return problems
+
+    def warm_up(self, index: str, queries: Sequence[Dict[str, Any]], sample_size: int = 200,
+                force_merge: bool = True) -> Dict[str, Any]:
+        """
+        切り替え前の新しいバージョンを温める
+
+        セグメントを1つにマージした後、直近の検索クエリの一部をWord Query APIと同じ検索関数で
+        新しい物理インデックスに対して再生します（ファイルシステムキャッシュ・クエリキャッシュの準備）。
+
+        Args:
+            index: 新しい物理インデックス
+            queries: 検索クエリ（fetch_recent_queries() の形式: q, search_context, exclude_uncooked）
+            sample_size: 再生するクエリ数の上限
+            force_merge: 再生前にセグメントをマージするか（登録後は更新しない読み取り専用インデックスのため）
+
+        Returns:
+            再生したクエリ数・失敗数・処理時間の中央値
+        """
+        from apps.word_query_api.endpoints.nutrition_search import (
+            elasticsearch_exact_match_only, elasticsearch_search_optimized_fallback
+        )
+
+        if force_merge:
+            self._request("POST", f"{index}/_forcemerge", params={"max_num_segments": 1}).raise_for_status()
+
+        sample = random.sample(list(queries), min(sample_size, len(queries)))
+        latencies, failures = [], 0
+        for query in sample:
+            search = (elasticsearch_search_optimized_fallback if query.get("search_context") == "word_search"
+                      else elasticsearch_exact_match_only)
+            started = time.perf_counter()
+            result = search(query["q"], size=10, exclude_uncooked=bool(query.get("exclude_uncooked")),
+                            index_url=f"{self.es_url}/{index}")
+            latencies.append((time.perf_counter() - started) * 1000)
+            failures += "error" in result
+        return {
+            "replayed": len(sample),
+            "failed": failures,
+            "median_ms": statistics.median(latencies) if latencies else 0.0
+        }
+
+    def swap_alias(self, index: str) -> Optional[str]:
+        """
+        エイリアスを index に切り替える（1回の _aliases リクエストで原子的に実行）
+
+        Returns:
+            切り替え前の物理インデックス（旧来の同名インデックスは削除されるためNone）
+        """
+        aliased = self.aliased_indices()
+        actions: List[Dict[str, Any]] = [
+            {"remove": {"index": aliased_index, "alias": self.alias}} for aliased_index in aliased
+        ]
+        if not aliased and self.legacy_index_exists():
+            # エイリアスと同名の物理インデックスは、エイリアスの追加と同時に削除する
+            actions.append({"remove_index": {"index": self.alias}})
+        actions.append({"add": {"index": index, "alias": self.alias}})
+        self._request("POST", "_aliases", json={"actions": actions}).raise_for_status()
+        return aliased[-1] if aliased else None
+
+    def rollback(self) -> str:
+        """エイリアスを現行の直前のバージョンに戻す"""
+        current = self.current_index()
+        older = [index for index in self.list_versions() if current is None or index < current]
+        if not older:
+            raise RuntimeError(f"No earlier version of '{self.alias}' to roll back to")
+        self.swap_alias(older[-1])
+        return older[-1]
+
+    def prune(self) -> List[str]:
+        """現行と直前 keep_versions 件より古いバージョンを削除（現行より新しい未切り替えの版は残す）"""
+        current = self.current_index()
+        versions = self.list_versions()
+        if current not in versions:
+            return []
+        older = versions[:versions.index(current)]
+        deleted = older[:max(0, len(older) - self.keep_versions)]
+        for index in deleted:
+            self._request("DELETE", index).raise_for_status()
+        return deleted
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Inspect, roll back or prune the versioned indices behind the read alias")
+    parser.add_argument("--es-url", default=os.environ.get("ELASTICSEARCH_URL", DEFAULT_ELASTICSEARCH_URL))
+    parser.add_argument("--alias", default=DEFAULT_ALIAS)
+    parser.add_argument("--keep", type=int, default=2, help="Previous versions kept for rollback")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--list", action="store_true", help="List versions (default)")
+    action.add_argument("--rollback", action="store_true", help="Point the alias at the previous version")
+    action.add_argument("--prune", action="store_true", help="Delete versions beyond --keep")
+    args = parser.parse_args()
+
+    manager = VersionedIndexManager(args.es_url, args.alias, keep_versions=args.keep)
+    if args.rollback:
+        print(f"⏪ '{args.alias}' → {manager.rollback()}")
+    elif args.prune:
+        print(f"🗑️ Deleted: {manager.prune() or 'none'}")
+
+    current = manager.current_index()
+    print(f"🏷️ Alias '{args.alias}' → {current or ('(legacy index)' if manager.legacy_index_exists() else '(none)')}")
+    for index in manager.list_versions():
+        print(f"   {'*' if index == current else ' '} {index} ({manager.count(index)} docs)")
+    return True
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)
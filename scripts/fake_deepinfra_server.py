@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Deep Infra（OpenAI互換API）のローカル代替サーバー
+
+記録済みフィクスチャの応答を返します。
+
+- /v1/openai/chat/completions: 画像分析（OpenAI互換）。stream=true のリクエストには Server-Sent Events で
+  chunk_size 文字ずつ送信するため、ストリーミング処理のテストや、外部APIなしでの開発に使用できます。
+- /v1/inference/<model>（multipart）: Whisper文字起こし。フィクスチャの transcripts から、受信した音声の
+  CRC32で1つを選んで返します（同じ音声には常に同じ文字起こし）。
+- /v1/inference/<model>（JSON）: NLUのテキスト生成。フィクスチャの content を generated_text として返します。
+
+フィクスチャ形式（JSON）:
+    {
+        "model": "google/gemma-3-27b-it",
+        "content": "<モデル出力テキスト>",
+        "transcripts": ["<文字起こし>", ...],   # 文字起こし用（省略時は content）
+        "chunk_size": 12,        # ストリーミング時の1チャンクの文字数
+        "chunk_delay_ms": 5,     # チャンク間の待ち時間
+        "latency_ms": "lognormal:800:0.3"  # 応答開始までの待ち時間の分布（LatencyDistribution.parse の形式）
+    }
+
+使用例:
+    python scripts/fake_deepinfra_server.py --fixture test_fixtures/deepinfra/phase1_two_dishes.json --port 8089
+    DEEPINFRA_BASE_URL=http://127.0.0.1:8089/v1/openai DEEPINFRA_API_KEY=dummy python -m apps.meal_analysis_api.main
+
+    python scripts/fake_deepinfra_server.py --fixture test_fixtures/deepinfra/phase1_two_dishes.json \
+        --transcription-fixture test_fixtures/deepinfra/whisper_meal_transcripts.json \
+        --text-generation-fixture test_fixtures/deepinfra/nlu_meal_extraction.json --latency chat=lognormal:1500:0.3
+    DEEPINFRA_INFERENCE_URL=http://127.0.0.1:8089/v1/inference ...
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+import zlib
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# ルート（レイテンシ分布・フィクスチャの指定単位）
+ROUTES = ("chat", "transcription", "text_generation")
+
+DEFAULT_FIXTURE_DIR = Path(__file__).resolve().parent.parent / "test_fixtures" / "deepinfra"
+
+
+def load_fixture(path) -> Dict[str, Any]:
+    """フィクスチャファイルを読み込む"""
+    with open(path, "r", encoding="utf-8") as f:
+        fixture = json.load(f)
+    if "content" not in fixture:
+        raise ValueError(f"Fixture {path} has no 'content'")
+    return fixture
+
+
+class LatencyDistribution:
+    """
+    応答開始までの待ち時間の分布（ミリ秒で指定）
+
+    形式（文字列 "種類:引数1[:引数2]" または {"distribution": 種類, ...} の辞書）:
+        constant:<ms>                 固定
+        uniform:<low_ms>:<high_ms>    一様分布
+        normal:<mean_ms>:<stddev_ms>  正規分布（0未満は0）
+        lognormal:<median_ms>:<sigma> 対数正規分布（外部APIの裾の長い遅延）
+    """
+
+    KINDS = ("constant", "uniform", "normal", "lognormal")
+    _DICT_ARGS = {"constant": ("ms",), "uniform": ("low", "high"), "normal": ("mean", "stddev"),
+                  "lognormal": ("median", "sigma")}
+
+    def __init__(self, kind: str = "constant", a: float = 0.0, b: float = 0.0, seed: Optional[int] = None):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution '{kind}' (expected one of {', '.join(self.KINDS)})")
+        self.kind = kind
+        self.a = float(a)
+        self.b = float(b)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: Union[None, str, float, Dict[str, Any]], seed: Optional[int] = None) -> Optional["LatencyDistribution"]:
+        """文字列・数値（固定ミリ秒）・辞書から作成（None の場合は None）"""
+        if spec is None or isinstance(spec, LatencyDistribution):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls("constant", spec, seed=seed)
+        if isinstance(spec, dict):
+            kind = spec.get("distribution", "constant")
+            args = [spec.get(name, 0.0) for name in cls._DICT_ARGS.get(kind, ())]
+            return cls(kind, *args, seed=spec.get("seed", seed))
+        kind, *args = str(spec).split(":")
+        return cls(kind, *[float(arg) for arg in args], seed=seed)
+
+    def sample_ms(self) -> float:
+        with self._lock:
+            if self.kind == "constant":
+                value = self.a
+            elif self.kind == "uniform":
+                value = self._rng.uniform(self.a, self.b)
+            elif self.kind == "normal":
+                value = self._rng.gauss(self.a, self.b)
+            else:
+                value = self.a * math.exp(self._rng.gauss(0.0, self.b))
+        return max(0.0, value)
+
+    def sleep(self) -> None:
+        """分布から1つ取り出して待つ"""
+        delay = self.sample_ms()
+        if delay:
+            time.sleep(delay / 1000.0)
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{self.a:g}" + (f":{self.b:g}" if self.kind != "constant" else "")
+
+
+def pick_transcript(fixture: Dict[str, Any], audio: bytes) -> str:
+    """音声データのCRC32でフィクスチャの文字起こしを1つ選ぶ"""
+    transcripts: List[str] = fixture.get("transcripts") or [fixture["content"]]
+    return transcripts[zlib.crc32(audio) % len(transcripts)]
+
+
+def _multipart_fields(content_type: str, body: bytes) -> Dict[str, bytes]:
+    """multipart/form-data の各フィールドの値"""
+    message = BytesParser(policy=policy.default).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+    fields = {}
+    for part in message.iter_parts() if message.is_multipart() else []:
+        name = part.get_param("name", header="content-disposition")
+        if name:
+            fields[name] = part.get_payload(decode=True) or b""
+    return fields
+
+
+class FakeDeepInfraHandler(BaseHTTPRequestHandler):
+    """OpenAI互換の /chat/completions ハンドラ"""
+
+    server_version = "FakeDeepInfra/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        content_type = self.headers.get("Content-Type") or ""
+        if path.endswith("/chat/completions"):
+            route = "chat"
+        elif "/inference/" in path:
+            route = "transcription" if content_type.startswith("multipart/form-data") else "text_generation"
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path: {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if route == "transcription":
+            request = {"model": path.split("/inference/", 1)[1], **_multipart_fields(content_type, body)}
+        else:
+            try:
+                request = json.loads(body or b"{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+                return
+
+        fixture = self.server.resolve_fixture(self.headers.get("X-Fixture"), route)
+        if fixture is None:
+            self._send_json(404, {"error": {"message": "Fixture not found"}})
+            return
+
+        if self.server.record_requests:
+            self.server.requests.append(request)
+        latency = self.server.latency.get(route) or LatencyDistribution.parse(fixture.get("latency_ms"))
+        if latency:
+            latency.sleep()
+
+        if route == "transcription":
+            self._send_json(200, {"text": pick_transcript(fixture, request.get("audio", b""))})
+            return
+        if route == "text_generation":
+            self._send_json(200, {"results": [{"generated_text": fixture["content"]}]})
+            return
+
+        model = request.get("model") or fixture.get("model", "fake-model")
+        if request.get("stream"):
+            self._stream_completion(model, fixture)
+        else:
+            self._send_json(200, self._completion_body(model, fixture["content"]))
+
+    def _completion_body(self, model: str, content: str) -> Dict[str, Any]:
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // 4, "total_tokens": len(content) // 4}
+        }
+
+    def _stream_completion(self, model: str, fixture: Dict[str, Any]) -> None:
+        content = fixture["content"]
+        chunk_size = max(1, int(fixture.get("chunk_size", 16)))
+        delay = float(fixture.get("chunk_delay_ms", 0)) / 1000.0
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> None:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            chunk({"role": "assistant", "content": ""})
+            for start in range(0, len(content), chunk_size):
+                if delay:
+                    time.sleep(delay)
+                chunk({"content": content[start:start + chunk_size]})
+            chunk({}, finish_reason="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # クライアントが途中で切断
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeDeepInfraServer(ThreadingHTTPServer):
+    """
+    フィクスチャを返すOpenAI互換サーバー
+
+    リクエストヘッダー X-Fixture でフィクスチャ名（fixture_dir内のファイル名、拡張子省略可）を
+    切り替えられます。未指定の場合は route_fixtures のルート（chat / transcription / text_generation）の
+    フィクスチャを返します（chat は default_fixture）。
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], default_fixture: Optional[Dict[str, Any]] = None,
+                 fixture_dir: Path = DEFAULT_FIXTURE_DIR, verbose: bool = False,
+                 route_fixtures: Optional[Dict[str, Dict[str, Any]]] = None,
+                 latency: Optional[Dict[str, Any]] = None, record_requests: bool = True):
+        """
+        Args:
+            route_fixtures: ルートごとのフィクスチャ（transcription / text_generation）
+            latency: ルートごとの待ち時間の分布（フィクスチャの latency_ms より優先、LatencyDistribution.parse の形式）
+            record_requests: 受信したリクエストを requests に記録するか（長時間のベンチマークでは無効にする）
+        """
+        super().__init__(address, FakeDeepInfraHandler)
+        self.default_fixture = default_fixture
+        self.fixture_dir = Path(fixture_dir)
+        self.verbose = verbose
+        self.route_fixtures = dict(route_fixtures or {})
+        self.latency = {route: LatencyDistribution.parse(spec) for route, spec in (latency or {}).items()}
+        self.record_requests = record_requests
+        self.requests = []  # 受信したリクエスト（テストでの検証用）
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/openai"
+
+    @property
+    def inference_url(self) -> str:
+        """ネイティブ推論API（DEEPINFRA_INFERENCE_URL）のURL"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/inference"
+
+    def resolve_fixture(self, name: Optional[str], route: str = "chat") -> Optional[Dict[str, Any]]:
+        if not name:
+            return self.route_fixtures.get(route) or (self.default_fixture if route == "chat" else None)
+        path = self.fixture_dir / (name if name.endswith(".json") else f"{name}.json")
+        if path.resolve().parent != self.fixture_dir.resolve() or not path.exists():
+            return None
+        return load_fixture(path)
+
+
+def start_fake_server(fixture_path=None, host: str = "127.0.0.1", port: int = 0,
+                      fixture_dir: Path = DEFAULT_FIXTURE_DIR, transcription_fixture_path=None,
+                      text_generation_fixture_path=None, latency: Optional[Dict[str, Any]] = None,
+                      record_requests: bool = True) -> FakeDeepInfraServer:
+    """
+    バックグラウンドスレッドでサーバーを起動（テスト用）
+
+    停止するには server.shutdown(); server.server_close() を呼び出します。
+    """
+    fixture = load_fixture(fixture_path) if fixture_path else None
+    route_fixtures = {}
+    if transcription_fixture_path:
+        route_fixtures["transcription"] = load_fixture(transcription_fixture_path)
+    if text_generation_fixture_path:
+        route_fixtures["text_generation"] = load_fixture(text_generation_fixture_path)
+    server = FakeDeepInfraServer((host, port), default_fixture=fixture, fixture_dir=fixture_dir,
+                                 route_fixtures=route_fixtures, latency=latency, record_requests=record_requests)
+    thread = threading.Thread(target=server.serve_forever, name="fake-deepinfra", daemon=True)
+    thread.start()
+    return server
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Deep Infra (OpenAI-compatible) local stand-in server")
+    parser.add_argument("--fixture", help="Default fixture file returned for every chat completion")
+    parser.add_argument("--transcription-fixture", help="Fixture for Whisper transcription (/v1/inference, multipart)")
+    parser.add_argument("--text-generation-fixture", help="Fixture for NLU text generation (/v1/inference, JSON)")
+    parser.add_argument("--latency", action="append", default=[], metavar="ROUTE=SPEC",
+                        help=f"Latency distribution per route ({'/'.join(ROUTES)}), e.g. chat=lognormal:1500:0.3")
+    parser.add_argument("--fixture-dir", default=str(DEFAULT_FIXTURE_DIR), help="Directory for X-Fixture lookups")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+
+    latency = dict(spec.split("=", 1) for spec in args.latency)
+    unknown = set(latency) - set(ROUTES)
+    if unknown:
+        parser.error(f"Unknown latency route(s): {', '.join(sorted(unknown))}")
+    fixture = load_fixture(args.fixture) if args.fixture else None
+    route_fixtures = {}
+    if args.transcription_fixture:
+        route_fixtures["transcription"] = load_fixture(args.transcription_fixture)
+    if args.text_generation_fixture:
+        route_fixtures["text_generation"] = load_fixture(args.text_generation_fixture)
+    server = FakeDeepInfraServer((args.host, args.port), default_fixture=fixture,
+                                 fixture_dir=Path(args.fixture_dir), verbose=True,
+                                 route_fixtures=route_fixtures, latency=latency)
+    print(f"🚀 Fake Deep Infra server listening on {server.base_url} and {server.inference_url}")
+    print(f"   fixture: {args.fixture or '(X-Fixture header)'}, fixture dir: {args.fixture_dir}")
+    for route, distribution in server.latency.items():
+        print(f"   latency {route}: {distribution!r} ms")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped")
+    finally:
+        server.server_close()
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Word Query API（apps/word_query_api）のローカル代替サーバー
+
+GET /health と GET /api/v1/nutrition/suggest を、Elasticsearchの代わりにMyNetDiary食材名リストの
+ローカル検索（shared/utils/mynetdiary_retrieval.py の CatalogueIndex）で応答します。
+応答は SuggestionResponse と同じ形式で、食材名と完全一致（大文字小文字を無視）すれば exact_match、
+それ以外は語幹化したトークンの一致順に tier_5_term_match を返します。栄養値は食材名から決まる擬似値です。
+
+使用例:
+    python scripts/fake_word_query_api.py --port 8002 --latency normal:15:5
+    WORD_QUERY_API_URL=http://127.0.0.1:8002 python -m apps.meal_analysis_api.main
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.fake_deepinfra_server import LatencyDistribution  # noqa: E402
+from shared.utils.mynetdiary_retrieval import CatalogueIndex, load_synonyms, tokenize  # noqa: E402
+from shared.utils.mynetdiary_utils import load_mynetdiary_ingredient_names  # noqa: E402
+
+INDEX_NAME = "fake_word_query_api"
+
+
+def pseudo_nutrition(name: str) -> Dict[str, Any]:
+    """食材名から決まる100gあたりの擬似栄養値"""
+    seed = zlib.crc32(name.encode("utf-8"))
+    return {
+        "calories": float(20 + seed % 380),
+        "protein": round((seed >> 8) % 300 / 10, 1),
+        "carbohydrates": round((seed >> 16) % 600 / 10, 1),
+        "fat": round((seed >> 4) % 250 / 10, 1),
+        "per_serving": "100g"
+    }
+
+
+class FakeWordQueryHandler(BaseHTTPRequestHandler):
+    """Word Query APIの /health と /api/v1/nutrition/suggest"""
+
+    server_version = "FakeWordQueryAPI/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") == "/health":
+            self._send_json(200, {"status": "healthy", "elasticsearch_index": INDEX_NAME})
+            return
+        if url.path.rstrip("/") != "/api/v1/nutrition/suggest":
+            self._send_json(404, {"detail": "Not Found"})
+            return
+
+        params = parse_qs(url.query)
+        query = (params.get("q") or [""])[0].strip()
+        if not query:
+            self._send_json(422, {"detail": "q is required"})
+            return
+        limit = int((params.get("limit") or ["10"])[0])
+
+        started = time.perf_counter()
+        if self.server.latency:
+            self.server.latency.sleep()
+        suggestions = [self._suggestion(rank, name, match_type, confidence)
+                       for rank, (name, match_type, confidence) in enumerate(self.server.suggest(query, limit), 1)]
+        processing_time = int((time.perf_counter() - started) * 1000)
+        self.server.request_count += 1
+        self._send_json(200, {
+            "query_info": {
+                "original_query": query,
+                "processed_query": query,
+                "timestamp": datetime.now().isoformat() + "Z",
+                "suggestion_type": "autocomplete"
+            },
+            "suggestions": suggestions,
+            "metadata": {
+                "total_suggestions": len(suggestions),
+                "total_hits": len(suggestions),
+                "search_time_ms": processing_time,
+                "processing_time_ms": processing_time,
+                "elasticsearch_index": INDEX_NAME
+            },
+            "status": {"success": True, "message": "Suggestions generated successfully"}
+        })
+
+    @staticmethod
+    def _suggestion(rank: int, name: str, match_type: str, confidence: float) -> Dict[str, Any]:
+        return {
+            "rank": rank,
+            "suggestion": name,
+            "match_type": match_type,
+            "confidence_score": confidence,
+            "food_info": {"search_name": name, "search_name_list": [name], "description": "", "original_name": name},
+            "nutrition_preview": pseudo_nutrition(name),
+            "alternative_names": []
+        }
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeWordQueryAPIServer(ThreadingHTTPServer):
+    """MyNetDiary食材名リストで応答するWord Query API"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency=None, verbose: bool = False):
+        """
+        Args:
+            latency: 1リクエストの待ち時間の分布（LatencyDistribution.parse の形式、Elasticsearchの検索時間の代わり）
+        """
+        super().__init__(address, FakeWordQueryHandler)
+        self.latency = LatencyDistribution.parse(latency)
+        self.verbose = verbose
+        self.request_count = 0
+        names = load_mynetdiary_ingredient_names()
+        self.index = CatalogueIndex(names, load_synonyms())
+        self._exact = {name.lower(): name for name in names}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def suggest(self, query: str, limit: int) -> List[Tuple[str, str, float]]:
+        """(食材名, match_type, confidence_score) のリスト（候補がなければクエリ自体を1件返す）"""
+        suggestions = []
+        exact = self._exact.get(query.lower())
+        if exact:
+            suggestions.append((exact, "exact_match", 100.0))
+        terms: Dict[str, float] = {}
+        for token in tokenize(query):
+            for term, weight in self.index.resolve(token):
+                terms[term] = max(terms.get(term, 0.0), weight)
+        ranked = self.index.search(terms, limit) if terms else []
+        for position, name in enumerate(ranked):
+            if name != exact and len(suggestions) < limit:
+                suggestions.append((name, "tier_5_term_match", round(max(10.0, 60.0 - 5 * position), 1)))
+        return suggestions or [(query, "tier_7_fuzzy_match", 10.0)]
+
+
+def start_fake_word_query_api(host: str = "127.0.0.1", port: int = 0, latency=None) -> FakeWordQueryAPIServer:
+    """
+    バックグラウンドスレッドでサーバーを起動（テスト用）
+
+    停止するには server.shutdown(); server.server_close() を呼び出します。
+    """
+    server = FakeWordQueryAPIServer((host, port), latency=latency)
+    thread = threading.Thread(target=server.serve_forever, name="fake-word-query-api", daemon=True)
+    thread.start()
+    return server
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Word Query API local stand-in backed by the MyNetDiary name list")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--latency", help="Latency distribution per request, e.g. normal:15:5")
+    args = parser.parse_args()
+
+    server = FakeWordQueryAPIServer((args.host, args.port), latency=args.latency, verbose=True)
+    print(f"🚀 Fake Word Query API listening on {server.base_url} ({len(server.index.names)} names)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped")
+    finally:
+        server.server_close()
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+JSON配列・JSONL（NDJSON）ファイルのストリーミング読み書き
+
+データベースのJSONファイル全体をメモリに載せずに、レコードを1件ずつ読み込み・書き出します
+（scripts/add_stemmed_fields.py・scripts/es_bulk_indexer.py で使用）。
+"""
+import json
+import os
+import textwrap
+from typing import Any, Dict, Iterator, Optional
+
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+
+
+def iter_json_documents(path, read_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """
+    JSON配列（[{...}, {...}]）またはNDJSON（1行1ドキュメント）のファイルからドキュメントを1件ずつ読み込む
+
+    Args:
+        path: データファイルのパス
+        read_size: 1回に読み込む文字数（バッファは最大でドキュメント1件分＋read_size）
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer, position, eof = "", 0, False
+        while True:
+            # ドキュメント間の空白・カンマと配列の開き括弧を読み飛ばす
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] in ",["):
+                position += 1
+            if position < len(buffer):
+                if buffer[position] == "]":
+                    return
+                try:
+                    document, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    yield document
+                    continue
+            elif eof:
+                return
+
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+
+
+class JsonDocumentWriter:
+    """
+    レコードを1件ずつJSON配列またはJSONL（拡張子 .jsonl / .ndjson）として書き出す
+
+    JSON配列は json.dump(records, f, ensure_ascii=False, indent=2) と同じ内容になります。
+    同じディレクトリの一時ファイルに書き出し、正常に終了した場合だけ出力ファイルを置き換えます
+    （途中で例外が発生した場合は一時ファイルを削除し、既存の出力ファイルはそのまま残ります）。
+
+    使用例:
+        with JsonDocumentWriter("db/output.json") as writer:
+            for record in records:
+                writer.write(record)
+    """
+
+    def __init__(self, path, indent: Optional[int] = 2):
+        """
+        Args:
+            path: 出力ファイルのパス
+            indent: JSON配列の各レコードのインデント（JSONLでは常に1行）
+        """
+        self.path = str(path)
+        self.indent = indent
+        self.jsonl = self.path.endswith(JSONL_SUFFIXES)
+        self.count = 0
+        self._file = None
+        directory, name = os.path.split(os.path.abspath(self.path))
+        self._temp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+
+    def __enter__(self) -> "JsonDocumentWriter":
+        self._file = open(self._temp_path, "w", encoding="utf-8")
+        return self
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self.jsonl:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            text = json.dumps(record, ensure_ascii=False, indent=self.indent)
+            if self.indent is not None:
+                text = textwrap.indent(text, " " * self.indent)
+            if self.indent is not None:
+                self._file.write(("[" if self.count == 0 else ",") + "\n" + text)
+            else:
+                self._file.write(("[" if self.count == 0 else ", ") + text)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None and not self.jsonl:
+                if self.count == 0:
+                    self._file.write("[]")
+                else:
+                    self._file.write(("\n" if self.indent is not None else "") + "]")
+            self._file.close()
+            if exc_type is None:
+                os.replace(self._temp_path, self.path)
+        finally:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+HdrHistogram形式のレイテンシヒストグラム（scripts/replay_traffic.py で使用）
+
+値（マイクロ秒の整数）を有効桁数 significant_figures の精度で対数線形のバケットに数えます。
+sub_bucket_count 未満の値は正確に、それ以上の値は 2のべき乗ごとに sub_bucket_count/2 個のバケットに分けるため、
+どの値も相対誤差 10^-significant_figures 以内で記録され、メモリ使用量は値の範囲の対数にしか比例しません。
+
+- record_corrected(): 閉ループ計測のcoordinated omission補正（期待間隔より長い応答の間に
+  送られるはずだったリクエストの値を補う、HdrHistogram の recordValueWithExpectedInterval と同じ）
+- format_percentile_report(): HdrHistogram の outputPercentileDistribution と同じ .hgrm 形式のレポート
+- compare_histograms(): 2回の計測のパーセンタイルの差分
+"""
+import math
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+REPORT_PERCENTILES = (50.0, 90.0, 99.0, 99.9, 100.0)
+
+
+class LatencyHistogram:
+    """対数線形バケットのヒストグラム（値はマイクロ秒の整数）"""
+
+    def __init__(self, significant_figures: int = 3):
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+        self.significant_figures = significant_figures
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_figures))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+        self.counts: Dict[int, int] = {}
+        self.total_count = 0
+        self.min_value: Optional[int] = None
+        self.max_value = 0
+        self._sum = 0
+        self._sum_squares = 0
+
+    # === バケット ===
+
+    def _index(self, value: int) -> int:
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.sub_bucket_half + (value >> shift) - self.sub_bucket_half
+
+    def _bucket_range(self, index: int) -> Tuple[int, int]:
+        """バケットに入る値の範囲（下限, 上限）"""
+        if index < self.sub_bucket_count:
+            return index, index
+        offset = index - self.sub_bucket_count
+        shift = offset // self.sub_bucket_half + 1
+        sub_bucket = offset % self.sub_bucket_half + self.sub_bucket_half
+        return sub_bucket << shift, ((sub_bucket + 1) << shift) - 1
+
+    def highest_equivalent_value(self, value: int) -> int:
+        """value と同じバケットに入る最大の値"""
+        return self._bucket_range(self._index(value))[1]
+
+    # === 記録 ===
+
+    def record(self, value: int, count: int = 1) -> None:
+        """値（マイクロ秒）を count 回記録"""
+        value = max(0, int(value))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += count
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+        self.max_value = max(self.max_value, value)
+        self._sum += value * count
+        self._sum_squares += value * value * count
+
+    def record_corrected(self, value: int, expected_interval: Optional[int]) -> None:
+        """
+        coordinated omission を補正して記録
+
+        value が expected_interval より長い場合、その間に expected_interval ごとに送られるはずだった
+        リクエストの値（value - expected_interval, value - 2*expected_interval, ...）も記録します。
+        """
+        self.record(value)
+        if not expected_interval or expected_interval <= 0:
+            return
+        missing = value - expected_interval
+        while missing >= expected_interval:
+            self.record(missing)
+            missing -= expected_interval
+
+    def add(self, other: "LatencyHistogram") -> None:
+        """別のヒストグラムの値を加える（同じ有効桁数であること）"""
+        if other.significant_figures != self.significant_figures:
+            raise ValueError("Cannot add histograms with different significant_figures")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += other.total_count
+        if other.min_value is not None:
+            self.min_value = other.min_value if self.min_value is None else min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+        self._sum += other._sum
+        self._sum_squares += other._sum_squares
+
+    # === 統計 ===
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self.total_count if self.total_count else 0.0
+
+    @property
+    def stdev(self) -> float:
+        if not self.total_count:
+            return 0.0
+        return math.sqrt(max(0.0, self._sum_squares / self.total_count - self.mean ** 2))
+
+    def _iter_cumulative(self) -> Iterator[Tuple[int, int]]:
+        cumulative = 0
+        for index in sorted(self.counts):
+            cumulative += self.counts[index]
+            yield index, cumulative
+
+    def value_at_percentile(self, percentile: float) -> int:
+        """パーセンタイルの値（バケットの上限、最大値を超えない）"""
+        if not self.total_count:
+            return 0
+        if percentile <= 0:
+            return self.min_value or 0
+        # 99.9 / 100 * 5000 = 4995.000000000001 のような浮動小数点の誤差で1件ずれないように丸める
+        target = max(1, math.ceil(round(min(percentile, 100.0) * self.total_count / 100, 9)))
+        for index, cumulative in self._iter_cumulative():
+            if cumulative >= target:
+                return min(self._bucket_range(index)[1], self.max_value)
+        return self.max_value
+
+    def _count_at_or_below(self, value: int) -> int:
+        limit = self._index(value)
+        return sum(count for index, count in self.counts.items() if index <= limit)
+
+    def percentile_distribution(self, ticks_per_half_distance: int = 5) -> List[Tuple[int, float, int]]:
+        """
+        HdrHistogram と同じ間隔のパーセンタイル（100%に近いほど細かく、半分の距離ごとに ticks_per_half_distance 点）
+
+        Returns:
+            (値, パーセンタイル(0-100), その値以下の件数) のリスト
+        """
+        if not self.total_count:
+            return []
+        rows = []
+        percentile = 0.0
+        while percentile < 100.0:
+            value = self.value_at_percentile(percentile)
+            count = self._count_at_or_below(value)
+            rows.append((value, percentile, count))
+            if count >= self.total_count:
+                break
+            half_distances = 2 ** (int(math.log2(100.0 / (100.0 - percentile))) + 1)
+            percentile += 100.0 / (ticks_per_half_distance * half_distances)
+        rows.append((self.max_value, 100.0, self.total_count))
+        return rows
+
+    # === 保存 ===
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "significant_figures": self.significant_figures,
+            "total_count": self.total_count,
+            "min": self.min_value,
+            "max": self.max_value,
+            "sum": self._sum,
+            "sum_squares": self._sum_squares,
+            "counts": {str(index): count for index, count in sorted(self.counts.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        histogram = cls(data.get("significant_figures", 3))
+        histogram.counts = {int(index): count for index, count in data.get("counts", {}).items()}
+        histogram.total_count = data.get("total_count", sum(histogram.counts.values()))
+        histogram.min_value = data.get("min")
+        histogram.max_value = data.get("max", 0)
+        histogram._sum = data.get("sum", 0)
+        histogram._sum_squares = data.get("sum_squares", 0)
+        return histogram
+
+
+def format_percentile_report(histogram: LatencyHistogram, unit_ratio: float = 1000.0,
+                             ticks_per_half_distance: int = 5) -> str:
+    """
+    HdrHistogram の .hgrm 形式のパーセンタイル分布（値は unit_ratio で割った値、既定はミリ秒）
+
+    HdrHistogram のプロットツール（HistogramLogAnalyzer、hdrhistogram.github.io のplotter）でそのまま読めます。
+    """
+    lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", ""]
+    for value, percentile, count in histogram.percentile_distribution(ticks_per_half_distance):
+        fraction = percentile / 100
+        if fraction < 1.0:
+            lines.append(f"{value / unit_ratio:12.3f} {fraction:14.12f} {count:10d} {1 / (1 - fraction):14.2f}")
+        else:
+            lines.append(f"{value / unit_ratio:12.3f} {fraction:14.12f} {count:10d}")
+    buckets = len({index // histogram.sub_bucket_half for index in histogram.counts})
+    lines.append(f"#[Mean    = {histogram.mean / unit_ratio:12.3f}, StdDeviation   = {histogram.stdev / unit_ratio:12.3f}]")
+    lines.append(f"#[Max     = {histogram.max_value / unit_ratio:12.3f}, Total count    = {histogram.total_count:12d}]")
+    lines.append(f"#[Buckets = {buckets:12d}, SubBuckets     = {histogram.sub_bucket_count:12d}]")
+    return "\n".join(lines) + "\n"
+
+
+def compare_histograms(baseline: LatencyHistogram, current: LatencyHistogram,
+                       percentiles: Sequence[float] = REPORT_PERCENTILES,
+                       unit_ratio: float = 1000.0) -> List[Dict[str, Any]]:
+    """
+    パーセンタイルごとの差分
+
+    Returns:
+        percentile, baseline, current（unit_ratio で割った値）, change（割合、基準が0の場合はNone）のリスト
+    """
+    rows = []
+    for percentile in percentiles:
+        base = baseline.value_at_percentile(percentile) / unit_ratio
+        value = current.value_at_percentile(percentile) / unit_ratio
+        rows.append({
+            "percentile": percentile,
+            "baseline": base,
+            "current": value,
+            "change": (value - base) / base if base else None
+        })
+    return rows
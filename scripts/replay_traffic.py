@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+取得したリクエストの再生による負荷試験（/complete・/voice・/suggest）
+
+リクエストの記録（JSON Lines、1行1リクエスト）を食事分析API（/api/v1/meal-analyses/complete, /voice）と
+Word Query API（/api/v1/nutrition/suggest）に送り、エンドポイントごとのレイテンシをHdrHistogram形式で記録します。
+
+- 開ループ（--rate）: 負荷とは無関係に一定間隔（--poisson で指数分布の間隔）でリクエストを送り、
+  レイテンシは予定送信時刻から測ります（coordinated omission の補正済み）。
+  --rate を指定せず記録に "at"（開始からの秒数）がある場合は、記録時の間隔（÷ --speed）で送ります。
+- 閉ループ（--concurrency）: 各ワーカーが応答を受け取ってから次のリクエストを送ります。
+  --expected-interval-ms を指定すると、HdrHistogram と同じ方法で coordinated omission を補正します。
+
+結果は <output>.json（ヒストグラム）と <output>.hgrm（エンドポイントごとのパーセンタイル分布）に保存され、
+compare サブコマンド（または run --compare）で2回の計測を比較できます。
+
+記録の形式:
+    {"endpoint": "suggest", "params": {"q": "chicken breast", "search_context": "meal_analysis", "exclude_uncooked": true}}
+    {"endpoint": "complete", "file": "images/lunch.jpg", "content_type": "image/jpeg", "form": {"seed": 123456}}
+    {"endpoint": "voice", "file": "audio/breakfast.wav", "form": {"language_code": "en-US"}, "at": 12.5}
+（file は記録ファイルからの相対パス）
+
+使用例:
+    # Word Query APIの直近の検索クエリ（RECENT_QUERIES_TOKEN が必要）と test_images/・test_audio/ から記録を作成
+    python scripts/replay_traffic.py capture --recent-queries http://localhost:8002 --test-data -o captures/local.jsonl
+    # 開ループ 2 req/s で60秒
+    python scripts/replay_traffic.py run captures/local.jsonl --rate 2 --duration 60 --output runs/before
+    # 閉ループ 同時実行4で200件、前回と比較（p99が10%以上悪化したら終了コード1）
+    python scripts/replay_traffic.py run captures/local.jsonl --concurrency 4 --requests 200 --output runs/after \\
+        --compare runs/before.json --fail-above 0.1
+    python scripts/replay_traffic.py compare runs/before.json runs/after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.es_versioned_index import fetch_recent_queries  # noqa: E402
+from scripts.latency_histogram import REPORT_PERCENTILES, LatencyHistogram, compare_histograms, format_percentile_report  # noqa: E402
+
+DEFAULT_MEAL_API_URL = "http://localhost:8001"
+DEFAULT_WORD_QUERY_API_URL = "http://localhost:8002"
+
+# エンドポイント → (API, メソッド, パス, アップロードするファイルのフィールド名)
+ENDPOINTS = {
+    "complete": ("meal", "POST", "/api/v1/meal-analyses/complete", "image"),
+    "voice": ("meal", "POST", "/api/v1/meal-analyses/voice", "audio"),
+    "suggest": ("word_query", "GET", "/api/v1/nutrition/suggest", None),
+}
+# 記録にない場合のフォームの既定値（負荷試験で分析ログを書き出さない）
+DEFAULT_FORM = {"save_detailed_logs": "false"}
+IMAGE_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+AUDIO_TYPES = {".wav": "audio/wav", ".mp3": "audio/mpeg", ".m4a": "audio/mp4", ".flac": "audio/flac", ".ogg": "audio/ogg"}
+
+
+@dataclass
+class CapturedRequest:
+    """記録された1リクエスト"""
+    endpoint: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    form: Dict[str, Any] = field(default_factory=dict)
+    file: Optional[str] = None
+    content_type: Optional[str] = None
+    at: Optional[float] = None
+    content: Optional[bytes] = None  # 読み込んだファイル（送信時にディスクを読まない）
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"endpoint": self.endpoint}
+        for name in ("params", "form", "file", "content_type", "at"):
+            value = getattr(self, name)
+            if value not in (None, {}):
+                data[name] = value
+        return data
+
+
+def load_capture(path: Path) -> List[CapturedRequest]:
+    """記録を読み込み、アップロードするファイルをメモリに読み込む"""
+    requests = []
+    files: Dict[Path, bytes] = {}
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            request = CapturedRequest(**json.loads(line))
+            if request.endpoint not in ENDPOINTS:
+                raise ValueError(f"{path}:{line_number}: unknown endpoint {request.endpoint!r}")
+            if ENDPOINTS[request.endpoint][3] is not None:
+                if not request.file:
+                    raise ValueError(f"{path}:{line_number}: {request.endpoint} requests need a file")
+                file_path = (path.parent / request.file).resolve()
+                if file_path not in files:
+                    files[file_path] = file_path.read_bytes()
+                request.content = files[file_path]
+                request.content_type = request.content_type or {**IMAGE_TYPES, **AUDIO_TYPES}.get(
+                    file_path.suffix.lower(), "application/octet-stream")
+            requests.append(request)
+    if not requests:
+        raise ValueError(f"No requests in {path}")
+    return requests
+
+
+def build_capture(output: Path, recent_queries_url: Optional[str] = None, test_data: bool = False,
+                  limit: int = 200) -> List[CapturedRequest]:
+    """Word Query APIの直近の検索クエリ・test_images/・test_audio/ から記録を作成して保存"""
+    requests = []
+    if recent_queries_url:
+        for query in fetch_recent_queries(recent_queries_url, limit=limit):
+            params = {"q": query["q"], "search_context": query.get("search_context", "meal_analysis"),
+                      "exclude_uncooked": query.get("exclude_uncooked", False)}
+            requests.append(CapturedRequest("suggest", params=params))
+    if test_data:
+        for directory, endpoint, types in (("test_images", "complete", IMAGE_TYPES), ("test_audio", "voice", AUDIO_TYPES)):
+            for path in sorted((ROOT / directory).glob("*")):
+                if path.suffix.lower() in types:
+                    file = os.path.relpath(path, output.resolve().parent)
+                    requests.append(CapturedRequest(endpoint, file=file, content_type=types[path.suffix.lower()]))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        for request in requests:
+            f.write(json.dumps(request.to_dict(), ensure_ascii=False) + "\n")
+    return requests
+
+
+# === 計測 ===
+
+@dataclass
+class EndpointStats:
+    """エンドポイントごとの計測結果"""
+    corrected: LatencyHistogram
+    uncorrected: LatencyHistogram
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def errors(self) -> int:
+        return sum(count for status, count in self.statuses.items() if not status.startswith("2"))
+
+    @property
+    def requests(self) -> int:
+        return sum(self.statuses.values())
+
+
+class TrafficReplayer:
+    """記録したリクエストを開ループまたは閉ループで送信し、エンドポイントごとのレイテンシを記録する"""
+
+    def __init__(self, requests: List[CapturedRequest], base_urls: Dict[str, str], timeout: float = 120.0,
+                 significant_figures: int = 3):
+        """
+        Args:
+            requests: 送信するリクエスト（記録順に繰り返し使う）
+            base_urls: API（"meal", "word_query"）→ ベースURL
+            timeout: 1リクエストのタイムアウト（秒）
+            significant_figures: ヒストグラムの有効桁数
+        """
+        self.requests = requests
+        self.base_urls = {name: url.rstrip("/") for name, url in base_urls.items()}
+        self.timeout = timeout
+        self.significant_figures = significant_figures
+        self.stats: Dict[str, EndpointStats] = {}
+        self.elapsed = 0.0
+
+    def _stats(self, endpoint: str) -> EndpointStats:
+        if endpoint not in self.stats:
+            self.stats[endpoint] = EndpointStats(LatencyHistogram(self.significant_figures),
+                                                 LatencyHistogram(self.significant_figures))
+        return self.stats[endpoint]
+
+    async def _send(self, client: httpx.AsyncClient, request: CapturedRequest) -> str:
+        api, method, path, file_field = ENDPOINTS[request.endpoint]
+        url = self.base_urls[api] + path
+        try:
+            if file_field is None:
+                params = {key: str(value).lower() if isinstance(value, bool) else value
+                          for key, value in request.params.items()}
+                response = await client.request(method, url, params=params)
+            else:
+                form = {key: str(value).lower() if isinstance(value, bool) else str(value)
+                        for key, value in {**DEFAULT_FORM, **request.form}.items()}
+                files = {file_field: (Path(request.file).name, request.content, request.content_type)}
+                response = await client.request(method, url, data=form, files=files)
+            await response.aread()
+            return str(response.status_code)
+        except httpx.HTTPError as e:
+            return type(e).__name__
+
+    def _record(self, request: CapturedRequest, status: str, intended: float, sent: float, done: float,
+                expected_interval_us: Optional[int] = None) -> None:
+        """
+        レイテンシを記録する
+
+        エラー応答・タイムアウト・接続エラーも、失敗が確定した時刻までのレイテンシとして記録します
+        （除外すると過負荷でタイムアウトしたリクエストほどパーセンタイルが良く見えるため）。
+        成否はステータス（HTTPステータスコードまたは例外名）ごとの件数で別に数えます。
+        """
+        stats = self._stats(request.endpoint)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.uncorrected.record(int((done - sent) * 1_000_000))
+        stats.corrected.record_corrected(int((done - intended) * 1_000_000), expected_interval_us)
+
+    def _limits(self, connections: int) -> httpx.Limits:
+        return httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+
+    async def run_open_loop(self, rate: Optional[float], count: int, poisson: bool = False, speed: float = 1.0,
+                            max_in_flight: int = 256, seed: int = 0) -> None:
+        """
+        開ループ: 予定時刻にリクエストを送り、予定時刻からの所要時間を記録する
+
+        Args:
+            rate: 1秒あたりのリクエスト数（None の場合は記録の "at" の間隔 ÷ speed）
+            count: 送信するリクエスト数
+            poisson: 間隔を指数分布にする（平均 1/rate）
+            max_in_flight: 同時に送信中のリクエストの上限（待機時間は補正後のレイテンシに含まれる）
+        """
+        schedule = self._schedule(rate, count, poisson, speed, seed)
+        in_flight = asyncio.Semaphore(max_in_flight)
+
+        async with httpx.AsyncClient(timeout=self.timeout, limits=self._limits(max_in_flight)) as client:
+            async def fire(request: CapturedRequest, intended: float) -> None:
+                async with in_flight:
+                    sent = time.perf_counter()
+                    status = await self._send(client, request)
+                    self._record(request, status, intended, sent, time.perf_counter())
+
+            started = time.perf_counter()
+            tasks = []
+            for i, offset in enumerate(schedule):
+                intended = started + offset
+                delay = intended - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(fire(self.requests[i % len(self.requests)], intended)))
+            await asyncio.gather(*tasks)
+            self.elapsed = time.perf_counter() - started
+
+    def _schedule(self, rate: Optional[float], count: int, poisson: bool, speed: float, seed: int) -> List[float]:
+        """各リクエストの開始からの予定送信時刻（秒）"""
+        if rate is None:
+            if any(request.at is None for request in self.requests):
+                raise ValueError("rate is required unless every captured request has an 'at' timestamp")
+            first = self.requests[0].at
+            span = self.requests[-1].at - first
+            # 記録を繰り返す場合は、記録全体の長さ＋平均間隔ずつずらす
+            period = span + (span / max(1, len(self.requests) - 1) if len(self.requests) > 1 else 1.0)
+            return [((self.requests[i % len(self.requests)].at - first) + (i // len(self.requests)) * period) / speed
+                    for i in range(count)]
+        rng = random.Random(seed)
+        offsets, offset = [], 0.0
+        for _ in range(count):
+            offsets.append(offset)
+            offset += rng.expovariate(rate) if poisson else 1.0 / rate
+        return offsets
+
+    async def run_closed_loop(self, concurrency: int, count: int, expected_interval_ms: Optional[float] = None,
+                              think_time_ms: float = 0.0) -> None:
+        """
+        閉ループ: concurrency 個のワーカーが応答を受け取ってから次のリクエストを送る
+
+        Args:
+            expected_interval_ms: ワーカーごとの期待送信間隔（指定するとcoordinated omissionを補正）
+            think_time_ms: 応答を受け取ってから次のリクエストまでの待ち時間
+        """
+        expected_interval_us = int(expected_interval_ms * 1000) if expected_interval_ms else None
+        next_index = iter(range(count))
+
+        async with httpx.AsyncClient(timeout=self.timeout, limits=self._limits(concurrency)) as client:
+            async def worker() -> None:
+                for i in next_index:
+                    request = self.requests[i % len(self.requests)]
+                    sent = time.perf_counter()
+                    status = await self._send(client, request)
+                    self._record(request, status, sent, sent, time.perf_counter(), expected_interval_us)
+                    if think_time_ms:
+                        await asyncio.sleep(think_time_ms / 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            self.elapsed = time.perf_counter() - started
+
+    # === 結果 ===
+
+    def results(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """エンドポイント（と全体 "all"）ごとのヒストグラム・ステータス・スループット"""
+        stats = dict(sorted(self.stats.items()))
+        if len(stats) > 1:
+            total = EndpointStats(LatencyHistogram(self.significant_figures), LatencyHistogram(self.significant_figures))
+            for endpoint_stats in stats.values():
+                total.corrected.add(endpoint_stats.corrected)
+                total.uncorrected.add(endpoint_stats.uncorrected)
+                for status, count in endpoint_stats.statuses.items():
+                    total.statuses[status] = total.statuses.get(status, 0) + count
+            stats["all"] = total
+        return {
+            "config": config,
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            "elapsed_s": round(self.elapsed, 3),
+            "endpoints": {
+                endpoint: {
+                    "requests": endpoint_stats.requests,
+                    "errors": endpoint_stats.errors,
+                    "statuses": endpoint_stats.statuses,
+                    "throughput_rps": round(endpoint_stats.requests / self.elapsed, 3) if self.elapsed else 0.0,
+                    "corrected": endpoint_stats.corrected.to_dict(),
+                    "uncorrected": endpoint_stats.uncorrected.to_dict()
+                }
+                for endpoint, endpoint_stats in stats.items()
+            }
+        }
+
+
+def write_reports(results: Dict[str, Any], output: Path) -> Tuple[Path, Path]:
+    """<output>.json（ヒストグラム）と <output>.hgrm（補正後のパーセンタイル分布）を保存"""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    json_path, hgrm_path = output.with_suffix(".json"), output.with_suffix(".hgrm")
+    json_path.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    sections = []
+    for endpoint, data in results["endpoints"].items():
+        sections.append(f"# endpoint: {endpoint} (coordinated-omission corrected, ms)\n"
+                        + format_percentile_report(LatencyHistogram.from_dict(data["corrected"])))
+    hgrm_path.write_text("\n".join(sections), encoding="utf-8")
+    return json_path, hgrm_path
+
+
+def print_summary(results: Dict[str, Any]) -> None:
+    labels = "".join(f"{'p' + format(p, 'g') if p < 100 else 'max':>10}" for p in REPORT_PERCENTILES)
+    print(f"\n   {'endpoint':<10}{'requests':>9}{'errors':>8}{'req/s':>8}  latency (ms){labels}")
+    for endpoint, data in results["endpoints"].items():
+        for kind in ("corrected", "uncorrected"):
+            histogram = LatencyHistogram.from_dict(data[kind])
+            values = "".join(f"{histogram.value_at_percentile(p) / 1000:>10.1f}" for p in REPORT_PERCENTILES)
+            if kind == "corrected":
+                print(f"   {endpoint:<10}{data['requests']:>9}{data['errors']:>8}{data['throughput_rps']:>8.2f}"
+                      f"  {kind:<12}{values}")
+            else:
+                print(f"   {'':<10}{'':>9}{'':>8}{'':>8}  {kind:<12}{values}")
+        failed = {status: count for status, count in data["statuses"].items() if not status.startswith("2")}
+        if failed:
+            print(f"   {'':<10}⚠️ {failed}")
+
+
+def compare_runs(baseline: Dict[str, Any], current: Dict[str, Any], fail_above: Optional[float] = None) -> List[str]:
+    """
+    2回の計測の補正後レイテンシを比較して表示する
+
+    Returns:
+        fail_above（割合）を超えて悪化したパーセンタイル・増えたエラーの一覧
+    """
+    regressions = []
+    print(f"\n   {'endpoint':<10}{'':>8}{'baseline ms':>13}{'current ms':>12}{'change':>9}")
+    for endpoint, data in current["endpoints"].items():
+        base = baseline["endpoints"].get(endpoint)
+        if base is None:
+            print(f"   {endpoint:<10} (not in baseline)")
+            continue
+        rows = compare_histograms(LatencyHistogram.from_dict(base["corrected"]), LatencyHistogram.from_dict(data["corrected"]))
+        for row in rows:
+            label = "max" if row["percentile"] >= 100 else f"p{row['percentile']:g}"
+            change = f"{row['change']:+.1%}" if row["change"] is not None else "n/a"
+            regressed = fail_above is not None and row["change"] is not None and row["change"] > fail_above
+            print(f"   {endpoint if label == 'p50' else '':<10}{label:>8}{row['baseline']:>13.1f}{row['current']:>12.1f}"
+                  f"{change:>9}{'  ❌' if regressed else ''}")
+            # 最大値は1件の外れ値で決まるため判定には使わない
+            if regressed and row["percentile"] < 100:
+                regressions.append(f"{endpoint} {label}: {row['baseline']:.1f} ms → {row['current']:.1f} ms ({change})")
+        base_rate = base["errors"] / base["requests"] if base["requests"] else 0.0
+        rate = data["errors"] / data["requests"] if data["requests"] else 0.0
+        print(f"   {'':<10}{'errors':>8}{base_rate:>13.1%}{rate:>12.1%}")
+        if fail_above is not None and rate > base_rate:
+            regressions.append(f"{endpoint} error rate: {base_rate:.1%} → {rate:.1%}")
+    return regressions
+
+
+def _run(args: argparse.Namespace) -> bool:
+    requests = load_capture(args.capture)
+    if args.endpoints:
+        requests = [request for request in requests if request.endpoint in args.endpoints]
+        if not requests:
+            print(f"❌ No {'/'.join(args.endpoints)} requests in {args.capture}")
+            return False
+    count = args.requests
+    if count is None:
+        count = int(args.duration * args.rate) if args.duration and args.rate else len(requests)
+
+    mode = "closed" if args.concurrency is not None else "open"
+    if args.speed <= 0:
+        print("❌ --speed must be greater than 0")
+        return False
+    if (args.rate is not None and args.rate <= 0) or (args.concurrency is not None and args.concurrency <= 0):
+        print("❌ --rate and --concurrency must be greater than 0")
+        return False
+    if mode == "open" and args.rate is None and any(request.at is None for request in requests):
+        print(f"❌ {args.capture} has no captured timing ('at'); specify --rate or --concurrency")
+        return False
+    config = {
+        "capture": str(args.capture), "mode": mode, "requests": count, "rate": args.rate, "poisson": args.poisson,
+        "speed": args.speed, "concurrency": args.concurrency, "expected_interval_ms": args.expected_interval_ms,
+        "endpoints": sorted({request.endpoint for request in requests}),
+        "meal_api": args.meal_api, "word_query_api": args.word_query_api,
+    }
+    print("🚀 Replaying captured traffic")
+    print(f"   {len(requests)} captured requests ({', '.join(config['endpoints'])}), {count} to send")
+    if mode == "open":
+        pacing = f"{args.rate} req/s{' (Poisson)' if args.poisson else ''}" if args.rate else f"captured timing ×{args.speed}"
+        print(f"   open loop, {pacing}")
+    else:
+        print(f"   closed loop, concurrency {args.concurrency}"
+              + (f", expected interval {args.expected_interval_ms} ms" if args.expected_interval_ms else ""))
+
+    replayer = TrafficReplayer(requests, {"meal": args.meal_api, "word_query": args.word_query_api},
+                               timeout=args.timeout, significant_figures=args.significant_figures)
+    if mode == "open":
+        asyncio.run(replayer.run_open_loop(args.rate, count, poisson=args.poisson, speed=args.speed,
+                                           max_in_flight=args.max_in_flight, seed=args.seed))
+    else:
+        asyncio.run(replayer.run_closed_loop(args.concurrency, count, expected_interval_ms=args.expected_interval_ms,
+                                             think_time_ms=args.think_time_ms))
+
+    results = replayer.results(config)
+    print_summary(results)
+    if args.output:
+        json_path, hgrm_path = write_reports(results, args.output)
+        print(f"\n💾 {json_path}, {hgrm_path}")
+    if all(data["errors"] == data["requests"] for data in results["endpoints"].values()):
+        print("\n❌ Every request failed (check --meal-api / --word-query-api and that the APIs are running)")
+        return False
+    if args.compare:
+        regressions = compare_runs(json.loads(args.compare.read_text(encoding="utf-8")), results, args.fail_above)
+        if regressions:
+            print("\n❌ Regressions:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            return False
+    print("\n✅ Replay completed")
+    return True
+
+
+def _compare(args: argparse.Namespace) -> bool:
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    current = json.loads(args.current.read_text(encoding="utf-8"))
+    print(f"📊 {args.baseline} → {args.current}")
+    regressions = compare_runs(baseline, current, args.fail_above)
+    for regression in regressions:
+        print(f"   ❌ {regression}")
+    return not regressions
+
+
+def _capture(args: argparse.Namespace) -> bool:
+    if not args.recent_queries and not args.test_data:
+        print("❌ Specify --recent-queries and/or --test-data")
+        return False
+    requests = build_capture(args.output, args.recent_queries, args.test_data, args.limit)
+    counts = {endpoint: sum(request.endpoint == endpoint for request in requests) for endpoint in ENDPOINTS}
+    print(f"💾 {args.output}: " + ", ".join(f"{endpoint} {count}" for endpoint, count in counts.items()))
+    return bool(requests)
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Replay captured /complete, /voice and /suggest requests as load")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Replay a capture and record latency histograms")
+    run.add_argument("capture", type=Path, help="Captured requests (JSON Lines)")
+    run.add_argument("--meal-api", default=os.environ.get("MEAL_ANALYSIS_API_URL", DEFAULT_MEAL_API_URL))
+    run.add_argument("--word-query-api", default=os.environ.get("WORD_QUERY_API_URL", DEFAULT_WORD_QUERY_API_URL))
+    run.add_argument("--endpoints", nargs="+", choices=sorted(ENDPOINTS), help="Only replay these endpoints")
+    pacing = run.add_mutually_exclusive_group()
+    pacing.add_argument("--rate", type=float, help="Open loop: requests per second")
+    pacing.add_argument("--concurrency", type=int, help="Closed loop: concurrent workers")
+    run.add_argument("--requests", type=int, help="Requests to send (default: --duration × --rate, or the capture size)")
+    run.add_argument("--duration", type=float, help="Open loop: seconds to run at --rate")
+    run.add_argument("--poisson", action="store_true", help="Open loop: exponentially distributed intervals")
+    run.add_argument("--speed", type=float, default=1.0, help="Open loop without --rate: captured timing speed-up")
+    run.add_argument("--max-in-flight", type=int, default=256, help="Open loop: cap on outstanding requests")
+    run.add_argument("--expected-interval-ms", type=float, help="Closed loop: correct coordinated omission")
+    run.add_argument("--think-time-ms", type=float, default=0.0, help="Closed loop: pause between requests")
+    run.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    run.add_argument("--significant-figures", type=int, default=3)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--output", type=Path, help="Write <output>.json and <output>.hgrm")
+    run.add_argument("--compare", type=Path, help="Baseline run (.json) to diff against")
+    run.add_argument("--fail-above", type=float, help="Exit 1 if a percentile regresses by more than this fraction")
+    run.set_defaults(handler=_run)
+
+    compare = commands.add_parser("compare", help="Diff two recorded runs")
+    compare.add_argument("baseline", type=Path)
+    compare.add_argument("current", type=Path)
+    compare.add_argument("--fail-above", type=float, help="Exit 1 if a percentile regresses by more than this fraction")
+    compare.set_defaults(handler=_compare)
+
+    capture = commands.add_parser("capture", help="Build a capture from recent /suggest queries and test data")
+    capture.add_argument("-o", "--output", type=Path, required=True)
+    capture.add_argument("--recent-queries", metavar="WORD_QUERY_API_URL", help="Fetch /suggest/recent-queries")
+    capture.add_argument("--limit", type=int, default=200, help="Recent queries to fetch")
+    capture.add_argument("--test-data", action="store_true", help="Add /complete and /voice requests for test_images/ and test_audio/")
+    capture.set_defaults(handler=_capture)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)
@@ -2,24 +2,39 @@
 """
 語幹化フィールドを含む新しいデータベースでElasticsearchインデックスを更新
 
+Word Query APIは読み取りエイリアス（INDEX_ALIAS）だけを検索するため、更新中も検索は止まりません。
+
 手順:
-1. 既存インデックスの削除
-2. 新しい設定でインデックス作成
-3. 語幹化データの一括インポート
+1. 新しい設定でバージョン付きインデックス {alias}_v<日時> を作成
+2. 語幹化データの一括インポート
+3. 検証（ドキュメント数・exact match）
+4. ウォームアップ（Word Query APIの直近の検索クエリを再生）
+5. エイリアスの切り替え（原子的）と古いバージョンの削除（直前 ES_KEEP_VERSIONS 件はロールバック用に保持）
+
+ロールバック: python scripts/es_versioned_index.py --rollback
 """
 
 import json
+import os
 import requests
-import time
+import sys
+from pathlib import Path
 from typing import Dict, Any, List
 
-# Production Elasticsearch VM設定
-ELASTICSEARCH_URL = "http://35.193.16.212:9200"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.es_bulk_indexer import StreamingBulkIndexer, iter_json_documents  # noqa: E402
+from scripts.es_versioned_index import VersionedIndexManager, fetch_recent_queries  # noqa: E402
+
+# Production Elasticsearch VM設定（ELASTICSEARCH_URL=http://localhost:9200 で同梱の elasticsearch-8.10.4 を使用）
+ELASTICSEARCH_URL = os.environ.get("ELASTICSEARCH_URL", "http://35.193.16.212:9200")
 SETTINGS_FILE = "elasticsearch_settings.json"
 DATA_FILE = "db/mynetdiary_converted_tool_calls_list_stemmed.json"
+BULK_WORKERS = int(os.environ.get("ES_BULK_WORKERS", "4"))
+KEEP_VERSIONS = int(os.environ.get("ES_KEEP_VERSIONS", "2"))
+WORD_QUERY_API_URL = os.environ.get("WORD_QUERY_API_URL", "http://localhost:8002")
 
-# JSONファイル名から動的にINDEX_NAMEを生成
-import os
+# JSONファイル名から動的にINDEX_ALIAS（読み取りエイリアス名）を生成
 def get_dynamic_index_name(data_file_path: str) -> str:
     """データファイルパスからインデックス名を動的生成"""
     # ファイル名のみ取得（パス除去）
@@ -28,7 +43,7 @@ def get_dynamic_index_name(data_file_path: str) -> str:
     index_name = os.path.splitext(filename)[0]
     return index_name
 
-INDEX_NAME = get_dynamic_index_name(DATA_FILE)
+INDEX_ALIAS = get_dynamic_index_name(DATA_FILE)
 
 def check_elasticsearch_connection():
     """Elasticsearchの接続確認"""
@@ -45,25 +60,9 @@ def check_elasticsearch_connection():
         print(f"❌ Elasticsearch接続失敗: {e}")
         return False
 
-def delete_existing_index():
-    """既存インデックスの削除"""
-    print(f"🗑️ 既存インデックス '{INDEX_NAME}' を削除中...")
-
-    try:
-        response = requests.delete(f"{ELASTICSEARCH_URL}/{INDEX_NAME}")
-        if response.status_code in [200, 404]:
-            print(f"✅ インデックス削除完了")
-            return True
-        else:
-            print(f"⚠️ インデックス削除警告: status {response.status_code}")
-            return True  # 404は正常（インデックスが存在しない）
-    except Exception as e:
-        print(f"❌ インデックス削除エラー: {e}")
-        return False
-
-def create_index_with_settings():
-    """新しい設定でインデックス作成"""
-    print(f"🏗️ 新しいインデックス '{INDEX_NAME}' を作成中...")
+def create_index_with_settings(manager):
+    """新しい設定でバージョン付きインデックスを作成（作成したインデックス名を返す）"""
+    print(f"🏗️ '{INDEX_ALIAS}' の新しいバージョンを作成中...")
 
     # 設定ファイル読み込み
     try:
@@ -71,151 +70,88 @@ def create_index_with_settings():
             settings = json.load(f)
     except Exception as e:
         print(f"❌ 設定ファイル読み込みエラー: {e}")
-        return False
+        return None
 
-    # インデックス作成
+    # インデックス作成（シャードの割り当てまで待機）
     try:
-        response = requests.put(
-            f"{ELASTICSEARCH_URL}/{INDEX_NAME}",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(settings),
-            timeout=120
-        )
-
-        if response.status_code == 200:
-            print(f"✅ インデックス作成完了")
-            return True
-        else:
-            print(f"❌ インデックス作成エラー: status {response.status_code}")
-            print(f"Response: {response.text}")
-            return False
+        index_name = manager.create_version(settings)
+        print(f"✅ インデックス作成完了: {index_name}")
+        return index_name
     except Exception as e:
         print(f"❌ インデックス作成失敗: {e}")
-        return False
+        return None
 
-def bulk_import_data():
-    """データの一括インポート"""
+def bulk_import_data(index_name):
+    """データの一括インポート（ファイルを1件ずつ読み込み、並列の _bulk で送信）。成功時は集計を返す"""
     import os
 
     # ファイルの存在確認とタイプ判定
     if not os.path.exists(DATA_FILE):
         print(f"❌ データファイルが見つかりません: {DATA_FILE}")
-        return False
+        return None
 
     file_type = "語幹化データ" if "stemmed" in DATA_FILE else "通常データ"
     print(f"📥 データインポート開始: {DATA_FILE}")
     print(f"📋 データタイプ: {file_type}")
 
-    # データファイル読み込み
+    # サンプルデータ確認（先頭の1件のみ読み込む）
     try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        print(f"📊 読み込みレコード数: {len(data)}")
-
-        # サンプルデータ確認
-        if len(data) > 0:
-            sample = data[0]
+        sample = next(iter_json_documents(DATA_FILE), None)
+        if sample is not None:
             has_stemmed_fields = 'stemmed_search_name' in sample and 'stemmed_description' in sample
             if has_stemmed_fields:
                 print(f"✅ 語幹化フィールド確認済み: stemmed_search_name, stemmed_description")
             else:
                 print(f"⚠️ 注意: 語幹化フィールドが見つかりません")
-
     except Exception as e:
         print(f"❌ データファイル読み込みエラー: {e}")
-        return False
+        return None
 
-    # バッチサイズ設定
-    batch_size = 100
-    total_batches = (len(data) + batch_size - 1) // batch_size
-
-    print(f"🔄 バッチ処理開始: {total_batches}バッチ（バッチサイズ: {batch_size}）")
-
-    success_count = 0
-    error_count = 0
-
-    for batch_idx in range(total_batches):
-        start_idx = batch_idx * batch_size
-        end_idx = min(start_idx + batch_size, len(data))
-        batch_data = data[start_idx:end_idx]
-
-        # Bulk APIフォーマット作成
-        bulk_body = []
-        for record in batch_data:
-            # インデックス操作
-            index_action = {
-                "index": {
-                    "_index": INDEX_NAME,
-                    "_id": record.get("id", "")
-                }
-            }
-            bulk_body.append(json.dumps(index_action))
-            bulk_body.append(json.dumps(record))
-
-        bulk_data = "\n".join(bulk_body) + "\n"
-
-        # Bulk API実行
-        try:
-            response = requests.post(
-                f"{ELASTICSEARCH_URL}/_bulk",
-                headers={"Content-Type": "application/x-ndjson"},
-                data=bulk_data,
-                timeout=600
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                batch_errors = [item for item in result.get("items", []) if "error" in item.get("index", {})]
-
-                if not batch_errors:
-                    success_count += len(batch_data)
-                    print(f"⚡ バッチ {batch_idx + 1}/{total_batches} 完了 ({len(batch_data)}件)")
-                else:
-                    error_count += len(batch_errors)
-                    success_count += len(batch_data) - len(batch_errors)
-                    print(f"⚠️ バッチ {batch_idx + 1}/{total_batches} 部分完了: {len(batch_errors)}件エラー")
-
-                    # エラーの詳細を表示（最初の5つまで）
-                    print("📋 エラー詳細:")
-                    for i, error_item in enumerate(batch_errors[:5]):
-                        error_detail = error_item.get("index", {}).get("error", {})
-                        error_type = error_detail.get("type", "unknown")
-                        error_reason = error_detail.get("reason", "unknown reason")
-                        print(f"   エラー {i+1}: {error_type} - {error_reason}")
-
-                    if len(batch_errors) > 5:
-                        print(f"   ... 他 {len(batch_errors) - 5} 件のエラー")
-            else:
-                error_count += len(batch_data)
-                print(f"❌ バッチ {batch_idx + 1}/{total_batches} 失敗: status {response.status_code}")
+    indexer = StreamingBulkIndexer(ELASTICSEARCH_URL, index_name, workers=BULK_WORKERS)
+    print(f"🔄 バルク処理開始: {BULK_WORKERS}並列（初期バッチ {indexer.sizer.batch_bytes >> 10} KiB、応答時間に応じて調整）")
 
-        except Exception as e:
-            error_count += len(batch_data)
-            print(f"❌ バッチ {batch_idx + 1}/{total_batches} 例外: {e}")
+    def progress(stats):
+        if stats.batches % 10 == 0:
+            print(f"⚡ {stats.batches}バッチ完了: {stats.indexed}件 ({stats.docs_per_second:.0f} docs/sec)")
+
+    try:
+        # ロード中は refresh を止めレプリカを0にする（終了後に元の設定へ戻して refresh）
+        with indexer.bulk_load_settings():
+            stats = indexer.index_documents(iter_json_documents(DATA_FILE), progress=progress)
+    except Exception as e:
+        print(f"❌ インポート例外: {e}")
+        return None
 
-        # 少し待機（Elasticsearchの負荷軽減）
-        time.sleep(0.1)
+    if stats.errors:
+        # エラーの詳細を表示（最初の5つまで）
+        print("📋 エラー詳細:")
+        for i, error in enumerate(stats.errors[:5]):
+            print(f"   エラー {i+1}: {error.get('type', 'unknown')} - {error.get('reason', 'unknown reason')}")
+        if stats.failed > 5:
+            print(f"   ... 他 {stats.failed - 5} 件のエラー")
 
     print(f"\n📊 インポート結果:")
-    print(f"   ✅ 成功: {success_count}件")
-    print(f"   ❌ エラー: {error_count}件")
-    print(f"   📈 総件数: {len(data)}件")
+    print(f"   ✅ 成功: {stats.indexed}件")
+    print(f"   ❌ エラー: {stats.failed}件")
+    print(f"   🔁 再送: {stats.retried}件")
+    print(f"   📈 総件数: {stats.indexed + stats.failed}件")
+    print(f"   🚀 スループット: {stats.docs_per_second:.0f} docs/sec ({stats.batches}バッチ、{stats.seconds:.1f}秒)")
 
-    return error_count == 0
+    return stats if stats.failed == 0 else None
 
-def verify_import():
-    """インポート結果の確認"""
+def verify_import(index_name):
+    """インポート結果の確認（サンプルレコードの表示）"""
     print(f"🔍 インポート結果確認中...")
 
     try:
         # ドキュメント数確認
-        response = requests.get(f"{ELASTICSEARCH_URL}/{INDEX_NAME}/_count")
+        response = requests.get(f"{ELASTICSEARCH_URL}/{index_name}/_count")
         if response.status_code == 200:
             count = response.json().get("count", 0)
             print(f"📊 インデックス内ドキュメント数: {count}")
 
         # サンプルデータ確認
-        response = requests.get(f"{ELASTICSEARCH_URL}/{INDEX_NAME}/_search?size=1")
+        response = requests.get(f"{ELASTICSEARCH_URL}/{index_name}/_search?size=1")
         if response.status_code == 200:
             result = response.json()
             hits = result.get("hits", {}).get("hits", [])
@@ -244,7 +180,7 @@ def main():
     print(f"🚀 Elasticsearch {index_type}インデックス更新開始")
     print(f"📄 対象ファイル: {DATA_FILE}")
     print(f"📋 データタイプ: {file_type}")
-    print(f"🏷️ インデックス名: {INDEX_NAME}")
+    print(f"🏷️ エイリアス: {INDEX_ALIAS}")
     print("=" * 70)
 
     # Step 1: 接続確認
@@ -252,61 +188,46 @@ def main():
         print("❌ 処理中止: Elasticsearch接続不可")
         return False
 
-    # Step 2: 既存インデックス削除
-    if not delete_existing_index():
-        print("❌ 処理中止: インデックス削除失敗")
-        return False
+    manager = VersionedIndexManager(ELASTICSEARCH_URL, INDEX_ALIAS, keep_versions=KEEP_VERSIONS)
+    print(f"📌 現在のバージョン: {manager.current_index() or ('(エイリアスなしの旧インデックス)' if manager.legacy_index_exists() else '(なし)')}")
 
-    # Step 3: 新しいインデックス作成
-    if not create_index_with_settings():
+    # Step 2: 新しいバージョンのインデックス作成（現行バージョンは検索に使われ続ける）
+    index_name = create_index_with_settings(manager)
+    if not index_name:
         print("❌ 処理中止: インデックス作成失敗")
         return False
 
-    # インデックス作成完了とシャード準備を待つ
-    print("⏳ インデックス作成完了とシャード準備待機中...")
-
-    # シャードが準備できるまで待機
-    max_wait_time = 60  # 最大60秒待機
-    wait_interval = 5   # 5秒間隔でチェック
-    waited_time = 0
-
-    while waited_time < max_wait_time:
-        try:
-            # インデックスの健康状態を確認
-            health_response = requests.get(f"{ELASTICSEARCH_URL}/_cluster/health/{INDEX_NAME}?wait_for_status=yellow&timeout=10s")
-            if health_response.status_code == 200:
-                health = health_response.json()
-                status = health.get('status', 'unknown')
-                print(f"📊 インデックス状態: {status}")
-
-                if status in ['yellow', 'green']:
-                    print("✅ シャード準備完了")
-                    break
-
-            print(f"⏳ シャード準備中... ({waited_time + wait_interval}/{max_wait_time}秒)")
-            time.sleep(wait_interval)
-            waited_time += wait_interval
-
-        except Exception as e:
-            print(f"⚠️ 健康状態チェックエラー: {e}")
-            time.sleep(wait_interval)
-            waited_time += wait_interval
-
-    if waited_time >= max_wait_time:
-        print("⚠️ 警告: シャード準備の確認がタイムアウトしました。インポートを続行します...")
-
-    # Step 4: データインポート
-    if not bulk_import_data():
-        print("❌ 処理中止: データインポート失敗")
+    # Step 3: データインポート
+    stats = bulk_import_data(index_name)
+    if stats is None:
+        print(f"❌ 処理中止: データインポート失敗（エイリアスは切り替えていません、{index_name} は残っています）")
         return False
 
-    # 少し待機（インデックス更新を待つ）
-    print("⏳ インデックス更新完了待機中...")
-    time.sleep(5)
-
-    # Step 5: 確認
-    if not verify_import():
-        print("⚠️ 警告: インポート確認で問題発生")
+    # Step 4: 検証
+    verify_import(index_name)
+    sample = next(iter_json_documents(DATA_FILE), {})
+    problems = manager.verify(index_name, expected_count=stats.indexed, sample_name=sample.get("original_name"))
+    if problems:
+        for problem in problems:
+            print(f"❌ 検証エラー: {problem}")
+        print(f"❌ 処理中止: 検証失敗（エイリアスは切り替えていません、{index_name} は残っています）")
+        return False
+    print("✅ 検証完了")
+
+    # Step 5: ウォームアップ（直近の検索クエリ、取得できなければ先頭のドキュメント名を再生）
+    queries = fetch_recent_queries(WORD_QUERY_API_URL)
+    if not queries:
+        queries = [{"q": document.get("original_name", ""), "search_context": "meal_analysis"}
+                   for document, _ in zip(iter_json_documents(DATA_FILE), range(200))]
+    warm_up = manager.warm_up(index_name, queries)
+    print(f"🔥 ウォームアップ完了: {warm_up['replayed']}クエリ（失敗 {warm_up['failed']}件、中央値 {warm_up['median_ms']:.0f}ms）")
+
+    # Step 6: エイリアスの切り替えと古いバージョンの削除
+    previous = manager.swap_alias(index_name)
+    print(f"🔀 エイリアス切り替え完了: '{INDEX_ALIAS}' → {index_name}（切り替え前: {previous or 'なし'}）")
+    deleted = manager.prune()
+    if deleted:
+        print(f"🗑️ 古いバージョンを削除: {', '.join(deleted)}")
 
     # 完了メッセージも動的に
     completion_type = "語幹化対応" if "stemmed" in DATA_FILE else "標準"
@@ -0,0 +1,27 @@
+"""
+文字起こし・NLU抽出結果のキャッシュ（SQLite永続化、サイズ上限付きLRU）
+"""
+
+from .store import SQLiteCache
+from .speech import (
+    NLU_CACHE,
+    TRANSCRIPT_CACHE,
+    cache_lookup,
+    cache_store,
+    get_speech_cache,
+    nlu_cache_key,
+    normalize_transcript,
+    transcript_cache_key
+)
+
+__all__ = [
+    "SQLiteCache",
+    "NLU_CACHE",
+    "TRANSCRIPT_CACHE",
+    "cache_lookup",
+    "cache_store",
+    "get_speech_cache",
+    "nlu_cache_key",
+    "normalize_transcript",
+    "transcript_cache_key"
+]
@@ -0,0 +1,147 @@
+"""
+音声分析のキャッシュ（文字起こし・NLU食品抽出）
+
+- 文字起こしキャッシュ: 音声データのハッシュ + バックエンド/モデル/言語 → 文字起こしテキスト
+  （再試行で同じ録音が再送された場合に音声認識を省略）
+- NLUキャッシュ: 正規化した文字起こし + モデル/プロンプトのハッシュ/temperature/seed → 抽出結果JSON
+  （"two eggs and toast" のようなよくある発話でLLM呼び出しを省略）
+
+参照結果は speech_cache_requests_total{cache,result} と speech_cache_hit_ratio{cache} として記録されます。
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import unicodedata
+from typing import Any, Dict, Optional
+
+from shared.cache.store import SQLiteCache
+from shared.config.settings import get_settings
+from shared.utils.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_CACHE = "transcript"
+NLU_CACHE = "nlu"
+
+_caches: Dict[str, SQLiteCache] = {}
+_metrics_registered = False
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def transcript_cache_key(audio_data: bytes, backend: str, model: Optional[str], language_code: str,
+                         temperature: Optional[float] = None, preprocessing: Optional[Dict[str, Any]] = None) -> str:
+    """
+    文字起こしキャッシュのキーを作成
+
+    Args:
+        audio_data: アップロードされた音声データ（正規化前）
+        backend: 音声認識バックエンド（"deepinfra_whisper" 等）
+        model: 音声認識モデル
+        language_code: 言語コード
+        temperature: 推論温度
+        preprocessing: 送信する音声を変える前処理の設定（正規化・分割の設定）
+    """
+    return _digest(hashlib.sha256(audio_data).hexdigest(), backend, model, language_code, temperature, preprocessing)
+
+
+def normalize_transcript(text: str) -> str:
+    """大文字小文字・全角半角・句読点・空白の違いを無視するための正規化"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def nlu_cache_key(text: str, model_id: Optional[str], system_prompt: str,
+                  temperature: Optional[float], seed: Optional[int]) -> str:
+    """NLUキャッシュのキーを作成（プロンプトはハッシュで区別し、変更時は自動的に別キーになる）"""
+    prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+    return _digest(normalize_transcript(text), model_id, prompt_hash, temperature, seed)
+
+
+def get_speech_cache(name: str) -> Optional[SQLiteCache]:
+    """
+    文字起こし（TRANSCRIPT_CACHE）またはNLU（NLU_CACHE）のキャッシュを取得
+
+    Returns:
+        SQLiteCache、キャッシュが無効な場合はNone
+    """
+    settings = get_settings()
+    if not settings.SPEECH_CACHE_ENABLED:
+        return None
+    if name not in _caches:
+        max_entries = settings.TRANSCRIPT_CACHE_MAX_ENTRIES if name == TRANSCRIPT_CACHE else settings.NLU_CACHE_MAX_ENTRIES
+        _caches[name] = SQLiteCache(
+            name,
+            db_path=settings.SPEECH_CACHE_DB_PATH,
+            max_entries=max_entries,
+            ttl_seconds=settings.SPEECH_CACHE_TTL_SECONDS
+        )
+        _register_cache_metrics()
+    return _caches[name]
+
+
+async def cache_lookup(name: str, key: str) -> Optional[Any]:
+    """
+    キャッシュを参照し、結果をメトリクスに記録する（SQLiteの操作はワーカースレッドで実行）
+
+    Returns:
+        キャッシュされた値、キャッシュが無効・ミス・参照（データベースを開くことを含む）に失敗した場合はNone
+    """
+    try:
+        cache = get_speech_cache(name)
+        if cache is None:
+            return None
+        value = await asyncio.to_thread(cache.get, key)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"{name} cache lookup failed, continuing without cache: {e}")
+        return None
+    record_cache_lookup(name, value is not None)
+    return value
+
+
+async def cache_store(name: str, key: str, value: Any) -> None:
+    """キャッシュに保存する（データベースを開けない場合を含め、失敗しても処理は継続する）"""
+    try:
+        cache = get_speech_cache(name)
+        if cache is None:
+            return
+        await asyncio.to_thread(cache.set, key, value)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"{name} cache store failed: {e}")
+
+
+def record_cache_lookup(name: str, hit: bool) -> None:
+    """キャッシュ参照の結果をメトリクスに記録"""
+    get_metrics_registry().counter(
+        "speech_cache_requests_total", "Transcript/NLU cache lookups by result"
+    ).inc(labels={"cache": name, "result": "hit" if hit else "miss"})
+
+
+def _register_cache_metrics() -> None:
+    """ヒット率・エントリ数のゲージを登録する（コールバックは現在のキャッシュを参照する）"""
+    global _metrics_registered
+    if _metrics_registered:
+        return
+    _metrics_registered = True
+
+    metrics = get_metrics_registry()
+    requests = metrics.counter("speech_cache_requests_total", "Transcript/NLU cache lookups by result")
+
+    def hit_ratios():
+        samples = []
+        for name in list(_caches):
+            hits = requests.get({"cache": name, "result": "hit"})
+            total = hits + requests.get({"cache": name, "result": "miss"})
+            samples.append(({"cache": name}, hits / total if total else 0.0))
+        return samples
+
+    metrics.gauge("speech_cache_hit_ratio", "Transcript/NLU cache hit ratio since process start").set_callback(hit_ratios)
+    metrics.gauge("speech_cache_entries", "Entries stored in the transcript/NLU caches").set_callback(
+        lambda: [({"cache": name}, len(cache)) for name, cache in list(_caches.items())]
+    )
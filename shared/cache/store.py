@@ -0,0 +1,157 @@
+"""
+SQLite永続キャッシュ
+
+キー（ハッシュ文字列）→ JSON値 を保存し、エントリ数の上限を超えると最後に参照された時刻が
+古いものから削除します（LRU）。プロセス再起動後もキャッシュ内容を保持します。
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries (namespace, accessed_at);
+"""
+
+
+class SQLiteCache:
+    """
+    SQLiteベースのサイズ上限付き永続キャッシュ
+
+    1つのデータベースファイルを複数のキャッシュ（namespace）で共有できます。
+    同期APIのため、asyncioコードからは asyncio.to_thread 経由で呼び出してください。
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        db_path: str = "speech_cache.sqlite3",
+        max_entries: int = 10000,
+        ttl_seconds: Optional[float] = None
+    ):
+        """
+        Args:
+            namespace: キャッシュ名（同じファイル内でエントリを区別する）
+            db_path: SQLiteデータベースファイルパス（":memory:" はプロセス内のみ）
+            max_entries: 保持する最大エントリ数（超過分はLRUで削除）
+            ttl_seconds: エントリの有効期間（None: 無期限）
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.namespace = namespace
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._shared_connection = None
+        self._lock = threading.Lock()
+
+        parent = Path(db_path).parent
+        if db_path != ":memory:" and str(parent) not in ("", "."):
+            parent.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            self._connection().executescript(_SCHEMA)
+
+        logger.info(f"SQLiteCache '{namespace}' initialized: {db_path} (max_entries={max_entries}, ttl={ttl_seconds}s)")
+
+    @property
+    def hit_ratio(self) -> float:
+        """このプロセスでの参照のヒット率（参照がなければ0）"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        """スレッドごとのコネクションを取得（":memory:" は全スレッドで1つを共有）"""
+        if self.db_path == ":memory:":
+            if self._shared_connection is None:
+                self._shared_connection = sqlite3.connect(":memory:", isolation_level=None, check_same_thread=False)
+            return self._shared_connection
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        キャッシュを参照する（ヒット時は参照時刻を更新）
+
+        Returns:
+            保存された値、なければ（または期限切れなら）None
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            conn.execute(
+                "UPDATE cache_entries SET accessed_at = ?, hits = hits + 1 WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """値を保存し、上限を超えたエントリを古い参照順に削除する"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(value, ensure_ascii=False), now, now)
+                )
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                    "SELECT key FROM cache_entries WHERE namespace = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.namespace, self.namespace, self.max_entries)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+
+    def clear(self) -> None:
+        """このキャッシュのエントリをすべて削除する"""
+        with self._lock:
+            self._connection().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
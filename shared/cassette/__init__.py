@@ -0,0 +1,30 @@
+"""
+上流呼び出しの記録・再生（CASSETTE_MODE=record | replay、オフラインでの性能問題の再現用）
+"""
+
+from .store import (
+    Cassette,
+    CassetteInUseError,
+    CassetteMissError,
+    Interaction,
+    close_cassettes,
+    get_cassette,
+    recorded_call,
+    recorded_stream
+)
+from .http import CassetteAsyncTransport, CassetteHTTPAdapter, cassette_session, cassette_transport
+
+__all__ = [
+    "Cassette",
+    "CassetteInUseError",
+    "CassetteMissError",
+    "Interaction",
+    "close_cassettes",
+    "get_cassette",
+    "recorded_call",
+    "recorded_stream",
+    "CassetteAsyncTransport",
+    "CassetteHTTPAdapter",
+    "cassette_session",
+    "cassette_transport"
+]
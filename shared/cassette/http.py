@@ -0,0 +1,174 @@
+"""
+HTTP呼び出しの記録・再生
+
+- httpx: Word Query API（AdvancedNutritionSearchComponent）向けのトランスポート
+- requests: Elasticsearch（Word Query API）向けのアダプター
+
+リクエストはメソッド・パス・クエリ・ボディで照合し、ホストは照合に含めません
+（本番環境で記録したカセットをローカルのURLに対して再生できます）。
+"""
+import asyncio
+import base64
+import time
+import weakref
+from http.client import responses as http_reasons
+from typing import Any, Dict, Optional, Union
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .store import Cassette, Interaction, compact, error_dict, get_cassette, request_key
+
+HTTP_KIND = "http"
+
+_sessions: "weakref.WeakKeyDictionary[Cassette, requests.Session]" = weakref.WeakKeyDictionary()
+
+
+def http_request_summary(method: str, url: Union[str, httpx.URL], body: Optional[Union[bytes, str]]) -> Dict[str, Any]:
+    """照合・記録用のリクエスト（ホストを除いたパス・クエリ、ボディ）"""
+    parts = urlsplit(str(url))
+    if isinstance(body, bytes):
+        try:
+            body = body.decode("utf-8")
+        except UnicodeDecodeError:
+            pass
+    return compact({
+        "method": method.upper(),
+        "path": parts.path,
+        "query": sorted(parse_qsl(parts.query, keep_blank_values=True)),
+        "body": body or None
+    })
+
+
+def _encode_body(status: int, content_type: Optional[str], content: bytes) -> Dict[str, Any]:
+    data: Dict[str, Any] = {"status": status, "content_type": content_type}
+    try:
+        data["body"] = content.decode("utf-8")
+    except UnicodeDecodeError:
+        data["body_base64"] = base64.b64encode(content).decode("ascii")
+    return data
+
+
+def _decode_body(data: Dict[str, Any]) -> bytes:
+    if "body_base64" in data:
+        return base64.b64decode(data["body_base64"])
+    return (data.get("body") or "").encode("utf-8")
+
+
+class CassetteAsyncTransport(httpx.AsyncBaseTransport):
+    """httpx.AsyncClient のトランスポート（記録時は実際のトランスポートに委譲）"""
+
+    def __init__(self, cassette: Cassette, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.cassette = cassette
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        summary = http_request_summary(request.method, request.url, await request.aread())
+        key = request_key(HTTP_KIND, summary)
+
+        if self.cassette.replaying:
+            interaction = self.cassette.next_interaction(HTTP_KIND, key, summary)
+            delay = self.cassette.replay_delay(interaction)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            interaction.raise_error()
+            data = interaction.response
+            headers = {"content-type": data["content_type"]} if data.get("content_type") else {}
+            return httpx.Response(data["status"], headers=headers, content=_decode_body(data), request=request)
+
+        started = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+            content = await response.aread()  # Content-Encodingは展開済み
+        except Exception as e:
+            self.cassette.record(Interaction(HTTP_KIND, key, summary, error=error_dict(e),
+                                             latency_ms=(time.perf_counter() - started) * 1000))
+            raise
+        content_type = response.headers.get("content-type")
+        self.cassette.record(Interaction(HTTP_KIND, key, summary,
+                                         response=_encode_body(response.status_code, content_type, content),
+                                         latency_ms=(time.perf_counter() - started) * 1000))
+        headers = {"content-type": content_type} if content_type else {}
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class CassetteHTTPAdapter(HTTPAdapter):
+    """requests.Session のアダプター（記録時は通常のHTTPAdapterとして送信）"""
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        summary = http_request_summary(request.method, request.url, request.body)
+        key = request_key(HTTP_KIND, summary)
+
+        if self.cassette.replaying:
+            interaction = self.cassette.next_interaction(HTTP_KIND, key, summary)
+            delay = self.cassette.replay_delay(interaction)
+            if delay > 0:
+                time.sleep(delay)
+            interaction.raise_error()
+            return self._replayed_response(request, interaction.response)
+
+        started = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+            content = response.content
+        except Exception as e:
+            self.cassette.record(Interaction(HTTP_KIND, key, summary, error=error_dict(e),
+                                             latency_ms=(time.perf_counter() - started) * 1000))
+            raise
+        self.cassette.record(Interaction(HTTP_KIND, key, summary,
+                                         response=_encode_body(response.status_code,
+                                                               response.headers.get("Content-Type"), content),
+                                         latency_ms=(time.perf_counter() - started) * 1000))
+        return response
+
+    def _replayed_response(self, request: requests.PreparedRequest, data: Dict[str, Any]) -> requests.Response:
+        response = requests.Response()
+        response.status_code = data["status"]
+        response.reason = http_reasons.get(data["status"], "")
+        response.headers = CaseInsensitiveDict({"Content-Type": data["content_type"]} if data.get("content_type") else {})
+        response._content = _decode_body(data)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+
+def cassette_transport() -> Optional[CassetteAsyncTransport]:
+    """
+    httpx.AsyncClient(transport=...) に渡すトランスポート
+
+    Returns:
+        CassetteAsyncTransport、CASSETTE_MODE=off の場合はNone（httpxの既定のトランスポート）
+    """
+    cassette = get_cassette()
+    return CassetteAsyncTransport(cassette) if cassette is not None else None
+
+
+def cassette_session() -> Optional[requests.Session]:
+    """
+    カセットを経由する requests.Session（カセットごとに1つ）
+
+    Returns:
+        requests.Session、CASSETTE_MODE=off の場合はNone
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return None
+    session = _sessions.get(cassette)
+    if session is None:
+        session = requests.Session()
+        adapter = CassetteHTTPAdapter(cassette)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _sessions[cassette] = session
+    return session
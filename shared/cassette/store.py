@@ -0,0 +1,358 @@
+"""
+上流呼び出しの記録・再生（カセット）
+
+CASSETTE_MODE=record では上流（Deep Infra画像分析・NLU・Whisper・Word Query API・Elasticsearch）への
+リクエスト・レスポンス・所要時間をカセットファイル（gzip圧縮したJSON Lines、1行1呼び出し）に記録し、
+CASSETTE_MODE=replay ではネットワークに接続せずに記録した応答を返します。
+
+- リクエストはキー（種類 + 引数の正規化JSONのハッシュ）で照合します。画像・音声などのバイト列と長い文字列は
+  SHA-256に置き換えて記録するため、カセットには入力データそのものは含まれません。
+- 同じキーの呼び出しは記録した順に返し、使い切ったら先頭から繰り返します（同時実行でも結果は決定的）。
+- CASSETTE_REPLAY_LATENCY_SCALE を指定すると記録時の所要時間（×倍率）だけ待ってから応答します。
+- 記録時に発生したエラーは同じ型（組み込み例外以外はRuntimeError）とメッセージで再現します。
+- 記録中はカセットファイルを排他ロックします（食事分析APIとWord Query APIを同じ CASSETTE_DIR で記録する場合は
+  アプリごとに CASSETTE_NAME を変えてください、同じカセットへの記録は CassetteInUseError になります）。
+"""
+import asyncio
+import atexit
+import builtins
+import copy
+import functools
+import gzip
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from shared.config.settings import get_settings
+
+try:
+    import fcntl
+except ImportError:  # Windows（ロックなしで記録する）
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+INLINE_STRING_LIMIT = 200  # これより長い文字列はハッシュに置き換える
+
+_cassettes: Dict[Tuple[str, str], "Cassette"] = {}
+_cassettes_lock = threading.Lock()
+_atexit_registered = False
+
+
+class CassetteMissError(RuntimeError):
+    """再生モードでカセットに記録されていない呼び出しが行われた"""
+
+
+class CassetteInUseError(RuntimeError):
+    """別のプロセス（またはCassette）が同じカセットに記録中"""
+
+
+def _digest(data: bytes) -> str:
+    return f"sha256:{hashlib.sha256(data).hexdigest()}:{len(data)}"
+
+
+def compact(value: Any) -> Any:
+    """リクエストを記録用に正規化（バイト列・長い文字列はハッシュ、Enumは値）"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return _digest(bytes(value))
+    if isinstance(value, Enum):
+        return compact(value.value)
+    if isinstance(value, str):
+        return value if len(value) <= INLINE_STRING_LIMIT else _digest(value.encode("utf-8"))
+    if isinstance(value, dict):
+        return {str(key): compact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [compact(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return compact(str(value))
+
+
+def request_key(kind: str, request: Dict[str, Any]) -> str:
+    """呼び出しの照合キー（request は compact() 済み）"""
+    canonical = json.dumps([kind, request], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class Interaction:
+    """記録された1回の呼び出し"""
+    kind: str
+    key: str
+    request: Dict[str, Any]
+    response: Any = None
+    error: Optional[Dict[str, str]] = None
+    latency_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"kind": self.kind, "key": self.key, "request": self.request, "latency_ms": round(self.latency_ms, 2)}
+        if self.response is not None:
+            data["response"] = self.response
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+    def raise_error(self) -> None:
+        """記録されたエラーを再現する"""
+        if self.error is None:
+            return
+        error_type = getattr(builtins, self.error.get("type", ""), None)
+        if not (isinstance(error_type, type) and issubclass(error_type, Exception)):
+            error_type = RuntimeError
+        raise error_type(self.error.get("message", ""))
+
+
+class Cassette:
+    """カセットファイル1つ分の記録・再生"""
+
+    def __init__(self, path: str, mode: str, latency_scale: float = 0.0):
+        """
+        Args:
+            path: カセットファイルのパス（.gz で終わる場合はgzip圧縮）
+            mode: "record"（記録、既存のファイルは上書き）または "replay"（再生）
+            latency_scale: 再生時に記録した所要時間に掛ける倍率（0: 待たずに応答）
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unsupported cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._file = None
+        self._lock_file = None
+        self.recorded = 0
+        self._interactions: Dict[Tuple[str, str], List[Interaction]] = defaultdict(list)
+        self._cursors: Dict[Tuple[str, str], int] = defaultdict(int)
+        if mode == "replay":
+            self._load()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _open(self, mode: str):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode + "t", encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Cassette not found: {self.path}")
+        count = 0
+        with self._open("r") as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        interaction = Interaction(**json.loads(line))
+                        self._interactions[(interaction.kind, interaction.key)].append(interaction)
+                        count += 1
+            except EOFError:
+                # 記録中のプロセスが終了処理をせずに終了した場合（最後にflushした行までは読める）
+                logger.warning(f"Cassette {self.path} was not closed cleanly; loaded {count} interactions")
+        logger.info(f"Loaded {count} interactions from cassette {self.path}")
+
+    def record(self, interaction: Interaction) -> None:
+        """呼び出しを1行追記する（行ごとにflushするため、途中で終了しても記録済みの行は再生できる）"""
+        line = json.dumps(interaction.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._acquire_file_lock()
+                self._file = self._open("w")
+            self._file.write(line)
+            self._file.flush()
+            self.recorded += 1
+
+    def _acquire_file_lock(self) -> None:
+        """既存のカセットを上書きする前に <path>.lock を排他ロックする（別のプロセスが記録中ならエラー）"""
+        if fcntl is None:
+            return
+        lock_file = open(self.path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise CassetteInUseError(
+                f"Cassette {self.path} is being recorded by another process; "
+                "set a different CASSETTE_NAME (or CASSETTE_DIR) for each app"
+            )
+        self._lock_file = lock_file
+
+    def next_interaction(self, kind: str, key: str, request: Dict[str, Any]) -> Interaction:
+        """同じキーの記録を記録順に返す（使い切ったら先頭から繰り返す）"""
+        recorded = self._interactions.get((kind, key))
+        if not recorded:
+            raise CassetteMissError(f"No recorded {kind} call in {self.path} for request {request}")
+        with self._lock:
+            index = self._cursors[(kind, key)]
+            self._cursors[(kind, key)] = index + 1
+        return recorded[index % len(recorded)]
+
+    def replay_delay(self, interaction: Interaction) -> float:
+        """再生時に待つ秒数"""
+        return interaction.latency_ms * self.latency_scale / 1000
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._lock_file is not None:
+                self._lock_file.close()  # ロックも解放される
+                self._lock_file = None
+
+
+def cassette_path(settings=None) -> str:
+    """設定（CASSETTE_DIR・CASSETTE_NAME）からカセットファイルのパスを作成"""
+    settings = settings or get_settings()
+    name = settings.CASSETTE_NAME
+    if not name.endswith((".jsonl", ".jsonl.gz")):
+        name = f"{name}.jsonl.gz"
+    return os.path.join(settings.CASSETTE_DIR, name)
+
+
+def get_cassette() -> Optional[Cassette]:
+    """
+    設定（CASSETTE_MODE）に応じたカセットを取得
+
+    Returns:
+        Cassette、CASSETTE_MODE=off の場合はNone
+    """
+    settings = get_settings()
+    mode = settings.CASSETTE_MODE
+    if mode == "off":
+        return None
+    if mode not in MODES:
+        raise ValueError(f"CASSETTE_MODE must be one of {MODES}, got {mode!r}")
+    global _atexit_registered
+    path = cassette_path(settings)
+    with _cassettes_lock:
+        cassette = _cassettes.get((path, mode))
+        if cassette is None:
+            if not _atexit_registered:
+                atexit.register(close_cassettes)
+                _atexit_registered = True
+            cassette = _cassettes[(path, mode)] = Cassette(path, mode)
+            logger.info(f"Cassette {mode} mode: {path}")
+    cassette.latency_scale = settings.CASSETTE_REPLAY_LATENCY_SCALE
+    return cassette
+
+
+def close_cassettes() -> None:
+    """記録中のカセットを閉じる（gzipの終端を書き込む、プロセス終了時にも自動で呼ばれる）"""
+    with _cassettes_lock:
+        for cassette in _cassettes.values():
+            cassette.close()
+        _cassettes.clear()
+
+
+def error_dict(error: BaseException) -> Dict[str, str]:
+    return {"type": type(error).__name__, "message": str(error)}
+
+
+def _bind_request(signature: inspect.Signature, context: Optional[Callable[[Any], Dict[str, Any]]],
+                  args: tuple, kwargs: dict) -> Dict[str, Any]:
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    instance = arguments.pop("self", None)
+    if context is not None:
+        arguments.update(context(instance))
+    return compact(arguments)
+
+
+def recorded_call(kind: str, context: Optional[Callable[[Any], Dict[str, Any]]] = None):
+    """
+    非同期メソッドの呼び出しを記録・再生するデコレーター（戻り値はJSONに変換できる値）
+
+    Args:
+        kind: 呼び出しの種類（例: "deepinfra.analyze_image"）
+        context: インスタンスから照合キーに含める値（モデルID等）を返す関数
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cassette = get_cassette()
+            if cassette is None:
+                return await func(*args, **kwargs)
+
+            request = _bind_request(signature, context, args, kwargs)
+            key = request_key(kind, request)
+            if cassette.replaying:
+                interaction = cassette.next_interaction(kind, key, request)
+                delay = cassette.replay_delay(interaction)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                interaction.raise_error()
+                return copy.deepcopy(interaction.response)
+
+            started = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                cassette.record(Interaction(kind, key, request, error=error_dict(e),
+                                            latency_ms=(time.perf_counter() - started) * 1000))
+                raise
+            cassette.record(Interaction(kind, key, request, response=result,
+                                        latency_ms=(time.perf_counter() - started) * 1000))
+            return result
+        return wrapper
+    return decorator
+
+
+def recorded_stream(kind: str, context: Optional[Callable[[Any], Dict[str, Any]]] = None):
+    """
+    非同期ジェネレーター（ストリーミング応答）を記録・再生するデコレーター
+
+    各断片を開始からの経過時間（ミリ秒）とともに記録し、再生時は断片ごとの間隔（×倍率）を再現します。
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> AsyncIterator[Any]:
+            cassette = get_cassette()
+            if cassette is None:
+                async for item in func(*args, **kwargs):
+                    yield item
+                return
+
+            request = _bind_request(signature, context, args, kwargs)
+            key = request_key(kind, request)
+            if cassette.replaying:
+                interaction = cassette.next_interaction(kind, key, request)
+                elapsed_ms = 0.0
+                for offset_ms, item in interaction.response or []:
+                    delay = (offset_ms - elapsed_ms) * cassette.latency_scale / 1000
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    elapsed_ms = offset_ms
+                    yield item
+                interaction.raise_error()
+                return
+
+            started = time.perf_counter()
+            chunks = []
+            try:
+                async for item in func(*args, **kwargs):
+                    chunks.append([round((time.perf_counter() - started) * 1000, 2), item])
+                    yield item
+            except Exception as e:
+                cassette.record(Interaction(kind, key, request, response=chunks, error=error_dict(e),
+                                            latency_ms=(time.perf_counter() - started) * 1000))
+                raise
+            cassette.record(Interaction(kind, key, request, response=chunks,
+                                        latency_ms=(time.perf_counter() - started) * 1000))
+        return wrapper
+    return decorator
@@ -7,11 +7,14 @@ with 20+ word queries. Includes detailed debug logging for each phase.
 
 import asyncio
 import httpx
+import inspect
 import json
 import time
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Union
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Union
 
+from shared.cassette import cassette_transport
 from shared.components.base import BaseComponent
 from shared.models.nutrition_search_models import NutritionQueryInput, NutritionQueryOutput, NutritionMatch
 from shared.config.settings import get_settings
@@ -85,10 +88,31 @@ class AdvancedNutritionSearchComponent(BaseComponent[NutritionQueryInput, Nutrit
 
         return results
 
+    @asynccontextmanager
+    async def search_session(self) -> AsyncIterator["NutritionSearchSession"]:
+        """
+        食材ごとに検索を先行投入できるセッションを開く
+
+        Phase1のストリーミング中に確定した食材から順に submit() し、
+        Phase1完了後に finish() で process() と同じ形式の結果を得ます。
+
+        使用例:
+            async with component.search_session() as session:
+                session.submit("rice white cooked")
+                result = await session.finish(nutrition_query_input)
+        """
+        await self._validate_word_query_api_connection()
+        client = httpx.AsyncClient(timeout=30.0, transport=cassette_transport())
+        session = NutritionSearchSession(self, client)
+        try:
+            yield session
+        finally:
+            await session.close()
+
     async def _validate_word_query_api_connection(self):
         """Word Query API接続確認 - 失敗時は即エラー"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with httpx.AsyncClient(timeout=10.0, transport=cassette_transport()) as client:
                 response = await client.get(f"{self.api_base_url}/health")
                 if response.status_code != 200:
                     raise ConnectionError(f"Word Query API health check failed: {response.status_code}")
@@ -107,17 +131,10 @@ class AdvancedNutritionSearchComponent(BaseComponent[NutritionQueryInput, Nutrit
         self.log_processing_detail("search_method", "word_query_api_only")
 
         start_time = time.time()
-        matches = {}
-        successful_matches = 0
-        exact_matches = 0
-        tier_1_exact_matches = 0
-        
-        # 食材名のみでexact match rateを計算（料理名は除外）
-        ingredient_count = len(input_data.ingredient_names)
 
         # Create parallel API requests
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with httpx.AsyncClient(timeout=30.0, transport=cassette_transport()) as client:
                 tasks = []
                 for term in search_terms:
                     task = self._single_api_request_strict(client, term)
@@ -131,6 +148,19 @@ class AdvancedNutritionSearchComponent(BaseComponent[NutritionQueryInput, Nutrit
             self.logger.error(error_msg)
             raise RuntimeError(error_msg) from e
 
+        return self._build_search_output(search_terms, api_responses, input_data, start_time)
+
+    def _build_search_output(self, search_terms: List[str], api_responses: List[Dict[str, Any]],
+                             input_data: NutritionQueryInput, start_time: float) -> NutritionQueryOutput:
+        """APIレスポンス一覧をNutritionQueryOutputに変換（一括検索・セッション検索共通）"""
+        matches = {}
+        successful_matches = 0
+        exact_matches = 0
+        tier_1_exact_matches = 0
+
+        # 食材名のみでexact match rateを計算（料理名は除外）
+        ingredient_count = len(input_data.ingredient_names)
+
         # Process results - すべて成功している前提
         for i, (term, response) in enumerate(zip(search_terms, api_responses)):
             if not response or not response.get("suggestions"):
@@ -302,4 +332,108 @@ class AdvancedNutritionSearchComponent(BaseComponent[NutritionQueryInput, Nutrit
             matches=matches,
             search_summary=search_summary,
             errors=errors if errors else None
-        )
\ No newline at end of file
+        )
+
+
+class NutritionSearchSession:
+    """
+    先行投入型の食材検索セッション（AdvancedNutritionSearchComponent.search_session() で生成）
+
+    submit() された食材はすぐにWord Query APIへのリクエストを開始し、
+    finish() で最終的な食材リストに対する結果をまとめます。
+    """
+
+    def __init__(self, component: AdvancedNutritionSearchComponent, client: httpx.AsyncClient):
+        self._component = component
+        self._client = client
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._start_time = time.time()
+        self._submit_times_ms: Dict[str, int] = {}
+
+    @property
+    def submitted_terms(self) -> List[str]:
+        return list(self._tasks.keys())
+
+    def submit(self, term: Optional[str]) -> None:
+        """食材名の検索を開始（同じ食材は1回だけ検索）"""
+        if not term or term in self._tasks:
+            return
+        self._tasks[term] = asyncio.create_task(self._component._single_api_request_strict(self._client, term))
+        self._submit_times_ms[term] = int((time.time() - self._start_time) * 1000)
+        self._component.logger.info(f"🔎 Prefetching nutrition search for '{term}'")
+
+    async def finish(self, input_data: NutritionQueryInput,
+                     on_match: Optional[Callable[[str, Dict[str, Any]], Any]] = None) -> NutritionQueryOutput:
+        """
+        最終的な食材リストの検索結果を取得
+
+        先行投入済みの食材はその結果を再利用し、未投入の食材はここで検索します。
+
+        Args:
+            input_data: 最終的な検索入力
+            on_match: 指定時は各食材の検索が完了した順に (食材名, APIレスポンス) で呼び出す
+                      （同期・非同期どちらも可。失敗した検索では呼ばれない）
+
+        Raises:
+            ValueError: 食材名が空の場合
+            RuntimeError: Word Query APIの検索が失敗した場合
+        """
+        search_terms = input_data.ingredient_names
+        if not search_terms:
+            raise ValueError("No ingredient names provided. ingredient_names is empty.")
+
+        prefetched_terms = [term for term in dict.fromkeys(search_terms) if term in self._tasks]
+        for term in search_terms:
+            self.submit(term)
+
+        if on_match is not None:
+            await self._notify_in_completion_order(list(dict.fromkeys(search_terms)), on_match)
+
+        try:
+            api_responses = await asyncio.gather(*(self._tasks[term] for term in search_terms))
+        except Exception as e:
+            error_msg = f"Word Query API batch request failed: {str(e)}"
+            self._component.logger.error(error_msg)
+            raise RuntimeError(error_msg) from e
+
+        results = self._component._build_search_output(search_terms, api_responses, input_data, self._start_time)
+
+        processing_time = int((time.time() - self._start_time) * 1000)
+        if results.search_summary:
+            results.search_summary["total_processing_time_ms"] = processing_time
+            results.search_summary["api_url_used"] = self._component.api_base_url
+            results.search_summary["prefetched_terms"] = len(prefetched_terms)
+            results.search_summary["prefetch_submit_times_ms"] = {
+                term: self._submit_times_ms[term] for term in prefetched_terms
+            }
+
+        self._component.logger.info(
+            f"🚀 Word Query API session search completed: {len(search_terms)} ingredient queries "
+            f"({len(prefetched_terms)} prefetched during Phase1) in {processing_time}ms"
+        )
+        return results
+
+    async def _notify_in_completion_order(self, terms: List[str],
+                                          on_match: Callable[[str, Dict[str, Any]], Any]) -> None:
+        """検索タスクの完了順にコールバックを呼ぶ（失敗したタスクは finish() の gather で例外になる）"""
+        pending = {self._tasks[term]: term for term in terms}
+        while pending:
+            done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for term in [term for task, term in pending.items() if task in done]:
+                task = self._tasks[term]
+                del pending[task]
+                if task.cancelled() or task.exception() is not None:
+                    return
+                callback_result = on_match(term, task.result())
+                if inspect.isawaitable(callback_result):
+                    await callback_result
+
+    async def close(self) -> None:
+        """未使用のリクエストを打ち切り、HTTPクライアントを閉じる"""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # 未使用タスクの例外を回収（警告抑止）
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        await self._client.aclose()
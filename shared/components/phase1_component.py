@@ -1,5 +1,7 @@
+import inspect
 import json
-from typing import Optional
+import time
+from typing import Any, Callable, Optional
 from datetime import datetime
 
 from .base import BaseComponent, ComponentError
@@ -11,6 +13,10 @@ from ..services.deepinfra_service import DeepInfraService
 from ..config import get_settings
 from ..config.prompts import Phase1Prompts
 from ..utils.json_parser import parse_json_from_string
+from ..utils.streaming_json import IncrementalIngredientParser, StreamedIngredient
+
+# ストリーミング中に確定した食材を受け取るコールバック（同期・非同期どちらも可）
+IngredientCallback = Callable[[StreamedIngredient], Any]
 
 
 class Phase1Component(BaseComponent[Phase1Input, Phase1Output]):
@@ -35,7 +41,8 @@ class Phase1Component(BaseComponent[Phase1Input, Phase1Output]):
         else:
             self.vision_service = vision_service
     
-    async def execute(self, input_data: Phase1Input, execution_log: Optional = None, temperature: Optional[float] = 0.0, seed: Optional[int] = 123456):
+    async def execute(self, input_data: Phase1Input, execution_log: Optional = None, temperature: Optional[float] = 0.0, seed: Optional[int] = 123456,
+                      on_ingredient: Optional[IngredientCallback] = None):
         """
         Phase1専用のexecuteメソッド（temperatureとseedパラメータ対応）
 
@@ -44,6 +51,7 @@ class Phase1Component(BaseComponent[Phase1Input, Phase1Output]):
             execution_log: 詳細実行ログ（オプション）
             temperature: AI推論のランダム性制御 (0.0-1.0, デフォルト: 0.0)
             seed: 再現性のためのシード値 (デフォルト: 123456)
+            on_ingredient: 指定時はストリーミングで分析し、食材が確定するたびに呼び出す（オプション）
 
         Returns:
             Phase1Output: 構造化された分析結果
@@ -61,7 +69,7 @@ class Phase1Component(BaseComponent[Phase1Input, Phase1Output]):
 
         try:
             start_time = datetime.now()
-            result = await self.process(input_data, temperature=temperature, seed=seed)
+            result = await self.process(input_data, temperature=temperature, seed=seed, on_ingredient=on_ingredient)
             end_time = datetime.now()
 
             processing_time = (end_time - start_time).total_seconds()
@@ -86,7 +94,8 @@ class Phase1Component(BaseComponent[Phase1Input, Phase1Output]):
         finally:
             self.current_execution_log = None
 
-    async def process(self, input_data: Phase1Input, temperature: Optional[float] = 0.0, seed: Optional[int] = 123456) -> Phase1Output:
+    async def process(self, input_data: Phase1Input, temperature: Optional[float] = 0.0, seed: Optional[int] = 123456,
+                      on_ingredient: Optional[IngredientCallback] = None) -> Phase1Output:
         """
         Phase1の主処理: 構造化画像分析（栄養データベース検索特化）
 
@@ -94,6 +103,8 @@ class Phase1Component(BaseComponent[Phase1Input, Phase1Output]):
             input_data: Phase1Input (image_bytes, image_mime_type, optional_text)
             temperature: AI推論のランダム性制御 (0.0-1.0, デフォルト: 0.0 - 決定的)
             seed: 再現性のためのシード値 (デフォルト: 123456)
+            on_ingredient: 指定時はストリーミングで分析し、食材が確定するたびに呼び出す
+                           （Vision Serviceがストリーミング非対応の場合は通常呼び出し）
 
         Returns:
             Phase1Output: 構造化された分析結果（信頼度スコア、属性、ブランド情報等を含む）
@@ -119,13 +130,16 @@ class Phase1Component(BaseComponent[Phase1Input, Phase1Output]):
             self.log_processing_detail("vision_api_call_start", "Calling Vision API for structured image analysis")
             
             prompt = Phase1Prompts.get_gemma3_prompt()
-            raw_response = await self.vision_service.analyze_image(
-                image_bytes=input_data.image_bytes,
-                image_mime_type=input_data.image_mime_type,
-                prompt=prompt,
-                temperature=temperature,
-                seed=seed
-            )
+            if on_ingredient is not None and hasattr(self.vision_service, "stream_image_analysis"):
+                raw_response = await self._stream_vision_response(input_data, prompt, temperature, seed, on_ingredient)
+            else:
+                raw_response = await self.vision_service.analyze_image(
+                    image_bytes=input_data.image_bytes,
+                    image_mime_type=input_data.image_mime_type,
+                    prompt=prompt,
+                    temperature=temperature,
+                    seed=seed
+                )
             # JSON文字列をパース
             vision_result = parse_json_from_string(raw_response)
             
@@ -305,6 +319,35 @@ class Phase1Component(BaseComponent[Phase1Input, Phase1Output]):
     
 
     
+    async def _stream_vision_response(self, input_data: Phase1Input, prompt: str, temperature: Optional[float],
+                                      seed: Optional[int], on_ingredient: IngredientCallback) -> str:
+        """Vision APIの出力をストリームで受信し、食材オブジェクトが閉じるたびにコールバックへ渡す"""
+        parser = IncrementalIngredientParser()
+        started = time.monotonic()
+        first_ingredient_ms = None
+
+        async for delta in self.vision_service.stream_image_analysis(
+            image_bytes=input_data.image_bytes,
+            image_mime_type=input_data.image_mime_type,
+            prompt=prompt,
+            temperature=temperature,
+            seed=seed
+        ):
+            for ingredient in parser.feed(delta):
+                if first_ingredient_ms is None:
+                    first_ingredient_ms = int((time.monotonic() - started) * 1000)
+                self.logger.info(f"Streamed ingredient [{ingredient.dish_index}.{ingredient.ingredient_index}]: {ingredient.ingredient_name}")
+                callback_result = on_ingredient(ingredient)
+                if inspect.isawaitable(callback_result):
+                    await callback_result
+
+        self.log_processing_detail("vision_api_streaming", {
+            "streamed_ingredients": parser.emitted_count,
+            "first_ingredient_ms": first_ingredient_ms,
+            "stream_duration_ms": int((time.monotonic() - started) * 1000)
+        })
+        return parser.text
+
     def _convert_structured_to_legacy(self, detected_items: list) -> list:
         """構造化データを従来形式に変換（フォールバック用）"""
         # このメソッドは重量情報が不完全な場合に使用されるため、エラーを発生させる
@@ -3,10 +3,11 @@ Phase1Speech: 音声分析コンポーネント
 
 音声データから料理・食材情報を抽出し、既存のPhase1Componentと同等の出力を生成します。
 """
+import asyncio
 import logging
 import uuid
 from datetime import datetime
-from typing import Optional, Any
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Tuple
 
 from shared.components.base import BaseComponent, ComponentError
 from shared.models.phase1_models import Phase1Input, Phase1Output, Dish, Ingredient
@@ -15,7 +16,13 @@ from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from shared.services.google_speech_service import GoogleSpeechService
-from shared.services.nlu_service import NLUService
+from shared.cache import NLU_CACHE, TRANSCRIPT_CACHE, cache_lookup, cache_store, nlu_cache_key, transcript_cache_key
+from shared.services.chunked_transcription import transcribe_in_chunks
+from shared.services.nlu_service import NLUService, build_voice_system_prompt, split_at_safe_boundary
+from shared.config.settings import get_settings
+from shared.utils.audio_chunking import AudioChunk, split_audio_on_silence
+from shared.utils.audio_normalization import normalize_audio
+from shared.utils.metrics import get_metrics_registry
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +37,7 @@ class Phase1SpeechComponent(BaseComponent):
 
     def __init__(self, speech_service_type: str = "deepinfra_whisper", whisper_model: str = "openai/whisper-large-v3-turbo", speech_service: Optional['GoogleSpeechService'] = None, nlu_service: Optional[NLUService] = None):
         super().__init__("Phase1SpeechComponent")
+        self.speech_service_type = speech_service_type
 
         # 音声認識サービスタイプに基づいてサービスを選択
         if speech_service_type == "deepinfra_whisper":
@@ -47,6 +55,18 @@ class Phase1SpeechComponent(BaseComponent):
             self.whisper_service = WhisperSpeechService(backend=WhisperBackend.DEEPINFRA_API)
             self.speech_service = None  # DeepInfra Whisper使用時はGoogleSpeechServiceを無効化
             logger.info(f"Initialized with DeepInfra Whisper model: {self.selected_model.value}")
+        elif speech_service_type == "local_whisper":
+            from shared.services.whisper_speech_service import WhisperSpeechService, WhisperBackend, WhisperModel
+
+            # モデルはプロセス内で常駐し、推論は専用ワーカープールで実行される
+            self.whisper_service = WhisperSpeechService(backend=WhisperBackend.LOCAL_WHISPER)
+            self.speech_service = None
+
+            # ローカルモデル名（"large-v3-turbo" 等）またはDeepInfraと同じ "openai/whisper-*" 形式を受け付ける
+            local_name = whisper_model.split("/")[-1].removeprefix("whisper-")
+            local_models = {m.value: m for m in self.whisper_service.get_supported_models()}
+            self.selected_model = local_models.get(local_name, WhisperModel.LARGE_V3_TURBO)
+            logger.info(f"Initialized with local Whisper model: {self.selected_model.value}")
         else:  # speech_service_type == "google"
             # Google Speech-to-Textサービスの初期化（依存性注入）
             from shared.services.google_speech_service import GoogleSpeechService
@@ -56,6 +76,10 @@ class Phase1SpeechComponent(BaseComponent):
             logger.info("Initialized with Google Speech-to-Text service")
 
         self.nlu_service = nlu_service or NLUService()
+        # 直近の音声正規化結果（ログ・分析結果用、正規化しなかった場合はNone）
+        self.last_audio_normalization: Optional[dict] = None
+        # 直近の分割文字起こしの結果（分割しなかった場合はNone）
+        self.last_chunked_transcription: Optional[dict] = None
 
         logger.info("Phase1SpeechComponent initialized successfully")
 
@@ -66,7 +90,8 @@ class Phase1SpeechComponent(BaseComponent):
         language_code: str = "en-US",
         llm_model_id: Optional[str] = None,
         temperature: Optional[float] = None,
-        seed: Optional[int] = None
+        seed: Optional[int] = None,
+        transcript: Optional[str] = None
     ) -> Phase1Output:
         """
         音声分析専用のexecuteメソッド
@@ -78,6 +103,7 @@ class Phase1SpeechComponent(BaseComponent):
             llm_model_id: 使用するLLMモデルID
             temperature: AI推論のランダム性制御 (0.0-1.0)
             seed: 再現性のためのシード値
+            transcript: 文字起こし済みのテキスト（ストリーミング入力等で指定時は音声認識を省略）
 
         Returns:
             Phase1Output: 既存システムと同等の構造化分析結果
@@ -112,7 +138,8 @@ class Phase1SpeechComponent(BaseComponent):
                 language_code=language_code, 
                 llm_model_id=llm_model_id,
                 temperature=temperature,
-                seed=seed
+                seed=seed,
+                transcript=transcript
             )
             
             end_time = datetime.now()
@@ -150,7 +177,8 @@ class Phase1SpeechComponent(BaseComponent):
         language_code: str = "en-US",
         llm_model_id: Optional[str] = None,
         temperature: Optional[float] = None,
-        seed: Optional[int] = None
+        seed: Optional[int] = None,
+        transcript: Optional[str] = None
     ) -> Phase1Output:
         """
         音声分析の主処理（WAV形式のみ対応）
@@ -161,39 +189,28 @@ class Phase1SpeechComponent(BaseComponent):
             llm_model_id: 使用するLLMモデルID
             temperature: AI推論のランダム性制御 (0.0-1.0)
             seed: 再現性のためのシード値
+            transcript: 文字起こし済みのテキスト（指定時は音声正規化・音声認識を省略）
 
         Returns:
             Phase1Output: 既存システムと同等の構造化分析結果
         """
         self.logger.info("Starting speech analysis for food extraction")
+        optional_text = getattr(input_data, 'optional_text', None)
+        nlu_dispatcher = None
 
-        # Step 1: 音声認識（Speech-to-Text）- WAV形式のみ対応
-        self.logger.info("Step 1: Speech-to-Text conversion")
-        try:
-            if self.whisper_service:
-                # Whisperサービス使用
-                transcript = await self.whisper_service.transcribe_audio(
-                    audio_data=input_data.audio_bytes,
-                    language_code=language_code,
-                    model=self.selected_model,
-                    temperature=temperature or 0.0
-                )
-                self.logger.info(f"Used Whisper model: {self.selected_model.value}")
-            else:
-                # Google Speech-to-Text使用
-                transcript = await self.speech_service.transcribe_audio(
-                    audio_data=input_data.audio_bytes,
-                    language_code=language_code
-                )
-                self.logger.info("Used Google Speech-to-Text service")
-            
+        if transcript is not None:
+            self.last_audio_normalization = None
+            self.last_chunked_transcription = None
+            self.logger.info("Step 1: Using transcript provided by the caller")
             self.log_processing_detail("speech_recognition_result", transcript)
-
-        except Exception as e:
-            self.logger.error(f"Speech recognition failed: {e}")
-            raise ComponentError(f"Speech-to-text conversion failed: {e}") from e
+        else:
+            transcript, nlu_dispatcher = await self._transcribe_input(
+                input_data.audio_bytes, language_code, llm_model_id, temperature, seed, optional_text
+            )
 
         if not transcript.strip():
+            if nlu_dispatcher:
+                nlu_dispatcher.cancel()
             error_msg = "No speech detected in audio data"
             self.logger.error(error_msg)
             raise ComponentError(error_msg)
@@ -203,13 +220,12 @@ class Phase1SpeechComponent(BaseComponent):
         try:
             # optional_textがあれば音声認識結果と結合
             combined_text = transcript
-            if hasattr(input_data, 'optional_text') and input_data.optional_text:
-                combined_text = f"{transcript}. Additional context: {input_data.optional_text}"
+            if optional_text:
+                combined_text = f"{transcript}. Additional context: {optional_text}"
                 self.logger.info(f"Combined transcript with optional text: {combined_text[:150]}...")
 
             # プロンプトをログに記録（画像分析と同様）
-            from shared.config.prompts import VoicePrompts
-            system_prompt = VoicePrompts.get_complete_prompt(use_mynetdiary_constraint=True, include_examples=True)
+            system_prompt = build_voice_system_prompt(combined_text)
             self.log_prompt("voice_nlu_system_prompt", system_prompt, {
                 "model_id": llm_model_id,
                 "language_code": language_code,
@@ -218,16 +234,17 @@ class Phase1SpeechComponent(BaseComponent):
                 "seed": seed
             })
 
-            # NLUサービスに新しいパラメータを渡す
-            nlu_result = await self.nlu_service.extract_foods_from_text(
-                text=combined_text,
-                model_id=llm_model_id,
-                temperature=temperature,
-                seed=seed
-            )
+            if nlu_dispatcher and nlu_dispatcher.finish():
+                # 文字起こし中に開始したセグメントごとのNLU結果をまとめる
+                nlu_result = NLUService.merge_extraction_results(await nlu_dispatcher.gather())
+                self.log_processing_detail("nlu_parallel_segments", nlu_dispatcher.segments)
+            else:
+                nlu_result = await self._extract_foods(combined_text, llm_model_id, temperature, seed)
             self.log_processing_detail("nlu_extraction_result", nlu_result)
 
         except Exception as e:
+            if nlu_dispatcher:
+                nlu_dispatcher.cancel()
             self.logger.error(f"NLU food extraction failed: {e}")
             raise ComponentError(f"Food extraction from text failed: {e}") from e
 
@@ -253,6 +270,210 @@ class Phase1SpeechComponent(BaseComponent):
             self.logger.error(f"Phase1Output conversion failed: {e}")
             raise ComponentError(f"Output format conversion failed: {e}") from e
 
+    async def _transcribe_input(
+        self,
+        audio_bytes: bytes,
+        language_code: str,
+        llm_model_id: Optional[str],
+        temperature: Optional[float],
+        seed: Optional[int],
+        optional_text: Optional[str]
+    ) -> Tuple[str, Optional["_NLUSegmentDispatcher"]]:
+        """
+        音声を正規化して文字起こしする（Step 0〜1）
+
+        長い音声は無音位置で分割して並列に文字起こしし、確定した文から順にNLU処理を始めます。
+        同じ音声・設定の文字起こしがキャッシュにあれば、正規化・音声認識を省略します。
+
+        Returns:
+            (文字起こしテキスト, 文字起こし中にNLU処理を開始した場合はそのディスパッチャー)
+        """
+        cache_key = self._transcript_cache_key(audio_bytes, language_code, temperature)
+        cached_transcript = await cache_lookup(TRANSCRIPT_CACHE, cache_key)
+        if cached_transcript is not None:
+            self.last_audio_normalization = None
+            self.last_chunked_transcription = None
+            self.logger.info("Step 1: Using cached transcript (speech-to-text skipped)")
+            self.log_processing_detail("transcript_cache", "hit")
+            self.log_processing_detail("speech_recognition_result", cached_transcript)
+            return cached_transcript, None
+
+        # Step 0: 音声正規化（モノラル・16kHz化、前後の無音除去、再エンコード）
+        audio_data, audio_format = await self._normalize_audio(audio_bytes)
+
+        # Step 1: 音声認識（Speech-to-Text）
+        self.logger.info("Step 1: Speech-to-Text conversion")
+        nlu_dispatcher = None
+        try:
+            chunks = await self._split_long_audio(audio_data)
+            if len(chunks) > 1:
+                settings = get_settings()
+                if settings.NLU_PARALLEL_SEGMENTS_ENABLED and not optional_text:
+                    nlu_dispatcher = _NLUSegmentDispatcher(
+                        lambda text: self._extract_foods(text, llm_model_id, temperature, seed),
+                        min_chars=settings.NLU_SEGMENT_MIN_CHARS
+                    )
+                transcript = await self._transcribe_chunks(
+                    chunks, language_code, temperature, on_text=nlu_dispatcher.add if nlu_dispatcher else None
+                )
+            else:
+                transcript = await self.transcribe_audio(audio_data, audio_format, language_code, temperature)
+
+            self.log_processing_detail("speech_recognition_result", transcript)
+
+        except Exception as e:
+            if nlu_dispatcher:
+                nlu_dispatcher.cancel()
+            self.logger.error(f"Speech recognition failed: {e}")
+            raise ComponentError(f"Speech-to-text conversion failed: {e}") from e
+
+        if transcript.strip():
+            await cache_store(TRANSCRIPT_CACHE, cache_key, transcript)
+        return transcript, nlu_dispatcher
+
+    def _transcript_cache_key(self, audio_bytes: bytes, language_code: str, temperature: Optional[float]) -> str:
+        """文字起こしキャッシュのキー（音声認識へ送る音声を変える前処理の設定も含める）"""
+        settings = get_settings()
+        preprocessing = {
+            name: getattr(settings, name) for name in (
+                "AUDIO_NORMALIZATION_ENABLED", "AUDIO_TARGET_SAMPLE_RATE", "AUDIO_TRIM_SILENCE",
+                "AUDIO_SILENCE_THRESHOLD_DBFS", "AUDIO_SILENCE_PADDING_MS", "AUDIO_OUTPUT_CODEC",
+                "SPEECH_CHUNKING_ENABLED", "SPEECH_CHUNK_MAX_SECONDS", "SPEECH_CHUNK_OVERLAP_SECONDS"
+            )
+        }
+        return transcript_cache_key(
+            audio_bytes,
+            backend=self.speech_service_type,
+            model=self.selected_model.value if self.selected_model else None,
+            language_code=language_code,
+            temperature=temperature or 0.0,
+            preprocessing=preprocessing
+        )
+
+    async def _extract_foods(self, text: str, llm_model_id: Optional[str], temperature: Optional[float],
+                             seed: Optional[int]) -> Dict:
+        """
+        NLUで食品を抽出する（同じ文字起こし・モデル・プロンプト・推論設定の結果はキャッシュから返す）
+
+        LLM出力のパースに失敗したフォールバック結果はキャッシュしません。
+        """
+        cache_key = nlu_cache_key(
+            text,
+            model_id=llm_model_id or getattr(self.nlu_service, "model_id", None),
+            system_prompt=build_voice_system_prompt(text),
+            temperature=temperature if temperature is not None else 0.0,
+            seed=seed
+        )
+        cached_result = await cache_lookup(NLU_CACHE, cache_key)
+        if cached_result is not None:
+            self.logger.info("Using cached NLU extraction result (LLM call skipped)")
+            return cached_result
+
+        result = await self.nlu_service.extract_foods_from_text(
+            text=text,
+            model_id=llm_model_id,
+            temperature=temperature,
+            seed=seed
+        )
+        if not NLUService.is_fallback_result(result):
+            await cache_store(NLU_CACHE, cache_key, result)
+        return result
+
+    async def transcribe_audio(self, audio_data: bytes, audio_format: str, language_code: str,
+                               temperature: Optional[float]) -> str:
+        """設定された音声認識サービスで音声データを文字起こしする"""
+        if self.whisper_service:
+            transcript = await self.whisper_service.transcribe_audio(
+                audio_data=audio_data,
+                language_code=language_code,
+                model=self.selected_model,
+                temperature=temperature or 0.0,
+                audio_format=audio_format
+            )
+            self.logger.info(f"Used Whisper model: {self.selected_model.value}")
+        else:
+            transcript = await self.speech_service.transcribe_audio(
+                audio_data=audio_data,
+                language_code=language_code
+            )
+            self.logger.info("Used Google Speech-to-Text service")
+        return transcript
+
+    async def _split_long_audio(self, audio_data: bytes) -> List[AudioChunk]:
+        """
+        SPEECH_CHUNK_MAX_SECONDS より長い音声を無音位置で分割する
+
+        分割が無効・不要・失敗した場合は要素が1つ以下のリストを返します。
+        """
+        self.last_chunked_transcription = None
+        settings = get_settings()
+        if not settings.SPEECH_CHUNKING_ENABLED:
+            return []
+
+        try:
+            return await asyncio.to_thread(
+                split_audio_on_silence,
+                audio_data,
+                max_chunk_seconds=settings.SPEECH_CHUNK_MAX_SECONDS,
+                overlap_seconds=settings.SPEECH_CHUNK_OVERLAP_SECONDS,
+                codec=settings.AUDIO_OUTPUT_CODEC
+            )
+        except ValueError as e:
+            self.logger.warning(f"Audio chunking skipped, transcribing as a single request: {e}")
+            return []
+
+    async def _transcribe_chunks(self, chunks: List[AudioChunk], language_code: str, temperature: Optional[float],
+                                 on_text: Optional[Callable[[str], None]] = None) -> str:
+        """分割した音声チャンクを並列に文字起こしし、重複を除いて結合する"""
+        result = await transcribe_in_chunks(
+            chunks,
+            lambda chunk: self.transcribe_audio(chunk.audio_bytes, chunk.file_extension, language_code, temperature),
+            max_concurrency=get_settings().SPEECH_CHUNK_MAX_CONCURRENCY,
+            on_text=on_text
+        )
+        self.last_chunked_transcription = result.to_dict()
+        self.log_processing_detail("chunked_transcription", self.last_chunked_transcription)
+        return result.transcript
+
+    async def _normalize_audio(self, audio_bytes: bytes) -> Tuple[bytes, str]:
+        """
+        文字起こし前に音声を正規化する（CPUバウンドなためワーカースレッドで実行）
+
+        正規化が無効・失敗した場合は元の音声をそのまま返します。
+
+        Returns:
+            (音声データ, ファイル形式の拡張子)
+        """
+        self.last_audio_normalization = None
+        settings = get_settings()
+        if not settings.AUDIO_NORMALIZATION_ENABLED:
+            return audio_bytes, "wav"
+
+        try:
+            result = await asyncio.to_thread(
+                normalize_audio,
+                audio_bytes,
+                target_sample_rate=settings.AUDIO_TARGET_SAMPLE_RATE,
+                trim=settings.AUDIO_TRIM_SILENCE,
+                silence_threshold_dbfs=settings.AUDIO_SILENCE_THRESHOLD_DBFS,
+                silence_padding_ms=settings.AUDIO_SILENCE_PADDING_MS,
+                codec=settings.AUDIO_OUTPUT_CODEC
+            )
+        except ValueError as e:
+            self.logger.warning(f"Audio normalization skipped, sending original audio: {e}")
+            return audio_bytes, "wav"
+
+        self.last_audio_normalization = result.to_dict()
+        self.log_processing_detail("audio_normalization", self.last_audio_normalization)
+        _record_normalization_metrics(result)
+        self.logger.info(
+            f"Audio normalized: {result.original_duration_seconds:.2f}s -> {result.duration_seconds:.2f}s, "
+            f"{result.original_bytes} -> {result.output_bytes} bytes ({result.bytes_saved_ratio:.0%} saved, "
+            f"{result.original_sample_rate}Hz/{result.original_channels}ch -> {result.sample_rate}Hz/mono {result.codec}) "
+            f"in {result.processing_time_ms:.0f}ms"
+        )
+        return result.audio_bytes, result.file_extension
+
     def _convert_to_phase1_output(self, nlu_result: dict, original_transcript: str) -> Phase1Output:
         """
         NLU結果を既存Phase1Output形式に変換
@@ -328,4 +549,63 @@ class Phase1SpeechComponent(BaseComponent):
             analysis_confidence=overall_confidence,
             processing_notes=processing_notes,
             warnings=warnings
-        )
\ No newline at end of file
+        )
+
+
+class _NLUSegmentDispatcher:
+    """
+    分割文字起こしの結果を文単位のセグメントに区切り、確定したものから順にNLU処理を開始する
+
+    区切り位置は split_at_safe_boundary で選ぶため、前の文を参照する文（"It had butter." 等）は
+    直前の文と同じセグメントに入ります。
+    """
+
+    def __init__(self, extract: Callable[[str], Awaitable[Dict]], min_chars: int):
+        self._extract = extract
+        self._min_chars = min_chars
+        self._pending = ""
+        self._tasks: List[asyncio.Task] = []
+        self.segments: List[str] = []
+
+    def add(self, text: str) -> None:
+        """結合済み文字起こしに追加されたテキストを受け取る"""
+        self._pending += text
+        segment, self._pending = split_at_safe_boundary(self._pending, self._min_chars)
+        if segment:
+            self._start(segment)
+
+    def finish(self) -> bool:
+        """
+        残りのテキストを最後のセグメントとして開始する
+
+        Returns:
+            セグメント単位でNLU処理したかどうか（文字起こし中に1つも区切れなかった場合はFalse）
+        """
+        if not self._tasks:
+            return False
+        if self._pending.strip():
+            self._start(self._pending.strip())
+            self._pending = ""
+        return True
+
+    async def gather(self) -> List[Dict]:
+        return await asyncio.gather(*self._tasks)
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    def _start(self, segment: str) -> None:
+        self.segments.append(segment)
+        self._tasks.append(asyncio.create_task(self._extract(segment)))
+
+
+def _record_normalization_metrics(result) -> None:
+    """音声正規化の入出力サイズ・音声長をメトリクスに記録"""
+    metrics = get_metrics_registry()
+    bytes_counter = metrics.counter("audio_normalization_bytes_total", "Audio bytes before and after normalization")
+    seconds_counter = metrics.counter("audio_normalization_audio_seconds_total", "Audio duration before and after normalization")
+    bytes_counter.inc(result.original_bytes, labels={"stage": "input"})
+    bytes_counter.inc(result.output_bytes, labels={"stage": "output"})
+    seconds_counter.inc(result.original_duration_seconds, labels={"stage": "input"})
+    seconds_counter.inc(result.duration_seconds, labels={"stage": "output"})
@@ -3,6 +3,8 @@
 
 音声分析と画像分析で共通して使用されるMyNetDiary制約やJSON構造などのプロンプト要素を管理します。
 """
+from typing import List, Optional
+
 from ...utils.mynetdiary_utils import format_mynetdiary_ingredients_for_prompt
 
 
@@ -10,14 +12,17 @@ class CommonPrompts:
     """音声分析と画像分析で共通のプロンプトコンポーネント"""
 
     @classmethod
-    def get_mynetdiary_ingredients_list_with_header(cls, exclude_uncooked: bool = True) -> str:
+    def get_mynetdiary_ingredients_list_with_header(cls, exclude_uncooked: bool = True, ingredient_names: Optional[List[str]] = None) -> str:
         """MyNetDiary食材名リスト（ヘッダー付き）を生成
         
         Args:
             exclude_uncooked: uncooked食材を除外するかどうか（デフォルト: True）
+            ingredient_names: 含める食材名（入力に関連する候補に絞り込む場合、指定しない場合はリスト全体）
         """
-        ingredients_list = format_mynetdiary_ingredients_for_prompt(exclude_uncooked=exclude_uncooked)
+        ingredients_list = format_mynetdiary_ingredients_for_prompt(exclude_uncooked=exclude_uncooked, ingredient_names=ingredient_names)
         exclusion_note = " (excluding uncooked items)" if exclude_uncooked else ""
+        if ingredient_names is not None:
+            exclusion_note = " (candidates selected for this input)"
         return f"""
 MYNETDIARY INGREDIENT CONSTRAINT - ABSOLUTELY CRITICAL:
 For ALL ingredients, you MUST select ONLY from the following MyNetDiary ingredient list{exclusion_note}.
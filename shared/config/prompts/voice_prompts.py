@@ -3,7 +3,7 @@
 
 音声認識されたテキストから料理・食材・重量を抽出するためのプロンプトを管理します。
 """
-from typing import Optional
+from typing import List, Optional
 from .common_prompts import CommonPrompts
 
 
@@ -12,12 +12,13 @@ class VoicePrompts:
 
 
     @classmethod
-    def get_system_prompt(cls, use_mynetdiary_constraint: bool = True) -> str:
+    def get_system_prompt(cls, use_mynetdiary_constraint: bool = True, candidate_names: Optional[List[str]] = None) -> str:
         """
         音声NLU用システムプロンプトを取得
 
         Args:
             use_mynetdiary_constraint: MyNetDiary制約を使用するかどうか
+            candidate_names: プロンプトに含めるMyNetDiary食材名（文字起こしから絞り込んだ候補、指定しない場合はリスト全体）
 
         Returns:
             システムプロンプト文字列
@@ -37,7 +38,7 @@ class VoicePrompts:
         if use_mynetdiary_constraint:
             base_prompt = f"""{base_prompt}
 
-{CommonPrompts.get_mynetdiary_ingredients_list_with_header()}
+{CommonPrompts.get_mynetdiary_ingredients_list_with_header(ingredient_names=candidate_names)}
 
 {CommonPrompts.get_formatting_requirements()}
 
@@ -87,18 +88,20 @@ class VoicePrompts:
 }"""
 
     @classmethod
-    def get_complete_prompt(cls, use_mynetdiary_constraint: bool = True, include_examples: bool = True) -> str:
+    def get_complete_prompt(cls, use_mynetdiary_constraint: bool = True, include_examples: bool = True,
+                            candidate_names: Optional[List[str]] = None) -> str:
         """
         完全なプロンプト（システム + 例）を取得
 
         Args:
             use_mynetdiary_constraint: MyNetDiary制約を使用するかどうか
             include_examples: 例を含めるかどうか
+            candidate_names: プロンプトに含めるMyNetDiary食材名（指定しない場合はリスト全体）
 
         Returns:
             完全なプロンプト文字列
         """
-        system_prompt = cls.get_system_prompt(use_mynetdiary_constraint)
+        system_prompt = cls.get_system_prompt(use_mynetdiary_constraint, candidate_names=candidate_names)
 
         if include_examples:
             example_prompt = cls.get_example_prompt()
@@ -12,6 +12,7 @@ class Settings(BaseSettings):
     DEEPINFRA_API_KEY: Optional[str] = None  # Deep Infra APIキー
     DEEPINFRA_MODEL_ID: str = "google/gemma-3-27b-it"  # Deep Infraモデル識別子（デフォルト）
     DEEPINFRA_BASE_URL: str = "https://api.deepinfra.com/v1/openai"  # OpenAI互換エンドポイント
+    DEEPINFRA_INFERENCE_URL: str = "https://api.deepinfra.com/v1/inference"  # ネイティブ推論API（Whisper・NLU）
 
     # Google Cloud設定（音声認識用）
     GOOGLE_APPLICATION_CREDENTIALS: Optional[str] = None  # Google Cloud認証情報ファイルパス
@@ -47,6 +48,67 @@ class Settings(BaseSettings):
         }
     }
     
+    # Phase1ストリーミング設定（生成途中で確定した食材から栄養検索を開始）
+    PHASE1_STREAMING_ENABLED: bool = False
+
+    # 音声正規化設定（文字起こし前にモノラル・16kHz化、前後の無音除去、再エンコード）
+    AUDIO_NORMALIZATION_ENABLED: bool = True
+    AUDIO_TARGET_SAMPLE_RATE: int = 16000
+    AUDIO_OUTPUT_CODEC: str = "flac"  # flac | opus | wav（flac/opusはsoundfileが必要、なければwav）
+    AUDIO_TRIM_SILENCE: bool = True
+    AUDIO_SILENCE_THRESHOLD_DBFS: float = -45.0  # 20msフレームのRMSがこれ以下なら無音
+    AUDIO_SILENCE_PADDING_MS: int = 200  # 無音除去時に残す前後の余白
+
+    # ローカルWhisper推論設定（speech_service="local_whisper"）
+    LOCAL_WHISPER_DEVICE: str = "auto"  # auto | cpu | cuda
+    LOCAL_WHISPER_INFERENCE_WORKERS: int = 1  # 推論専用ワーカースレッド数（同じモデルの推論は1つずつ実行）
+    LOCAL_WHISPER_MAX_BATCH_SIZE: int = 8  # 1回の推論にまとめる最大リクエスト数
+    LOCAL_WHISPER_BATCH_WAIT_MS: float = 20.0  # バッチを埋めるために待つ最大時間
+    LOCAL_WHISPER_PRELOAD_MODELS: List[str] = []  # 起動時にロードするモデル（例: ["large-v3-turbo"]）
+
+    # 長時間音声の分割文字起こし設定（無音位置で分割し、チャンクを並列に文字起こし）
+    SPEECH_CHUNKING_ENABLED: bool = True
+    SPEECH_CHUNK_MAX_SECONDS: float = 30.0  # これより長い音声を分割する（チャンクの最大長）
+    SPEECH_CHUNK_OVERLAP_SECONDS: float = 1.0  # 隣接チャンクの重なり（境界の単語の欠落防止）
+    SPEECH_CHUNK_MAX_CONCURRENCY: int = 4  # 同時に文字起こしするチャンク数
+    NLU_PARALLEL_SEGMENTS_ENABLED: bool = True  # 分割した文字起こしを文単位でまとめて並列にNLU処理
+    NLU_SEGMENT_MIN_CHARS: int = 300  # 並列NLUの1セグメントの最小文字数
+
+    # WebSocketストリーミング音声入力設定（/voice/ws、無音判定の閾値は AUDIO_SILENCE_THRESHOLD_DBFS）
+    VOICE_STREAM_SEGMENT_SILENCE_MS: int = 400  # この長さの無音で発話区間を閉じて文字起こしを開始
+    VOICE_STREAM_END_OF_SPEECH_MS: int = 1200  # この長さの無音で発話終了とみなしNLU以降を開始
+    VOICE_STREAM_MAX_AUDIO_SECONDS: float = 300.0  # 1セッションで受け付ける最大音声長
+
+    # 文字起こし・NLU抽出結果のキャッシュ（音声データ/正規化した文字起こしのハッシュで参照、SQLiteに永続化）
+    SPEECH_CACHE_ENABLED: bool = True
+    SPEECH_CACHE_DB_PATH: str = "speech_cache.sqlite3"  # キャッシュ用SQLiteファイルのパス
+    TRANSCRIPT_CACHE_MAX_ENTRIES: int = 5000  # 文字起こしキャッシュの最大エントリ数（超過分はLRUで削除）
+    NLU_CACHE_MAX_ENTRIES: int = 20000  # NLUキャッシュの最大エントリ数（超過分はLRUで削除）
+    SPEECH_CACHE_TTL_SECONDS: Optional[float] = 7 * 24 * 3600  # エントリの有効期間（None: 無期限）
+
+    # 上流呼び出しの記録・再生（Deep Infra・Whisper・NLU・Word Query API・Elasticsearch、shared/cassette）
+    CASSETTE_MODE: str = "off"  # off | record（記録） | replay（ネットワークに接続せずに再生）
+    CASSETTE_DIR: str = "cassettes"  # カセットファイルの保存先
+    CASSETTE_NAME: str = "default"  # カセット名（拡張子がない場合は {CASSETTE_NAME}.jsonl.gz）
+    CASSETTE_REPLAY_LATENCY_SCALE: float = 0.0  # 再生時に記録した所要時間に掛ける倍率（0: 待たずに応答、1: 記録時と同じ）
+
+    # 音声NLUプロンプトのMyNetDiary食材名リストの絞り込み（文字起こしの食品の言及ごとに上位K件をローカル検索）
+    VOICE_NLU_CATALOGUE_RETRIEVAL_ENABLED: bool = True
+    VOICE_NLU_CATALOGUE_TOP_K: int = 12  # 言及ごとにプロンプトに含める候補数
+
+    # SSEストリーミングエンドポイント設定（/complete/stream, /voice/stream）
+    SSE_KEEPALIVE_SECONDS: float = 15.0  # イベントがない間にkeep-aliveコメントを送る間隔
+
+    # 自動モデルルーティング設定（ai_model_id="auto"）
+    MODEL_ROUTER_DEFAULT_LATENCY_BUDGET_MS: int = 30000  # latency_budget_ms未指定時のレイテンシ予算
+    MODEL_ROUTER_EWMA_ALPHA: float = 0.2  # レイテンシ・エラー率EWMAの平滑化係数
+    MODEL_ROUTER_WINDOW_SIZE: int = 200  # パーセンタイル計算に使う直近サンプル数
+    MODEL_ROUTER_MIN_SAMPLES: int = 5  # 観測値で予測するのに必要な最小サンプル数（未満は設定値を使用）
+    MODEL_ROUTER_LATENCY_PERCENTILE: float = 90.0  # 予算判定に使うレイテンシのパーセンタイル
+    MODEL_ROUTER_TIMEOUT_MULTIPLIER: float = 1.5  # 予測レイテンシに対するタイムアウト倍率
+    MODEL_ROUTER_MAX_ERROR_RATE: float = 0.5  # これを超えるエラー率のモデルは選択しない
+    MODEL_ROUTER_PROBE_INTERVAL_SECONDS: float = 30.0  # 除外中のモデルに回復確認のリクエストを1回送る間隔
+
     # 栄養データベース検索設定
     USE_ELASTICSEARCH_SEARCH: bool = True  # Elasticsearch栄養データベース検索を使用するかどうか
     USE_LOCAL_NUTRITION_SEARCH: bool = False  # ローカル栄養データベース検索を使用するかどうか（レガシー）
@@ -62,12 +124,44 @@ class Settings(BaseSettings):
     jaro_winkler_threshold: float = 0.85  # Jaro-Winkler類似度の閾値
     fuzzy_min_score_tier3: float = 5.0  # Tier 3の最小スコア閾値
     fuzzy_max_candidates: int = 5  # Tier 4で取得する最大候補数
+
+    # 食材名の補正（Phase1の食材名を栄養検索前にMyNetDiary食材名へ置き換える）
+    CATALOGUE_SNAPPING_ENABLED: bool = True
+    CATALOGUE_SNAP_MIN_TOKEN_SORT: float = 85.0  # 置き換えるtoken-sort比率の下限（0-100）
+    CATALOGUE_SNAP_MIN_JARO_WINKLER: float = 0.9  # 置き換えるJaro-Winkler類似度の下限（0-1）
     
     # キャッシュ設定
     CACHE_TYPE: str = "simple"  # "simple", "redis", "memcached"
     CACHE_REDIS_URL: Optional[str] = None  # Redisを使用する場合のURL
     NUTRITION_CACHE_TTL_SECONDS: int = 3600  # 栄養データベースレスポンスのキャッシュ有効期間（1時間）
     
+    # 非同期ジョブ設定（/jobs エンドポイント）
+    JOB_QUEUE_ENABLED: bool = True  # ジョブワーカーをアプリ起動時に開始するかどうか
+    JOB_QUEUE_DB_PATH: str = "job_queue.sqlite3"  # SQLite永続キューのパス
+    JOB_WORKER_CONCURRENCY: int = 2  # 同時実行ジョブ数
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = 300  # リース期限（heartbeatが途絶えると再配信）
+    JOB_MAX_ATTEMPTS: int = 3  # 最大試行回数
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0  # キューが空の時のポーリング間隔
+    JOB_RETRY_BACKOFF_SECONDS: float = 5.0  # 再試行の基本待機時間（試行ごとに倍増）
+    JOB_RESULT_RETENTION_SECONDS: int = 86400  # 完了済みジョブの保持期間（24時間）
+    JOB_WEBHOOK_TIMEOUT_SECONDS: float = 10.0  # Webhook送信タイムアウト
+    JOB_WEBHOOK_MAX_RETRIES: int = 3  # Webhook送信の最大試行回数
+    JOB_WEBHOOK_ALLOWED_HOSTS: List[str] = []  # プライベートアドレスでもWebhookを送信してよいホスト名（例: ["hooks.internal"]）
+
+    # アドミッション制御設定（429 + Retry-After によるロードシェディング）
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_COMPLETE_MAX_CONCURRENCY: int = 8  # /complete の同時実行数（Vision API呼び出し数の上限）
+    ADMISSION_COMPLETE_MAX_QUEUE: int = 32  # /complete の待機キュー長
+    ADMISSION_VOICE_MAX_CONCURRENCY: int = 8  # /voice の同時実行数
+    ADMISSION_VOICE_MAX_QUEUE: int = 32  # /voice の待機キュー長
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 30.0  # 待機タイムアウト（超過で429）
+    ADMISSION_SUGGEST_MAX_CONCURRENCY: int = 64  # Word Query API /suggest の同時実行数
+    ADMISSION_SUGGEST_MAX_QUEUE: int = 256  # /suggest の待機キュー長
+    ADMISSION_SUGGEST_QUEUE_TIMEOUT_SECONDS: float = 2.0  # /suggest の待機タイムアウト
+
+    # Word Query API の運用エンドポイント
+    RECENT_QUERIES_TOKEN: Optional[str] = None  # /suggest/recent-queries のBearerトークン（未設定の場合はエンドポイント無効）
+
     # API設定
     API_LOG_LEVEL: str = "INFO"
     FASTAPI_ENV: str = "development"
@@ -0,0 +1,15 @@
+"""
+非同期ジョブ基盤（SQLite永続キュー + ワーカープール）
+"""
+
+from .store import JobStatus, JobRecord, SQLiteJobStore
+from .worker import JobWorkerPool, PermanentJobError, check_webhook_url
+
+__all__ = [
+    "JobStatus",
+    "JobRecord",
+    "SQLiteJobStore",
+    "JobWorkerPool",
+    "PermanentJobError",
+    "check_webhook_url"
+]
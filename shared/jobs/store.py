@@ -0,0 +1,412 @@
+"""
+SQLite永続ジョブキュー
+
+非同期ジョブ（画像・音声分析）の投入・リース・完了・再試行を管理します。
+at-least-once配信: ワーカーはvisibility timeout付きでジョブをリースし、
+期限内に完了（ack）しなかったジョブは再びキューに戻ります。
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(str, Enum):
+    """ジョブ状態"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+TERMINAL_STATUSES = (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+
+@dataclass
+class JobRecord:
+    """ジョブレコード"""
+    job_id: str
+    kind: str
+    status: JobStatus
+    params: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+    created_at: float
+    updated_at: float
+    available_at: float
+    payload: Optional[bytes] = None
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[float] = None
+    started_at: Optional[float] = None
+    completed_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    webhook_url: Optional[str] = None
+    webhook_status: Optional[str] = None
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    payload BLOB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    started_at REAL,
+    completed_at REAL,
+    result TEXT,
+    error TEXT,
+    webhook_url TEXT,
+    webhook_status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_available ON jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (status, lease_expires_at);
+"""
+
+_COLUMNS_WITHOUT_PAYLOAD = (
+    "job_id, kind, status, params, attempts, max_attempts, created_at, updated_at, "
+    "available_at, lease_owner, lease_expires_at, started_at, completed_at, result, "
+    "error, webhook_url, webhook_status"
+)
+
+
+class SQLiteJobStore:
+    """
+    SQLiteベースの永続ジョブストア
+
+    プロセス再起動後もキュー状態を保持します。同期APIのため、
+    asyncioコードからは asyncio.to_thread 経由で呼び出してください。
+    """
+
+    def __init__(
+        self,
+        db_path: str = "job_queue.sqlite3",
+        visibility_timeout_seconds: float = 300.0,
+        max_attempts: int = 3
+    ):
+        """
+        Args:
+            db_path: SQLiteデータベースファイルパス（":memory:"は不可）
+            visibility_timeout_seconds: リース期間（この間にack/heartbeatがないと再配信）
+            max_attempts: デフォルトの最大試行回数
+        """
+        if db_path == ":memory:":
+            raise ValueError("SQLiteJobStore requires a file-backed database for durability")
+
+        self.db_path = db_path
+        self.visibility_timeout_seconds = visibility_timeout_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+        parent = Path(db_path).parent
+        if str(parent) not in ("", "."):
+            parent.mkdir(parents=True, exist_ok=True)
+
+        self._connection().executescript(_SCHEMA)
+
+        logger.info(f"SQLiteJobStore initialized: {db_path} (visibility_timeout={visibility_timeout_seconds}s, max_attempts={max_attempts})")
+
+    # ------------------------------------------------------------------
+    # 接続管理
+    # ------------------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        """スレッドごとのコネクションを取得"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    class _Transaction:
+        def __init__(self, conn: sqlite3.Connection):
+            self.conn = conn
+
+        def __enter__(self) -> sqlite3.Connection:
+            # BEGIN IMMEDIATE で書き込みロックを先に取得し、リースの二重取得を防ぐ
+            self.conn.execute("BEGIN IMMEDIATE")
+            return self.conn
+
+        def __exit__(self, exc_type, exc, tb):
+            if exc_type is None:
+                self.conn.execute("COMMIT")
+            else:
+                self.conn.execute("ROLLBACK")
+            return False
+
+    def _transaction(self) -> "_Transaction":
+        return self._Transaction(self._connection())
+
+    def close(self) -> None:
+        """現在のスレッドのコネクションを閉じる"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ------------------------------------------------------------------
+    # 投入・参照
+    # ------------------------------------------------------------------
+
+    def enqueue(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        payload: Optional[bytes] = None,
+        webhook_url: Optional[str] = None,
+        max_attempts: Optional[int] = None
+    ) -> JobRecord:
+        """
+        ジョブを投入
+
+        Args:
+            kind: ジョブ種別（ハンドラー名）
+            params: JSONシリアライズ可能なパラメータ
+            payload: 画像・音声などのバイナリ入力
+            webhook_url: 完了時に通知するURL
+            max_attempts: 最大試行回数（None: ストアのデフォルト）
+
+        Returns:
+            JobRecord: 投入されたジョブ
+        """
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        attempts_limit = max_attempts or self.max_attempts
+
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, status, params, payload, attempts, max_attempts, "
+                "created_at, updated_at, available_at, webhook_url) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?)",
+                (job_id, kind, JobStatus.QUEUED.value, json.dumps(params), payload,
+                 attempts_limit, now, now, now, webhook_url)
+            )
+
+        logger.info(f"[job:{job_id}] Enqueued {kind} job (payload={len(payload) if payload else 0} bytes)")
+        return self.get(job_id)
+
+    def get(self, job_id: str, include_payload: bool = False) -> Optional[JobRecord]:
+        """ジョブを取得（存在しない場合はNone）"""
+        columns = _COLUMNS_WITHOUT_PAYLOAD + (", payload" if include_payload else "")
+        row = self._connection().execute(
+            f"SELECT {columns} FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def count_by_status(self) -> Dict[str, int]:
+        """状態別のジョブ数を取得"""
+        counts = {status.value: 0 for status in JobStatus}
+        for row in self._connection().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+            counts[row["status"]] = row["n"]
+        return counts
+
+    # ------------------------------------------------------------------
+    # ワーカー操作
+    # ------------------------------------------------------------------
+
+    def claim(self, worker_id: str) -> Optional[JobRecord]:
+        """
+        実行可能なジョブを1件リース
+
+        キュー待ちのジョブ、またはリース期限切れ（ワーカー停止等）の実行中ジョブを
+        古い順に取得します。試行回数を使い切った期限切れジョブは失敗として確定します。
+
+        Args:
+            worker_id: リースを取得するワーカーID
+
+        Returns:
+            リースしたJobRecord（payload含む）、なければNone
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT job_id, status, attempts, max_attempts FROM jobs "
+                    "WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at <= ?) "
+                    "ORDER BY available_at, created_at LIMIT 1",
+                    (JobStatus.QUEUED.value, now, JobStatus.RUNNING.value, now)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                if row["attempts"] >= row["max_attempts"]:
+                    # 期限切れのまま試行回数上限に達したジョブは失敗として確定
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, completed_at = ?, updated_at = ?, "
+                        "lease_owner = NULL, lease_expires_at = NULL WHERE job_id = ?",
+                        (JobStatus.FAILED.value,
+                         f"Visibility timeout exceeded after {row['attempts']} attempts",
+                         now, now, row["job_id"])
+                    )
+                    logger.warning(f"[job:{row['job_id']}] Dead-lettered after {row['attempts']} attempts (lease expired)")
+                    continue
+
+                if row["status"] == JobStatus.RUNNING.value:
+                    logger.warning(f"[job:{row['job_id']}] Lease expired, redelivering to {worker_id}")
+
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, "
+                    "lease_expires_at = ?, started_at = COALESCE(started_at, ?), updated_at = ? "
+                    "WHERE job_id = ?",
+                    (JobStatus.RUNNING.value, worker_id, now + self.visibility_timeout_seconds,
+                     now, now, row["job_id"])
+                )
+                claimed = conn.execute(
+                    f"SELECT {_COLUMNS_WITHOUT_PAYLOAD}, payload FROM jobs WHERE job_id = ?",
+                    (row["job_id"],)
+                ).fetchone()
+                return self._row_to_record(claimed)
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """
+        リースを延長
+
+        Returns:
+            リースを保持している場合True（他ワーカーに再配信済みならFalse）
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? "
+                "WHERE job_id = ? AND lease_owner = ? AND status = ?",
+                (now + self.visibility_timeout_seconds, now, job_id, worker_id, JobStatus.RUNNING.value)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        """
+        ジョブを成功として確定（ack）
+
+        Returns:
+            確定できた場合True（リースを失っていた場合False）
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, completed_at = ?, updated_at = ?, "
+                "lease_owner = NULL, lease_expires_at = NULL, payload = NULL "
+                "WHERE job_id = ? AND lease_owner = ? AND status = ?",
+                (JobStatus.SUCCEEDED.value, json.dumps(result), now, now,
+                 job_id, worker_id, JobStatus.RUNNING.value)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry_delay_seconds: float = 0.0,
+             retryable: bool = True) -> Optional[JobRecord]:
+        """
+        ジョブの失敗を記録（nack）
+
+        試行回数が残っていてretryableならキューに戻し、そうでなければ失敗として確定します。
+
+        Returns:
+            更新後のJobRecord（リースを失っていた場合None）
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE job_id = ? AND lease_owner = ? AND status = ?",
+                (job_id, worker_id, JobStatus.RUNNING.value)
+            ).fetchone()
+            if row is None:
+                return None
+
+            if retryable and row["attempts"] < row["max_attempts"]:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, available_at = ?, updated_at = ?, "
+                    "lease_owner = NULL, lease_expires_at = NULL WHERE job_id = ?",
+                    (JobStatus.QUEUED.value, error, now + retry_delay_seconds, now, job_id)
+                )
+                logger.warning(f"[job:{job_id}] Attempt {row['attempts']}/{row['max_attempts']} failed, retrying in {retry_delay_seconds:.1f}s: {error}")
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, completed_at = ?, updated_at = ?, "
+                    "lease_owner = NULL, lease_expires_at = NULL, payload = NULL WHERE job_id = ?",
+                    (JobStatus.FAILED.value, error, now, now, job_id)
+                )
+                logger.error(f"[job:{job_id}] Failed permanently after {row['attempts']} attempts: {error}")
+
+        return self.get(job_id)
+
+    def release(self, job_id: str, worker_id: str) -> bool:
+        """
+        リースを返却して即座に再配信可能にする（シャットダウン時など）
+
+        試行回数は消費しません。
+
+        Returns:
+            返却できた場合True
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), available_at = ?, updated_at = ?, "
+                "lease_owner = NULL, lease_expires_at = NULL WHERE job_id = ? AND lease_owner = ? AND status = ?",
+                (JobStatus.QUEUED.value, now, now, job_id, worker_id, JobStatus.RUNNING.value)
+            )
+            return cursor.rowcount == 1
+
+    def set_webhook_status(self, job_id: str, webhook_status: str) -> None:
+        """Webhook配信結果を記録"""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET webhook_status = ?, updated_at = ? WHERE job_id = ?",
+                (webhook_status, time.time(), job_id)
+            )
+
+    def purge_finished(self, older_than_seconds: float) -> int:
+        """保持期間を過ぎた完了済みジョブを削除"""
+        cutoff = time.time() - older_than_seconds
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND completed_at < ?",
+                (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value, cutoff)
+            )
+            return cursor.rowcount
+
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _row_to_record(row: sqlite3.Row) -> JobRecord:
+        keys = row.keys()
+        return JobRecord(
+            job_id=row["job_id"],
+            kind=row["kind"],
+            status=JobStatus(row["status"]),
+            params=json.loads(row["params"]),
+            attempts=row["attempts"],
+            max_attempts=row["max_attempts"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+            available_at=row["available_at"],
+            payload=row["payload"] if "payload" in keys else None,
+            lease_owner=row["lease_owner"],
+            lease_expires_at=row["lease_expires_at"],
+            started_at=row["started_at"],
+            completed_at=row["completed_at"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            webhook_url=row["webhook_url"],
+            webhook_status=row["webhook_status"]
+        )
@@ -0,0 +1,324 @@
+"""
+非同期ジョブワーカープール
+
+SQLiteJobStoreからジョブをリースし、登録済みハンドラーで実行します。
+実行中はリースを定期的に延長（heartbeat）し、完了時にはWebhookで結果を通知します。
+"""
+import asyncio
+import ipaddress
+import socket
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+import httpx
+import logging
+
+from .store import JobRecord, JobStatus, SQLiteJobStore
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[JobRecord], Awaitable[Dict[str, Any]]]
+
+
+class PermanentJobError(Exception):
+    """再試行しても成功しないジョブエラー（入力不正など）"""
+    pass
+
+
+def check_webhook_url(webhook_url: str, allowed_hosts: Sequence[str] = ()) -> None:
+    """
+    Webhookの送信先を検証（SSRF対策）
+
+    http(s) の絶対URLで、ホストが allowed_hosts に含まれるか、名前解決したすべてのアドレスが
+    グローバルアドレスであることを確認します（ループバック・プライベート・リンクローカル
+    （クラウドのメタデータ 169.254.169.254 を含む）などは拒否）。
+
+    Raises:
+        ValueError: 送信先として許可されない場合
+    """
+    parsed = urlparse(webhook_url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("webhook_url must be an absolute http(s) URL")
+    host = parsed.hostname
+    if host in {allowed.lower() for allowed in allowed_hosts}:
+        return
+
+    try:
+        addresses = socket.getaddrinfo(host, parsed.port or (443 if parsed.scheme == "https" else 80),
+                                       type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ValueError(f"webhook_url host cannot be resolved: {host}") from e
+    for address in addresses:
+        ip = ipaddress.ip_address(address[4][0].split("%", 1)[0])
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"webhook_url must not point to a private, loopback or link-local address: {host}")
+
+
+class JobWorkerPool:
+    """
+    ジョブワーカープール
+
+    同一イベントループ上でconcurrency個のワーカーを起動します。
+    パイプラインはI/Oバウンドなため、スレッドではなくasyncioタスクで並行実行します。
+    """
+
+    def __init__(
+        self,
+        store: SQLiteJobStore,
+        handlers: Dict[str, JobHandler],
+        concurrency: int = 2,
+        poll_interval_seconds: float = 1.0,
+        retry_backoff_seconds: float = 5.0,
+        result_retention_seconds: float = 86400.0,
+        webhook_timeout_seconds: float = 10.0,
+        webhook_max_retries: int = 3,
+        webhook_allowed_hosts: Sequence[str] = ()
+    ):
+        """
+        Args:
+            store: ジョブストア
+            handlers: ジョブ種別 → 非同期ハンドラー
+            concurrency: 同時実行ワーカー数
+            poll_interval_seconds: キューが空の時のポーリング間隔
+            retry_backoff_seconds: 再試行の基本待機時間（試行ごとに倍増）
+            result_retention_seconds: 完了済みジョブの保持期間
+            webhook_timeout_seconds: Webhook送信タイムアウト
+            webhook_max_retries: Webhook送信の最大試行回数
+            webhook_allowed_hosts: プライベートアドレスでもWebhookを送信してよいホスト名
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+
+        self.store = store
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval_seconds = poll_interval_seconds
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.result_retention_seconds = result_retention_seconds
+        self.webhook_timeout_seconds = webhook_timeout_seconds
+        self.webhook_max_retries = webhook_max_retries
+        self.webhook_allowed_hosts = list(webhook_allowed_hosts)
+
+        # heartbeatはvisibility timeoutの1/3間隔で送信
+        self.heartbeat_interval_seconds = max(store.visibility_timeout_seconds / 3.0, 0.05)
+
+        self.pool_id = uuid.uuid4().hex[:8]
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._in_flight = 0
+        self._last_purge = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks) and not self._stopping
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def start(self) -> None:
+        """ワーカーを起動"""
+        if self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker_loop(f"{self.pool_id}-{i}"), name=f"job-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        logger.info(f"JobWorkerPool {self.pool_id} started with {self.concurrency} workers (kinds: {sorted(self.handlers)})")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        ワーカーを停止
+
+        実行中のジョブはtimeoutまで完了を待ち、それ以降はキャンセルしてリースを返却します。
+        """
+        if not self._tasks:
+            return
+        self._stopping = True
+        if self._wakeup:
+            self._wakeup.set()
+
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        self._tasks = []
+        logger.info(f"JobWorkerPool {self.pool_id} stopped ({len(pending)} workers cancelled)")
+
+    def notify(self) -> None:
+        """新規ジョブ投入をワーカーに通知"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def submit(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        payload: Optional[bytes] = None,
+        webhook_url: Optional[str] = None
+    ) -> JobRecord:
+        """
+        ジョブを投入してワーカーを起こす
+
+        Raises:
+            ValueError: 未登録のジョブ種別
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}. Available: {sorted(self.handlers)}")
+
+        job = await asyncio.to_thread(self.store.enqueue, kind, params, payload, webhook_url)
+        self.notify()
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[JobRecord]:
+        """ジョブ状態を取得"""
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """キュー統計を取得"""
+        counts = await asyncio.to_thread(self.store.count_by_status)
+        return {
+            "pool_id": self.pool_id,
+            "concurrency": self.concurrency,
+            "in_flight": self._in_flight,
+            "queue_depth": counts.get(JobStatus.QUEUED.value, 0),
+            "status_counts": counts
+        }
+
+    # ------------------------------------------------------------------
+
+    async def _worker_loop(self, worker_id: str) -> None:
+        while not self._stopping:
+            try:
+                job = await asyncio.to_thread(self.store.claim, worker_id)
+            except Exception as e:
+                logger.error(f"[worker:{worker_id}] Failed to claim job: {e}", exc_info=True)
+                job = None
+
+            if job is None:
+                await self._maybe_purge()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                if not self._stopping:
+                    self._wakeup.clear()
+                continue
+
+            await self._run_job(job, worker_id)
+
+    async def _run_job(self, job: JobRecord, worker_id: str) -> None:
+        handler = self.handlers.get(job.kind)
+        self._in_flight += 1
+        start_time = time.time()
+        heartbeat_task = asyncio.create_task(self._heartbeat_loop(job.job_id, worker_id))
+
+        logger.info(f"[job:{job.job_id}] Running {job.kind} on {worker_id} (attempt {job.attempts}/{job.max_attempts})")
+
+        try:
+            if handler is None:
+                raise PermanentJobError(f"No handler registered for job kind '{job.kind}'")
+
+            result = await handler(job)
+            acked = await asyncio.to_thread(self.store.complete, job.job_id, worker_id, result)
+            elapsed = time.time() - start_time
+            if acked:
+                logger.info(f"[job:{job.job_id}] Succeeded in {elapsed:.2f}s")
+            else:
+                # リース期限切れで別ワーカーに再配信済み（at-least-once）
+                logger.warning(f"[job:{job.job_id}] Lease lost before ack; result discarded after {elapsed:.2f}s")
+                return
+
+        except asyncio.CancelledError:
+            # シャットダウン：試行回数を消費せずにリースを返却
+            await asyncio.shield(asyncio.to_thread(self.store.release, job.job_id, worker_id))
+            logger.warning(f"[job:{job.job_id}] Cancelled during shutdown; lease released")
+            raise
+
+        except Exception as e:
+            retryable = not isinstance(e, PermanentJobError)
+            delay = self.retry_backoff_seconds * (2 ** max(job.attempts - 1, 0))
+            updated = await asyncio.to_thread(
+                self.store.fail, job.job_id, worker_id, f"{type(e).__name__}: {e}", delay, retryable
+            )
+            if updated is None or not updated.is_terminal:
+                return
+
+        finally:
+            heartbeat_task.cancel()
+            self._in_flight -= 1
+
+        final_job = await asyncio.to_thread(self.store.get, job.job_id)
+        if final_job and final_job.webhook_url:
+            await self._deliver_webhook(final_job)
+
+    async def _heartbeat_loop(self, job_id: str, worker_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval_seconds)
+            try:
+                still_owner = await asyncio.to_thread(self.store.heartbeat, job_id, worker_id)
+            except Exception as e:
+                logger.warning(f"[job:{job_id}] Heartbeat failed: {e}")
+                continue
+            if not still_owner:
+                logger.warning(f"[job:{job_id}] Heartbeat rejected; lease no longer held by {worker_id}")
+                return
+
+    async def _deliver_webhook(self, job: JobRecord) -> None:
+        """
+        完了通知をWebhookにPOST（失敗してもジョブ状態には影響しない）
+
+        投入時に検証済みでも、DNSの応答が変わる場合（DNS rebinding）に備えて送信ごとに送信先を再検証します。
+        リダイレクトには従いません。
+        """
+        body = {
+            "job_id": job.job_id,
+            "kind": job.kind,
+            "status": job.status.value,
+            "attempts": job.attempts,
+            "result": job.result,
+            "error": job.error
+        }
+        last_error = None
+        for attempt in range(1, self.webhook_max_retries + 1):
+            try:
+                await asyncio.to_thread(check_webhook_url, job.webhook_url, self.webhook_allowed_hosts)
+            except ValueError as e:
+                last_error = f"rejected: {e}"
+                break
+
+            try:
+                async with httpx.AsyncClient(timeout=self.webhook_timeout_seconds) as client:
+                    response = await client.post(job.webhook_url, json=body)
+                if response.status_code < 400:
+                    await asyncio.to_thread(self.store.set_webhook_status, job.job_id, f"delivered:{response.status_code}")
+                    logger.info(f"[job:{job.job_id}] Webhook delivered ({response.status_code})")
+                    return
+                last_error = f"HTTP {response.status_code}"
+            except Exception as e:
+                last_error = str(e)
+
+            if attempt < self.webhook_max_retries:
+                await asyncio.sleep(2 ** (attempt - 1))
+
+        await asyncio.to_thread(self.store.set_webhook_status, job.job_id, f"failed:{last_error}")
+        logger.warning(f"[job:{job.job_id}] Webhook delivery failed after {self.webhook_max_retries} attempts: {last_error}")
+
+    async def _maybe_purge(self) -> None:
+        now = time.time()
+        if now - self._last_purge < 300:
+            return
+        self._last_purge = now
+        try:
+            removed = await asyncio.to_thread(self.store.purge_finished, self.result_retention_seconds)
+            if removed:
+                logger.info(f"Purged {removed} finished jobs older than {self.result_retention_seconds}s")
+        except Exception as e:
+            logger.warning(f"Job purge failed: {e}")
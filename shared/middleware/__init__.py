@@ -0,0 +1,25 @@
+"""
+Shared ASGI middleware for unified API system
+"""
+
+from .admission_control import (
+    AdmissionControlMiddleware,
+    AdmissionRule,
+    AdmissionRejected,
+    PriorityLimiter,
+    search_context_priority,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    PRIORITY_LOW
+)
+
+__all__ = [
+    "AdmissionControlMiddleware",
+    "AdmissionRule",
+    "AdmissionRejected",
+    "PriorityLimiter",
+    "search_context_priority",
+    "PRIORITY_HIGH",
+    "PRIORITY_NORMAL",
+    "PRIORITY_LOW"
+]
@@ -0,0 +1,334 @@
+"""
+アドミッション制御ミドルウェア
+
+ルートごとに同時実行数の上限と有界な待機キューを設け、
+あふれたリクエストは 429 + Retry-After で即座に拒否（ロードシェディング）します。
+WebSocket を対象にしたルールでは接続の受け入れ前に枠を取得し、拒否した接続は 1013（Try Again Later）で閉じます。
+待機キューは優先度付きで、パイプライン由来のリクエストを補完候補より先に処理します。
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+import logging
+
+from shared.utils.metrics import MetricsRegistry, get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# 優先度クラス（値が小さいほど優先）
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_HIGH: "high",
+    PRIORITY_NORMAL: "normal",
+    PRIORITY_LOW: "low",
+}
+
+
+class AdmissionRejected(Exception):
+    """アドミッション拒否（429で応答する）"""
+
+    def __init__(self, reason: str, retry_after_seconds: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_seconds = retry_after_seconds
+
+
+class PriorityLimiter:
+    """
+    優先度付きの有界セマフォ
+
+    - 同時実行数が max_concurrency 未満なら即座に実行
+    - それ以外は優先度順の待機キューに入る（最大 max_queue 件）
+    - キューが満杯の場合、より低優先度の待機者を押し出して入るか、自身が拒否される
+    - queue_timeout_seconds 以内に枠が空かなければ拒否
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout_seconds: float):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
+        if max_queue < 0:
+            raise ValueError("max_queue must be >= 0")
+
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+
+        self._active = 0
+        self._waiters: List[list] = []  # [priority, seq, future]（heap）
+        self._waiting = 0
+        self._seq = itertools.count()
+        self._depth_by_priority: Dict[int, int] = {}
+        # Retry-After推定用の処理時間EWMA（秒）
+        self._ewma_service_seconds = 1.0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    def queue_depth_by_priority(self) -> Dict[int, int]:
+        return dict(self._depth_by_priority)
+
+    def retry_after_seconds(self) -> int:
+        """現在のキュー長と処理時間から再試行までの目安秒数を推定"""
+        estimate = self._ewma_service_seconds * (self._waiting + 1) / self.max_concurrency
+        return max(1, int(math.ceil(estimate)))
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL) -> float:
+        """
+        実行枠を取得
+
+        Returns:
+            待機時間（秒）
+
+        Raises:
+            AdmissionRejected: キュー満杯・待機タイムアウト・押し出し
+        """
+        if self._active < self.max_concurrency and self._waiting == 0:
+            self._active += 1
+            return 0.0
+
+        if self._waiting >= self.max_queue:
+            victim = self._lowest_priority_waiter()
+            if victim is None or victim[0] <= priority:
+                raise AdmissionRejected("queue_full", self.retry_after_seconds())
+            # 低優先度の待機者を押し出して枠を譲る
+            victim_future = victim[2]
+            self._remove_waiter(victim)
+            victim_future.set_exception(AdmissionRejected("preempted", self.retry_after_seconds()))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = [priority, next(self._seq), future]
+        heapq.heappush(self._waiters, entry)
+        self._waiting += 1
+        self._depth_by_priority[priority] = self._depth_by_priority.get(priority, 0) + 1
+
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # タイムアウト直前に枠が割り当てられていた場合はそのまま使う
+                return time.monotonic() - start
+            self._remove_waiter(entry)
+            raise AdmissionRejected("queue_timeout", self.retry_after_seconds())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            else:
+                self._remove_waiter(entry)
+            raise
+
+        return time.monotonic() - start
+
+    def release(self, service_seconds: Optional[float] = None) -> None:
+        """実行枠を返却し、最優先の待機者に引き渡す"""
+        if service_seconds is not None:
+            self._ewma_service_seconds = 0.8 * self._ewma_service_seconds + 0.2 * service_seconds
+
+        while self._waiters:
+            entry = heapq.heappop(self._waiters)
+            priority, _, future = entry
+            if entry[2] is None:
+                continue  # 削除済み
+            self._waiting -= 1
+            self._depth_by_priority[priority] -= 1
+            entry[2] = None
+            if not future.done():
+                # 枠をそのまま引き渡す（_activeは変えない）
+                future.set_result(True)
+                return
+
+        self._active -= 1
+
+    def _lowest_priority_waiter(self) -> Optional[list]:
+        candidates = [entry for entry in self._waiters if entry[2] is not None]
+        if not candidates:
+            return None
+        # 優先度が最も低く、その中で最も新しい待機者
+        return max(candidates, key=lambda entry: (entry[0], entry[1]))
+
+    def _remove_waiter(self, entry: list) -> None:
+        if entry[2] is None:
+            return
+        entry[2] = None
+        self._waiting -= 1
+        self._depth_by_priority[entry[0]] -= 1
+        # 削除済みエントリはrelease時に読み飛ばす（遅延削除）
+
+
+@dataclass
+class AdmissionRule:
+    """ルート単位のアドミッション設定"""
+    name: str
+    path_prefix: str
+    max_concurrency: int
+    max_queue: int
+    queue_timeout_seconds: float = 30.0
+    methods: Optional[List[str]] = None
+    exact_path: bool = False  # Trueの場合はpath_prefixと完全一致するパスのみ対象
+    websocket: bool = False  # Trueの場合は同じパスのWebSocket接続も対象（接続中は枠を保持）
+    priority_resolver: Optional[Callable[[Dict[str, Any]], int]] = None
+    limiter: Optional[PriorityLimiter] = field(default=None, init=False)
+
+    def __post_init__(self):
+        self.limiter = PriorityLimiter(self.name, self.max_concurrency, self.max_queue, self.queue_timeout_seconds)
+
+    def matches(self, scope: Dict[str, Any]) -> bool:
+        if scope["type"] == "websocket" and not self.websocket:
+            return False
+        path = scope.get("path", "")
+        if self.exact_path:
+            if path.rstrip("/") != self.path_prefix.rstrip("/"):
+                return False
+        elif not path.startswith(self.path_prefix):
+            return False
+        return scope["type"] == "websocket" or self.methods is None or scope.get("method") in self.methods
+
+    def resolve_priority(self, scope: Dict[str, Any]) -> int:
+        if self.priority_resolver is None:
+            return PRIORITY_NORMAL
+        return self.priority_resolver(scope)
+
+
+def search_context_priority(scope: Dict[str, Any]) -> int:
+    """
+    Word Query APIの search_context クエリパラメータから優先度を決定
+
+    meal_analysis（パイプライン）→ high, word_search（オートコンプリート）→ low
+    """
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    context = (query.get("search_context") or [""])[0]
+    if context == "meal_analysis":
+        return PRIORITY_HIGH
+    if context == "word_search":
+        return PRIORITY_LOW
+    return PRIORITY_NORMAL
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGIアドミッション制御ミドルウェア
+
+    使用例:
+        app.add_middleware(AdmissionControlMiddleware, rules=[AdmissionRule(...)])
+    """
+
+    def __init__(self, app, rules: List[AdmissionRule], metrics: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.rules = rules
+        metrics = metrics or get_metrics_registry()
+
+        self._in_flight_gauge = metrics.gauge("admission_in_flight", "Requests currently executing per route")
+        self._queue_gauge = metrics.gauge("admission_queue_depth", "Requests waiting for admission per route and priority")
+        self._rejected_counter = metrics.counter("admission_rejected_total", "Requests shed with 429 per route and reason")
+        self._admitted_counter = metrics.counter("admission_admitted_total", "Requests admitted per route and priority")
+        self._wait_histogram = metrics.histogram("admission_wait_seconds", "Time spent waiting for admission")
+
+        self._in_flight_gauge.set_callback(self._collect_in_flight)
+        self._queue_gauge.set_callback(self._collect_queue_depth)
+
+        for rule in rules:
+            logger.info(f"Admission control: {rule.name} ({rule.path_prefix}) concurrency={rule.max_concurrency}, queue={rule.max_queue}, timeout={rule.queue_timeout_seconds}s")
+
+    def _collect_in_flight(self):
+        return [({"route": rule.name}, rule.limiter.active) for rule in self.rules]
+
+    def _collect_queue_depth(self):
+        samples = []
+        for rule in self.rules:
+            depths = rule.limiter.queue_depth_by_priority()
+            for priority, name in PRIORITY_NAMES.items():
+                samples.append(({"route": rule.name, "priority": name}, depths.get(priority, 0)))
+        return samples
+
+    def _match(self, scope: Dict[str, Any]) -> Optional[AdmissionRule]:
+        for rule in self.rules:
+            if rule.matches(scope):
+                return rule
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        rule = self._match(scope)
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        priority = rule.resolve_priority(scope)
+        priority_name = PRIORITY_NAMES.get(priority, str(priority))
+
+        try:
+            waited = await rule.limiter.acquire(priority)
+        except AdmissionRejected as e:
+            self._rejected_counter.inc(labels={"route": rule.name, "reason": e.reason})
+            logger.warning(f"Admission rejected on {rule.name} ({priority_name}): {e.reason}, retry after {e.retry_after_seconds}s")
+            if scope["type"] == "websocket":
+                await self._close_websocket(receive, send, e)
+            else:
+                await self._send_rejection(send, e)
+            return
+
+        self._admitted_counter.inc(labels={"route": rule.name, "priority": priority_name})
+        self._wait_histogram.observe(waited, labels={"route": rule.name})
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            rule.limiter.release(time.monotonic() - start)
+
+    @staticmethod
+    async def _close_websocket(receive, send, rejection: AdmissionRejected) -> None:
+        """
+        WebSocket接続を 1013（Try Again Later）で閉じる
+
+        受け入れ前に閉じるとクライアントにはHTTP 403としか伝わらないため、受け入れてから閉じる。
+        """
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+        await send({"type": "websocket.accept"})
+        await send({
+            "type": "websocket.close",
+            "code": 1013,
+            "reason": f"Server is overloaded ({rejection.reason}), retry after {rejection.retry_after_seconds}s"
+        })
+
+    @staticmethod
+    async def _send_rejection(send, rejection: AdmissionRejected) -> None:
+        body = json.dumps({
+            "detail": {
+                "code": "TOO_MANY_REQUESTS",
+                "message": f"Server is overloaded ({rejection.reason}), please retry later",
+                "retry_after_seconds": rejection.retry_after_seconds
+            }
+        }).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"retry-after", str(rejection.retry_after_seconds).encode("ascii")),
+                (b"content-length", str(len(body)).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
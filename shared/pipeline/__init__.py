@@ -1,4 +1,5 @@
 from .orchestrator import MealAnalysisPipeline
+from .voice_orchestrator import VoiceAnalysisPipeline
 from .result_manager import ResultManager
 
-__all__ = ["MealAnalysisPipeline", "ResultManager"] 
\ No newline at end of file
+__all__ = ["MealAnalysisPipeline", "VoiceAnalysisPipeline", "ResultManager"] 
@@ -0,0 +1,91 @@
+"""
+パイプラインの段階イベント
+
+分析パイプラインが各段階の完了時に通知するイベント名と、そのペイロードの構築関数を定義します。
+SSEエンドポイント（/complete/stream, /voice/stream）はこれらのイベントをそのままクライアントへ送信します。
+"""
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from ..models import Phase1Output
+
+# 料理・食材の検出完了（Phase1）
+PHASE1_DETECTED = "phase1_detected"
+# 食材ごとの栄養データベース照合完了（検索完了順）
+INGREDIENT_MATCHED = "ingredient_matched"
+# 栄養計算完了
+NUTRITION_CALCULATED = "nutrition_calculated"
+# 最終レスポンス（エンドポイントが送信）
+FINAL = "final"
+# 失敗（エンドポイントが送信）
+ERROR = "error"
+
+PipelineEventCallback = Callable[[str, Dict[str, Any]], Union[None, Awaitable[None]]]
+
+
+async def emit_pipeline_event(callback: Optional[PipelineEventCallback], event: str, data: Dict[str, Any]) -> None:
+    """
+    イベントコールバックを呼び出す（同期・非同期どちらのコールバックにも対応）
+
+    Args:
+        callback: イベントコールバック（Noneの場合は何もしない）
+        event: イベント名
+        data: イベントのペイロード
+    """
+    if callback is None:
+        return
+    result = callback(event, data)
+    if inspect.isawaitable(result):
+        await result
+
+
+def build_phase1_event(analysis_id: str, phase1_result: Phase1Output) -> Dict[str, Any]:
+    """phase1_detected イベントのペイロード（検出された料理と食材）"""
+    return {
+        "analysis_id": analysis_id,
+        "dishes": [
+            {
+                "dish_name": dish.dish_name,
+                "confidence": dish.confidence,
+                "ingredients": [
+                    {"ingredient_name": ing.ingredient_name, "weight_g": ing.weight_g}
+                    for ing in dish.ingredients
+                ]
+            }
+            for dish in phase1_result.dishes
+        ],
+        "total_dishes": len(phase1_result.dishes),
+        "total_ingredients": len(phase1_result.get_all_ingredient_names())
+    }
+
+
+def build_ingredient_match_event(analysis_id: str, term: str, api_response: Dict[str, Any]) -> Dict[str, Any]:
+    """ingredient_matched イベントのペイロード（Word Query APIの最上位候補）"""
+    suggestions = api_response.get("suggestions") or []
+    top = suggestions[0] if suggestions else None
+    return {
+        "analysis_id": analysis_id,
+        "ingredient_name": term,
+        "matched": top is not None,
+        "match": {
+            "name": top.get("food_info", {}).get("search_name", top.get("suggestion")),
+            "match_type": top.get("match_type"),
+            "confidence_score": top.get("confidence_score"),
+            "nutrition_per_100g": top.get("nutrition_preview", {})
+        } if top else None
+    }
+
+
+def build_nutrition_event(analysis_id: str, meal_nutrition) -> Dict[str, Any]:
+    """nutrition_calculated イベントのペイロード（料理ごと・食事全体の栄養価）"""
+    return {
+        "analysis_id": analysis_id,
+        "dishes": [
+            {
+                "dish_name": dish.dish_name,
+                "total_nutrition": dish.total_nutrition.model_dump()
+            }
+            for dish in meal_nutrition.dishes
+        ],
+        "total_nutrition": meal_nutrition.total_nutrition.model_dump()
+    }
@@ -7,13 +7,19 @@ import logging
 
 from ..components import Phase1Component, NutritionCalculationComponent
 from ..services.deepinfra_service import DeepInfraService
+from ..services.model_router import AUTO_MODEL_ID, RoutedVisionService
 from ..models import (
     Phase1Input, Phase1Output,
     NutritionQueryInput
 )
 from ..models.nutrition_calculation_models import NutritionCalculationInput
 from ..config import get_settings
+from ..utils.catalogue_snapping import snap_ingredient_name, snap_phase1_ingredients
 from .result_manager import ResultManager
+from .events import (
+    PHASE1_DETECTED, INGREDIENT_MATCHED, NUTRITION_CALCULATED, PipelineEventCallback,
+    emit_pipeline_event, build_phase1_event, build_ingredient_match_event, build_nutrition_event
+)
 
 logger = logging.getLogger(__name__)
 
@@ -25,14 +31,15 @@ class MealAnalysisPipeline:
     4つのフェーズを統合して完全な分析を実行します。
     """
     
-    def __init__(self, model_id: Optional[str] = None):
+    def __init__(self, model_id: Optional[str] = None, latency_budget_ms: Optional[float] = None):
         """
         パイプラインの初期化
 
         常にWord Query API（AdvancedNutritionSearchComponent）を使用します。
 
         Args:
-            model_id: 使用する画像分析モデルID（None: 設定ファイルのデフォルト使用）
+            model_id: 使用する画像分析モデルID（None: 設定ファイルのデフォルト使用、"auto": レイテンシ予算に基づく自動選択）
+            latency_budget_ms: model_id="auto" の場合のレイテンシ予算（ミリ秒、None: 設定ファイルのデフォルト）
         """
         self.pipeline_id = str(uuid.uuid4())[:8]
         self.settings = get_settings()
@@ -47,9 +54,14 @@ class MealAnalysisPipeline:
 
         # Vision Serviceの初期化（モデルID対応）
         try:
-            # DeepInfraServiceを試行（model_idパラメータ付き）
-            self.vision_service = DeepInfraService(model_id=self.model_id)
-            logger.info(f"Using DeepInfra service with model: {self.vision_service.model_id}")
+            if self.model_id == AUTO_MODEL_ID:
+                # 観測レイテンシに基づきリクエストごとにモデルを選択
+                self.vision_service = RoutedVisionService(latency_budget_ms=latency_budget_ms)
+                logger.info(f"Using auto-routed DeepInfra service (latency budget: {self.vision_service.latency_budget_ms:.0f}ms)")
+            else:
+                # DeepInfraServiceを試行（model_idパラメータ付き）
+                self.vision_service = DeepInfraService(model_id=self.model_id)
+                logger.info(f"Using DeepInfra service with model: {self.vision_service.model_id}")
 
             # モデル設定情報をログ出力
             if self.vision_service.model_config:
@@ -87,7 +99,9 @@ class MealAnalysisPipeline:
         seed: Optional[int] = 123456,
         save_detailed_logs: bool = True,
         test_execution: bool = False,
-        test_results_dir: Optional[str] = None
+        test_results_dir: Optional[str] = None,
+        stream_phase1: Optional[bool] = None,
+        event_callback: Optional[PipelineEventCallback] = None
     ) -> Dict[str, Any]:
         """
         完全な食事分析を実行
@@ -99,6 +113,10 @@ class MealAnalysisPipeline:
             temperature: AI推論のランダム性制御 (0.0-1.0)
             seed: 再現性のためのシード値
             save_detailed_logs: 分析ログを保存するかどうか
+            stream_phase1: Phase1をストリーミングで受信し、確定した食材から栄養検索を開始するかどうか
+                           （None: 設定ファイルの PHASE1_STREAMING_ENABLED に従う）
+            event_callback: 指定時は各段階の完了時に (イベント名, ペイロード) で呼び出す
+                            （phase1_detected / ingredient_matched / nutrition_calculated）
 
         Returns:
             完全な分析結果
@@ -136,29 +154,50 @@ class MealAnalysisPipeline:
             # Phase1の詳細ログを作成
             phase1_log = result_manager.create_execution_log("Phase1Component", f"{analysis_id}_phase1") if result_manager else None
             
-            phase1_result = await self.phase1_component.execute(phase1_input, phase1_log, temperature=temperature, seed=seed)
-            
-            self.logger.info(f"[{analysis_id}] Phase 1 completed - Detected {len(phase1_result.dishes)} dishes")
-            
-            # === Nutrition Search Phase: データベース照合 ===
             if self.use_fuzzy_matching:
                 search_phase_name = "Fuzzy Ingredient Search"
             else:
                 search_phase_name = "Word Query API Search"
-            self.logger.info(f"[{analysis_id}] {search_phase_name} Phase: Database matching")
-            
-            # === 栄養検索入力を作成（Word Query API用） ===
-            nutrition_search_input = NutritionQueryInput(
-                ingredient_names=phase1_result.get_all_ingredient_names(),
-                dish_names=phase1_result.get_all_dish_names(),
-                preferred_source="advanced_search"
-            )
 
-            # Nutrition Searchの詳細ログを作成
-            search_log = result_manager.create_execution_log(self.search_component_name, f"{analysis_id}_nutrition_search") if result_manager else None
+            if stream_phase1 is None:
+                stream_phase1 = self.settings.PHASE1_STREAMING_ENABLED
+
+            if stream_phase1 or event_callback is not None:
+                # ストリーミング: 食材オブジェクトが閉じた時点で栄養検索を先行投入し、生成と検索を重ねる
+                # イベント通知時は食材ごとの照合完了を通知するため検索セッションを使用する
+                if stream_phase1:
+                    self.logger.info(f"[{analysis_id}] Phase 1 streaming enabled - {search_phase_name} starts per ingredient")
+                async with self.nutrition_search_component.search_session() as search_session:
+                    phase1_result = await self.phase1_component.execute(
+                        phase1_input, phase1_log, temperature=temperature, seed=seed,
+                        on_ingredient=(lambda ingredient: search_session.submit(snap_ingredient_name(ingredient.ingredient_name))) if stream_phase1 else None
+                    )
+                    self.logger.info(f"[{analysis_id}] Phase 1 completed - Detected {len(phase1_result.dishes)} dishes "
+                                     f"({len(search_session.submitted_terms)} ingredient searches already started)")
+                    catalogue_snaps = self._snap_to_catalogue(analysis_id, phase1_result)
+                    await emit_pipeline_event(event_callback, PHASE1_DETECTED, build_phase1_event(analysis_id, phase1_result))
+
+                    nutrition_search_input = self._build_nutrition_search_input(phase1_result)
+                    nutrition_search_result = await search_session.finish(
+                        nutrition_search_input,
+                        on_match=(lambda term, response: emit_pipeline_event(
+                            event_callback, INGREDIENT_MATCHED, build_ingredient_match_event(analysis_id, term, response)
+                        )) if event_callback is not None else None
+                    )
+            else:
+                phase1_result = await self.phase1_component.execute(phase1_input, phase1_log, temperature=temperature, seed=seed)
+
+                self.logger.info(f"[{analysis_id}] Phase 1 completed - Detected {len(phase1_result.dishes)} dishes")
+                catalogue_snaps = self._snap_to_catalogue(analysis_id, phase1_result)
+
+                # === Nutrition Search Phase: データベース照合 ===
+                self.logger.info(f"[{analysis_id}] {search_phase_name} Phase: Database matching")
+
+                # === 栄養検索入力を作成（Word Query API用） ===
+                nutrition_search_input = self._build_nutrition_search_input(phase1_result)
 
-            # Word Query API実行
-            nutrition_search_result = await self.nutrition_search_component.process(nutrition_search_input)
+                # Word Query API実行
+                nutrition_search_result = await self.nutrition_search_component.process(nutrition_search_input)
             
             self.logger.info(f"[{analysis_id}] {search_phase_name} completed - {nutrition_search_result.get_match_rate():.1%} match rate")
             
@@ -176,6 +215,8 @@ class MealAnalysisPipeline:
             nutrition_calculation_result = await self.nutrition_calculation_component.execute(nutrition_calculation_input, calculation_log)
             
             self.logger.info(f"[{analysis_id}] Nutrition Calculation completed - {nutrition_calculation_result.meal_nutrition.calculation_summary['total_ingredients']} ingredients, {nutrition_calculation_result.meal_nutrition.total_nutrition.calories:.1f} kcal total")
+            await emit_pipeline_event(event_callback, NUTRITION_CALCULATED,
+                                      build_nutrition_event(analysis_id, nutrition_calculation_result.meal_nutrition))
             
             # === 結果の構築 ===
             
@@ -225,7 +266,7 @@ class MealAnalysisPipeline:
                 "analysis_confidence": phase1_result.analysis_confidence,
                 "processing_notes": phase1_result.processing_notes,
                 "metadata": {
-                    "ai_model_used": self.deepinfra_service.model_id if hasattr(self, 'deepinfra_service') else "unknown"
+                    "ai_model_used": getattr(self.vision_service, "model_id", "unknown")
                 },
                 "input_data": {
                     "image_mime_type": image_mime_type,
@@ -297,7 +338,8 @@ class MealAnalysisPipeline:
                 "nutrition_search_result": {
                     "matches_count": len(nutrition_search_result.matches),
                     "match_rate": nutrition_search_result.get_match_rate(),
-                    "search_summary": nutrition_search_result.search_summary
+                    "search_summary": nutrition_search_result.search_summary,
+                    "catalogue_snaps": catalogue_snaps
                 },
 
                 "processing_summary": {
@@ -317,6 +359,12 @@ class MealAnalysisPipeline:
                     "components_used": ["Phase1Component", self.search_component_name, "NutritionCalculationComponent"]
                 }
             }
+
+            # 自動ルーティングの判断（候補・試行結果・最終モデル）を記録
+            model_routing = getattr(self.vision_service, "last_decision", None)
+            if model_routing is not None:
+                phase1_dict["metadata"]["model_routing"] = model_routing
+                complete_result["metadata"]["model_routing"] = model_routing
             
             # 新しいResultManagerで各フェーズの結果を保存
             if result_manager:
@@ -407,6 +455,23 @@ class MealAnalysisPipeline:
             ]
         } 
 
+    def _snap_to_catalogue(self, analysis_id: str, phase1_result: Phase1Output) -> list:
+        """Phase1の食材名をMyNetDiary食材名に補正し、置き換えた食材名の一覧を返す"""
+        results = snap_phase1_ingredients(phase1_result)
+        catalogue_snaps = [result.to_dict() for result in results if result.changed]
+        if catalogue_snaps:
+            self.logger.info(f"[{analysis_id}] Snapped {len(catalogue_snaps)}/{len(results)} ingredient names to the catalogue")
+        return catalogue_snaps
+
+    @staticmethod
+    def _build_nutrition_search_input(phase1_result: Phase1Output) -> NutritionQueryInput:
+        """Phase1の結果から栄養検索入力を作成（Word Query API用）"""
+        return NutritionQueryInput(
+            ingredient_names=phase1_result.get_all_ingredient_names(),
+            dish_names=phase1_result.get_all_dish_names(),
+            preferred_source="advanced_search"
+        )
+
     def _calculate_match_rate_display(self, nutrition_search_input, nutrition_search_result):
         """マッチ率の表示文字列を計算（Word Query API用）"""
         from ..models.nutrition_search_models import NutritionQueryInput
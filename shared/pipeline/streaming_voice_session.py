@@ -0,0 +1,209 @@
+"""
+ストリーミング音声入力のセッション
+
+WebSocket等で逐次届くPCM音声をVADで発話区間に区切り、区間が閉じるたびに文字起こしを開始します。
+発話終了を検出した時点で残りの区間の文字起こしを待ち、NLU→栄養検索→栄養計算を開始します。
+発話終了から最終結果までの時間を voice_stream_end_of_speech_to_result_seconds として記録します。
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import numpy as np
+
+from shared.config.settings import get_settings
+from shared.pipeline.events import FINAL
+from shared.pipeline.voice_orchestrator import VoiceAnalysisPipeline
+from shared.utils.audio_chunking import TranscriptStitcher
+from shared.utils.audio_normalization import codec_file_extension, encode_audio, resample
+from shared.utils.metrics import MetricsRegistry, get_metrics_registry
+from shared.utils.voice_activity import SpeechSegment, VoiceActivityDetector
+
+logger = logging.getLogger(__name__)
+
+# ストリーミング入力固有のイベント
+PARTIAL_TRANSCRIPT = "partial_transcript"
+END_OF_SPEECH = "end_of_speech"
+
+# (イベント名, ペイロード) を送信する非同期関数
+SessionSender = Callable[[str, Dict], Awaitable[None]]
+
+
+class StreamingVoiceSession:
+    """
+    1回の発話（1食分の音声）のストリーミング分析セッション
+
+    使用例:
+        session = StreamingVoiceSession(pipeline, send)
+        while not await session.feed(pcm_frame):
+            ...
+        response = await session.finish(build_response)
+
+    feed に渡す音声は16bit little-endian・モノラルのPCMです。
+    送信されるイベントは partial_transcript, end_of_speech, パイプラインの段階イベント
+    （phase1_detected / ingredient_matched / nutrition_calculated）、final です。
+    """
+
+    def __init__(
+        self,
+        pipeline: VoiceAnalysisPipeline,
+        send: SessionSender,
+        sample_rate: int = 16000,
+        language_code: str = "en-US",
+        llm_model_id: Optional[str] = None,
+        temperature: Optional[float] = 0.0,
+        seed: Optional[int] = 123456,
+        save_detailed_logs: bool = True,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        settings = get_settings()
+        self.pipeline = pipeline
+        self.sample_rate = sample_rate
+        self.language_code = language_code
+        self.llm_model_id = llm_model_id
+        self.temperature = temperature
+        self.seed = seed
+        self.save_detailed_logs = save_detailed_logs
+        self._send = send
+        self._target_sample_rate = settings.AUDIO_TARGET_SAMPLE_RATE
+        self._codec = settings.AUDIO_OUTPUT_CODEC
+        self._max_audio_seconds = settings.VOICE_STREAM_MAX_AUDIO_SECONDS
+
+        self.vad = VoiceActivityDetector(
+            sample_rate,
+            threshold_dbfs=settings.AUDIO_SILENCE_THRESHOLD_DBFS,
+            segment_silence_ms=settings.VOICE_STREAM_SEGMENT_SILENCE_MS,
+            end_of_speech_ms=settings.VOICE_STREAM_END_OF_SPEECH_MS,
+            padding_ms=settings.AUDIO_SILENCE_PADDING_MS,
+            max_segment_seconds=settings.SPEECH_CHUNK_MAX_SECONDS
+        )
+        self._semaphore = asyncio.Semaphore(max(1, settings.SPEECH_CHUNK_MAX_CONCURRENCY))
+        self._stitcher = TranscriptStitcher(max_overlap_tokens=0)  # 発話区間は重ならないため重複除去は不要
+        self._pcm = bytearray()
+        self._last_segment_task: Optional[asyncio.Task] = None
+        self._segment_tasks = []
+        self.end_of_speech_at: Optional[float] = None
+
+        metrics = metrics or get_metrics_registry()
+        self._result_latency_histogram = metrics.histogram(
+            "voice_stream_end_of_speech_to_result_seconds", "Time from detected end of speech to the final result"
+        )
+        self._transcript_latency_histogram = metrics.histogram(
+            "voice_stream_end_of_speech_to_transcript_seconds", "Time from detected end of speech to the complete transcript"
+        )
+
+    @property
+    def audio_seconds(self) -> float:
+        return len(self._pcm) / 2 / self.sample_rate
+
+    async def feed(self, pcm: bytes) -> bool:
+        """
+        PCM音声を追加する
+
+        Returns:
+            発話終了を検出したかどうか（最大音声長に達した場合も発話終了とみなす）
+        """
+        if self.end_of_speech_at is not None:
+            return True
+        pcm = pcm[:len(pcm) - len(pcm) % 2]
+        self._pcm.extend(pcm)
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+
+        segments, end_of_speech = self.vad.push(samples)
+        for segment in segments:
+            self._start_transcription(segment)
+        if end_of_speech or self.audio_seconds >= self._max_audio_seconds:
+            await self.end_speech()
+            return True
+        return False
+
+    async def end_speech(self) -> None:
+        """発話終了を確定する（クライアントからの終了通知・VADの検出のどちらからも呼ばれる）"""
+        if self.end_of_speech_at is not None:
+            return
+        for segment in self.vad.flush():
+            self._start_transcription(segment)
+        self.end_of_speech_at = time.perf_counter()
+        logger.info(f"End of speech after {self.audio_seconds:.2f}s of audio ({len(self._segment_tasks)} segments)")
+        await self._send(END_OF_SPEECH, {"audio_seconds": round(self.audio_seconds, 3), "segments": len(self._segment_tasks)})
+
+    async def finish(self, build_response: Callable[[Dict[str, Any]], Any] = lambda result: result) -> Any:
+        """
+        残りの文字起こしを待ってNLU→栄養検索→栄養計算を実行し、final イベントを送信する
+
+        Args:
+            build_response: パイプライン結果をレスポンスに変換する関数
+
+        Returns:
+            build_response の戻り値
+
+        Raises:
+            ValueError: 発話が検出されなかった場合
+            RuntimeError: 文字起こし・分析が失敗した場合
+        """
+        await self.end_speech()
+        if not self._segment_tasks:
+            raise ValueError("No speech detected in audio stream")
+
+        try:
+            await self._last_segment_task
+        except Exception as e:
+            raise RuntimeError(f"Speech-to-text conversion failed: {e}") from e
+        transcript = self._stitcher.text
+        self._transcript_latency_histogram.observe(time.perf_counter() - self.end_of_speech_at)
+
+        audio_bytes, _ = encode_audio(
+            np.frombuffer(bytes(self._pcm), dtype="<i2").astype(np.float32) / 32768.0, self.sample_rate, "wav"
+        )
+        result = await self.pipeline.execute_complete_analysis(
+            audio_bytes=audio_bytes,
+            audio_mime_type="audio/wav",
+            language_code=self.language_code,
+            llm_model_id=self.llm_model_id,
+            temperature=self.temperature,
+            seed=self.seed,
+            save_detailed_logs=self.save_detailed_logs,
+            event_callback=self._send,
+            transcript=transcript
+        )
+        response = build_response(result)
+
+        latency = time.perf_counter() - self.end_of_speech_at
+        self._result_latency_histogram.observe(latency)
+        payload = response.model_dump(mode="json") if hasattr(response, "model_dump") else response
+        await self._send(FINAL, {"result": payload, "end_of_speech_to_result_ms": round(latency * 1000, 1)})
+        logger.info(f"Streaming voice analysis completed {latency * 1000:.0f}ms after end of speech")
+        return response
+
+    def cancel(self) -> None:
+        """接続切断時に実行中の文字起こしを取り消す"""
+        for task in self._segment_tasks:
+            task.cancel()
+
+    def _start_transcription(self, segment: SpeechSegment) -> None:
+        previous = self._last_segment_task
+        self._last_segment_task = asyncio.create_task(self._transcribe_segment(segment, previous))
+        self._segment_tasks.append(self._last_segment_task)
+
+    async def _transcribe_segment(self, segment: SpeechSegment, previous: Optional[asyncio.Task]) -> None:
+        """発話区間を文字起こしし、前の区間の結合が終わってから時間順に結合・送信する"""
+        async with self._semaphore:
+            audio_data, codec = await asyncio.to_thread(self._encode_segment, segment)
+            text = await self.pipeline.phase1_speech_component.transcribe_audio(
+                audio_data, codec_file_extension(codec), self.language_code, self.temperature
+            )
+        if previous is not None:
+            await previous
+        self._stitcher.add(text)
+        await self._send(PARTIAL_TRANSCRIPT, {
+            "segment": segment.index,
+            "start_seconds": segment.start_seconds,
+            "end_seconds": segment.end_seconds,
+            "text": text.strip(),
+            "transcript": self._stitcher.text
+        })
+
+    def _encode_segment(self, segment: SpeechSegment):
+        samples = resample(segment.samples, self.sample_rate, self._target_sample_rate)
+        return encode_audio(samples, self._target_sample_rate, self._codec)
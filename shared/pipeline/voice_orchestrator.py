@@ -0,0 +1,370 @@
+import uuid
+from datetime import datetime
+from typing import Optional, Dict, Any
+import logging
+
+from ..components.phase1_speech_component import Phase1SpeechComponent
+from ..components.advanced_nutrition_search_component import AdvancedNutritionSearchComponent
+from ..components.nutrition_calculation_component import NutritionCalculationComponent
+from ..models.voice_analysis_models import VoiceAnalysisInput
+from ..models.nutrition_search_models import NutritionQueryInput
+from ..models.nutrition_calculation_models import NutritionCalculationInput
+from ..config import get_settings
+from ..utils.catalogue_snapping import snap_phase1_ingredients
+from .result_manager import ResultManager
+from .events import (
+    PHASE1_DETECTED, INGREDIENT_MATCHED, NUTRITION_CALCULATED, PipelineEventCallback,
+    emit_pipeline_event, build_phase1_event, build_ingredient_match_event, build_nutrition_event
+)
+
+logger = logging.getLogger(__name__)
+
+
+class VoiceAnalysisPipeline:
+    """
+    音声食事分析パイプラインのオーケストレーター
+
+    音声認識→NLU→栄養検索→栄養計算を統合して実行します。
+    同期エンドポイントと非同期ジョブの両方から利用されます。
+    """
+
+    def __init__(self, speech_service: str = "deepinfra_whisper", whisper_model: str = "openai/whisper-large-v3-turbo"):
+        """
+        パイプラインの初期化
+
+        Args:
+            speech_service: 音声認識サービス ("google" | "deepinfra_whisper")
+            whisper_model: DeepInfra Whisperモデル
+        """
+        self.pipeline_id = str(uuid.uuid4())[:8]
+        self.settings = get_settings()
+        self.speech_service = speech_service
+        self.whisper_model = whisper_model
+
+        self.phase1_speech_component = Phase1SpeechComponent(
+            speech_service_type=speech_service,
+            whisper_model=whisper_model
+        )
+        self.nutrition_search_component = AdvancedNutritionSearchComponent()
+        self.nutrition_calculation_component = NutritionCalculationComponent()
+
+        self.logger = logging.getLogger(f"{__name__}.{self.pipeline_id}")
+
+    async def execute_complete_analysis(
+        self,
+        audio_bytes: bytes,
+        audio_mime_type: str = "audio/wav",
+        language_code: str = "en-US",
+        llm_model_id: Optional[str] = None,
+        optional_text: Optional[str] = None,
+        temperature: Optional[float] = 0.0,
+        seed: Optional[int] = 123456,
+        save_detailed_logs: bool = True,
+        test_execution: bool = False,
+        test_results_dir: Optional[str] = None,
+        event_callback: Optional[PipelineEventCallback] = None,
+        transcript: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        音声からの完全な食事分析を実行
+
+        Args:
+            audio_bytes: 音声データ
+            audio_mime_type: 音声のMIMEタイプ
+            language_code: 音声認識言語コード
+            llm_model_id: NLUで使用するLLMモデルID
+            optional_text: 追加のテキスト情報
+            temperature: AI推論のランダム性制御 (0.0-1.0)
+            seed: 再現性のためのシード値
+            save_detailed_logs: 分析ログを保存するかどうか
+            test_execution: テスト実行モード
+            test_results_dir: テスト結果保存先ディレクトリ
+            event_callback: 指定時は各段階の完了時に (イベント名, ペイロード) で呼び出す
+                            （phase1_detected / ingredient_matched / nutrition_calculated）
+            transcript: 文字起こし済みのテキスト（ストリーミング入力で発話区間ごとに文字起こし済みの場合。
+                        指定時は音声認識を省略してNLUから開始）
+
+        Returns:
+            完全な分析結果（MealAnalysisPipelineと同一構造）
+        """
+        analysis_id = str(uuid.uuid4())[:8]
+        start_time = datetime.now()
+
+        # ResultManagerの初期化
+        if save_detailed_logs:
+            if test_execution and test_results_dir:
+                result_manager = ResultManager(base_dir=f"{test_results_dir}/api_calls")
+            else:
+                result_manager = ResultManager()
+            result_manager.initialize_session(analysis_id)
+        else:
+            result_manager = None
+
+        self.logger.info(f"[{analysis_id}] Starting voice meal analysis pipeline (language: {language_code}, speech_service: {self.speech_service})")
+
+        try:
+            # === Phase 1: 音声分析（Speech-to-Text + NLU） ===
+            self.logger.info(f"[{analysis_id}] Phase 1: Voice analysis (Speech-to-Text + NLU)")
+
+            voice_input = VoiceAnalysisInput(
+                audio_bytes=audio_bytes,
+                audio_mime_type=audio_mime_type,
+                llm_model_id=llm_model_id,
+                language_code=language_code,
+                optional_text=optional_text,
+                temperature=temperature,
+                seed=seed
+            )
+
+            phase1_log = result_manager.create_execution_log("Phase1SpeechComponent", f"{analysis_id}_phase1_speech") if result_manager else None
+
+            phase1_result = await self.phase1_speech_component.execute(
+                input_data=voice_input,
+                execution_log=phase1_log,
+                language_code=language_code,
+                llm_model_id=llm_model_id,
+                temperature=temperature,
+                seed=seed,
+                transcript=transcript
+            )
+
+            self.logger.info(f"[{analysis_id}] Phase 1 completed - Detected {len(phase1_result.dishes)} dishes")
+            snap_results = snap_phase1_ingredients(phase1_result)
+            catalogue_snaps = [result.to_dict() for result in snap_results if result.changed]
+            if catalogue_snaps:
+                self.logger.info(f"[{analysis_id}] Snapped {len(catalogue_snaps)}/{len(snap_results)} ingredient names to the catalogue")
+            await emit_pipeline_event(event_callback, PHASE1_DETECTED, build_phase1_event(analysis_id, phase1_result))
+
+            phase1_dict = {
+                "detected_food_items": [
+                    {
+                        "item_name": item.item_name,
+                        "confidence": item.confidence,
+                        "attributes": [
+                            {
+                                "type": attr.type.value if hasattr(attr.type, 'value') else str(attr.type),
+                                "value": attr.value,
+                                "confidence": attr.confidence
+                            }
+                            for attr in item.attributes
+                        ],
+                        "brand": item.brand or "",
+                        "category_hints": item.category_hints,
+                        "negative_cues": item.negative_cues
+                    }
+                    for item in phase1_result.detected_food_items
+                ],
+                "dishes": [
+                    {
+                        "dish_name": dish.dish_name,
+                        "confidence": dish.confidence,
+                        "ingredients": [
+                            {
+                                "ingredient_name": ing.ingredient_name,
+                                "confidence": ing.confidence,
+                                "weight_g": ing.weight_g
+                            }
+                            for ing in dish.ingredients
+                        ],
+                        "attributes": [
+                            {
+                                "type": attr.type.value if hasattr(attr.type, 'value') else str(attr.type),
+                                "value": attr.value,
+                                "confidence": attr.confidence
+                            }
+                            for attr in dish.detected_attributes
+                        ]
+                    }
+                    for dish in phase1_result.dishes
+                ],
+                "analysis_confidence": phase1_result.analysis_confidence,
+                "processing_notes": phase1_result.processing_notes,
+                "input_data": {
+                    "audio_bytes": len(audio_bytes),  # バイト数のみ保存（実際のデータは大きすぎるため）
+                    "audio_mime_type": audio_mime_type,
+                    "language_code": language_code,
+                    "llm_model_id": llm_model_id,
+                    "optional_text": optional_text,
+                    "temperature": temperature,
+                    "seed": seed,
+                    "speech_service": self.speech_service,
+                    "whisper_model": self.whisper_model if self.speech_service != "google" else None
+                },
+                "processing_details": {
+                    "audio_normalization": self.phase1_speech_component.last_audio_normalization,
+                    "chunked_transcription": self.phase1_speech_component.last_chunked_transcription
+                }
+            }
+            # Phase1SpeechComponentの実行ログから音声認識結果を取得
+            if phase1_log and phase1_log.processing_details.get("speech_recognition_result"):
+                phase1_dict["processing_details"]["speech_recognition_result"] = \
+                    phase1_log.processing_details["speech_recognition_result"]
+
+            if result_manager:
+                result_manager.add_phase_result("Phase1SpeechComponent", phase1_dict)
+
+            # === Phase 2: 栄養検索 ===
+            self.logger.info(f"[{analysis_id}] Phase 2: Nutrition database search")
+
+            nutrition_search_input = NutritionQueryInput(
+                ingredient_names=phase1_result.get_all_ingredient_names(),
+                dish_names=phase1_result.get_all_dish_names(),
+                preferred_source="advanced_search"
+            )
+            if event_callback is not None:
+                # 食材ごとの照合完了を通知するため検索セッションを使用（結果の形式は process() と同一）
+                async with self.nutrition_search_component.search_session() as search_session:
+                    nutrition_search_result = await search_session.finish(
+                        nutrition_search_input,
+                        on_match=lambda term, response: emit_pipeline_event(
+                            event_callback, INGREDIENT_MATCHED, build_ingredient_match_event(analysis_id, term, response)
+                        )
+                    )
+            else:
+                nutrition_search_result = await self.nutrition_search_component.process(nutrition_search_input)
+
+            self.logger.info(f"[{analysis_id}] Phase 2 completed - {nutrition_search_result.get_match_rate():.1%} match rate")
+
+            nutrition_search_dict = {
+                "matches_count": len(nutrition_search_result.matches),
+                "match_rate": nutrition_search_result.get_match_rate(),
+                "search_summary": nutrition_search_result.search_summary,
+                "catalogue_snaps": catalogue_snaps
+            }
+            if result_manager:
+                result_manager.add_phase_result("AdvancedNutritionSearchComponent", {
+                    **nutrition_search_dict,
+                    "matches": [
+                        {
+                            "query_term": str(term),
+                            "matched_food": str(term),
+                            "confidence_score": 1.0,
+                            "source_database": "elasticsearch",
+                            "nutrition_per_100g": {}
+                        }
+                        for term in nutrition_search_result.matches
+                    ]
+                })
+
+            # === Phase 3: 栄養計算 ===
+            self.logger.info(f"[{analysis_id}] Phase 3: Nutrition calculation")
+
+            nutrition_calculation_input = NutritionCalculationInput(
+                phase1_result=phase1_result,
+                nutrition_search_result=nutrition_search_result
+            )
+            calculation_log = result_manager.create_execution_log("NutritionCalculationComponent", f"{analysis_id}_nutrition_calculation") if result_manager else None
+
+            nutrition_calculation_result = await self.nutrition_calculation_component.execute(nutrition_calculation_input, calculation_log)
+            meal_nutrition = nutrition_calculation_result.meal_nutrition
+
+            self.logger.info(f"[{analysis_id}] Phase 3 completed - {meal_nutrition.total_nutrition.calories:.1f} kcal total")
+            await emit_pipeline_event(event_callback, NUTRITION_CALCULATED, build_nutrition_event(analysis_id, meal_nutrition))
+
+            nutrition_calculation_dict = {
+                "dishes": [
+                    {
+                        "dish_name": dish.dish_name,
+                        "confidence": dish.confidence,
+                        "ingredients": [
+                            {
+                                "ingredient_name": ing.ingredient_name,
+                                "weight_g": ing.weight_g,
+                                "nutrition_per_100g": ing.nutrition_per_100g,
+                                "calculated_nutrition": _nutrition_to_dict(ing.calculated_nutrition),
+                                "source_db": ing.source_db,
+                                "calculation_notes": ing.calculation_notes
+                            }
+                            for ing in dish.ingredients
+                        ],
+                        "total_nutrition": _nutrition_to_dict(dish.total_nutrition),
+                        "calculation_metadata": dish.calculation_metadata
+                    }
+                    for dish in meal_nutrition.dishes
+                ],
+                "total_nutrition": _nutrition_to_dict(meal_nutrition.total_nutrition),
+                "calculation_summary": meal_nutrition.calculation_summary,
+                "warnings": meal_nutrition.warnings,
+                "match_rate_percent": nutrition_search_result.get_match_rate() * 100
+            }
+
+            if result_manager:
+                result_manager.add_phase_result("NutritionCalculationComponent", nutrition_calculation_dict)
+
+            # === 結果の構築 ===
+            processing_time = (datetime.now() - start_time).total_seconds()
+
+            complete_result = {
+                "analysis_id": analysis_id,
+                "input_type": "voice",
+                "phase1_result": phase1_dict,
+                "nutrition_search_result": nutrition_search_dict,
+                "processing_summary": {
+                    "total_dishes": len(phase1_result.dishes),
+                    "total_ingredients": len(phase1_result.get_all_ingredient_names()),
+                    "nutrition_calculation_status": "completed",
+                    "total_calories": meal_nutrition.total_nutrition.calories,
+                    "pipeline_status": "completed",
+                    "processing_time_seconds": processing_time
+                },
+                "final_nutrition_result": nutrition_calculation_dict,
+                # 音声分析ではNLUでLLMを使用
+                "ai_model_used": llm_model_id or self.settings.DEEPINFRA_MODEL_ID,
+                "metadata": {
+                    "pipeline_version": "v2.0",
+                    "timestamp": datetime.now().isoformat(),
+                    "components_used": ["Phase1SpeechComponent", "AdvancedNutritionSearchComponent", "NutritionCalculationComponent"],
+                    "speech_service": self.speech_service,
+                    "whisper_model": self.whisper_model if self.speech_service != "google" else None
+                }
+            }
+
+            if result_manager:
+                result_manager.set_final_result({
+                    "analysis_id": analysis_id,
+                    "input_type": "voice",
+                    "processing_time_seconds": processing_time,
+                    "total_dishes": len(phase1_result.dishes),
+                    "total_calories": meal_nutrition.total_nutrition.calories,
+                    "optional_text_used": optional_text,
+                    "temperature": temperature,
+                    "seed": seed,
+                    "speech_service": self.speech_service,
+                    "whisper_model": self.whisper_model if self.speech_service != "google" else None
+                })
+                result_manager.finalize_pipeline()
+                result_manager.save_phase_results()
+                complete_result["analysis_folder"] = result_manager.get_analysis_folder_path()
+                self.logger.info(f"[{analysis_id}] Analysis logs saved to folder: {result_manager.get_analysis_folder_path()}")
+
+            self.logger.info(f"[{analysis_id}] Voice meal analysis completed successfully in {processing_time:.2f}s")
+
+            return complete_result
+
+        except Exception as e:
+            self.logger.error(f"[{analysis_id}] Voice meal analysis failed: {str(e)}", exc_info=True)
+
+            # エラー時もResultManagerを保存
+            if result_manager:
+                result_manager.set_final_result({
+                    "error": str(e),
+                    "timestamp": datetime.now().isoformat(),
+                    "analysis_id": analysis_id
+                })
+                result_manager.finalize_pipeline()
+                result_manager.save_phase_results()
+
+            raise
+
+
+def _nutrition_to_dict(nutrition) -> Dict[str, Any]:
+    """NutritionInfoをレスポンス用の辞書に変換"""
+    return {
+        "calories": nutrition.calories,
+        "protein": nutrition.protein,
+        "fat": nutrition.fat,
+        "carbs": nutrition.carbs,
+        "fiber": nutrition.fiber,
+        "sugar": nutrition.sugar,
+        "sodium": nutrition.sodium
+    }
@@ -2,10 +2,8 @@
 Shared services for unified API system
 """
 
-from .speech_service import SpeechService
 from .nlu_service import NLUService
 
 __all__ = [
-    "SpeechService",
     "NLUService"
-]
\ No newline at end of file
+]
@@ -0,0 +1,131 @@
+"""
+長時間音声の並列チャンク文字起こし
+
+split_audio_on_silence で分割したチャンクを、同時実行数を制限しながら任意のバックエンド
+（DeepInfra / OpenAI / ローカルWhisper / Google）で並列に文字起こしし、時間順に重複を除いて結合します。
+"""
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, List, Optional
+
+from shared.utils.audio_chunking import AudioChunk, TranscriptStitcher
+from shared.utils.metrics import MetricsRegistry, get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# チャンク1つを文字起こしする関数（バックエンドごとの呼び出しを包む）
+ChunkTranscriber = Callable[[AudioChunk], Awaitable[str]]
+# 結合済みテキストに追加された部分を時間順に受け取るコールバック
+StitchedTextCallback = Callable[[str], None]
+
+
+@dataclass
+class ChunkTranscript:
+    """チャンクごとの文字起こし結果"""
+    index: int
+    start_seconds: float
+    end_seconds: float
+    text: str
+    latency_ms: float
+
+
+@dataclass
+class ChunkedTranscriptionResult:
+    """並列チャンク文字起こしの結果"""
+    transcript: str
+    chunks: List[ChunkTranscript] = field(default_factory=list)
+    max_concurrency: int = 1
+    wall_time_ms: float = 0.0
+
+    @property
+    def audio_seconds(self) -> float:
+        return self.chunks[-1].end_seconds if self.chunks else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "chunk_count": len(self.chunks),
+            "max_concurrency": self.max_concurrency,
+            "audio_seconds": self.audio_seconds,
+            "wall_time_ms": self.wall_time_ms,
+            "chunks": [asdict(chunk) for chunk in self.chunks],
+        }
+
+
+async def transcribe_in_chunks(
+    chunks: List[AudioChunk],
+    transcribe: ChunkTranscriber,
+    max_concurrency: int = 4,
+    on_text: Optional[StitchedTextCallback] = None,
+    metrics: Optional[MetricsRegistry] = None
+) -> ChunkedTranscriptionResult:
+    """
+    チャンクを並列に文字起こしし、時間順に結合する
+
+    チャンクは最大 max_concurrency 件ずつ同時に処理されます。結合は先頭から順に行い、
+    あるチャンクまでの結果がそろった時点で追加分を on_text に渡すため、
+    呼び出し側は残りのチャンクを待たずに後続処理（NLU等）を始められます。
+
+    Args:
+        chunks: 時間順の音声チャンク
+        transcribe: チャンク1つを文字起こしする関数
+        max_concurrency: 同時に文字起こしするチャンク数の上限
+        on_text: 結合済みテキストへの追加分を受け取るコールバック（オプション）
+        metrics: メトリクスレジストリ（省略時はプロセス共通のレジストリ）
+
+    Returns:
+        ChunkedTranscriptionResult
+
+    Raises:
+        RuntimeError: いずれかのチャンクの文字起こしが失敗した場合（残りのチャンクはキャンセル）
+    """
+    metrics = metrics or get_metrics_registry()
+    chunk_histogram = metrics.histogram(
+        "speech_chunk_transcription_seconds", "Transcription latency of a single audio chunk"
+    )
+    count_histogram = metrics.histogram(
+        "speech_transcription_chunks", "Number of chunks a recording was split into", buckets=(1, 2, 4, 8, 16, 32, 64)
+    )
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    started = time.perf_counter()
+
+    async def run(chunk: AudioChunk) -> ChunkTranscript:
+        async with semaphore:
+            chunk_started = time.perf_counter()
+            text = await transcribe(chunk)
+            elapsed = time.perf_counter() - chunk_started
+        chunk_histogram.observe(elapsed)
+        logger.debug(f"Chunk {chunk.index} ({chunk.start_seconds:.1f}-{chunk.end_seconds:.1f}s) transcribed in {elapsed:.2f}s")
+        return ChunkTranscript(chunk.index, chunk.start_seconds, chunk.end_seconds, text, round(elapsed * 1000, 1))
+
+    tasks = [asyncio.create_task(run(chunk)) for chunk in chunks]
+    stitcher = TranscriptStitcher()
+    results = []
+    try:
+        for chunk, task in zip(chunks, tasks):
+            try:
+                result = await task
+            except Exception as e:
+                raise RuntimeError(f"Transcription of chunk {chunk.index} failed: {e}") from e
+            results.append(result)
+            appended = stitcher.add(result.text)
+            if appended and on_text:
+                on_text(appended)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    count_histogram.observe(len(chunks))
+    wall_time_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(
+        f"Transcribed {len(chunks)} chunks ({results[-1].end_seconds if results else 0:.1f}s of audio) "
+        f"with concurrency {max_concurrency} in {wall_time_ms:.0f}ms"
+    )
+    return ChunkedTranscriptionResult(
+        transcript=stitcher.text,
+        chunks=results,
+        max_concurrency=max_concurrency,
+        wall_time_ms=wall_time_ms
+    )
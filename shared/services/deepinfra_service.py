@@ -1,14 +1,18 @@
 # app_v2/services/deepinfra_service.py
 
 import os
+import asyncio
 import base64
 import logging
 import json
 import hashlib
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, AsyncIterator
 
 from openai import AsyncOpenAI, APIError, RateLimitError, APIConnectionError
+from ..cassette import recorded_call, recorded_stream
 from ..config import get_settings
+from .model_router import get_model_latency_tracker
 
 # ロガーの設定
 logger = logging.getLogger(__name__)
@@ -39,6 +43,8 @@ class DeepInfraService:
         base_model = model_id or settings.DEEPINFRA_MODEL_ID
         # バージョンpin機能：MODEL:VERSION形式で固定
         self.model_id = f"{base_model}:{model_version}" if model_version else base_model
+        # レイテンシ統計はバージョンを除いたモデルID単位で記録
+        self.base_model_id = base_model
         
         # モデル検証
         if not settings.validate_model_id(self.model_id):
@@ -65,6 +71,28 @@ class DeepInfraService:
         base64_image = base64.b64encode(image_bytes).decode('utf-8')
         return f"data:{mime_type};base64,{base64_image}"
 
+    def _build_messages(self, image_bytes: bytes, image_mime_type: str, prompt: str) -> List[Dict[str, Any]]:
+        """OpenAI互換のマルチモーダルメッセージペイロードを構築"""
+        base64_image_url = self._encode_image_to_base64(image_bytes, image_mime_type)
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": base64_image_url
+                        }
+                    }
+                ]
+            }
+        ]
+
+    @recorded_call("deepinfra.analyze_image", context=lambda service: {"model_id": service.model_id})
     async def analyze_image(
         self,
         image_bytes: bytes,
@@ -104,27 +132,10 @@ class DeepInfraService:
             expected_time = self.model_config["expected_response_time_ms"]
             logger.info(f"Expected response time for {self.model_id}: {expected_time}ms")
 
-        base64_image_url = self._encode_image_to_base64(image_bytes, image_mime_type)
-
-        # OpenAI互換のマルチモーダルメッセージペイロードを構築
-        messages: List[Dict[str, Any]] = [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": base64_image_url
-                        }
-                    }
-                ]
-            }
-        ]
+        messages = self._build_messages(image_bytes, image_mime_type, prompt)
 
+        started = time.monotonic()
+        outcome = "error"
         try:
             response = await self.client.chat.completions.create(
                 model=self.model_id,
@@ -152,8 +163,14 @@ class DeepInfraService:
                 logger.error(f"Invalid JSON received from API: {e}")
                 raise ValueError(f"APIから無効なJSONが返されました: {e}")
             
+            outcome = "success"
             return raw_json_content
 
+        except asyncio.CancelledError:
+            # タイムアウト等による打ち切りは呼び出し側で記録する
+            outcome = "cancelled"
+            raise
+
         except (RateLimitError, APIConnectionError) as e:
             logger.error(f"API communication error (retriable): {e}", exc_info=True)
             # TODO: ここに指数バックオフ付きのリトライロジックを実装することを推奨
@@ -163,4 +180,108 @@ class DeepInfraService:
             raise Exception(f"APIエラーが発生しました: {e}") from e
         except Exception as e:
             logger.error(f"An unexpected error occurred during API call: {e}", exc_info=True)
-            raise ValueError(f"予期せぬエラーが発生しました: {e}") from e 
\ No newline at end of file
+            raise ValueError(f"予期せぬエラーが発生しました: {e}") from e
+        finally:
+            if outcome != "cancelled":
+                # 自動ルーティング（ai_model_id="auto"）用にレイテンシとエラー率を記録
+                get_model_latency_tracker().record(
+                    self.base_model_id,
+                    (time.monotonic() - started) * 1000,
+                    success=(outcome == "success")
+                ) 
+
+    @recorded_stream("deepinfra.stream_image_analysis", context=lambda service: {"model_id": service.model_id})
+    async def stream_image_analysis(
+        self,
+        image_bytes: bytes,
+        image_mime_type: str,
+        prompt: str,
+        max_tokens: int = 4096,
+        temperature: float = 0.0,
+        seed: int = 123456
+    ) -> AsyncIterator[str]:
+        """
+        画像分析をストリーミングで実行し、生成されたテキスト断片を順次返す
+
+        analyze_image と同じリクエストを stream=True で送信します。
+        受信したテキストのJSON検証は呼び出し側で行います。
+
+        Args:
+            image_bytes: 分析対象の画像のバイトデータ。
+            image_mime_type: 画像のMIMEタイプ (例: 'image/jpeg')。
+            prompt: モデルに与える指示プロンプト。
+            max_tokens: 生成される最大トークン数。
+            temperature: 生成のランダム性を制御する値 (0に近いほど決定的)。
+            seed: 再現性のためのシード値。
+
+        Yields:
+            モデルが生成したテキスト断片。
+
+        Raises:
+            ValueError: レスポンスが空の場合に発生。
+            Exception: Deep Infra APIとの通信でエラーが発生した場合に発生。
+        """
+        logger.info(f"Starting streaming image analysis with model {self.model_id}.")
+
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        logger.info(f"[input_digest] model={self.model_id} image_sha256={image_hash} prompt_sha256={prompt_hash} temp={temperature} seed={seed} stream=true")
+
+        messages = self._build_messages(image_bytes, image_mime_type, prompt)
+
+        started = time.monotonic()
+        outcome = "error"
+        received_chars = 0
+        first_token_ms = None
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model_id,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                seed=seed,
+                top_p=1.0,
+                response_format={"type": "json_object"},
+                stream=True,
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content if chunk.choices[0].delta else None
+                if not delta:
+                    continue
+                if first_token_ms is None:
+                    first_token_ms = (time.monotonic() - started) * 1000
+                received_chars += len(delta)
+                yield delta
+
+            if received_chars == 0:
+                logger.error("Streaming API response is empty.")
+                raise ValueError("APIからのレスポンスが空です。")
+
+            outcome = "success"
+            logger.info(f"Streaming response finished: {received_chars} chars, first token after {first_token_ms:.0f}ms")
+
+        except (asyncio.CancelledError, GeneratorExit):
+            # 呼び出し側による打ち切りはエラーとして記録しない
+            outcome = "cancelled"
+            raise
+
+        except (RateLimitError, APIConnectionError) as e:
+            logger.error(f"API communication error (retriable): {e}", exc_info=True)
+            raise Exception(f"APIとの通信に一時的な問題が発生しました: {e}") from e
+        except APIError as e:
+            logger.error(f"A non-retriable API error occurred: {e}", exc_info=True)
+            raise Exception(f"APIエラーが発生しました: {e}") from e
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"An unexpected error occurred during streaming API call: {e}", exc_info=True)
+            raise ValueError(f"予期せぬエラーが発生しました: {e}") from e
+        finally:
+            if outcome != "cancelled":
+                get_model_latency_tracker().record(
+                    self.base_model_id,
+                    (time.monotonic() - started) * 1000,
+                    success=(outcome == "success")
+                )
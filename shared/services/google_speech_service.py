@@ -8,8 +8,18 @@ import logging
 from typing import Optional
 from google.cloud import speech
 
+from shared.utils.audio_normalization import probe_audio_format
+
 logger = logging.getLogger(__name__)
 
+# ヘッダーから判定したフォーマットとGoogle Speech-to-Textのエンコーディングの対応
+_ENCODINGS = {
+    "wav": speech.RecognitionConfig.AudioEncoding.LINEAR16,
+    "flac": speech.RecognitionConfig.AudioEncoding.FLAC,
+    "ogg": speech.RecognitionConfig.AudioEncoding.OGG_OPUS,
+}
+_OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
 
 class GoogleSpeechService:
     """
@@ -51,7 +61,7 @@ class GoogleSpeechService:
         音声データをテキストに変換
 
         Args:
-            audio_data: WAV音声バイナリデータ
+            audio_data: 音声バイナリデータ（WAV / FLAC / OGG Opus、フォーマットはヘッダーから判定）
             language_code: 言語コード (ISO BCP-47形式、例: "en-US", "ja-JP")
 
         Returns:
@@ -66,10 +76,20 @@ class GoogleSpeechService:
             from google.cloud import speech
             import asyncio
 
+            # エンコーディング・サンプリングレート・チャンネル数はヘッダーから取得
+            audio_format, sample_rate, channels = probe_audio_format(audio_data)
+            encoding = _ENCODINGS.get(audio_format, speech.RecognitionConfig.AudioEncoding.LINEAR16)
+            if audio_format == "ogg" and sample_rate not in _OPUS_SAMPLE_RATES:
+                sample_rate = 48000  # Opusのデコードレート（OpusHeadの元サンプリングレートは参考値）
+            if sample_rate is None:
+                logger.warning(f"Could not read sample rate from {audio_format} header, assuming 16000 Hz")
+                sample_rate = 16000
+
             # Google Speech-to-Text設定
             config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=16000,
+                encoding=encoding,
+                sample_rate_hertz=sample_rate,
+                audio_channel_count=channels or 1,
                 language_code=language_code,
                 # Enhancedモデルを使用（より高精度）
                 model="latest_long",
@@ -114,18 +134,10 @@ class GoogleSpeechService:
             audio_data: 音声バイナリデータ
 
         Returns:
-            tuple: (エンコーディング, 推定サンプリングレート)
+            tuple: (エンコーディング, サンプリングレート)（ヘッダーから読めない場合は16000）
         """
-        # 簡易的なフォーマット判定
-        if audio_data.startswith(b'RIFF') and b'WAVE' in audio_data[:12]:
-            return ("wav", 16000)
-        elif audio_data.startswith(b'fLaC'):
-            return ("flac", 16000)
-        elif (audio_data.startswith(b'ID3') or 
-              audio_data[:2] == b'\\xff\\xfb' or 
-              audio_data[:2] == b'\\xff\\xf3' or 
-              audio_data[:2] == b'\\xff\\xf2'):
-            return ("mp3", 16000)
-        else:
+        audio_format, sample_rate, _ = probe_audio_format(audio_data)
+        if audio_format == "unknown":
             logger.warning("Could not detect audio format, defaulting to WAV")
-            return ("wav", 16000)
\ No newline at end of file
+            return ("wav", 16000)
+        return (audio_format, sample_rate or 16000)
@@ -0,0 +1,496 @@
+"""
+レイテンシを考慮したVisionモデルルーター
+
+ai_model_id="auto" が指定された場合に使用します。
+モデルごとに観測したレイテンシ（EWMA・パーセンタイル）とエラー率を記録し、
+リクエストごとのレイテンシ予算を満たす中で最も精度の高いモデルを選択します。
+選択したモデルがタイムアウトした場合はより高速なモデルにフォールバックします。
+エラー率が高く除外したモデルにも、一定時間ごとに1回だけリクエストを送って回復を確かめます。
+"""
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from ..config import get_settings
+from ..utils.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# 自動ルーティングを指定するモデルID
+AUTO_MODEL_ID = "auto"
+
+
+@dataclass
+class ModelLatencyStats:
+    """モデル単位の観測統計"""
+    model_id: str
+    window_size: int
+    ewma_latency_ms: Optional[float] = None
+    ewma_error_rate: float = 0.0
+    success_count: int = 0
+    error_count: int = 0
+    timeout_count: int = 0
+    last_used_at: float = 0.0  # 最後に記録・試行枠を確保した時刻（time.monotonic）
+    samples: Deque[float] = field(default=None)
+
+    def __post_init__(self):
+        if self.samples is None:
+            self.samples = deque(maxlen=self.window_size)
+
+
+class ModelLatencyTracker:
+    """
+    モデルごとのレイテンシ・エラー率トラッカー
+
+    - 成功・タイムアウト時のレイテンシをEWMAと直近ウィンドウ（パーセンタイル用）に記録
+    - エラー率はEWMA（成功=0, 失敗=1）で追跡
+    """
+
+    def __init__(self, ewma_alpha: float = 0.2, window_size: int = 200):
+        if not 0.0 < ewma_alpha <= 1.0:
+            raise ValueError("ewma_alpha must be in (0, 1]")
+        self.ewma_alpha = ewma_alpha
+        self.window_size = window_size
+        self._stats: Dict[str, ModelLatencyStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_id: str, latency_ms: float, success: bool, timed_out: bool = False) -> None:
+        """
+        1回の呼び出し結果を記録
+
+        Args:
+            model_id: モデルID
+            latency_ms: 呼び出しに要した時間（ミリ秒）
+            success: 成功したかどうか
+            timed_out: タイムアウトで打ち切られたかどうか（レイテンシは下限値として記録）
+        """
+        alpha = self.ewma_alpha
+        with self._lock:
+            stats = self._stats.get(model_id)
+            if stats is None:
+                stats = ModelLatencyStats(model_id=model_id, window_size=self.window_size)
+                self._stats[model_id] = stats
+
+            # エラー応答のレイテンシは処理時間を表さないため、成功とタイムアウトのみ反映
+            if success or timed_out:
+                stats.samples.append(latency_ms)
+                if stats.ewma_latency_ms is None:
+                    stats.ewma_latency_ms = latency_ms
+                else:
+                    stats.ewma_latency_ms = (1 - alpha) * stats.ewma_latency_ms + alpha * latency_ms
+
+            stats.ewma_error_rate = (1 - alpha) * stats.ewma_error_rate + alpha * (0.0 if success else 1.0)
+            stats.last_used_at = time.monotonic()
+            if success:
+                stats.success_count += 1
+            elif timed_out:
+                stats.timeout_count += 1
+            else:
+                stats.error_count += 1
+
+    def percentile(self, model_id: str, percentile: float) -> Optional[float]:
+        """直近ウィンドウのレイテンシパーセンタイル（サンプルがなければNone）"""
+        with self._lock:
+            stats = self._stats.get(model_id)
+            samples = sorted(stats.samples) if stats else []
+        if not samples:
+            return None
+        # nearest-rank法
+        rank = max(1, int(math.ceil(percentile / 100.0 * len(samples))))
+        return samples[rank - 1]
+
+    def sample_count(self, model_id: str) -> int:
+        with self._lock:
+            stats = self._stats.get(model_id)
+            return len(stats.samples) if stats else 0
+
+    def error_rate(self, model_id: str) -> float:
+        with self._lock:
+            stats = self._stats.get(model_id)
+            return stats.ewma_error_rate if stats else 0.0
+
+    def claim_probe(self, model_id: str, interval_seconds: float) -> bool:
+        """
+        最後の呼び出しから interval_seconds 以上経過していれば、試行1回分の枠を確保する
+
+        除外中のモデルには呼び出しがなく統計が更新されないため、回復の確認に使います。
+        枠を確保すると次の interval_seconds までは確保できません（同時に複数の試行を送らない）。
+        """
+        now = time.monotonic()
+        with self._lock:
+            stats = self._stats.get(model_id)
+            if stats is None or now - stats.last_used_at < interval_seconds:
+                return False
+            stats.last_used_at = now
+            return True
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """全モデルの統計スナップショット"""
+        with self._lock:
+            model_ids = list(self._stats.keys())
+        result = {}
+        for model_id in model_ids:
+            with self._lock:
+                stats = self._stats[model_id]
+                entry = {
+                    "ewma_latency_ms": stats.ewma_latency_ms,
+                    "error_rate": stats.ewma_error_rate,
+                    "success_count": stats.success_count,
+                    "error_count": stats.error_count,
+                    "timeout_count": stats.timeout_count,
+                    "samples": len(stats.samples)
+                }
+            entry["p50_latency_ms"] = self.percentile(model_id, 50)
+            entry["p90_latency_ms"] = self.percentile(model_id, 90)
+            entry["p99_latency_ms"] = self.percentile(model_id, 99)
+            result[model_id] = entry
+        return result
+
+
+@dataclass
+class RoutingCandidate:
+    """ルーティング候補モデル"""
+    model_id: str
+    predicted_latency_ms: float
+    latency_source: str  # "observed"（観測値）または "configured"（MODEL_PERFORMANCE_CONFIG）
+    error_rate: float
+    quality: float
+    probe: bool = False  # エラー率が高いが、回復確認のために候補に戻したか
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model_id": self.model_id,
+            "predicted_latency_ms": round(self.predicted_latency_ms, 1),
+            "latency_source": self.latency_source,
+            "error_rate": round(self.error_rate, 4),
+            "quality": self.quality,
+            "probe": self.probe
+        }
+
+
+@dataclass
+class RoutingPlan:
+    """1リクエスト分のルーティング計画"""
+    latency_budget_ms: float
+    primary: RoutingCandidate
+    fallback: Optional[RoutingCandidate]
+    primary_timeout_ms: Optional[float]
+    within_budget: bool
+    candidates: List[RoutingCandidate]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": AUTO_MODEL_ID,
+            "latency_budget_ms": self.latency_budget_ms,
+            "selected_model": self.primary.model_id,
+            "fallback_model": self.fallback.model_id if self.fallback else None,
+            "primary_timeout_ms": round(self.primary_timeout_ms, 1) if self.primary_timeout_ms is not None else None,
+            "within_budget": self.within_budget,
+            "candidates": [candidate.to_dict() for candidate in self.candidates]
+        }
+
+
+class VisionModelRouter:
+    """
+    レイテンシ予算に基づくモデル選択
+
+    候補は SUPPORTED_VISION_MODELS のうち MODEL_PERFORMANCE_CONFIG に特性が定義されたモデル。
+    観測サンプルが MODEL_ROUTER_MIN_SAMPLES 未満のモデルは設定値の expected_response_time_ms で予測します。
+    エラー率が MODEL_ROUTER_MAX_ERROR_RATE を超えるモデルは除外しますが、最後の呼び出しから
+    MODEL_ROUTER_PROBE_INTERVAL_SECONDS 経過するごとに1回だけ候補に戻します（成功すればエラー率が下がり回復する）。
+    """
+
+    def __init__(self, tracker: Optional["ModelLatencyTracker"] = None, settings=None):
+        self.settings = settings or get_settings()
+        self.tracker = tracker or get_model_latency_tracker()
+
+    def candidates(self) -> List[RoutingCandidate]:
+        """現在の統計に基づく候補一覧"""
+        settings = self.settings
+        candidates = []
+        for model_id in settings.SUPPORTED_VISION_MODELS:
+            config = settings.get_model_config(model_id)
+            if not config:
+                continue  # 特性が不明なモデル（実験用など）は自動選択しない
+
+            observed = None
+            if self.tracker.sample_count(model_id) >= settings.MODEL_ROUTER_MIN_SAMPLES:
+                observed = self.tracker.percentile(model_id, settings.MODEL_ROUTER_LATENCY_PERCENTILE)
+
+            if observed is not None:
+                predicted, source = observed, "observed"
+            else:
+                predicted, source = float(config.get("expected_response_time_ms", math.inf)), "configured"
+
+            confidence_range = config.get("confidence_range") or [0.0, 0.0]
+            candidates.append(RoutingCandidate(
+                model_id=model_id,
+                predicted_latency_ms=predicted,
+                latency_source=source,
+                error_rate=self.tracker.error_rate(model_id),
+                quality=confidence_range[-1]
+            ))
+        return candidates
+
+    def plan(self, latency_budget_ms: float) -> RoutingPlan:
+        """
+        レイテンシ予算に対するルーティング計画を作成
+
+        Args:
+            latency_budget_ms: リクエストのレイテンシ予算（ミリ秒）
+
+        Returns:
+            RoutingPlan
+
+        Raises:
+            RuntimeError: 候補モデルが1つもない場合
+        """
+        settings = self.settings
+        candidates = self.candidates()
+        if not candidates:
+            raise RuntimeError("No vision model with MODEL_PERFORMANCE_CONFIG is available for auto routing")
+
+        # エラー率の高いモデルは除外（試行枠を確保できたものは回復確認のために残す。全滅した場合は全候補を使う）
+        max_error_rate = settings.MODEL_ROUTER_MAX_ERROR_RATE
+        if any(c.error_rate <= max_error_rate for c in candidates):
+            for c in candidates:
+                if c.error_rate > max_error_rate:
+                    c.probe = self.tracker.claim_probe(c.model_id, settings.MODEL_ROUTER_PROBE_INTERVAL_SECONDS)
+            healthy = [c for c in candidates if c.error_rate <= max_error_rate or c.probe]
+        else:
+            healthy = candidates
+        by_speed = sorted(healthy, key=lambda c: c.predicted_latency_ms)
+
+        # 予算内で最も精度の高いモデル。予算内のモデルがなければ最速モデル
+        in_budget = [c for c in healthy if c.predicted_latency_ms <= latency_budget_ms]
+        if in_budget:
+            primary = max(in_budget, key=lambda c: (c.quality, -c.predicted_latency_ms))
+        else:
+            primary = by_speed[0]
+
+        fallback = next(
+            (c for c in by_speed if c.model_id != primary.model_id and c.predicted_latency_ms < primary.predicted_latency_ms),
+            None
+        )
+
+        # フォールバック先がある場合のみ、主モデルにタイムアウトを設定する
+        primary_timeout_ms = None
+        if fallback is not None:
+            # 予算いっぱいまで待つとフォールバックの時間がなくなるため、その分を残す
+            # （ただし予測レイテンシより短くはしない）
+            primary_timeout_ms = max(
+                primary.predicted_latency_ms,
+                min(
+                    primary.predicted_latency_ms * settings.MODEL_ROUTER_TIMEOUT_MULTIPLIER,
+                    latency_budget_ms - fallback.predicted_latency_ms
+                )
+            )
+
+        return RoutingPlan(
+            latency_budget_ms=latency_budget_ms,
+            primary=primary,
+            fallback=fallback,
+            primary_timeout_ms=primary_timeout_ms,
+            within_budget=bool(in_budget),
+            candidates=candidates
+        )
+
+
+class RoutedVisionService:
+    """
+    自動ルーティング付きVisionサービス
+
+    DeepInfraService と同じ analyze_image インターフェースを持ち、Phase1Component にそのまま渡せます。
+    呼び出し後の last_decision にルーティング判断（候補・試行結果・最終モデル）が記録されます。
+    """
+
+    def __init__(
+        self,
+        latency_budget_ms: Optional[float] = None,
+        router: Optional[VisionModelRouter] = None,
+        service_factory: Optional[Callable[[str], Any]] = None
+    ):
+        """
+        Args:
+            latency_budget_ms: レイテンシ予算（ミリ秒）。Noneの場合は設定ファイルのデフォルト
+            router: 使用するルーター（Noneの場合はグローバルなトラッカーを使うルーター）
+            service_factory: モデルIDからVisionサービスを生成する関数（Noneの場合はDeepInfraService）
+
+        Raises:
+            ValueError: Deep Infra API keyが設定されていない場合
+        """
+        settings = get_settings()
+        self.latency_budget_ms = float(latency_budget_ms or settings.MODEL_ROUTER_DEFAULT_LATENCY_BUDGET_MS)
+        self.router = router or VisionModelRouter()
+
+        if service_factory is None:
+            if not (settings.DEEPINFRA_API_KEY or os.getenv("DEEPINFRA_API_KEY")):
+                raise ValueError("Deep Infra API keyが設定されていません。設定ファイルまたは環境変数 'DEEPINFRA_API_KEY' を設定してください。")
+            from .deepinfra_service import DeepInfraService
+            service_factory = lambda model_id: DeepInfraService(model_id=model_id)
+        self._service_factory = service_factory
+        self._services: Dict[str, Any] = {}
+
+        # 呼び出し後に実際に使用したモデルへ更新される
+        self.model_id = AUTO_MODEL_ID
+        self.model_config: Dict[str, Any] = {}
+        self.last_decision: Optional[Dict[str, Any]] = None
+
+        self._attempts_counter = get_metrics_registry().counter(
+            "vision_model_router_attempts_total", "Auto-routed vision model attempts per model and outcome"
+        )
+
+    def _get_service(self, model_id: str):
+        service = self._services.get(model_id)
+        if service is None:
+            service = self._service_factory(model_id)
+            self._services[model_id] = service
+        return service
+
+    async def analyze_image(
+        self,
+        image_bytes: bytes,
+        image_mime_type: str,
+        prompt: str,
+        max_tokens: int = 4096,
+        temperature: float = 0.0,
+        seed: int = 123456
+    ) -> str:
+        """
+        ルーティング計画に従って画像分析を実行
+
+        Returns:
+            モデルからのJSONレスポンス文字列
+
+        Raises:
+            Exception: 主モデル・フォールバックモデルの両方が失敗した場合（最後のエラー）
+        """
+        plan = self.router.plan(self.latency_budget_ms)
+        decision = plan.to_dict()
+        decision["attempts"] = []
+        self.last_decision = decision
+
+        logger.info(
+            f"Auto routing: budget={self.latency_budget_ms:.0f}ms -> {plan.primary.model_id} "
+            f"(predicted {plan.primary.predicted_latency_ms:.0f}ms, {plan.primary.latency_source}), "
+            f"fallback={plan.fallback.model_id if plan.fallback else None}"
+        )
+
+        started = time.monotonic()
+        attempts = [(plan.primary, plan.primary_timeout_ms)]
+        if plan.fallback is not None:
+            attempts.append((plan.fallback, None))
+
+        last_error: Optional[BaseException] = None
+        for candidate, timeout_ms in attempts:
+            if candidate is not plan.primary:
+                # フォールバックには残りの予算を与える（予測レイテンシを下回らない範囲で）
+                remaining_ms = self.latency_budget_ms - (time.monotonic() - started) * 1000
+                timeout_ms = max(remaining_ms, candidate.predicted_latency_ms * self.router.settings.MODEL_ROUTER_TIMEOUT_MULTIPLIER)
+
+            service = self._get_service(candidate.model_id)
+            attempt_started = time.monotonic()
+            try:
+                call = service.analyze_image(
+                    image_bytes, image_mime_type, prompt,
+                    max_tokens=max_tokens, temperature=temperature, seed=seed
+                )
+                if timeout_ms is None:
+                    result = await call
+                else:
+                    result = await asyncio.wait_for(call, timeout=timeout_ms / 1000.0)
+            except asyncio.TimeoutError as e:
+                elapsed_ms = (time.monotonic() - attempt_started) * 1000
+                # キャンセルされた呼び出しはサービス側で記録されないため、ここで記録する
+                self.router.tracker.record(candidate.model_id, elapsed_ms, success=False, timed_out=True)
+                self._record_attempt(decision, candidate.model_id, "timeout", elapsed_ms, timeout_ms)
+                logger.warning(f"Auto routing: {candidate.model_id} exceeded timeout {timeout_ms:.0f}ms")
+                last_error = TimeoutError(f"{candidate.model_id} did not respond within {timeout_ms:.0f}ms")
+                last_error.__cause__ = e
+                continue
+            except Exception as e:
+                elapsed_ms = (time.monotonic() - attempt_started) * 1000
+                self._record_attempt(decision, candidate.model_id, "error", elapsed_ms, timeout_ms, error=str(e))
+                logger.warning(f"Auto routing: {candidate.model_id} failed: {e}")
+                last_error = e
+                continue
+
+            elapsed_ms = (time.monotonic() - attempt_started) * 1000
+            self._record_attempt(decision, candidate.model_id, "success", elapsed_ms, timeout_ms)
+            self.model_id = candidate.model_id
+            self.model_config = self.router.settings.get_model_config(candidate.model_id)
+            decision["final_model"] = candidate.model_id
+            decision["fell_back"] = candidate is not plan.primary
+            decision["total_latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+            return result
+
+        decision["final_model"] = None
+        decision["fell_back"] = len(decision["attempts"]) > 1
+        decision["total_latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+        raise last_error
+
+    def _record_attempt(
+        self,
+        decision: Dict[str, Any],
+        model_id: str,
+        outcome: str,
+        latency_ms: float,
+        timeout_ms: Optional[float],
+        error: Optional[str] = None
+    ) -> None:
+        attempt = {
+            "model_id": model_id,
+            "outcome": outcome,
+            "latency_ms": round(latency_ms, 1),
+            "timeout_ms": round(timeout_ms, 1) if timeout_ms is not None else None
+        }
+        if error:
+            attempt["error"] = error
+        decision["attempts"].append(attempt)
+        self._attempts_counter.inc(labels={"model": model_id, "outcome": outcome})
+
+
+# グローバルなトラッカーインスタンス
+_model_latency_tracker = None
+
+
+def get_model_latency_tracker() -> ModelLatencyTracker:
+    """モデルレイテンシトラッカーのシングルトンインスタンスを取得"""
+    global _model_latency_tracker
+    if _model_latency_tracker is None:
+        settings = get_settings()
+        _model_latency_tracker = ModelLatencyTracker(
+            ewma_alpha=settings.MODEL_ROUTER_EWMA_ALPHA,
+            window_size=settings.MODEL_ROUTER_WINDOW_SIZE
+        )
+        _register_tracker_metrics(_model_latency_tracker, settings.MODEL_ROUTER_LATENCY_PERCENTILE)
+    return _model_latency_tracker
+
+
+def _register_tracker_metrics(tracker: ModelLatencyTracker, routing_percentile: float) -> None:
+    """モデル別のレイテンシ・エラー率をメトリクスに公開"""
+    metrics = get_metrics_registry()
+    metrics.gauge("vision_model_latency_ewma_ms", "EWMA of observed vision model latency").set_callback(
+        lambda: [
+            ({"model": model_id}, stats["ewma_latency_ms"])
+            for model_id, stats in tracker.snapshot().items()
+            if stats["ewma_latency_ms"] is not None
+        ]
+    )
+    metrics.gauge("vision_model_latency_routing_percentile_ms", f"p{routing_percentile:g} of recent vision model latency").set_callback(
+        lambda: [
+            ({"model": model_id}, value)
+            for model_id in tracker.snapshot()
+            for value in [tracker.percentile(model_id, routing_percentile)]
+            if value is not None
+        ]
+    )
+    metrics.gauge("vision_model_error_rate", "EWMA of vision model error rate").set_callback(
+        lambda: [({"model": model_id}, stats["error_rate"]) for model_id, stats in tracker.snapshot().items()]
+    )
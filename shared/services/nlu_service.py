@@ -4,16 +4,33 @@ DeepInfra LLMを使用したNLU（自然言語理解）サービス
 音声認識されたテキストから料理名・食材名・重量を抽出する機能を提供します。
 """
 import os
+import re
 import json
 import logging
 import httpx
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 
+from ..cassette import recorded_call
 from ..config.settings import get_settings
 from ..config.prompts import VoicePrompts
+from ..utils.json_parser import parse_json_from_string
+from ..utils.mynetdiary_retrieval import get_catalogue_index
 
 logger = logging.getLogger(__name__)
 
+# JSONパースに失敗した場合のフォールバック結果の料理名
+FALLBACK_DISH_NAME = "Meal from voice input"
+
+# 文末記号（英語は直後に空白が続く場合のみ文末とみなす）
+_SENTENCE_END_PATTERN = re.compile(r"[.!?](?=\s)|[。！？]")
+# 直前の文を参照・継続する文頭語（この前では分割しない）
+_CONTINUATION_WORDS = {
+    "it", "its", "it's", "they", "them", "their", "that", "this", "these", "those",
+    "both", "each", "also", "and", "with", "plus", "but", "which", "same",
+}
+_CONTINUATION_PREFIXES = ("それ", "その", "これ", "この", "あれ", "あの", "そして", "あと", "また", "さらに", "どちら", "両方")
+
 
 class NLUService:
     """DeepInfra LLMを使用した食品抽出サービス"""
@@ -34,10 +51,11 @@ class NLUService:
 
         # モデルIDの決定
         self.model_id = model_id or self.settings.DEEPINFRA_MODEL_ID
-        self.base_url = "https://api.deepinfra.com/v1/inference"
+        self.base_url = self.settings.DEEPINFRA_INFERENCE_URL.rstrip("/")
 
         logger.info(f"NLU Service initialized with model: {self.model_id}")
 
+    @recorded_call("nlu.extract_foods_from_text", context=lambda service: {"default_model_id": service.model_id})
     async def extract_foods_from_text(
         self, 
         text: str, 
@@ -70,8 +88,9 @@ class NLUService:
             logger.info(f"Using temperature: {effective_temperature}, seed: {seed}")
 
         try:
-            # プロンプトを構築
-            system_prompt = self._build_system_prompt()
+            # プロンプトを構築（MyNetDiary食材名リストは文字起こしに関連する候補に絞り込む）
+            system_prompt = self._build_system_prompt(text=text)
+            logger.info(f"System prompt: {len(system_prompt)} chars")
             user_prompt = text
 
             # DeepInfra APIエンドポイント
@@ -115,17 +134,11 @@ class NLUService:
 
             logger.info(f"LLM generated text: '{generated_text[:300]}{'...' if len(generated_text) > 300 else ''}'")
 
-            # JSONパース
+            # JSONパース（説明文・コードフェンスを読み飛ばし、max_tokensで切れた出力は修復する）
             try:
-                # JSONの開始と終了を検出
-                json_start = generated_text.find('{')
-                json_end = generated_text.rfind('}') + 1
-
-                if json_start == -1 or json_end == 0:
-                    raise ValueError("No JSON structure found in response")
-
-                json_text = generated_text[json_start:json_end]
-                result_json = json.loads(json_text)
+                result_json = parse_json_from_string(generated_text, repair_truncated=True)
+                if not isinstance(result_json, dict):
+                    raise ValueError("LLM output is not a JSON object")
 
                 logger.info(f"Successfully parsed JSON response with {len(result_json.get('dishes', []))} dishes")
                 return result_json
@@ -149,16 +162,19 @@ class NLUService:
             logger.error(f"Unexpected error during food extraction: {e}")
             raise RuntimeError(f"Food extraction failed: {e}") from e
 
-    def _build_system_prompt(self, use_mynetdiary_constraint: bool = True) -> str:
+    def _build_system_prompt(self, use_mynetdiary_constraint: bool = True, text: Optional[str] = None) -> str:
         """
         食品抽出用のシステムプロンプトを構築
 
         Args:
             use_mynetdiary_constraint: MyNetDiary制約を使用するかどうか
+            text: 抽出対象のテキスト（食材名リストの候補の絞り込みに使用）
 
         Returns:
             システムプロンプト文字列
         """
+        if use_mynetdiary_constraint:
+            return build_voice_system_prompt(text)
         return VoicePrompts.get_complete_prompt(
             use_mynetdiary_constraint=use_mynetdiary_constraint,
             include_examples=True
@@ -188,8 +204,109 @@ class NLUService:
 
         return {
             "dishes": [{
-                "dish_name": "Meal from voice input",
+                "dish_name": FALLBACK_DISH_NAME,
                 "confidence": 0.5,
                 "ingredients": detected_foods
             }]
-        }
\ No newline at end of file
+        }
+
+    @staticmethod
+    def is_fallback_result(result: Dict[str, Any]) -> bool:
+        """抽出結果がLLM出力のパース失敗時のフォールバック結果かどうか"""
+        dishes = result.get("dishes", [])
+        return len(dishes) == 1 and dishes[0].get("dish_name") == FALLBACK_DISH_NAME
+
+    @staticmethod
+    def merge_extraction_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        テキストを分割して抽出した複数の結果を1つにまとめる
+
+        料理名が同じ料理（大文字小文字は無視）は食材リストを連結して1つの料理にします。
+
+        Args:
+            results: extract_foods_from_text の結果（テキスト順）
+
+        Returns:
+            extract_foods_from_text と同じ形式の結果
+        """
+        merged: Dict[str, Dict[str, Any]] = {}
+        for result in results:
+            for dish in result.get("dishes", []):
+                key = str(dish.get("dish_name", "")).strip().lower()
+                if key in merged:
+                    merged[key]["ingredients"].extend(dish.get("ingredients", []))
+                else:
+                    merged[key] = {**dish, "ingredients": list(dish.get("ingredients", []))}
+        return {"dishes": list(merged.values())}
+
+
+def build_voice_system_prompt(text: Optional[str] = None) -> str:
+    """
+    音声NLU用のシステムプロンプト（MyNetDiary制約・例を含む）を構築
+
+    VOICE_NLU_CATALOGUE_RETRIEVAL_ENABLED の場合は、テキスト中の食品の言及ごとに検索した
+    上位 VOICE_NLU_CATALOGUE_TOP_K 件の食材名だけをリストに含めます。
+    言及が見つからない・検索に失敗した場合はリスト全体を含めます。
+
+    Args:
+        text: 抽出対象のテキスト（Noneの場合はリスト全体）
+
+    Returns:
+        システムプロンプト文字列
+    """
+    settings = get_settings()
+    candidate_names = None
+    if text and settings.VOICE_NLU_CATALOGUE_RETRIEVAL_ENABLED:
+        try:
+            candidate_names = list(_retrieve_catalogue_candidates(text, settings.VOICE_NLU_CATALOGUE_TOP_K)) or None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Catalogue retrieval failed, using the full ingredient list: {e}")
+        if candidate_names is None:
+            logger.info("No food mentions matched the catalogue, using the full ingredient list")
+    return VoicePrompts.get_complete_prompt(
+        use_mynetdiary_constraint=True,
+        include_examples=True,
+        candidate_names=candidate_names
+    )
+
+
+@lru_cache(maxsize=256)
+def _retrieve_catalogue_candidates(text: str, top_k: int) -> Tuple[str, ...]:
+    """テキストに関連するMyNetDiary食材名の候補（プロンプト構築・NLUキャッシュのキー作成で共有）"""
+    names = tuple(get_catalogue_index().candidate_names(text, top_k))
+    logger.info(f"Catalogue retrieval selected {len(names)} candidate ingredient names")
+    return names
+
+
+def split_at_safe_boundary(text: str, min_chars: int) -> Tuple[str, str]:
+    """
+    食品抽出を独立に行っても意味が変わらない位置でテキストを分割する
+
+    文末で区切り、かつ次の文が前の文を参照する語（"it", "それ" など）で始まらない位置のうち、
+    前半が min_chars 文字以上になる最後の位置で分割します。
+    次の文の最初の語が確定していない位置（テキスト末尾の文末）では分割しません。
+
+    Args:
+        text: 文字起こしテキスト（末尾は未確定でもよい）
+        min_chars: 前半の最小文字数
+
+    Returns:
+        (前半, 残り)。安全な分割位置がない場合は ("", text)
+    """
+    for match in reversed(list(_SENTENCE_END_PATTERN.finditer(text))):
+        boundary = match.end()
+        if boundary < min_chars:
+            break
+        following = text[boundary:].lstrip()
+        first_word = following.split(maxsplit=1)[0] if following else ""
+        if match.group() in "。！？":
+            # 日本語は語の区切りがないため、次の文の冒頭2文字以上が届いていれば判定する
+            if len(following) < 2:
+                continue
+        elif not first_word or len(following) == len(first_word):
+            # 次の文の最初の語が空白で終わっていない場合はまだ途中の可能性がある
+            continue
+        if first_word.lower().strip(",.!?") in _CONTINUATION_WORDS or following.startswith(_CONTINUATION_PREFIXES):
+            continue
+        return text[:boundary].strip(), text[boundary:]
+    return "", text
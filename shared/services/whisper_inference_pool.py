@@ -0,0 +1,395 @@
+"""
+ローカルWhisper推論の常駐ワーカープール
+
+- WhisperModelRegistry: (モデル名, デバイス) ごとに1つだけモデルをロードしてプロセス内で共有する
+  （openai-whisper は推論ごとにモデルへ kv-cache のフックを登録するため、同じモデルの推論は1つずつ実行する）
+- WhisperInferencePool: 専用のワーカースレッドで推論を実行し、同時に届いたリクエストを
+  同一条件（モデル・言語・temperature・プロンプト）ごとにマイクロバッチ化する
+
+30秒以下の音声はメルスペクトログラムを束ねて whisper.decode で一括推論し、
+30秒を超える音声は従来どおり model.transcribe で1件ずつ推論します。
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import asyncio
+import numpy as np
+
+from shared.utils.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+WHISPER_SAMPLE_RATE = 16000
+# whisper.decode が一度に扱える音声長（秒）
+WHISPER_WINDOW_SECONDS = 30
+
+ModelLoader = Callable[[str, str], Any]
+# (モデル, 音声リスト, バッチキー) -> 文字起こしリスト
+BatchTranscriber = Callable[[Any, List[np.ndarray], "BatchKey"], List[str]]
+
+
+def resolve_device(device: str = "auto") -> str:
+    """"auto" を実際のデバイス名（GPU利用可能時は "cuda"、それ以外は "cpu"）に解決する"""
+    if device != "auto":
+        return device
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _load_whisper_model(model_name: str, device: str) -> Any:
+    """openai-whisperでモデルをロードする"""
+    try:
+        import whisper
+    except ImportError as e:
+        raise RuntimeError("openai-whisper library not installed. Run: pip install openai-whisper torch torchaudio") from e
+    return whisper.load_model(model_name, device=device)
+
+
+class WhisperModelRegistry:
+    """
+    プロセス内で共有するWhisperモデルの常駐管理
+
+    同じ (モデル名, デバイス) のロードは1回だけ行われ、並行して要求された場合も
+    後続の呼び出しは最初のロード完了を待ちます。
+    共有モデルで推論する側は inference_lock() を保持します（同時に decode すると kv-cache が混ざる）。
+    """
+
+    def __init__(self, loader: Optional[ModelLoader] = None):
+        self._loader = loader or _load_whisper_model
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._inference_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.load_count = 0
+
+    def get_model(self, model_name: str, device: str = "auto") -> Any:
+        """
+        ロード済みモデルを取得する（未ロードならロードする）
+
+        Raises:
+            RuntimeError: モデルのロードに失敗した場合
+        """
+        key = (model_name, resolve_device(device))
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            model = self._models.get(key)
+            if model is None:
+                started = time.perf_counter()
+                logger.info(f"Loading local Whisper model: {model_name} on {key[1]}")
+                try:
+                    model = self._loader(*key)
+                except RuntimeError:
+                    raise
+                except Exception as e:
+                    raise RuntimeError(f"Local Whisper model initialization error: {e}") from e
+                self._models[key] = model
+                self.load_count += 1
+                logger.info(f"Local Whisper model {model_name} loaded on {key[1]} in {time.perf_counter() - started:.1f}s")
+        return model
+
+    def inference_lock(self, model_name: str, device: str = "auto") -> threading.Lock:
+        """(モデル名, デバイス) ごとの推論ロック"""
+        with self._lock:
+            return self._inference_locks.setdefault((model_name, resolve_device(device)), threading.Lock())
+
+    def loaded_models(self) -> List[Tuple[str, str]]:
+        """ロード済みの (モデル名, デバイス) 一覧"""
+        return list(self._models.keys())
+
+    def unload(self, model_name: str, device: str = "auto") -> bool:
+        """モデルを解放する（ロードされていなければFalse）"""
+        return self._models.pop((model_name, resolve_device(device)), None) is not None
+
+
+@dataclass(frozen=True)
+class BatchKey:
+    """同じバッチにまとめられる条件"""
+    model_name: str
+    device: str
+    language: Optional[str]
+    temperature: float
+    prompt: Optional[str]
+
+
+@dataclass
+class _PendingRequest:
+    audio: np.ndarray
+    future: Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def transcribe_batch_with_whisper(model: Any, audios: List[np.ndarray], key: BatchKey) -> List[str]:
+    """
+    openai-whisperで音声リストを文字起こしする
+
+    すべて30秒以下ならメルスペクトログラムを束ねて1回の whisper.decode で推論し、
+    それ以外は1件ずつ model.transcribe で推論します。
+    """
+    import whisper
+    import torch
+
+    fp16 = key.device != "cpu"
+    window = WHISPER_SAMPLE_RATE * WHISPER_WINDOW_SECONDS
+    if len(audios) > 1 and all(len(audio) <= window for audio in audios):
+        n_mels = getattr(model.dims, "n_mels", 80)
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)), n_mels=n_mels)
+            for audio in audios
+        ]).to(model.device)
+        options = whisper.DecodingOptions(
+            language=key.language, temperature=key.temperature, prompt=key.prompt,
+            fp16=fp16, without_timestamps=True
+        )
+        return [result.text.strip() for result in whisper.decode(model, mels, options)]
+
+    return [
+        model.transcribe(audio, language=key.language, temperature=key.temperature,
+                         initial_prompt=key.prompt, fp16=fp16)["text"].strip()
+        for audio in audios
+    ]
+
+
+class WhisperInferencePool:
+    """
+    ローカルWhisper推論専用のワーカースレッドプール（マイクロバッチ付き）
+
+    各ワーカーは最も古いリクエストの条件でバッチを作り、最大 batch_wait_ms だけ
+    同条件のリクエストを待ってから（または max_batch_size に達したら）推論します。
+    ワーカーがすべて推論中の間に届いたリクエストは次のバッチにまとめられます。
+    同じモデルの推論はモデルごとのロックで1つずつ実行するため、workers を増やして並行に推論できるのは
+    異なるモデル・デバイスのバッチだけです（同じモデルでは次のバッチの準備が重なるだけ）。
+    """
+
+    def __init__(
+        self,
+        registry: Optional[WhisperModelRegistry] = None,
+        workers: int = 1,
+        max_batch_size: int = 8,
+        batch_wait_ms: float = 20.0,
+        batch_transcriber: Optional[BatchTranscriber] = None
+    ):
+        if workers < 1 or max_batch_size < 1:
+            raise ValueError("workers and max_batch_size must be at least 1")
+        self.registry = registry or get_whisper_model_registry()
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.batch_wait_seconds = batch_wait_ms / 1000
+        self._transcribe_batch = batch_transcriber or transcribe_batch_with_whisper
+
+        self._pending: "OrderedDict[BatchKey, Deque[_PendingRequest]]" = OrderedDict()
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        self.busy_workers = 0
+
+        metrics = get_metrics_registry()
+        self._batch_size_histogram = metrics.histogram(
+            "whisper_inference_batch_size", "Requests per local Whisper inference batch", buckets=(1, 2, 4, 8, 16, 32)
+        )
+        self._batch_seconds_histogram = metrics.histogram("whisper_inference_batch_seconds", "Local Whisper batch inference time")
+        self._queue_wait_histogram = metrics.histogram("whisper_inference_queue_wait_seconds", "Time requests wait for a Whisper worker")
+
+    def queue_depth(self) -> Dict[str, int]:
+        """モデルごとの待機中リクエスト数"""
+        with self._condition:
+            depths: Dict[str, int] = {}
+            for key, requests in self._pending.items():
+                depths[key.model_name] = depths.get(key.model_name, 0) + len(requests)
+            return depths
+
+    async def transcribe(
+        self,
+        audio: np.ndarray,
+        model_name: str,
+        device: str = "auto",
+        language: Optional[str] = None,
+        temperature: float = 0.0,
+        prompt: Optional[str] = None
+    ) -> str:
+        """
+        16kHzモノラル音声（float32）を文字起こしする
+
+        Raises:
+            RuntimeError: プールが停止済み、またはモデルのロード・推論に失敗した場合
+        """
+        key = BatchKey(model_name, resolve_device(device), language, float(temperature), prompt)
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Whisper inference pool is shut down")
+            self._start_workers()
+            self._pending.setdefault(key, deque()).append(_PendingRequest(np.asarray(audio, dtype=np.float32), future))
+            self._condition.notify()
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """新規受付を停止し、待機中のリクエストを処理してからワーカーを終了する"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _start_workers(self) -> None:
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"whisper-inference-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_batch(self) -> Optional[Tuple[BatchKey, List[_PendingRequest]]]:
+        """最も古い条件のバッチを取り出す（停止済みで待機がなければNone）"""
+        with self._condition:
+            while True:
+                while not self._pending:
+                    if self._closed:
+                        return None
+                    self._condition.wait()
+
+                key, requests = next(iter(self._pending.items()))
+                deadline = requests[0].enqueued_at + self.batch_wait_seconds
+                while len(requests) < self.max_batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                # 待機中に他のワーカーが同じ条件のリクエストをすべて取り出した場合はやり直す
+                if requests and self._pending.get(key) is requests:
+                    break
+
+            batch = [requests.popleft() for _ in range(min(self.max_batch_size, len(requests)))]
+            if not requests:
+                del self._pending[key]
+            else:
+                self._pending.move_to_end(key)  # 残りは他の条件の後に回す
+            self.busy_workers += 1
+            return key, batch
+
+    def _worker_loop(self) -> None:
+        while True:
+            item = self._next_batch()
+            if item is None:
+                return
+            key, batch = item
+            try:
+                self._run_batch(key, batch)
+            finally:
+                with self._condition:
+                    self.busy_workers -= 1
+
+    def _run_batch(self, key: BatchKey, batch: List[_PendingRequest]) -> None:
+        # 待機中にキャンセルされたリクエストは推論しない
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started = time.monotonic()
+        for request in batch:
+            self._queue_wait_histogram.observe(started - request.enqueued_at, labels={"model": key.model_name})
+        try:
+            model = self.registry.get_model(key.model_name, key.device)
+            with self.registry.inference_lock(key.model_name, key.device):
+                transcripts = self._transcribe_batch(model, [request.audio for request in batch], key)
+            if len(transcripts) != len(batch):
+                raise RuntimeError(f"Whisper returned {len(transcripts)} transcripts for {len(batch)} inputs")
+        except Exception as e:
+            logger.error(f"Local Whisper batch inference failed ({key.model_name}, batch={len(batch)}): {e}")
+            error = e if isinstance(e, RuntimeError) else RuntimeError(f"Local Whisper inference failed: {e}")
+            for request in batch:
+                request.future.set_exception(error)
+            return
+
+        elapsed = time.monotonic() - started
+        labels = {"model": key.model_name}
+        self._batch_size_histogram.observe(len(batch), labels=labels)
+        self._batch_seconds_histogram.observe(elapsed, labels=labels)
+        logger.info(f"Local Whisper batch of {len(batch)} ({key.model_name} on {key.device}) completed in {elapsed:.2f}s")
+        for request, transcript in zip(batch, transcripts):
+            request.future.set_result(transcript)
+
+
+# グローバルなインスタンス
+_whisper_model_registry = None
+_whisper_inference_pool = None
+_pool_metrics_registered = False
+
+
+def get_whisper_model_registry() -> WhisperModelRegistry:
+    """Whisperモデルレジストリのシングルトンインスタンスを取得"""
+    global _whisper_model_registry
+    if _whisper_model_registry is None:
+        _whisper_model_registry = WhisperModelRegistry()
+    return _whisper_model_registry
+
+
+def get_whisper_inference_pool() -> WhisperInferencePool:
+    """Whisper推論プールのシングルトンインスタンスを取得（設定ファイルのLOCAL_WHISPER_*を使用）"""
+    global _whisper_inference_pool
+    if _whisper_inference_pool is None:
+        from shared.config.settings import get_settings
+        settings = get_settings()
+        _whisper_inference_pool = WhisperInferencePool(
+            registry=get_whisper_model_registry(),
+            workers=settings.LOCAL_WHISPER_INFERENCE_WORKERS,
+            max_batch_size=settings.LOCAL_WHISPER_MAX_BATCH_SIZE,
+            batch_wait_ms=settings.LOCAL_WHISPER_BATCH_WAIT_MS
+        )
+        _register_pool_metrics()
+    return _whisper_inference_pool
+
+
+async def preload_whisper_models(model_names: List[str], device: str = "auto") -> None:
+    """起動時にモデルをロードしておく（失敗してもアプリは起動し、初回リクエスト時に再試行される）"""
+    registry = get_whisper_model_registry()
+    for model_name in model_names:
+        try:
+            await asyncio.to_thread(registry.get_model, model_name, device)
+        except RuntimeError as e:
+            logger.error(f"Failed to preload local Whisper model {model_name}: {e}")
+
+
+async def shutdown_whisper_inference_pool() -> None:
+    """推論プールを停止する（作成されていなければ何もしない）"""
+    global _whisper_inference_pool
+    if _whisper_inference_pool is not None:
+        pool, _whisper_inference_pool = _whisper_inference_pool, None
+        await asyncio.to_thread(pool.shutdown)
+
+
+def _register_pool_metrics() -> None:
+    """プールのゲージを登録する（コールバックは現在のシングルトンを参照する）"""
+    global _pool_metrics_registered
+    if _pool_metrics_registered:
+        return
+    _pool_metrics_registered = True
+
+    def pool_samples(collect):
+        pool = _whisper_inference_pool
+        return collect(pool) if pool is not None else []
+
+    metrics = get_metrics_registry()
+    metrics.gauge("whisper_inference_queue_depth", "Local Whisper requests waiting for a worker per model").set_callback(
+        lambda: pool_samples(lambda pool: [({"model": model}, depth) for model, depth in pool.queue_depth().items()])
+    )
+    metrics.gauge("whisper_inference_busy_workers", "Local Whisper workers currently running a batch").set_callback(
+        lambda: pool_samples(lambda pool: [({}, pool.busy_workers)])
+    )
+    metrics.gauge("whisper_loaded_models", "Local Whisper models resident in memory").set_callback(
+        lambda: [({"model": name, "device": device}, 1) for name, device in get_whisper_model_registry().loaded_models()]
+    )
@@ -10,8 +10,18 @@ from enum import Enum
 import asyncio
 import os
 
+from shared.cassette import recorded_call
+
 logger = logging.getLogger(__name__)
 
+# アップロード時のファイル形式とContent-Typeの対応
+_AUDIO_CONTENT_TYPES = {
+    "wav": "audio/wav",
+    "flac": "audio/flac",
+    "ogg": "audio/ogg",
+    "mp3": "audio/mpeg",
+}
+
 class WhisperBackend(Enum):
     """Whisperバックエンドの種類"""
     OPENAI_API = "openai_api"
@@ -66,6 +76,7 @@ class WhisperSpeechService:
         self.backend = backend
         self._openai_client = None
         self._deepinfra_api_key = None
+        self._deepinfra_inference_url = None
         self._local_whisper_model = None
 
         if self.backend == WhisperBackend.OPENAI_API:
@@ -109,6 +120,7 @@ class WhisperSpeechService:
                 raise RuntimeError("DeepInfra API key not provided. Set DEEPINFRA_API_KEY environment variable or configure in settings.")
 
             self._deepinfra_api_key = final_api_key
+            self._deepinfra_inference_url = settings.DEEPINFRA_INFERENCE_URL.rstrip("/")
             logger.info("DeepInfra client initialized successfully")
 
         except Exception as e:
@@ -116,27 +128,13 @@ class WhisperSpeechService:
             raise RuntimeError(f"DeepInfra client initialization error: {e}") from e
 
     def _init_local_whisper(self, model_name: str):
-        """ローカルWhisperモデルの初期化（遅延初期化）"""
-        try:
-            import whisper
-            import torch
-
-            logger.info(f"Loading local Whisper model: {model_name}")
-            self._local_whisper_model = whisper.load_model(model_name)
+        """ローカルWhisperモデルの取得（プロセス内で常駐し、サービスインスタンス間で共有）"""
+        from shared.config.settings import get_settings
+        from shared.services.whisper_inference_pool import get_whisper_model_registry
 
-            # GPU利用可能時は自動でGPU使用
-            if torch.cuda.is_available():
-                self._local_whisper_model = self._local_whisper_model.cuda()
-                logger.info(f"Using GPU for Whisper model: {torch.cuda.get_device_name(0)}")
-            else:
-                logger.info("Using CPU for Whisper model")
-
-        except ImportError as e:
-            raise RuntimeError("openai-whisper library not installed. Run: pip install openai-whisper torch torchaudio") from e
-        except Exception as e:
-            logger.error(f"Failed to initialize local Whisper model: {e}")
-            raise RuntimeError(f"Local Whisper model initialization error: {e}") from e
+        self._local_whisper_model = get_whisper_model_registry().get_model(model_name, get_settings().LOCAL_WHISPER_DEVICE)
 
+    @recorded_call("whisper.transcribe_audio", context=lambda service: {"backend": service.backend})
     async def transcribe_audio(
         self,
         audio_data: bytes,
@@ -144,7 +142,8 @@ class WhisperSpeechService:
         model: WhisperModel = WhisperModel.DEEPINFRA_LARGE_V3_TURBO,
         temperature: float = 0.0,
         response_format: str = "text",
-        prompt: Optional[str] = None
+        prompt: Optional[str] = None,
+        audio_format: str = "wav"
     ) -> str:
         """
         音声データをテキストに変換
@@ -156,6 +155,7 @@ class WhisperSpeechService:
             temperature: 推論時の温度パラメータ (0.0-1.0)
             response_format: レスポンス形式 ("text", "json", "srt", "vtt")
             prompt: 転写を導くためのオプションプロンプト
+            audio_format: 音声データのファイル形式（拡張子: "wav", "flac", "ogg" など）
 
         Returns:
             認識されたテキスト
@@ -168,15 +168,15 @@ class WhisperSpeechService:
         try:
             if self.backend == WhisperBackend.OPENAI_API:
                 return await self._transcribe_with_openai_api(
-                    audio_data, language_code, model, temperature, response_format, prompt
+                    audio_data, language_code, model, temperature, response_format, prompt, audio_format
                 )
             elif self.backend == WhisperBackend.DEEPINFRA_API:
                 return await self._transcribe_with_deepinfra_api(
-                    audio_data, language_code, model, temperature, response_format, prompt
+                    audio_data, language_code, model, temperature, response_format, prompt, audio_format
                 )
             else:
                 return await self._transcribe_with_local_whisper(
-                    audio_data, language_code, model, temperature, prompt
+                    audio_data, language_code, model, temperature, prompt, audio_format
                 )
 
         except Exception as e:
@@ -190,7 +190,8 @@ class WhisperSpeechService:
         model: WhisperModel,
         temperature: float,
         response_format: str,
-        prompt: Optional[str]
+        prompt: Optional[str],
+        audio_format: str = "wav"
     ) -> str:
         """OpenAI APIを使用した音声認識"""
         logger.info(f"Using OpenAI API with model: {model.value}")
@@ -200,7 +201,7 @@ class WhisperSpeechService:
         whisper_language = language_code.split('-')[0] if '-' in language_code else language_code
 
         # 音声データを一時ファイルに保存（OpenAI APIはファイルオブジェクトを要求）
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
+        with tempfile.NamedTemporaryFile(suffix=f'.{audio_format}', delete=False) as temp_file:
             temp_file.write(audio_data)
             temp_file_path = temp_file.name
 
@@ -250,7 +251,8 @@ class WhisperSpeechService:
         model: WhisperModel,
         temperature: float,
         response_format: str,
-        prompt: Optional[str]
+        prompt: Optional[str],
+        audio_format: str = "wav"
     ) -> str:
         """DeepInfra APIを使用した音声認識"""
         import aiohttp
@@ -260,60 +262,47 @@ class WhisperSpeechService:
         # 言語コードをWhisper APIが認識する形式に変換
         whisper_language = language_code.split('-')[0] if '-' in language_code else language_code
 
-        # 音声データを一時ファイルに保存
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-            temp_file.write(audio_data)
-            temp_file_path = temp_file.name
-
-        try:
-            # DeepInfra APIエンドポイント
-            api_url = f"https://api.deepinfra.com/v1/inference/{model.value}"
-            
-            headers = {
-                "Authorization": f"Bearer {self._deepinfra_api_key}"
-            }
-
-            # マルチパートフォームデータの準備
-            async with aiohttp.ClientSession() as session:
-                with aiohttp.FormData() as data:
-                    # 音声ファイルをアップロード
-                    with open(temp_file_path, 'rb') as audio_file:
-                        data.add_field('audio', audio_file, 
-                                     filename='audio.wav',
-                                     content_type='audio/wav')
-                    
-                    # オプションパラメータ
-                    if whisper_language != "en":
-                        data.add_field('language', whisper_language)
-                    if temperature != 0.0:
-                        data.add_field('temperature', str(temperature))
-                    if prompt:
-                        data.add_field('prompt', prompt)
-                    
-                    logger.info(f"Calling DeepInfra Whisper API: {api_url}")
-
-                    async with session.post(api_url, headers=headers, data=data) as response:
-                        if response.status != 200:
-                            error_text = await response.text()
-                            raise RuntimeError(f"DeepInfra API error {response.status}: {error_text}")
-                        
-                        result = await response.json()
-                        
-                        # DeepInfraのレスポンス形式に応じた処理
-                        if 'text' in result:
-                            transcript = result['text']
-                        elif 'results' in result and result['results']:
-                            transcript = result['results'][0].get('text', '')
-                        else:
-                            transcript = str(result)
-
-                        logger.info(f"DeepInfra API transcription successful: '{transcript[:100]}{'...' if len(transcript) > 100 else ''}'")
-                        return transcript.strip()
+        # DeepInfra APIエンドポイント
+        api_url = f"{self._deepinfra_inference_url}/{model.value}"
+
+        headers = {
+            "Authorization": f"Bearer {self._deepinfra_api_key}"
+        }
+
+        # マルチパートフォームデータの準備（音声はメモリ上のバイト列をそのままアップロード）
+        data = aiohttp.FormData()
+        data.add_field('audio', audio_data,
+                       filename=f'audio.{audio_format}',
+                       content_type=_AUDIO_CONTENT_TYPES.get(audio_format, 'application/octet-stream'))
+
+        # オプションパラメータ
+        if whisper_language != "en":
+            data.add_field('language', whisper_language)
+        if temperature != 0.0:
+            data.add_field('temperature', str(temperature))
+        if prompt:
+            data.add_field('prompt', prompt)
+
+        logger.info(f"Calling DeepInfra Whisper API: {api_url}")
+
+        async with aiohttp.ClientSession() as session:
+            async with session.post(api_url, headers=headers, data=data) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise RuntimeError(f"DeepInfra API error {response.status}: {error_text}")
+
+                result = await response.json()
+
+                # DeepInfraのレスポンス形式に応じた処理
+                if 'text' in result:
+                    transcript = result['text']
+                elif 'results' in result and result['results']:
+                    transcript = result['results'][0].get('text', '')
+                else:
+                    transcript = str(result)
 
-        finally:
-            # 一時ファイルのクリーンアップ
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+                logger.info(f"DeepInfra API transcription successful: '{transcript[:100]}{'...' if len(transcript) > 100 else ''}'")
+                return transcript.strip()
 
     async def _transcribe_with_local_whisper(
         self,
@@ -321,50 +310,55 @@ class WhisperSpeechService:
         language_code: str,
         model: WhisperModel,
         temperature: float,
-        prompt: Optional[str]
+        prompt: Optional[str],
+        audio_format: str = "wav"
     ) -> str:
-        """ローカルWhisperを使用した音声認識"""
-        logger.info(f"Using local Whisper with model: {model.value}")
+        """ローカルWhisperを使用した音声認識（常駐モデル・専用ワーカープールで推論）"""
+        from shared.config.settings import get_settings
+        from shared.services.whisper_inference_pool import get_whisper_inference_pool
 
-        # モデルの初期化（遅延初期化）
-        if self._local_whisper_model is None:
-            self._init_local_whisper(model.value)
+        logger.info(f"Using local Whisper with model: {model.value}")
 
         # 言語コードをWhisperが認識する形式に変換
         whisper_language = language_code.split('-')[0] if '-' in language_code else language_code
 
-        # 音声データを一時ファイルに保存
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-            temp_file.write(audio_data)
-            temp_file_path = temp_file.name
+        # 16kHzモノラルに変換（CPUバウンドなのでスレッドで実行）
+        audio = await asyncio.to_thread(self._load_audio_for_local_whisper, audio_data, audio_format)
+
+        transcript = await get_whisper_inference_pool().transcribe(
+            audio,
+            model_name=model.value,
+            device=get_settings().LOCAL_WHISPER_DEVICE,
+            language=whisper_language if whisper_language != "en" else None,
+            temperature=temperature,
+            prompt=prompt
+        )
+        logger.info(f"Local Whisper transcription successful: '{transcript[:100]}{'...' if len(transcript) > 100 else ''}'")
+        return transcript
+
+    @staticmethod
+    def _load_audio_for_local_whisper(audio_data: bytes, audio_format: str):
+        """音声データを16kHzモノラルのfloat32配列に変換（自前でデコードできない形式はffmpeg経由）"""
+        from shared.utils.audio_normalization import decode_audio, downmix_to_mono, resample
+        from shared.services.whisper_inference_pool import WHISPER_SAMPLE_RATE
 
         try:
-            # Whisperの転写オプション
-            transcribe_options = {
-                "language": whisper_language if whisper_language != "en" else None,
-                "temperature": temperature
-            }
-
-            # オプションプロンプトを追加
-            if prompt:
-                transcribe_options["initial_prompt"] = prompt
-
-            logger.info(f"Running local Whisper with options: {transcribe_options}")
-
-            # 非同期でWhisper実行（CPUバウンドなのでthread pool使用）
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                lambda: self._local_whisper_model.transcribe(temp_file_path, **transcribe_options)
-            )
-
-            transcript = result["text"].strip()
-            logger.info(f"Local Whisper transcription successful: '{transcript[:100]}{'...' if len(transcript) > 100 else ''}'")
+            samples, sample_rate = decode_audio(audio_data)
+            return resample(downmix_to_mono(samples), sample_rate, WHISPER_SAMPLE_RATE)
+        except ValueError:
+            pass
 
-            return transcript
+        try:
+            import whisper
+        except ImportError as e:
+            raise RuntimeError("openai-whisper library not installed. Run: pip install openai-whisper torch torchaudio") from e
 
+        with tempfile.NamedTemporaryFile(suffix=f'.{audio_format}', delete=False) as temp_file:
+            temp_file.write(audio_data)
+            temp_file_path = temp_file.name
+        try:
+            return whisper.load_audio(temp_file_path)
         finally:
-            # 一時ファイルのクリーンアップ
             if os.path.exists(temp_file_path):
                 os.unlink(temp_file_path)
 
@@ -376,21 +370,15 @@ class WhisperSpeechService:
             audio_data: 音声バイナリデータ
 
         Returns:
-            tuple: (エンコーディング, 推定サンプリングレート)
+            tuple: (エンコーディング, サンプリングレート)（ヘッダーから読めない場合は16000）
         """
-        # 簡易的なフォーマット判定（既存実装と同様）
-        if audio_data.startswith(b'RIFF') and b'WAVE' in audio_data[:12]:
-            return ("wav", 16000)
-        elif audio_data.startswith(b'fLaC'):
-            return ("flac", 16000)
-        elif (audio_data.startswith(b'ID3') or
-              audio_data[:2] == b'\\xff\\xfb' or
-              audio_data[:2] == b'\\xff\\xf3' or
-              audio_data[:2] == b'\\xff\\xf2'):
-            return ("mp3", 16000)
-        else:
+        from shared.utils.audio_normalization import probe_audio_format
+
+        audio_format, sample_rate, _ = probe_audio_format(audio_data)
+        if audio_format == "unknown":
             logger.warning("Could not detect audio format, defaulting to WAV")
             return ("wav", 16000)
+        return (audio_format, sample_rate or 16000)
 
     def get_supported_models(self) -> list[WhisperModel]:
         """バックエンドでサポートされているモデル一覧を取得"""
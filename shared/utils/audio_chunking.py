@@ -0,0 +1,202 @@
+"""
+長時間音声の分割と文字起こし結果の結合
+
+音声を無音位置で重なりのあるチャンクに分割し（split_audio_on_silence）、
+チャンクごとの文字起こし結果を重なり部分の重複を除いて結合します（TranscriptStitcher）。
+分割はCPUバウンドな処理のため、非同期コードからは asyncio.to_thread で呼び出してください。
+"""
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+from shared.utils.audio_normalization import (
+    codec_file_extension,
+    decode_audio,
+    downmix_to_mono,
+    encode_audio,
+    frame_levels_dbfs,
+    probe_audio_format,
+)
+
+# 切れ目を探すときのレベルの平滑化幅（単語間の短い途切れより、文の間の間を優先するため）
+_SMOOTHING_SECONDS = 0.3
+# 重複除去で比較する最大トークン数
+_MAX_OVERLAP_TOKENS = 16
+
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uff66-\uff9f]")
+_WORD_PATTERN = re.compile(r"\S+")
+
+
+@dataclass
+class AudioChunk:
+    """分割された音声チャンク（start_secondsは前のチャンクとの重なりを含む）"""
+    index: int
+    start_seconds: float
+    end_seconds: float
+    audio_bytes: bytes
+    file_extension: str
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.end_seconds - self.start_seconds
+
+
+def find_silence_cut_points(samples: np.ndarray, sample_rate: int, max_chunk_seconds: float) -> List[int]:
+    """
+    チャンク長が max_chunk_seconds を超えないように、最も静かな位置で切れ目を選ぶ
+
+    各切れ目は前の切れ目から max_chunk_seconds の後半（50%〜100%）の範囲で、
+    平滑化したフレームレベルが最小になる位置です。最後のチャンクも max_chunk_seconds の半分以上になります。
+
+    Args:
+        samples: モノラル音声
+        sample_rate: サンプリングレート
+        max_chunk_seconds: チャンクの最大長（秒）
+
+    Returns:
+        切れ目のサンプル位置（昇順）。分割不要な場合は空リスト
+    """
+    levels, frame_length = frame_levels_dbfs(samples, sample_rate)
+    max_frames = int(max_chunk_seconds * sample_rate / frame_length)
+    min_frames = max(1, max_frames // 2)
+    if max_frames < 2 or len(levels) <= max_frames:
+        return []
+
+    window = max(1, int(_SMOOTHING_SECONDS * sample_rate / frame_length))
+    smoothed = np.convolve(levels, np.ones(window) / window, mode="same")
+
+    cut_points = []
+    start = 0
+    while len(levels) - start > max_frames:
+        low = start + min_frames
+        high = min(start + max_frames, len(levels) - min_frames)
+        cut = low + int(np.argmin(smoothed[low:high + 1]))
+        cut_points.append(cut * frame_length)
+        start = cut
+    return cut_points
+
+
+def split_audio_on_silence(
+    audio_data: bytes,
+    max_chunk_seconds: float = 30.0,
+    overlap_seconds: float = 1.0,
+    codec: str = "flac"
+) -> List[AudioChunk]:
+    """
+    音声を無音位置で重なりのあるチャンクに分割する
+
+    2番目以降のチャンクは切れ目の overlap_seconds 前から始まるため、切れ目付近の単語は
+    両方のチャンクで文字起こしされます（重複は TranscriptStitcher で除去）。
+    分割が不要な長さの場合は、元の音声をそのまま1チャンクとして返します。
+
+    Args:
+        audio_data: 音声バイナリデータ
+        max_chunk_seconds: チャンクの最大長（重なりを除く、秒）
+        overlap_seconds: 隣接チャンクの重なり（秒）
+        codec: チャンクの出力コーデック（"flac" | "opus" | "wav"）
+
+    Returns:
+        AudioChunkのリスト（時間順）
+
+    Raises:
+        ValueError: デコードできない音声の場合
+    """
+    samples, sample_rate = decode_audio(audio_data)
+    mono = downmix_to_mono(samples)
+    duration = len(mono) / sample_rate
+
+    cut_points = find_silence_cut_points(mono, sample_rate, max_chunk_seconds)
+    if not cut_points:
+        audio_format = probe_audio_format(audio_data)[0]
+        return [AudioChunk(0, 0.0, round(duration, 3), audio_data, audio_format if audio_format != "unknown" else "wav")]
+
+    overlap = int(overlap_seconds * sample_rate)
+    boundaries = [0] + cut_points + [len(mono)]
+    chunks = []
+    for index in range(len(boundaries) - 1):
+        start = max(0, boundaries[index] - overlap) if index else 0
+        end = boundaries[index + 1]
+        encoded, used_codec = encode_audio(mono[start:end], sample_rate, codec)
+        chunks.append(AudioChunk(
+            index=index,
+            start_seconds=round(start / sample_rate, 3),
+            end_seconds=round(end / sample_rate, 3),
+            audio_bytes=encoded,
+            file_extension=codec_file_extension(used_codec)
+        ))
+    return chunks
+
+
+def _is_cjk(text: str) -> bool:
+    """単語を空白で区切らない言語（日本語・中国語）のテキストかどうか"""
+    characters = re.sub(r"\s", "", text)
+    return bool(characters) and len(_CJK_PATTERN.findall(characters)) * 2 > len(characters)
+
+
+def _tokenize(text: str, cjk: bool) -> List[Tuple[str, int]]:
+    """比較用に正規化したトークンと、元テキストでのトークン終了位置の一覧"""
+    spans = ((m.group(), m.end()) for m in re.finditer(r"\S", text)) if cjk else \
+        ((m.group(), m.end()) for m in _WORD_PATTERN.finditer(text))
+    tokens = []
+    for token, end in spans:
+        normalized = re.sub(r"[^\w]", "", token.lower())
+        if normalized:
+            tokens.append((normalized, end))
+    return tokens
+
+
+class TranscriptStitcher:
+    """
+    チャンクの文字起こし結果を時間順に結合する
+
+    前のテキストの末尾と次のテキストの先頭で一致する最長のトークン列（大文字小文字・句読点は無視）を
+    重なり部分とみなし、次のテキストから取り除いてから連結します。
+    追加済みのテキストは後から変わらないため、add() の戻り値を逐次NLUに渡せます。
+    """
+
+    def __init__(self, max_overlap_tokens: int = _MAX_OVERLAP_TOKENS):
+        self.max_overlap_tokens = max_overlap_tokens
+        self.text = ""
+
+    def add(self, text: str) -> str:
+        """
+        次のチャンクのテキストを追加する
+
+        Returns:
+            実際に追加されたテキスト（区切りの空白を含む）
+        """
+        text = text.strip()
+        if not text:
+            return ""
+        if not self.text:
+            self.text = text
+            return text
+
+        cjk = _is_cjk(self.text + text)
+        previous = [token for token, _ in _tokenize(self.text, cjk)][-self.max_overlap_tokens:]
+        following = _tokenize(text, cjk)[:self.max_overlap_tokens]
+
+        # 日本語は1文字の一致では偶然の可能性が高いため2文字以上を重なりとみなす
+        min_overlap = 2 if cjk else 1
+        overlap_end = 0
+        for size in range(min(len(previous), len(following)), min_overlap - 1, -1):
+            if previous[-size:] == [token for token, _ in following[:size]]:
+                overlap_end = following[size - 1][1]
+                break
+
+        remainder = text[overlap_end:].lstrip(" \t\n,.、。!?！？")
+        if not remainder:
+            return ""
+        appended = remainder if cjk else f" {remainder}"
+        self.text += appended
+        return appended
+
+
+def stitch_transcripts(transcripts: List[str], max_overlap_tokens: int = _MAX_OVERLAP_TOKENS) -> str:
+    """時間順のチャンク文字起こし結果を重複を除いて1つのテキストに結合する"""
+    stitcher = TranscriptStitcher(max_overlap_tokens)
+    for transcript in transcripts:
+        stitcher.add(transcript)
+    return stitcher.text
@@ -0,0 +1,382 @@
+"""
+音声の正規化（文字起こし前の前処理）
+
+アップロードされた音声をデコードし、モノラル化・16kHzへのリサンプリング・前後の無音除去を行い、
+FLAC / Opus（soundfile利用可能時）または16bit PCM WAVに再エンコードします。
+CPUバウンドな処理のため、非同期コードからは asyncio.to_thread で呼び出してください。
+"""
+import io
+import logging
+import struct
+import time
+import wave
+from dataclasses import asdict, dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TARGET_SAMPLE_RATE = 16000
+
+# 出力コーデック: (soundfileのフォーマット, サブタイプ, MIMEタイプ, 拡張子)
+_CODECS = {
+    "flac": ("FLAC", "PCM_16", "audio/flac", "flac"),
+    "opus": ("OGG", "OPUS", "audio/ogg", "ogg"),
+    "wav": ("WAV", "PCM_16", "audio/wav", "wav"),
+}
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# 無音判定のフレーム長
+_FRAME_MS = 20
+# リサンプリング時のアンチエイリアスFIRフィルタのタップ数
+_RESAMPLE_TAPS = 101
+
+
+@dataclass
+class AudioNormalizationResult:
+    """音声正規化の結果"""
+    audio_bytes: bytes
+    codec: str
+    mime_type: str
+    file_extension: str
+    sample_rate: int
+    original_bytes: int
+    original_sample_rate: int
+    original_channels: int
+    original_duration_seconds: float
+    duration_seconds: float
+    trimmed_leading_seconds: float
+    trimmed_trailing_seconds: float
+    processing_time_ms: float
+
+    @property
+    def output_bytes(self) -> int:
+        return len(self.audio_bytes)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.output_bytes
+
+    @property
+    def bytes_saved_ratio(self) -> float:
+        return self.bytes_saved / self.original_bytes if self.original_bytes else 0.0
+
+    def to_dict(self) -> dict:
+        """ログ・レスポンス用の辞書（音声データ本体を除く）"""
+        data = asdict(self)
+        del data["audio_bytes"]
+        data.update(
+            output_bytes=self.output_bytes,
+            bytes_saved=self.bytes_saved,
+            bytes_saved_ratio=round(self.bytes_saved_ratio, 4)
+        )
+        return data
+
+
+def _soundfile():
+    """soundfileモジュール（未インストールの場合はNone）"""
+    try:
+        import soundfile
+        return soundfile
+    except (ImportError, OSError):
+        return None
+
+
+def probe_audio_format(audio_data: bytes) -> Tuple[str, Optional[int], Optional[int]]:
+    """
+    ヘッダーから音声フォーマットを判定する（デコードはしない）
+
+    Args:
+        audio_data: 音声バイナリデータ
+
+    Returns:
+        (フォーマット, サンプリングレート, チャンネル数)。
+        フォーマットは "wav" | "flac" | "ogg" | "mp3" | "unknown"、不明な値はNone
+    """
+    if audio_data[:4] == b"RIFF" and audio_data[8:12] == b"WAVE":
+        fmt = _find_wav_fmt(audio_data)
+        if fmt is None:
+            return ("wav", None, None)
+        _, channels, sample_rate, _ = fmt
+        return ("wav", sample_rate, channels)
+    if audio_data[:4] == b"fLaC" and len(audio_data) >= 26:
+        # STREAMINFO: サンプリングレート20bit, チャンネル数-1が3bit
+        packed = int.from_bytes(audio_data[18:21], "big")
+        return ("flac", packed >> 4, ((packed >> 1) & 0x7) + 1)
+    if audio_data[:4] == b"OggS":
+        head = audio_data.find(b"OpusHead", 0, 200)
+        if head != -1 and len(audio_data) >= head + 16:
+            channels = audio_data[head + 9]
+            sample_rate = struct.unpack_from("<I", audio_data, head + 12)[0]
+            return ("ogg", sample_rate or None, channels)
+        return ("ogg", None, None)
+    if audio_data[:3] == b"ID3" or audio_data[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return ("mp3", None, None)
+    return ("unknown", None, None)
+
+
+def _iter_riff_chunks(audio_data: bytes):
+    pos = 12
+    while pos + 8 <= len(audio_data):
+        chunk_id = audio_data[pos:pos + 4]
+        size = struct.unpack_from("<I", audio_data, pos + 4)[0]
+        yield chunk_id, pos + 8, size
+        pos += 8 + size + (size & 1)  # チャンクは2バイト境界に揃えられる
+
+
+def _find_wav_fmt(audio_data: bytes) -> Optional[Tuple[int, int, int, int]]:
+    """fmtチャンクの (フォーマットタグ, チャンネル数, サンプリングレート, ビット深度)（途中で切れている場合はNone）"""
+    for chunk_id, start, size in _iter_riff_chunks(audio_data):
+        if chunk_id == b"fmt " and size >= 16:
+            if start + 16 > len(audio_data):
+                return None
+            format_tag, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", audio_data, start)
+            if format_tag == _WAVE_FORMAT_EXTENSIBLE and size >= 26 and start + 26 <= len(audio_data):
+                format_tag = struct.unpack_from("<H", audio_data, start + 24)[0]  # SubFormat GUIDの先頭
+            return format_tag, channels, sample_rate, bits
+    return None
+
+
+def _decode_wav(audio_data: bytes) -> Tuple[np.ndarray, int]:
+    """RIFF/WAVE（PCM 8/16/24/32bit, IEEE float）を (フレーム数, チャンネル数) のfloat32配列にデコード"""
+    fmt = _find_wav_fmt(audio_data)
+    if fmt is None:
+        raise ValueError("WAV file has no complete fmt chunk")
+    format_tag, channels, sample_rate, bits = fmt
+    if channels == 0 or sample_rate == 0:
+        raise ValueError("WAV file has invalid channel count or sample rate")
+
+    # ADPCM等の圧縮形式は1サンプルが8bit未満・バイト境界に揃わないため、フレーム幅を計算する前に除外する
+    supported = (format_tag == _WAVE_FORMAT_PCM and bits in (8, 16, 24, 32)) or \
+        (format_tag == _WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64))
+    if not supported:
+        raise ValueError(f"Unsupported WAV encoding (format tag: {format_tag:#06x}, bits: {bits})")
+
+    data = None
+    for chunk_id, start, size in _iter_riff_chunks(audio_data):
+        if chunk_id == b"data":
+            # ストリーミング書き出しのWAVはサイズが0や最大値のことがあるため末尾までに制限する
+            end = len(audio_data) if size in (0, 0xFFFFFFFF) else min(start + size, len(audio_data))
+            data = audio_data[start:end]
+            break
+    if data is None:
+        raise ValueError("WAV file has no data chunk")
+
+    sample_width = bits // 8
+    frame_width = sample_width * channels
+    data = data[:len(data) - len(data) % frame_width]
+
+    if format_tag == _WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        samples = np.frombuffer(data, dtype="<f4" if bits == 32 else "<f8").astype(np.float32)
+    elif format_tag == _WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif format_tag == _WAVE_FORMAT_PCM and bits == 16:
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    elif format_tag == _WAVE_FORMAT_PCM and bits == 24:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+        samples = values.astype(np.float32) / 8388608.0
+    else:
+        samples = (np.frombuffer(data, dtype="<i4").astype(np.float64) / 2147483648.0).astype(np.float32)
+
+    return samples.reshape(-1, channels), sample_rate
+
+
+def decode_audio(audio_data: bytes) -> Tuple[np.ndarray, int]:
+    """
+    音声データをデコードする
+
+    WAVは標準ライブラリ相当の実装でデコードし、それ以外（FLAC, OGG等）はsoundfileが利用可能な場合のみ対応します。
+
+    Args:
+        audio_data: 音声バイナリデータ
+
+    Returns:
+        ((フレーム数, チャンネル数) のfloat32配列 [-1.0, 1.0], サンプリングレート)
+
+    Raises:
+        ValueError: デコードできない形式の場合
+    """
+    if not audio_data:
+        raise ValueError("Audio data is empty")
+    if audio_data[:4] == b"RIFF" and audio_data[8:12] == b"WAVE":
+        return _decode_wav(audio_data)
+
+    soundfile = _soundfile()
+    if soundfile is None:
+        raise ValueError(f"Unsupported audio format '{probe_audio_format(audio_data)[0]}' (install soundfile to decode non-WAV audio)")
+    try:
+        samples, sample_rate = soundfile.read(io.BytesIO(audio_data), dtype="float32", always_2d=True)
+    except Exception as e:
+        raise ValueError(f"Failed to decode audio: {e}") from e
+    return samples, sample_rate
+
+
+def downmix_to_mono(samples: np.ndarray) -> np.ndarray:
+    """(フレーム数, チャンネル数) の配列をチャンネル平均でモノラル化"""
+    if samples.ndim == 1:
+        return samples
+    if samples.shape[1] == 1:
+        return samples[:, 0]
+    return samples.mean(axis=1, dtype=np.float32)
+
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """
+    モノラル音声をリサンプリングする
+
+    ダウンサンプリング時は窓関数法のFIRローパスフィルタでエイリアシングを抑えてから
+    線形補間します（音声認識の前処理として十分な品質）。
+    """
+    if source_rate == target_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+
+    if target_rate < source_rate:
+        # 遮断周波数は変換後のナイキスト周波数の90%（サンプル周期あたりの周波数）
+        cutoff = 0.45 * target_rate / source_rate
+        n = np.arange(_RESAMPLE_TAPS) - (_RESAMPLE_TAPS - 1) / 2
+        taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(_RESAMPLE_TAPS)
+        taps /= taps.sum()
+        samples = np.convolve(samples, taps, mode="same")
+
+    output_length = int(round(len(samples) * target_rate / source_rate))
+    positions = np.arange(output_length) * (source_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def frame_levels_dbfs(samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, int]:
+    """
+    モノラル音声を20msフレームに分割し、各フレームのRMSレベル（dBFS）を求める
+
+    Returns:
+        (フレームごとのdBFS配列, 1フレームのサンプル数)。端数のサンプルは含みません。
+    """
+    frame_length = max(1, sample_rate * _FRAME_MS // 1000)
+    frame_count = len(samples) // frame_length
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1)) if frame_count else np.zeros(0)
+    return 20 * np.log10(rms + 1e-10), frame_length
+
+
+def trim_silence(samples: np.ndarray, sample_rate: int, threshold_dbfs: float = -45.0,
+                 padding_ms: int = 200) -> Tuple[np.ndarray, float, float]:
+    """
+    前後の無音を除去する
+
+    20msフレームのRMSが閾値を超える最初と最後のフレームの間（前後にpadding_msの余白）を残します。
+    すべてのフレームが閾値以下の場合は除去しません（小さな声の録音を空にしないため）。
+
+    Returns:
+        (無音除去後の音声, 先頭で除去した秒数, 末尾で除去した秒数)
+    """
+    levels, frame_length = frame_levels_dbfs(samples, sample_rate)
+    voiced = np.flatnonzero(levels > threshold_dbfs)
+    if len(voiced) == 0:
+        return samples, 0.0, 0.0
+
+    padding = sample_rate * padding_ms // 1000
+    start = max(0, voiced[0] * frame_length - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame_length + padding)
+    return samples[start:end], start / sample_rate, (len(samples) - end) / sample_rate
+
+
+def codec_file_extension(codec: str) -> str:
+    """出力コーデックに対応するファイル拡張子（"opus" → "ogg" など）"""
+    return _CODECS[codec][3]
+
+
+def encode_audio(samples: np.ndarray, sample_rate: int, codec: str = "flac") -> Tuple[bytes, str]:
+    """
+    モノラル音声をエンコードする
+
+    Args:
+        samples: float32のモノラル音声
+        sample_rate: サンプリングレート
+        codec: "flac" | "opus" | "wav"（soundfileがない場合は常にwav）
+
+    Returns:
+        (エンコード済みバイト列, 実際に使用したコーデック)
+    """
+    if codec not in _CODECS:
+        raise ValueError(f"Unsupported codec: {codec}. Available: {', '.join(_CODECS)}")
+
+    soundfile = _soundfile() if codec != "wav" else None
+    if codec != "wav" and soundfile is None:
+        logger.warning(f"soundfile is not installed, encoding normalized audio as WAV instead of {codec}")
+        codec = "wav"
+
+    if soundfile is not None:
+        file_format, subtype, _, _ = _CODECS[codec]
+        buffer = io.BytesIO()
+        soundfile.write(buffer, samples, sample_rate, format=file_format, subtype=subtype)
+        return buffer.getvalue(), codec
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).round().astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(pcm.tobytes())
+    return buffer.getvalue(), "wav"
+
+
+def normalize_audio(
+    audio_data: bytes,
+    target_sample_rate: int = TARGET_SAMPLE_RATE,
+    trim: bool = True,
+    silence_threshold_dbfs: float = -45.0,
+    silence_padding_ms: int = 200,
+    codec: str = "flac"
+) -> AudioNormalizationResult:
+    """
+    文字起こし用に音声を正規化する（デコード→モノラル化→リサンプリング→無音除去→再エンコード）
+
+    Args:
+        audio_data: 元の音声バイナリデータ
+        target_sample_rate: 出力サンプリングレート
+        trim: 前後の無音を除去するかどうか
+        silence_threshold_dbfs: 無音とみなすフレームRMSの閾値（dBFS）
+        silence_padding_ms: 無音除去時に残す前後の余白（ミリ秒）
+        codec: 出力コーデック（"flac" | "opus" | "wav"）
+
+    Returns:
+        AudioNormalizationResult
+
+    Raises:
+        ValueError: デコードできない音声・未対応のコーデックの場合
+    """
+    started = time.perf_counter()
+
+    samples, source_rate = decode_audio(audio_data)
+    original_channels = samples.shape[1]
+    original_duration = samples.shape[0] / source_rate
+
+    mono = resample(downmix_to_mono(samples), source_rate, target_sample_rate)
+    leading = trailing = 0.0
+    if trim:
+        mono, leading, trailing = trim_silence(mono, target_sample_rate, silence_threshold_dbfs, silence_padding_ms)
+
+    encoded, codec = encode_audio(mono, target_sample_rate, codec)
+    _, _, mime_type, extension = _CODECS[codec]
+
+    return AudioNormalizationResult(
+        audio_bytes=encoded,
+        codec=codec,
+        mime_type=mime_type,
+        file_extension=extension,
+        sample_rate=target_sample_rate,
+        original_bytes=len(audio_data),
+        original_sample_rate=source_rate,
+        original_channels=original_channels,
+        original_duration_seconds=round(original_duration, 3),
+        duration_seconds=round(len(mono) / target_sample_rate, 3),
+        trimmed_leading_seconds=round(leading, 3),
+        trimmed_trailing_seconds=round(trailing, 3),
+        processing_time_ms=round((time.perf_counter() - started) * 1000, 1)
+    )
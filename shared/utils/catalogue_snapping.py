@@ -0,0 +1,200 @@
+"""
+LLMが出力した食材名のMyNetDiary食材名への補正（スナップ）
+
+画像分析・音声NLUのモデルはリストの食材名と少しだけ異なる名前（複数形・語順・"cooked" の欠落など）を
+返すことがあり、そのまま /suggest に送ると照合に失敗して食事全体の分析が失敗します。
+栄養検索の前に、全食材名を1回の rapidfuzz.process.cdist でMyNetDiary食材名と比較し、
+信頼度の閾値を満たす場合だけリストの食材名に置き換えます。
+
+段階（app_backup/components/fuzzy_ingredient_search_component.py のTierに対応）:
+    1. exact: 完全一致
+    2. normalized: 小文字化・句読点除去・単数形化・単語のソート後の一致（語順・複数形の違い）
+    3. fuzzy: token-sort比率（ソート後）とJaro-Winkler類似度（元の語順）がどちらも閾値以上の最良候補
+"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from rapidfuzz.distance import JaroWinkler
+
+from shared.config.settings import get_settings
+from shared.utils.metrics import get_metrics_registry
+from shared.utils.mynetdiary_retrieval import stem_token
+from shared.utils.mynetdiary_utils import load_mynetdiary_ingredient_names
+
+logger = logging.getLogger(__name__)
+
+EXACT = "exact"
+NORMALIZED = "normalized"
+FUZZY = "fuzzy"
+UNMATCHED = "unmatched"
+
+
+def normalize_name(name: str) -> str:
+    """小文字化・句読点除去・単数形化（語順は保持）"""
+    return " ".join(stem_token(word) for word in re.sub(r"[^\w\s%]", " ", name.lower()).split())
+
+
+def normalize_and_sort(name: str) -> str:
+    """normalize_name の単語をアルファベット順に並べる"""
+    return " ".join(sorted(normalize_name(name).split()))
+
+
+@dataclass
+class SnapResult:
+    """1つの食材名の補正結果"""
+    original: str
+    name: str  # 補正後の食材名（補正しない場合は original）
+    method: str  # exact | normalized | fuzzy | unmatched
+    token_sort_score: float = 0.0  # 0-100
+    jaro_winkler_score: float = 0.0  # 0-1
+
+    @property
+    def changed(self) -> bool:
+        return self.name != self.original
+
+    def to_dict(self) -> Dict:
+        return {
+            "original": self.original,
+            "name": self.name,
+            "method": self.method,
+            "token_sort_score": round(self.token_sort_score, 1),
+            "jaro_winkler_score": round(self.jaro_winkler_score, 4)
+        }
+
+
+class CatalogueSnapper:
+    """
+    食材名をMyNetDiary食材名に補正する
+
+    使用例:
+        snapper = CatalogueSnapper(load_mynetdiary_ingredient_names())
+        results = snapper.snap_many(["Apple with skin raw", "brown rice long grain cooked without salt"])
+    """
+
+    def __init__(self, names: Sequence[str], min_token_sort: float = 85.0, min_jaro_winkler: float = 0.9,
+                 workers: int = 1):
+        """
+        Args:
+            names: MyNetDiary食材名
+            min_token_sort: fuzzy段階で置き換えるtoken-sort比率の下限（0-100）
+            min_jaro_winkler: fuzzy段階で置き換えるJaro-Winkler類似度の下限（0-1）
+            workers: cdistのスレッド数（-1: 全コア）
+        """
+        self.names = list(names)
+        self.min_token_sort = min_token_sort
+        self.min_jaro_winkler = min_jaro_winkler
+        self.workers = workers
+        self._exact = set(self.names)
+        self._ordered_choices = [normalize_name(name) for name in self.names]
+        self._sorted_choices = [" ".join(sorted(choice.split())) for choice in self._ordered_choices]
+        self._normalized: Dict[str, str] = {}
+        for name, normalized in zip(self.names, self._sorted_choices):
+            self._normalized.setdefault(normalized, name)
+
+    def snap(self, name: str) -> SnapResult:
+        """1つの食材名を補正する"""
+        return self.snap_many([name])[0]
+
+    def snap_many(self, names: Sequence[str]) -> List[SnapResult]:
+        """
+        複数の食材名をまとめて補正する（exact/normalized で決まらない名前は1回のcdistで比較）
+
+        Returns:
+            names と同じ順序の補正結果
+        """
+        results: List[Optional[SnapResult]] = [None] * len(names)
+        pending, ordered_queries, sorted_queries = [], [], []
+        for i, name in enumerate(names):
+            if name in self._exact:
+                results[i] = SnapResult(name, name, EXACT, 100.0, 1.0)
+                continue
+            ordered = normalize_name(name)
+            normalized = " ".join(sorted(ordered.split()))
+            if normalized in self._normalized:
+                results[i] = SnapResult(name, self._normalized[normalized], NORMALIZED, 100.0, 1.0)
+            elif normalized:
+                pending.append(i)
+                ordered_queries.append(ordered)
+                sorted_queries.append(normalized)
+            else:
+                results[i] = SnapResult(name, name, UNMATCHED)
+
+        if pending:
+            # 正規化済みの文字列を比較するため processor は指定しない
+            token_sort = process.cdist(sorted_queries, self._sorted_choices, scorer=fuzz.token_sort_ratio,
+                                       dtype=np.float32, workers=self.workers)
+            jaro_winkler = process.cdist(ordered_queries, self._ordered_choices, scorer=JaroWinkler.normalized_similarity,
+                                         dtype=np.float32, workers=self.workers)
+            best = np.argmax(token_sort / 100.0 + jaro_winkler, axis=1)
+            for row, i in enumerate(pending):
+                column = int(best[row])
+                token_sort_score = float(token_sort[row, column])
+                jaro_winkler_score = float(jaro_winkler[row, column])
+                if token_sort_score >= self.min_token_sort and jaro_winkler_score >= self.min_jaro_winkler:
+                    results[i] = SnapResult(names[i], self.names[column], FUZZY, token_sort_score, jaro_winkler_score)
+                else:
+                    results[i] = SnapResult(names[i], names[i], UNMATCHED, token_sort_score, jaro_winkler_score)
+        return results
+
+
+def snap_phase1_ingredients(phase1_result, snapper: Optional["CatalogueSnapper"] = None) -> List[SnapResult]:
+    """
+    Phase1の結果の全食材名を補正し、置き換える（栄養検索・栄養計算は補正後の名前を使用する）
+
+    段階ごとの件数を catalogue_snap_total{method} に記録します。
+
+    Args:
+        phase1_result: Phase1Output
+        snapper: CatalogueSnapper（省略時は get_catalogue_snapper()）
+
+    Returns:
+        食材ごとの補正結果（Phase1Output.get_all_ingredient_names() と同じ順序）。補正が無効な場合は空リスト
+    """
+    snapper = snapper or get_catalogue_snapper()
+    if snapper is None:
+        return []
+
+    ingredients = [ingredient for dish in phase1_result.dishes for ingredient in dish.ingredients]
+    results = snapper.snap_many([ingredient.ingredient_name for ingredient in ingredients])
+    counter = get_metrics_registry().counter("catalogue_snap_total", "Phase 1 ingredient names by catalogue snapping outcome")
+    for ingredient, result in zip(ingredients, results):
+        counter.inc(labels={"method": result.method})
+        if result.changed:
+            logger.info(f"Snapped ingredient name '{result.original}' -> '{result.name}' ({result.method}, "
+                        f"token_sort={result.token_sort_score:.0f}, jaro_winkler={result.jaro_winkler_score:.3f})")
+            ingredient.ingredient_name = result.name
+    return results
+
+
+def snap_ingredient_name(name: str) -> str:
+    """1つの食材名を補正する（Phase1ストリーミング中の栄養検索の先行投入用、無効な場合はそのまま）"""
+    snapper = get_catalogue_snapper()
+    return snapper.snap(name).name if snapper else name
+
+
+_catalogue_snapper: Optional[CatalogueSnapper] = None
+
+
+def get_catalogue_snapper() -> Optional[CatalogueSnapper]:
+    """
+    MyNetDiary食材名リスト全体（栄養データベースと同じ名前）の補正器を取得
+
+    Returns:
+        CatalogueSnapper、CATALOGUE_SNAPPING_ENABLED が無効な場合はNone
+    """
+    global _catalogue_snapper
+    settings = get_settings()
+    if not settings.CATALOGUE_SNAPPING_ENABLED:
+        return None
+    if _catalogue_snapper is None:
+        _catalogue_snapper = CatalogueSnapper(
+            load_mynetdiary_ingredient_names(),
+            min_token_sort=settings.CATALOGUE_SNAP_MIN_TOKEN_SORT,
+            min_jaro_winkler=settings.CATALOGUE_SNAP_MIN_JARO_WINKLER
+        )
+        logger.info(f"Catalogue snapper initialized with {len(_catalogue_snapper.names)} names")
+    return _catalogue_snapper
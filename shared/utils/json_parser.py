@@ -1,104 +1,252 @@
+"""
+LLM出力からのJSON抽出
+
+最初の "{" からのデコードを試し、失敗した場合は文字列リテラルを考慮した括弧スキャナーで
+候補となるJSONオブジェクトの範囲を見つけ、括弧の対応が取れた候補だけを json.loads に渡します。
+対応の崩れた・パースできない候補や、閉じない候補のうち閉じ括弧を補っても修復できないもの
+（説明文中の "{" など）は、その次の "{" から走査し直します（後続や内側のオブジェクトも拾える）。
+修復できる閉じない候補は途中で切れたJSONとみなし、その内側の断片は返しません。
+走査し直す量は入力長の定数倍までに制限するため、閉じない "{" が大量に並ぶ入力でも処理は入力長に対して線形です。
+"""
 import json
-import re
 import logging
-from typing import Dict, Any, Optional
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
-def parse_json_from_string(text: str) -> Dict[str, Any]:
+# オブジェクト内で意味を持つ文字（文字列外）
+_STRUCTURAL_CHARS = re.compile(r'[{}\[\]"]')
+# 文字列内で意味を持つ文字
+_STRING_SPECIAL_CHARS = re.compile(r'["\\]')
+# 修復時の切断位置探索用（文字列外のカンマ）
+_COMMA_OR_QUOTE = re.compile(r'[",]')
+_CLOSERS = {"{": "}", "[": "]"}
+# 失敗した候補の内側を走査し直す量の上限（入力長に対する倍率）
+_RESCAN_FACTOR = 2
+
+_decoder = json.JSONDecoder()
+
+
+class _JsonSpanScanner:
+    """
+    JSONオブジェクト候補 `{ ... }` の範囲を開始位置の順に返すスキャナー
+
+    - 文字列リテラル内の括弧・エスケープは無視する
+    - 括弧の対応が崩れた候補は破棄し、開始位置の次から走査し直す
+    - nested=True の場合、返した候補の内側も走査し直す（パースできなかった候補の内側のオブジェクト用）
+    - 走査し直す量は入力長の _RESCAN_FACTOR 倍までで、超えた後は後戻りせずに走査を続ける
+    - 入力の末尾まで閉じない候補は、修復できれば tail・repaired に残して走査を終え、
+      修復できなければ開始位置の次から走査し直す
+    """
+
+    def __init__(self, text: str, nested: bool = False):
+        self.text = text
+        self.nested = nested
+        # (開始位置, 未閉鎖の括弧スタック, 最後の安全な切断位置, 文字列内で終了したか)
+        self.tail: Optional[Tuple[int, List[str], int, bool]] = None
+        self.repaired: Optional[Any] = None
+        self._rescan_budget = _RESCAN_FACTOR * len(text)
+
+    def _rescan_from(self, start: int, pos: int) -> int:
+        """start の次から走査し直せる場合はその位置、予算を使い切った場合は pos を返す"""
+        if pos - start > self._rescan_budget:
+            return pos
+        self._rescan_budget -= pos - start
+        return start + 1
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        text = self.text
+        pos = 0
+        while True:
+            start = text.find("{", pos)
+            if start == -1:
+                return
+
+            stack = ["{"]
+            pos = start + 1
+            # 切断してもJSONとして成立する位置（開き括弧の直後・閉じ括弧の直後）
+            last_cut = pos
+            mismatched = False
+            truncated = None
+
+            while stack:
+                match = _STRUCTURAL_CHARS.search(text, pos)
+                if match is None:
+                    truncated = (start, stack, last_cut, False)
+                    break
+                char = match.group()
+                index = match.start()
+
+                if char == '"':
+                    end = self._skip_string(index + 1)
+                    if end is None:
+                        truncated = (start, stack, last_cut, True)
+                        break
+                    pos = end
+                elif char == "{" or char == "[":
+                    stack.append(char)
+                    pos = index + 1
+                    last_cut = pos
+                else:
+                    if _CLOSERS[stack[-1]] != char:
+                        mismatched = True
+                        pos = index + 1
+                        break
+                    stack.pop()
+                    pos = index + 1
+                    last_cut = pos
+
+            if truncated is not None:
+                repaired = _repair_truncated(self, truncated)
+                if repaired is not None:
+                    self.tail, self.repaired = truncated, repaired
+                    return
+                pos = self._rescan_from(start, len(text))
+            elif mismatched:
+                pos = self._rescan_from(start, pos)
+            else:
+                yield start, pos
+                if self.nested:
+                    pos = self._rescan_from(start, pos)
+
+    def last_comma_after(self, pos: int) -> int:
+        """pos以降で文字列外にある最後のカンマの位置（なければ-1）"""
+        text = self.text
+        last_comma = -1
+        while True:
+            match = _COMMA_OR_QUOTE.search(text, pos)
+            if match is None:
+                return last_comma
+            if match.group() == ",":
+                last_comma = match.start()
+                pos = match.end()
+                continue
+            end = self._skip_string(match.end())
+            if end is None:
+                return last_comma
+            pos = end
+
+    def _skip_string(self, pos: int) -> Optional[int]:
+        """文字列リテラルの終端（閉じクォートの次の位置）を返す。終端がなければNone"""
+        text = self.text
+        while True:
+            match = _STRING_SPECIAL_CHARS.search(text, pos)
+            if match is None:
+                return None
+            if match.group() == "\\":
+                pos = match.start() + 2  # エスケープされた1文字を読み飛ばす
+                continue
+            return match.end()
+
+
+def iter_json_object_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    テキスト中の括弧の対応が取れたトップレベルJSONオブジェクト候補の範囲を返す
+
+    Args:
+        text: 検索対象のテキスト
+
+    Yields:
+        (開始位置, 終了位置) のタプル（text[start:end] が候補）
+    """
+    return iter(_JsonSpanScanner(text))
+
+
+def _repair_truncated(scanner: _JsonSpanScanner, tail: Tuple[int, List[str], int, bool]) -> Optional[Any]:
+    """途中で切れたJSONオブジェクトを閉じ括弧の補完で修復する"""
+    text = scanner.text
+    start, stack, last_cut, in_string = tail
+    closers = "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+    # 1. 末尾をそのまま閉じる（開いた文字列があれば閉じる）
+    body = text[start:].rstrip()
+    if in_string:
+        body += '"'
+    candidates = [body + closers]
+    # 2. 最後の安全な切断位置まで戻して閉じる（書きかけのキーや値を捨てる）
+    #    最後の括弧以降にある文字列外のカンマの直前は、完結した要素の直後なので切断できる
+    last_comma = scanner.last_comma_after(last_cut)
+    if last_comma != -1:
+        last_cut = last_comma
+    candidates.append(text[start:last_cut].rstrip() + closers)
+
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except (json.JSONDecodeError, RecursionError):
+            continue
+    return None
+
+
+def parse_json_from_string(text: str, repair_truncated: bool = False) -> Dict[str, Any]:
     """
     テキストからJSON部分を抽出してパースする
-    
+
     Args:
-        text: JSON文字列を含むテキスト
-        
+        text: JSON文字列を含むテキスト（コードフェンスや前後の説明文を含んでよい）
+        repair_truncated: Trueの場合、途中で切れたJSON（max_tokens到達など）を
+                          未閉鎖の文字列・配列・オブジェクトを閉じて修復する
+
     Returns:
         パースされたJSONオブジェクト
-        
+
     Raises:
         ValueError: JSONが見つからない、またはパースできない場合
     """
     if not text or not isinstance(text, str):
         raise ValueError("Invalid input: text must be a non-empty string")
-    
+
     # まず、テキスト全体がJSONかどうかを試す
     try:
         return json.loads(text.strip())
     except json.JSONDecodeError:
         pass
-    
-    # JSONブロックを探す（```json ... ``` または { ... }）
-    json_patterns = [
-        r'```json\s*(\{.*?\})\s*```',  # Markdown JSONブロック
-        r'```\s*(\{.*?\})\s*```',      # 一般的なMarkdownブロック
-        r'(\{.*\})',                   # 単純な{}ブロック
-    ]
-    
-    for pattern in json_patterns:
-        matches = re.findall(pattern, text, re.DOTALL)
-        for match in matches:
-            try:
-                # JSONとしてパース
-                parsed = json.loads(match.strip())
-                logger.info(f"Successfully parsed JSON from pattern: {pattern[:20]}...")
-                return parsed
-            except json.JSONDecodeError:
-                continue
-    
-    # 最後の手段：行ごとに{}を探す
-    lines = text.split('\n')
-    json_lines = []
-    in_json = False
-    brace_count = 0
-    
-    for line in lines:
-        if '{' in line and not in_json:
-            in_json = True
-            json_lines = [line]
-            brace_count = line.count('{') - line.count('}')
-        elif in_json:
-            json_lines.append(line)
-            brace_count += line.count('{') - line.count('}')
-            if brace_count <= 0:
-                # JSONブロック終了
-                json_text = '\n'.join(json_lines)
-                try:
-                    parsed = json.loads(json_text)
-                    logger.info("Successfully parsed JSON from line-by-line extraction")
-                    return parsed
-                except json.JSONDecodeError:
-                    pass
-                in_json = False
-                json_lines = []
-                brace_count = 0
-    
+
+    # 最初の "{" から始まるJSONを楽観的にC実装でデコード（前置きテキスト・コードフェンス付きの典型ケース）
+    first_brace = text.find("{")
+    if first_brace == -1:
+        logger.error(f"Failed to parse JSON from text: {text[:200]}...")
+        raise ValueError("No valid JSON found in the provided text")
+    try:
+        parsed, _ = _decoder.raw_decode(text, first_brace)
+        return parsed
+    except json.JSONDecodeError:
+        pass
+
+    scanner = _JsonSpanScanner(text, nested=True)
+    for start, end in scanner:
+        # 全文に対するraw_decodeは失敗時に先頭からの行番号を数えるため、候補範囲だけを切り出す
+        try:
+            parsed = json.loads(text[start:end])
+        except json.JSONDecodeError:
+            continue
+        logger.info(f"Successfully parsed JSON from text span [{start}:{end}] of {len(text)} chars")
+        return parsed
+
+    if repair_truncated and scanner.tail is not None:
+        logger.warning(f"Parsed truncated JSON by closing {len(scanner.tail[1])} open brackets (input: {len(text)} chars)")
+        return scanner.repaired
+
     # すべての方法が失敗した場合
     logger.error(f"Failed to parse JSON from text: {text[:200]}...")
     raise ValueError("No valid JSON found in the provided text")
 
+
 def extract_json_content(text: str) -> Optional[str]:
     """
     テキストからJSON部分のみを抽出する（パースはしない）
-    
+
     Args:
         text: JSON文字列を含むテキスト
-        
+
     Returns:
-        JSON文字列、または見つからない場合はNone
+        最初の括弧の対応が取れたJSONオブジェクト文字列、または見つからない場合はNone
     """
     if not text or not isinstance(text, str):
         return None
-    
-    # JSONブロックを探す
-    json_patterns = [
-        r'```json\s*(\{.*?\})\s*```',
-        r'```\s*(\{.*?\})\s*```',
-        r'(\{.*\})',
-    ]
-    
-    for pattern in json_patterns:
-        matches = re.findall(pattern, text, re.DOTALL)
-        if matches:
-            return matches[0].strip()
-    
-    return None 
\ No newline at end of file
+
+    for start, end in _JsonSpanScanner(text):
+        return text[start:end]
+
+    return None
@@ -0,0 +1,232 @@
+"""
+プロセス内メトリクスレジストリ
+
+Counter / Gauge / Histogram を保持し、Prometheusテキスト形式とJSONで出力します。
+外部依存なしで /metrics エンドポイントやオートスケーラーから参照できます。
+"""
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in items) + "}"
+
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """単調増加カウンター"""
+    metric_type = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in items]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {_format_labels(key) or "_": value for key, value in self._values.items()}
+
+
+class Gauge(_Metric):
+    """現在値ゲージ（値の直接設定、またはスクレイプ時コールバック）"""
+    metric_type = "gauge"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: Dict[LabelKey, float] = {}
+        self._callbacks: List[Callable[[], Iterable[Tuple[Dict[str, str], float]]]] = []
+
+    def set(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1.0, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, labels: Optional[Dict[str, str]] = None) -> None:
+        self.inc(-amount, labels)
+
+    def get(self, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def set_callback(self, callback: Callable[[], Iterable[Tuple[Dict[str, str], float]]]) -> None:
+        """スクレイプ時に (labels, value) を返すコールバックを登録"""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def _collect(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            values = dict(self._values)
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                for labels, value in callback():
+                    values[_label_key(labels)] = value
+            except Exception:
+                # メトリクス収集失敗でスクレイプ全体を落とさない
+                continue
+        return values
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in self._collect().items()]
+
+    def snapshot(self) -> Dict:
+        return {_format_labels(key) or "_": value for key, value in self._collect().items()}
+
+
+class Histogram(_Metric):
+    """累積バケットヒストグラム"""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelKey, List[int]] = {}
+        self._sums: Dict[LabelKey, float] = {}
+
+    def observe(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+                self._counts[key] = counts
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def count(self, labels: Optional[Dict[str, str]] = None) -> int:
+        return sum(self._counts.get(_label_key(labels), []))
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                _format_labels(key) or "_": {"count": sum(counts), "sum": self._sums[key]}
+                for key, counts in self._counts.items()
+            }
+
+
+class MetricsRegistry:
+    """メトリクスレジストリ（同名メトリクスは同一インスタンスを返す）"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, description: str, **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, description, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' already registered as {metric.metric_type}")
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str = "", buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Prometheusテキスト形式で出力"""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            if metric.description:
+                lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """JSON出力用のスナップショット"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+# グローバルなレジストリインスタンス
+_metrics_registry = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """メトリクスレジストリのシングルトンインスタンスを取得"""
+    global _metrics_registry
+    if _metrics_registry is None:
+        _metrics_registry = MetricsRegistry()
+    return _metrics_registry
@@ -0,0 +1,254 @@
+"""
+MyNetDiary食材名リストのローカル検索（音声NLUプロンプトの候補絞り込み用）
+
+文字起こしから食品の言及（連続する内容語）を取り出し、食材名の転置インデックスで
+語幹化したトークン・同義語・あいまい一致（ASRの綴り揺れ）によりスコアリングします。
+言及ごとの上位K件だけをプロンプトに含めることで、約1,100件の全リストを毎回送らずに済みます。
+"""
+import difflib
+import logging
+import math
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from shared.utils.mynetdiary_utils import load_mynetdiary_ingredient_names
+
+logger = logging.getLogger(__name__)
+
+SYNONYMS_PATH = Path(__file__).parent.parent.parent / "data" / "mynetdiary_synonyms.txt"
+
+# 言及の区切りになる機能語・量の表現
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "with", "without", "of", "for", "on", "in", "at", "to", "from", "some", "few",
+    "i", "me", "my", "we", "you", "it", "its", "they", "he", "she", "this", "that", "these", "those", "then",
+    "had", "have", "ate", "eat", "eaten", "drank", "drink", "was", "were", "is", "are", "be", "also", "just",
+    "breakfast", "lunch", "dinner", "snack", "meal", "today", "morning", "evening", "night", "yesterday",
+    "cup", "glass", "bowl", "plate", "slice", "piece", "serving", "spoon", "tablespoon", "teaspoon",
+    "gram", "ounce", "pound", "half", "one", "two", "three", "four", "five", "little", "lot", "about", "like",
+    "no", "not", "side", "topped", "all", "added", "additional", "context",
+}
+# 単独では食品の言及にならない調理法・状態の語（食品名と連続する場合は言及に含める）
+_DESCRIPTORS = {
+    "raw", "cooked", "boiled", "steamed", "fried", "baked", "roasted", "grilled", "scrambled", "poached",
+    "canned", "frozen", "dried", "fresh", "plain", "low", "fat", "reduced", "sodium", "salted", "unsalted",
+    "sweetened", "unsweetened", "whole", "prepared", "unprepared", "lean", "skinless", "boneless", "large",
+    "medium", "small", "hot", "cold", "homemade", "sliced", "chopped", "grated", "light", "regular",
+}
+# 語尾規則で処理できない複数形
+_IRREGULAR_PLURALS = {"leaves": "leaf", "loaves": "loaf", "halves": "half", "knives": "knife", "geese": "goose"}
+# 語幹が一致しない語のあいまい一致の類似度の下限
+_FUZZY_CUTOFF = 0.82
+# 食材名の先頭語（主要語）に一致した場合の加点
+_HEAD_BONUS = 0.5
+
+
+def stem_token(token: str) -> str:
+    """複数形を単数形に揃える軽量な語幹化（tomatoes → tomato, berries → berry）"""
+    token = token.lower()
+    if token in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[token]
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("ches", "shes", "sses", "xes", "oes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """英字の単語に分割して語幹化する"""
+    return [stem_token(token) for token in re.findall(r"[a-z]+", text.lower())]
+
+
+def load_synonyms(path: Path = SYNONYMS_PATH) -> Dict[Tuple[str, ...], List[str]]:
+    """
+    同義語辞書を読み込む
+
+    1行に1グループで、"aubergine, eggplant" はカンマ区切りの相互の同義語、
+    "pizza => mozzarella cheese, marinara" は左辺から右辺への一方向の展開です
+    （Elasticsearchの同義語ファイルと同じ書式）。
+
+    Returns:
+        語幹化したフレーズ → 展開する語幹のリスト
+    """
+    synonyms: Dict[Tuple[str, ...], List[str]] = defaultdict(list)
+    if not path.exists():
+        logger.warning(f"Synonym file not found, retrieving without synonyms: {path}")
+        return synonyms
+
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "=>" in line:
+            source, targets = line.split("=>", 1)
+            phrases = [tuple(tokenize(term)) for term in source.split(",")]
+            expansions = [token for term in targets.split(",") for token in tokenize(term)]
+            for phrase in filter(None, phrases):
+                synonyms[phrase].extend(expansions)
+            continue
+        group = [phrase for phrase in (tuple(tokenize(term)) for term in line.split(",")) if phrase]
+        for phrase in group:
+            synonyms[phrase].extend(token for other in group if other != phrase for token in other)
+    return synonyms
+
+
+@dataclass
+class _Mention:
+    """食品の言及（text）と検索に使う語彙の重み、発話中の食品語に対応する語彙"""
+    text: str
+    terms: Dict[str, float]
+    food_terms: List[str]
+
+
+@dataclass
+class CatalogueMatch:
+    """文字起こし中の1つの食品の言及と、その候補食材名（スコア順）"""
+    mention: str
+    names: List[str]
+
+
+class CatalogueIndex:
+    """
+    食材名リストの転置インデックス
+
+    使用例:
+        index = CatalogueIndex(load_mynetdiary_ingredient_names(exclude_uncooked=True))
+        index.candidate_names("I had scrambled eggs and toast with butter", top_k=8)
+    """
+
+    def __init__(self, names: Sequence[str], synonyms: Optional[Dict[Tuple[str, ...], List[str]]] = None):
+        self.names = list(names)
+        self._tokens = [tokenize(name) for name in self.names]
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for i, tokens in enumerate(self._tokens):
+            for token in dict.fromkeys(tokens):
+                self._postings[token].append(i)
+        self._idf = {token: math.log(1 + len(self.names) / len(ids)) for token, ids in self._postings.items()}
+        self._vocabulary = sorted(self._postings)
+
+        # フレーズ（語幹のタプル）→ 展開する語幹
+        self._synonyms = dict(synonyms or {})
+        self._max_phrase_length = max((len(phrase) for phrase in self._synonyms), default=1)
+
+    def resolve(self, token: str) -> List[Tuple[str, float]]:
+        """語幹をインデックスの語彙に対応付ける（完全一致、なければあいまい一致）"""
+        return _resolve_cached(self, token)
+
+    def _resolve_uncached(self, token: str) -> List[Tuple[str, float]]:
+        if token in self._postings:
+            return [(token, 1.0)]
+        if len(token) < 4:
+            return []
+        matches = difflib.get_close_matches(token, self._vocabulary, n=2, cutoff=_FUZZY_CUTOFF)
+        return [(match, difflib.SequenceMatcher(None, token, match).ratio()) for match in matches]
+
+    def find_mentions(self, text: str) -> List[_Mention]:
+        """
+        文字起こしから食品の言及を取り出す
+
+        機能語・量の表現で区切られた、語彙に対応付けられる語の連続を1つの言及とします。
+        調理法・状態の語だけの連続は言及としません。
+
+        Returns:
+            言及のリスト（発話順）
+        """
+        words = re.findall(r"[a-z]+", text.lower())
+        stems = [stem_token(word) for word in words]
+        mentions = []
+        run_words: List[str] = []
+        run_terms: Dict[str, float] = {}
+        food_terms: List[str] = []
+
+        def close_run():
+            if run_words and food_terms:
+                mentions.append(_Mention(" ".join(run_words), dict(run_terms), list(dict.fromkeys(food_terms))))
+
+        i = 0
+        while i < len(stems):
+            expansions, length = self._match_synonym(stems, i)
+            terms = {}
+            for stem in stems[i:i + length]:
+                if stem not in _STOPWORDS:
+                    for term, weight in self.resolve(stem):
+                        terms[term] = max(terms.get(term, 0.0), weight)
+                        if stem not in _DESCRIPTORS and weight == max(w for _, w in self.resolve(stem)):
+                            food_terms.append(term)
+            for stem in expansions:
+                for term, weight in self.resolve(stem):
+                    terms[term] = max(terms.get(term, 0.0), 0.8 * weight)
+
+            if terms:
+                run_words.extend(words[i:i + length])
+                for term, weight in terms.items():
+                    run_terms[term] = max(run_terms.get(term, 0.0), weight)
+                if expansions and not food_terms:
+                    food_terms.extend(term for term in terms if term not in _DESCRIPTORS)
+            else:
+                close_run()
+                run_words, run_terms, food_terms = [], {}, []
+            i += length
+        close_run()
+        return mentions
+
+    def search(self, terms: Dict[str, float], top_k: int, required_terms: Sequence[str] = ()) -> List[str]:
+        """
+        重み付きの語でスコアリングし、上位の食材名を返す（短い一般的な名前を優先）
+
+        required_terms の語を含む食材名が上位 top_k 件に1つもない場合は、その語を含む上位の食材名を追加します
+        （"chicken curry" のような複数の食品を含む言及で一方の食品の候補が落ちないようにするため）。
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        for term, weight in terms.items():
+            idf = self._idf[term]
+            for i in self._postings[term]:
+                scores[i] += weight * idf * (1 + _HEAD_BONUS if self._tokens[i][0] == term else 1)
+        ranked = sorted(scores, key=lambda i: (-scores[i] / (1 + 0.05 * len(self._tokens[i])), self.names[i]))
+
+        selected = ranked[:top_k]
+        for term in required_terms:
+            if not any(term in self._tokens[i] for i in selected):
+                selected.extend([i for i in ranked if term in self._tokens[i]][:max(1, top_k // 4)])
+        return [self.names[i] for i in selected]
+
+    def retrieve(self, text: str, top_k: int = 8) -> List[CatalogueMatch]:
+        """言及ごとに上位 top_k 件（言及に複数の食品を含む場合はそれ以上）の食材名を返す"""
+        return [
+            CatalogueMatch(mention.text, self.search(mention.terms, top_k, mention.food_terms))
+            for mention in self.find_mentions(text)
+        ]
+
+    def candidate_names(self, text: str, top_k: int = 8) -> List[str]:
+        """全言及の候補食材名（重複なし・元のリスト順）。言及が見つからなければ空リスト"""
+        selected = {name for match in self.retrieve(text, top_k) for name in match.names}
+        return [name for name in self.names if name in selected]
+
+    def _match_synonym(self, stems: List[str], start: int) -> Tuple[List[str], int]:
+        """start から始まる最長の同義語フレーズを探す（なければ1語）"""
+        for length in range(min(self._max_phrase_length, len(stems) - start), 0, -1):
+            phrase = tuple(stems[start:start + length])
+            if phrase in self._synonyms:
+                return self._synonyms[phrase], length
+        return [], 1
+
+
+@lru_cache(maxsize=4096)
+def _resolve_cached(index: CatalogueIndex, token: str) -> List[Tuple[str, float]]:
+    return index._resolve_uncached(token)
+
+
+_catalogue_index: Optional[CatalogueIndex] = None
+
+
+def get_catalogue_index() -> CatalogueIndex:
+    """MyNetDiary食材名リスト（uncookedを除く、プロンプトと同じリスト）のインデックスを取得"""
+    global _catalogue_index
+    if _catalogue_index is None:
+        _catalogue_index = CatalogueIndex(load_mynetdiary_ingredient_names(exclude_uncooked=True), load_synonyms())
+        logger.info(f"MyNetDiary catalogue index built: {len(_catalogue_index.names)} names")
+    return _catalogue_index
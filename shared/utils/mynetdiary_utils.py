@@ -2,7 +2,7 @@
 MyNetDiary関連のユーティリティ関数
 """
 import os
-from typing import List, Set
+from typing import List, Optional, Set
 from pathlib import Path
 
 def load_mynetdiary_ingredient_names(exclude_uncooked: bool = False) -> List[str]:
@@ -40,17 +40,19 @@ def get_mynetdiary_ingredient_names_as_set() -> Set[str]:
     """
     return set(load_mynetdiary_ingredient_names())
 
-def format_mynetdiary_ingredients_for_prompt(exclude_uncooked: bool = False) -> str:
+def format_mynetdiary_ingredients_for_prompt(exclude_uncooked: bool = False, ingredient_names: Optional[List[str]] = None) -> str:
     """
     MyNetDiary の食材名リストをプロンプト用にフォーマット
     
     Args:
         exclude_uncooked: uncooked 食材を除外するかどうか
+        ingredient_names: 含める食材名（指定しない場合はリスト全体）
     
     Returns:
         str: プロンプトに組み込み可能な形式の食材名リスト
     """
-    ingredient_names = load_mynetdiary_ingredient_names(exclude_uncooked=exclude_uncooked)
+    if ingredient_names is None:
+        ingredient_names = load_mynetdiary_ingredient_names(exclude_uncooked=exclude_uncooked)
     
     # 食材名を番号付きリストとしてフォーマット
     formatted_list = []
@@ -0,0 +1,137 @@
+"""
+Server-Sent Events ストリーム
+
+分析パイプラインをバックグラウンドタスクで実行し、段階イベントを text/event-stream 形式で送信します。
+リクエスト受付から最初の有用なイベントまでの時間（time to first useful byte）を
+analysis_stream_first_event_seconds として記録します。
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from shared.pipeline.events import ERROR, FINAL, PipelineEventCallback
+from shared.utils.metrics import MetricsRegistry, get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+SSE_MEDIA_TYPE = "text/event-stream"
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # リバースプロキシのバッファリングを無効化
+}
+
+_DONE = object()
+
+
+def format_sse_event(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """
+    1件のSSEイベントを整形する
+
+    Args:
+        event: イベント名
+        data: JSONシリアライズ可能なペイロード
+        event_id: イベントID（オプション）
+
+    Returns:
+        "event: ...\\ndata: ...\\n\\n" 形式の文字列
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    lines.extend(f"data: {line}" for line in payload.splitlines())
+    return "\n".join(lines) + "\n\n"
+
+
+class AnalysisEventStream:
+    """
+    パイプライン実行をSSEイベント列に変換するストリーム
+
+    使用例:
+        stream = AnalysisEventStream("complete")
+        return StreamingResponse(stream.run(lambda callback: run_analysis(event_callback=callback)),
+                                 media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS)
+
+    run に渡す関数はイベントコールバックを受け取り、最終結果（pydanticモデルまたは辞書）を返します。
+    最終結果は final イベント、例外は error イベントとして送信されます。
+    """
+
+    def __init__(self, endpoint: str, keepalive_seconds: Optional[float] = 15.0,
+                 metrics: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            endpoint: メトリクスのラベルに使うエンドポイント名
+            keepalive_seconds: イベントがない間にコメント行を送る間隔（Noneで無効）
+            metrics: メトリクスレジストリ（省略時はプロセス共通のレジストリ）
+        """
+        self.endpoint = endpoint
+        self.keepalive_seconds = keepalive_seconds
+        self.started_at = time.monotonic()
+        self.first_event_seconds: Optional[float] = None
+        self._queue: "asyncio.Queue" = asyncio.Queue()
+        self._event_id = 0
+
+        metrics = metrics or get_metrics_registry()
+        self._first_event_histogram = metrics.histogram(
+            "analysis_stream_first_event_seconds",
+            "Time from request start to the first useful streamed event"
+        )
+        self._events_counter = metrics.counter("analysis_stream_events_total", "Streamed analysis events by endpoint and event")
+
+    def emit(self, event: str, data: Dict[str, Any]) -> None:
+        """パイプラインのイベントコールバック（キューに積むだけで待たない）"""
+        self._queue.put_nowait((event, data))
+
+    async def run(self, analysis: Callable[[PipelineEventCallback], Awaitable[Any]]) -> AsyncIterator[str]:
+        """
+        分析を開始し、SSE形式のイベント文字列を順に返す
+
+        クライアントが切断した場合（ジェネレーターが閉じられた場合）は分析タスクを取り消します。
+        """
+        task = asyncio.create_task(self._execute(analysis))
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is _DONE:
+                    break
+                event, data = item
+                yield self._format(event, data)
+        finally:
+            if not task.done():
+                logger.info(f"Analysis stream ({self.endpoint}) closed by client, cancelling analysis")
+                task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _execute(self, analysis: Callable[[PipelineEventCallback], Awaitable[Any]]) -> None:
+        try:
+            result = await analysis(self.emit)
+            if hasattr(result, "model_dump"):
+                result = result.model_dump(mode="json")
+            self.emit(FINAL, result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # HTTPExceptionなどはstatus_code/detailを持つ
+            status_code = getattr(e, "status_code", 500)
+            detail = getattr(e, "detail", None) or str(e)
+            logger.error(f"Streamed analysis ({self.endpoint}) failed: {detail}", exc_info=status_code >= 500)
+            self.emit(ERROR, {"status_code": status_code, "detail": detail})
+        finally:
+            self._queue.put_nowait(_DONE)
+
+    def _format(self, event: str, data: Dict[str, Any]) -> str:
+        self._event_id += 1
+        labels = {"endpoint": self.endpoint, "event": event}
+        self._events_counter.inc(labels=labels)
+        if self.first_event_seconds is None and event != ERROR:
+            self.first_event_seconds = time.monotonic() - self.started_at
+            self._first_event_histogram.observe(self.first_event_seconds, labels=labels)
+            logger.info(f"Analysis stream ({self.endpoint}) first event '{event}' after {self.first_event_seconds:.2f}s")
+        return format_sse_event(event, data, self._event_id)
@@ -0,0 +1,186 @@
+"""
+ストリーミングJSONの逐次パーサー
+
+LLMのトークンストリームを受け取りながら `dishes[].ingredients[]` の各食材オブジェクトを
+閉じ括弧が届いた時点で取り出します。文字列内の括弧・エスケープを考慮し、
+JSON本体の前にあるコードフェンスや説明文は読み飛ばします。
+"""
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StreamedIngredient:
+    """ストリームから取り出した食材オブジェクト"""
+    dish_index: int
+    ingredient_index: int
+    data: Dict[str, Any]
+
+    @property
+    def ingredient_name(self) -> Optional[str]:
+        name = self.data.get("ingredient_name")
+        return name if isinstance(name, str) else None
+
+
+class _Frame:
+    """コンテナ（object / array）のスキャン状態"""
+    __slots__ = ("kind", "key", "index", "start", "current_key", "expect_key", "child_count")
+
+    def __init__(self, kind: str, key: Any, index: int, start: int):
+        self.kind = kind              # "object" または "array"
+        self.key = key                # 親objectでのキー（親がarrayの場合はNone）
+        self.index = index            # 親arrayでの位置（親がobjectの場合は-1）
+        self.start = start            # バッファ内の開始位置
+        self.current_key = None       # object: 直近に読んだキー
+        self.expect_key = kind == "object"
+        self.child_count = 0          # array: 子コンテナの数
+
+
+class IncrementalIngredientParser:
+    """
+    `dishes[].ingredients[]` を逐次抽出するパーサー
+
+    使用例:
+        parser = IncrementalIngredientParser()
+        async for delta in stream:
+            for ingredient in parser.feed(delta):
+                ...
+        full_text = parser.text
+    """
+
+    def __init__(self, dishes_key: str = "dishes", ingredients_key: str = "ingredients"):
+        self.dishes_key = dishes_key
+        self.ingredients_key = ingredients_key
+        self._chunks: List[str] = []
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._finished = False
+        self.emitted_count = 0
+
+    @property
+    def text(self) -> str:
+        """これまでに受信したテキスト全体"""
+        if self._chunks:
+            self._buffer += "".join(self._chunks)
+            self._chunks = []
+        return self._buffer
+
+    @property
+    def finished(self) -> bool:
+        """ルートのJSONオブジェクトが閉じたかどうか"""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[StreamedIngredient]:
+        """
+        テキスト断片を追加し、新たに閉じた食材オブジェクトを返す
+
+        Args:
+            chunk: ストリームから受信したテキスト断片
+
+        Returns:
+            この断片で完成した食材の一覧（出現順）
+        """
+        if not chunk:
+            return []
+        self._chunks.append(chunk)
+        buffer = self.text
+        emitted: List[StreamedIngredient] = []
+
+        pos = self._pos
+        length = len(buffer)
+        stack = self._stack
+        while pos < length and not self._finished:
+            char = buffer[pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._on_string_end(buffer, pos)
+                pos += 1
+                continue
+
+            if not stack:
+                # ルートオブジェクト開始前（コードフェンス・前置きテキスト）は読み飛ばす
+                if char == "{":
+                    stack.append(_Frame("object", None, -1, pos))
+                pos += 1
+                continue
+
+            top = stack[-1]
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char in "{[":
+                self._open(char, pos)
+            elif char in "}]":
+                frame = stack.pop()
+                if frame.kind == "object":
+                    ingredient = self._match_ingredient(frame, buffer, pos)
+                    if ingredient is not None:
+                        emitted.append(ingredient)
+                if not stack:
+                    self._finished = True
+            elif char == ":":
+                top.expect_key = False
+            elif char == ",":
+                if top.kind == "object":
+                    top.expect_key = True
+                    top.current_key = None
+            pos += 1
+
+        self._pos = pos
+        self.emitted_count += len(emitted)
+        return emitted
+
+    def _open(self, char: str, pos: int) -> None:
+        parent = self._stack[-1]
+        if parent.kind == "object":
+            frame = _Frame("object" if char == "{" else "array", parent.current_key, -1, pos)
+        else:
+            frame = _Frame("object" if char == "{" else "array", None, parent.child_count, pos)
+            parent.child_count += 1
+        self._stack.append(frame)
+
+    def _on_string_end(self, buffer: str, pos: int) -> None:
+        if not self._stack:
+            return
+        top = self._stack[-1]
+        if top.kind == "object" and top.expect_key:
+            try:
+                top.current_key = json.loads(buffer[self._string_start:pos + 1])
+            except json.JSONDecodeError:
+                top.current_key = None
+
+    def _match_ingredient(self, frame: _Frame, buffer: str, end: int) -> Optional[StreamedIngredient]:
+        """閉じたobjectが dishes[i].ingredients[j] に位置する場合に食材として返す"""
+        stack = self._stack
+        if len(stack) < 3:
+            return None
+        ingredients_array, dish_object, dishes_array = stack[-1], stack[-2], stack[-3]
+        if not (
+            ingredients_array.kind == "array" and ingredients_array.key == self.ingredients_key
+            and dish_object.kind == "object"
+            and dishes_array.kind == "array" and dishes_array.key == self.dishes_key
+        ):
+            return None
+
+        try:
+            data = json.loads(buffer[frame.start:end + 1])
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed streamed ingredient: {e}")
+            return None
+        if not isinstance(data, dict):
+            return None
+        return StreamedIngredient(dish_index=dish_object.index, ingredient_index=frame.index, data=data)
@@ -0,0 +1,135 @@
+"""
+エネルギーベースの音声区間検出（VAD）
+
+ストリーミング入力の音声を20msフレームごとのRMSレベルで判定し、
+発話区間（無音で区切られた区間）と発話終了（長い無音）を逐次検出します。
+"""
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+from shared.utils.audio_normalization import frame_levels_dbfs
+
+
+@dataclass
+class SpeechSegment:
+    """検出された発話区間（前後の余白を含む）"""
+    index: int
+    start_seconds: float
+    end_seconds: float
+    samples: np.ndarray
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.end_seconds - self.start_seconds
+
+
+class VoiceActivityDetector:
+    """
+    音声を逐次受け取り、発話区間と発話終了を検出する
+
+    発話中に segment_silence_ms 以上の無音が続くと区間を閉じ（文字起こしを開始できる単位）、
+    最後の発話から end_of_speech_ms 以上の無音が続くと発話終了とみなします。
+    区間が max_segment_seconds に達した場合は無音を待たずに閉じます。
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        threshold_dbfs: float = -45.0,
+        segment_silence_ms: int = 400,
+        end_of_speech_ms: int = 1200,
+        padding_ms: int = 200,
+        max_segment_seconds: float = 30.0
+    ):
+        self.sample_rate = sample_rate
+        self.threshold_dbfs = threshold_dbfs
+        self._frame_length = frame_levels_dbfs(np.zeros(sample_rate, dtype=np.float32), sample_rate)[1]
+        frame_ms = self._frame_length * 1000 / sample_rate
+        self._segment_silence_frames = max(1, int(segment_silence_ms / frame_ms))
+        self._end_of_speech_frames = max(self._segment_silence_frames, int(end_of_speech_ms / frame_ms))
+        self._padding_frames = int(padding_ms / frame_ms)
+        self._max_segment_frames = max(1, int(max_segment_seconds * 1000 / frame_ms))
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._pre_roll = deque(maxlen=max(1, self._padding_frames))
+        self._segment: List[np.ndarray] = []
+        self._segment_start_frame = 0
+        self._frame_index = 0
+        self._silence_run = 0
+        self._segment_count = 0
+        self.speech_detected = False
+        self.end_of_speech = False
+
+    @property
+    def processed_seconds(self) -> float:
+        return self._frame_index * self._frame_length / self.sample_rate
+
+    def push(self, samples: np.ndarray) -> Tuple[List[SpeechSegment], bool]:
+        """
+        モノラル音声（float32）を追加する
+
+        Returns:
+            (この呼び出しで閉じた発話区間, 発話終了を検出したかどうか)。発話終了後の入力は無視します。
+        """
+        if self.end_of_speech:
+            return [], True
+
+        self._buffer = np.concatenate([self._buffer, samples.astype(np.float32, copy=False)])
+        levels, frame_length = frame_levels_dbfs(self._buffer, self.sample_rate)
+        frames = self._buffer[:len(levels) * frame_length].reshape(len(levels), frame_length)
+        self._buffer = self._buffer[len(levels) * frame_length:]
+
+        segments = []
+        for frame, level in zip(frames, levels):
+            segment = self._process_frame(frame, level > self.threshold_dbfs)
+            if segment is not None:
+                segments.append(segment)
+            if self.end_of_speech:
+                break
+        return segments, self.end_of_speech
+
+    def flush(self) -> List[SpeechSegment]:
+        """入力終了時に閉じていない発話区間を閉じる（クライアントからの終了通知用）"""
+        self.end_of_speech = True
+        if not self._segment:
+            return []
+        return [self._close_segment()]
+
+    def _process_frame(self, frame: np.ndarray, voiced: bool):
+        self._frame_index += 1
+        self._silence_run = 0 if voiced else self._silence_run + 1
+
+        if not self._segment:
+            if voiced:
+                self.speech_detected = True
+                self._segment = list(self._pre_roll) + [frame]
+                self._segment_start_frame = self._frame_index - len(self._segment)
+                self._pre_roll.clear()
+                return None
+            self._pre_roll.append(frame)
+            if self.speech_detected and self._silence_run >= self._end_of_speech_frames:
+                self.end_of_speech = True
+            return None
+
+        self._segment.append(frame)
+        if self._silence_run >= self._segment_silence_frames or len(self._segment) >= self._max_segment_frames:
+            return self._close_segment()
+        return None
+
+    def _close_segment(self) -> SpeechSegment:
+        # 末尾の無音は余白分だけ残す
+        trailing = max(0, min(self._silence_run, len(self._segment)) - self._padding_frames)
+        frames = self._segment[:len(self._segment) - trailing] if trailing else self._segment
+        start = self._segment_start_frame * self._frame_length / self.sample_rate
+        segment = SpeechSegment(
+            index=self._segment_count,
+            start_seconds=round(start, 3),
+            end_seconds=round(start + len(frames) * self._frame_length / self.sample_rate, 3),
+            samples=np.concatenate(frames)
+        )
+        self._segment_count += 1
+        self._segment = []
+        return segment
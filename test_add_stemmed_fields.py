@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+語幹化フィールド追加（scripts/add_stemmed_fields.py）とJSONのストリーミング読み書き（scripts/json_stream.py）のテスト
+
+プロセスプールでの語幹化が入力順を保ち、従来の json.dump と同じ出力になることを検証します。
+"""
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from nltk.stem import PorterStemmer
+
+from scripts.add_stemmed_fields import add_stemmed_fields, enrich_records, process_database
+from scripts.json_stream import JsonDocumentWriter, iter_json_documents
+
+
+def _records(count):
+    names = ["Apples with skin raw", "Rice brown long grain cooked", "Chicken breast grilled", "Café latte 2%"]
+    return [
+        {"id": i, "original_name": names[i % 4],
+         "search_name": names[i % 4].split()[0] if i % 3 else [names[i % 4].split()[0], names[i % 4]],
+         "description": f"{names[i % 4]}, branded item {i}"}
+        for i in range(count)
+    ]
+
+
+class TestStemmedFieldEnrichment(unittest.TestCase):
+    """語幹化フィールド追加のテストケース"""
+
+    def test_process_pool_keeps_order_and_matches_sequential_stemming(self):
+        records = _records(257)
+        stemmer = PorterStemmer()
+        expected = [add_stemmed_fields(record, stemmer) for record in records]
+
+        self.assertEqual(list(enrich_records(iter(records), workers=2, chunk_size=10)), expected)
+        self.assertEqual(expected[1]["stemmed_search_name"], "rice")
+        self.assertEqual(expected[3]["stemmed_search_name"], ["caf", "caf latt"])
+
+    def test_output_matches_json_dump_for_arrays_and_jsonl(self):
+        records = _records(40)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_path = Path(tmpdir) / "foods.json"
+            input_path.write_text(json.dumps(records, ensure_ascii=False, indent=2), encoding="utf-8")
+            stemmer = PorterStemmer()
+            expected = [add_stemmed_fields(record, stemmer) for record in records]
+
+            array_path = Path(tmpdir) / "foods_stemmed.json"
+            self.assertTrue(process_database(str(input_path), str(array_path), workers=2, chunk_size=7))
+            self.assertEqual(array_path.read_text(encoding="utf-8"), json.dumps(expected, ensure_ascii=False, indent=2))
+
+            jsonl_path = Path(tmpdir) / "foods_stemmed.jsonl"
+            self.assertTrue(process_database(str(array_path), str(jsonl_path), workers=1))
+            self.assertEqual(len(jsonl_path.read_text(encoding="utf-8").splitlines()), 40)
+            self.assertEqual(list(iter_json_documents(jsonl_path)), expected)
+
+    def test_empty_array_is_written(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "empty.json"
+            with JsonDocumentWriter(path):
+                pass
+            self.assertEqual(json.loads(path.read_text(encoding="utf-8")), [])
+
+    def test_failure_keeps_existing_output(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "foods_stemmed.json"
+            path.write_text('[{"id": 1}]', encoding="utf-8")
+            with self.assertRaises(RuntimeError):
+                with JsonDocumentWriter(path) as writer:
+                    writer.write({"id": 2})
+                    raise RuntimeError("stemming failed")
+
+            self.assertEqual(path.read_text(encoding="utf-8"), '[{"id": 1}]')
+            self.assertEqual([p.name for p in Path(tmpdir).iterdir()], ["foods_stemmed.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
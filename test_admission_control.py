@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+アドミッション制御ミドルウェアのテスト
+
+同時実行上限・有界キュー・優先度順の引き渡し・429 + Retry-After と、WebSocket 接続の 1013 での拒否を検証します。
+"""
+import asyncio
+import unittest
+
+from shared.middleware import (
+    AdmissionControlMiddleware,
+    AdmissionRejected,
+    AdmissionRule,
+    PriorityLimiter,
+    search_context_priority,
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+)
+from shared.utils.metrics import MetricsRegistry
+
+
+class TestPriorityLimiter(unittest.TestCase):
+    """PriorityLimiterのテストケース"""
+
+    def test_higher_priority_is_served_first(self):
+        async def scenario():
+            limiter = PriorityLimiter("t", max_concurrency=1, max_queue=10, queue_timeout_seconds=1.0)
+            await limiter.acquire()
+            order = []
+
+            async def waiter(name, priority):
+                await limiter.acquire(priority)
+                order.append(name)
+                limiter.release()
+
+            tasks = [asyncio.create_task(waiter("autocomplete", PRIORITY_LOW))]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(waiter("pipeline", PRIORITY_HIGH)))
+            await asyncio.sleep(0)
+            self.assertEqual(limiter.queue_depth, 2)
+
+            limiter.release()
+            await asyncio.gather(*tasks)
+            return order, limiter.active
+
+        order, active = asyncio.run(scenario())
+        self.assertEqual(order, ["pipeline", "autocomplete"])
+        self.assertEqual(active, 0)
+
+    def test_full_queue_sheds_or_preempts_low_priority(self):
+        async def scenario():
+            limiter = PriorityLimiter("t", max_concurrency=1, max_queue=1, queue_timeout_seconds=1.0)
+            await limiter.acquire()
+            low = asyncio.create_task(limiter.acquire(PRIORITY_LOW))
+            await asyncio.sleep(0)
+
+            with self.assertRaises(AdmissionRejected) as rejected:
+                await limiter.acquire(PRIORITY_LOW)
+            self.assertEqual(rejected.exception.reason, "queue_full")
+
+            high = asyncio.create_task(limiter.acquire(PRIORITY_HIGH))
+            await asyncio.sleep(0)
+            with self.assertRaises(AdmissionRejected) as preempted:
+                await low
+            self.assertEqual(preempted.exception.reason, "preempted")
+
+            limiter.release()
+            await high
+            limiter.release()
+            return limiter.active, limiter.queue_depth
+
+        self.assertEqual(asyncio.run(scenario()), (0, 0))
+
+    def test_queue_timeout(self):
+        async def scenario():
+            limiter = PriorityLimiter("t", max_concurrency=1, max_queue=5, queue_timeout_seconds=0.05)
+            await limiter.acquire()
+            with self.assertRaises(AdmissionRejected) as rejected:
+                await limiter.acquire()
+            return rejected.exception, limiter.queue_depth
+
+        rejection, depth = asyncio.run(scenario())
+        self.assertEqual(rejection.reason, "queue_timeout")
+        self.assertGreaterEqual(rejection.retry_after_seconds, 1)
+        self.assertEqual(depth, 0)
+
+
+class TestAdmissionControlMiddleware(unittest.TestCase):
+    """AdmissionControlMiddlewareのテストケース"""
+
+    def test_rejects_with_429_and_retry_after(self):
+        async def scenario():
+            release = asyncio.Event()
+
+            async def app(scope, receive, send):
+                await release.wait()
+                await send({"type": "http.response.start", "status": 200, "headers": []})
+                await send({"type": "http.response.body", "body": b"ok"})
+
+            registry = MetricsRegistry()
+            middleware = AdmissionControlMiddleware(app, rules=[
+                AdmissionRule(name="suggest", path_prefix="/api/v1/nutrition/suggest", exact_path=True,
+                              max_concurrency=1, max_queue=0, priority_resolver=search_context_priority)
+            ], metrics=registry)
+
+            def call(path="/api/v1/nutrition/suggest", query=b"q=egg&search_context=word_search"):
+                messages = []
+
+                async def send(message):
+                    messages.append(message)
+
+                scope = {"type": "http", "method": "GET", "path": path, "query_string": query}
+                return messages, asyncio.create_task(middleware(scope, None, send))
+
+            first_messages, first = call()
+            await asyncio.sleep(0)
+            second_messages, second = call()
+            await second
+            # 完全一致ルールなので /suggest/health は対象外
+            health_messages, health = call(path="/api/v1/nutrition/suggest/health")
+            await asyncio.sleep(0)
+            metrics_text = registry.render_prometheus()
+            release.set()
+            await asyncio.gather(first, health)
+            return first_messages, second_messages, health_messages, metrics_text
+
+        first, second, health, metrics_text = asyncio.run(scenario())
+        self.assertEqual(first[0]["status"], 200)
+        self.assertEqual(second[0]["status"], 429)
+        self.assertIn((b"retry-after", b"1"), second[0]["headers"])
+        self.assertEqual(health[0]["status"], 200)
+        self.assertIn('admission_in_flight{route="suggest"} 1', metrics_text)
+        self.assertIn('admission_rejected_total{reason="queue_full",route="suggest"} 1', metrics_text)
+
+    def test_websocket_sessions_share_the_voice_limit(self):
+        async def scenario():
+            release = asyncio.Event()
+
+            async def app(scope, receive, send):
+                if scope["type"] == "websocket":
+                    await receive()
+                    await send({"type": "websocket.accept"})
+                    await release.wait()
+                    await send({"type": "websocket.close", "code": 1000})
+                    return
+                await send({"type": "http.response.start", "status": 200, "headers": []})
+                await send({"type": "http.response.body", "body": b"ok"})
+
+            rule = AdmissionRule(name="voice", path_prefix="/api/v1/meal-analyses/voice", methods=["POST"],
+                                 websocket=True, max_concurrency=1, max_queue=0)
+            other = AdmissionRule(name="complete", path_prefix="/api/v1/meal-analyses/complete",
+                                  max_concurrency=1, max_queue=0)
+            middleware = AdmissionControlMiddleware(app, rules=[rule, other], metrics=MetricsRegistry())
+
+            def call(scope_type, path="/api/v1/meal-analyses/voice/ws"):
+                messages = []
+
+                async def receive():
+                    return {"type": "websocket.connect"}
+
+                async def send(message):
+                    messages.append(message)
+
+                scope = {"type": scope_type, "path": path, "query_string": b""}
+                if scope_type == "http":
+                    scope["method"] = "POST"
+                return messages, asyncio.create_task(middleware(scope, receive, send))
+
+            session, first = call("websocket")
+            await asyncio.sleep(0)
+            rejected_ws, second = call("websocket")
+            rejected_http, third = call("http", path="/api/v1/meal-analyses/voice")
+            await asyncio.gather(second, third)
+            # ルールが WebSocket を対象にしない場合は通す
+            other_ws, fourth = call("websocket", path="/api/v1/meal-analyses/complete")
+            await asyncio.sleep(0)
+            release.set()
+            await asyncio.gather(first, fourth)
+            return session, rejected_ws, rejected_http, other_ws, rule.limiter.active
+
+        session, rejected_ws, rejected_http, other_ws, active = asyncio.run(scenario())
+        self.assertEqual([m["type"] for m in session], ["websocket.accept", "websocket.close"])
+        self.assertEqual(rejected_ws[0], {"type": "websocket.accept"})
+        self.assertEqual(rejected_ws[1]["code"], 1013)
+        self.assertEqual(rejected_http[0]["status"], 429)
+        self.assertEqual(other_ws[1]["code"], 1000)
+        self.assertEqual(active, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+音声正規化（shared/utils/audio_normalization.py）のテスト
+
+test_audio/ のWAVファイルと合成音声で、モノラル化・16kHz化・無音除去・再エンコードを検証します。
+"""
+import io
+import struct
+import unittest
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from shared.utils.audio_normalization import (
+    decode_audio,
+    normalize_audio,
+    probe_audio_format,
+)
+
+try:
+    import soundfile
+except (ImportError, OSError):
+    soundfile = None
+
+AUDIO_DIR = Path(__file__).parent / "test_audio"
+
+
+def _wav_bytes(samples: np.ndarray, sample_rate: int, bits: int = 16, float_format: bool = False) -> bytes:
+    """(フレーム数, チャンネル数) のfloat配列からWAVを生成（24bit・floatにも対応）"""
+    channels = samples.shape[1]
+    if float_format:
+        data = samples.astype("<f4").tobytes()
+        format_tag = 3
+    elif bits == 24:
+        values = (np.clip(samples, -1, 1) * 8388607).astype("<i4").reshape(-1)
+        data = b"".join(int(v).to_bytes(3, "little", signed=True) for v in values)
+        format_tag = 1
+    else:
+        data = (np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes()
+        format_tag = 1
+    block_align = channels * bits // 8
+    fmt = struct.pack("<HHIIHH", format_tag, channels, sample_rate, sample_rate * block_align, block_align, bits)
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def _tone_with_silence(sample_rate: int, silence_seconds: float, tone_seconds: float, channels: int = 2) -> np.ndarray:
+    silence = np.zeros(int(sample_rate * silence_seconds), dtype=np.float32)
+    t = np.arange(int(sample_rate * tone_seconds)) / sample_rate
+    tone = (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    mono = np.concatenate([silence, tone, silence])
+    return np.stack([mono] * channels, axis=1)
+
+
+class TestAudioNormalization(unittest.TestCase):
+    """normalize_audioのテストケース"""
+
+    def test_test_audio_files_are_normalized(self):
+        for path in sorted(AUDIO_DIR.glob("*.wav")):
+            with self.subTest(file=path.name):
+                original = path.read_bytes()
+                with wave.open(str(path)) as reader:
+                    original_duration = reader.getnframes() / reader.getframerate()
+
+                result = normalize_audio(original, codec="wav")
+                samples, sample_rate = decode_audio(result.audio_bytes)
+
+                self.assertEqual(sample_rate, 16000)
+                self.assertEqual(samples.shape[1], 1)
+                self.assertLessEqual(result.duration_seconds, original_duration + 0.01)
+                self.assertGreater(result.duration_seconds, original_duration * 0.5)
+                self.assertGreater(result.bytes_saved, 0)  # 24kHz → 16kHz
+                self.assertEqual(result.to_dict()["output_bytes"], len(result.audio_bytes))
+
+    def test_stereo_44k_with_silence_is_trimmed_and_downmixed(self):
+        audio = _wav_bytes(_tone_with_silence(44100, 1.0, 2.0), 44100)
+        result = normalize_audio(audio, codec="wav", silence_padding_ms=200)
+
+        self.assertEqual(result.original_channels, 2)
+        self.assertEqual(result.original_sample_rate, 44100)
+        self.assertAlmostEqual(result.original_duration_seconds, 4.0, places=2)
+        self.assertAlmostEqual(result.trimmed_leading_seconds, 0.8, delta=0.03)
+        self.assertAlmostEqual(result.trimmed_trailing_seconds, 0.8, delta=0.03)
+        self.assertAlmostEqual(result.duration_seconds, 2.4, delta=0.05)
+        self.assertGreater(result.bytes_saved_ratio, 0.85)
+        self.assertEqual(probe_audio_format(result.audio_bytes), ("wav", 16000, 1))
+
+    def test_all_silent_audio_is_not_trimmed(self):
+        audio = _wav_bytes(np.zeros((16000, 1), dtype=np.float32), 16000)
+        result = normalize_audio(audio, codec="wav")
+        self.assertEqual(result.duration_seconds, 1.0)
+
+    def test_decodes_24bit_and_float_wav(self):
+        samples = _tone_with_silence(16000, 0.1, 0.2, channels=1)
+        for kwargs in ({"bits": 24}, {"bits": 32, "float_format": True}):
+            with self.subTest(**kwargs):
+                decoded, sample_rate = decode_audio(_wav_bytes(samples, 16000, **kwargs))
+                self.assertEqual(sample_rate, 16000)
+                np.testing.assert_allclose(decoded, samples, atol=1e-4)
+
+    def test_undecodable_audio_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            normalize_audio(b"RIFF\x00\x00\x00\x00WAVEjunk")
+
+    def test_truncated_wav_header_raises_value_error(self):
+        # fmt チャンクのヘッダーだけで本体がない（struct.error ではなく ValueError）
+        audio = b"RIFF" + struct.pack("<I", 100) + b"WAVE" + b"fmt " + struct.pack("<I", 16) + b"\x01\x00"
+        self.assertEqual(len(audio), 22)
+        self.assertEqual(probe_audio_format(audio), ("wav", None, None))
+        for convert in (decode_audio, normalize_audio):
+            with self.subTest(convert=convert.__name__):
+                with self.assertRaisesRegex(ValueError, "fmt chunk"):
+                    convert(audio)
+
+    def test_non_pcm_wav_raises_value_error(self):
+        # IMA ADPCM（4bit）: 1サンプルが1バイト未満の圧縮形式
+        fmt = struct.pack("<HHIIHHHH", 0x11, 1, 16000, 8110, 256, 4, 2, 505)
+        body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", 512) + bytes(512)
+        audio = b"RIFF" + struct.pack("<I", len(body)) + body
+        for convert in (decode_audio, normalize_audio):
+            with self.subTest(convert=convert.__name__):
+                with self.assertRaisesRegex(ValueError, "Unsupported WAV encoding"):
+                    convert(audio)
+
+    @unittest.skipIf(soundfile is None, "soundfile is not installed")
+    def test_flac_and_opus_output(self):
+        original = (AUDIO_DIR / "lunch_detailed.wav").read_bytes()
+        for codec, expected_format in (("flac", "flac"), ("opus", "ogg")):
+            with self.subTest(codec=codec):
+                result = normalize_audio(original, codec=codec)
+                self.assertEqual(result.codec, codec)
+                self.assertEqual(probe_audio_format(result.audio_bytes)[:2], (expected_format, 16000))
+                decoded, sample_rate = soundfile.read(io.BytesIO(result.audio_bytes))
+                self.assertEqual(sample_rate, 16000)
+                self.assertAlmostEqual(len(decoded) / sample_rate, result.duration_seconds, delta=0.05)
+                self.assertGreater(result.bytes_saved_ratio, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
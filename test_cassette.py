@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+上流呼び出しの記録・再生（shared/cassette）のテスト
+
+記録したカセットからネットワークに接続せずに同じ結果が返ること（同じリクエストは記録順、エラーも再現）、
+記録時の所要時間の再現、HTTP（requests）の記録・再生、食事・音声パイプライン全体の再生を検証します。
+"""
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+os.environ.setdefault("DEEPINFRA_API_KEY", "test-key")
+
+from benchmarks.bench_pipeline_e2e import (  # noqa: E402
+    DEFAULT_LATENCY, StandIns, configure_environment, load_images, load_recordings, meal_executor, voice_executor
+)
+from shared.cassette import (  # noqa: E402
+    Cassette, CassetteInUseError, CassetteMissError, cassette_session, close_cassettes, get_cassette, recorded_call
+)
+from shared.cassette import store  # noqa: E402
+from shared.config.settings import get_settings  # noqa: E402
+
+
+class FakeUpstream:
+    model_id = "fake-model"
+
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    @recorded_call("fake.analyze", context=lambda service: {"model_id": service.model_id})
+    async def analyze(self, image_bytes, prompt, temperature=0.0):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if prompt == "fail":
+            raise ValueError("upstream rejected the prompt")
+        return {"call": self.calls, "size": len(image_bytes)}
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.calls += 1
+        data = json.dumps({"path": self.path, "echo": json.loads(body), "call": self.server.calls}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class CassetteTestCase(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.cassette_dir = tmpdir.name
+        patcher = mock.patch.dict(store._cassettes, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_cassettes)
+
+    def use_cassette(self, mode, latency_scale=0.0):
+        close_cassettes()
+        settings = get_settings()
+        for name, value in (("CASSETTE_MODE", mode), ("CASSETTE_DIR", self.cassette_dir),
+                            ("CASSETTE_NAME", "test"), ("CASSETTE_REPLAY_LATENCY_SCALE", latency_scale)):
+            patcher = mock.patch.object(settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class TestRecordedCall(CassetteTestCase):
+    """recorded_call の記録・再生のテストケース"""
+
+    def test_replay_serves_recorded_results_in_order_without_calling_upstream(self):
+        image = b"\x89PNG" + os.urandom(512)
+        self.use_cassette("record")
+        upstream = FakeUpstream()
+
+        async def record():
+            first = await upstream.analyze(image, "describe the meal")
+            second = await upstream.analyze(image, prompt="describe the meal")
+            with self.assertRaises(ValueError):
+                await upstream.analyze(image, "fail")
+            return first, second
+        recorded = asyncio.run(record())
+        self.assertEqual(upstream.calls, 3)
+
+        close_cassettes()
+        with gzip.open(os.path.join(self.cassette_dir, "test.jsonl.gz"), "rb") as f:
+            content = f.read()
+        self.assertNotIn(image, content)  # 画像はハッシュだけを記録
+        self.assertEqual(len(content.splitlines()), 3)
+
+        self.use_cassette("replay")
+        replayed_upstream = FakeUpstream()
+
+        async def replay():
+            results = [await replayed_upstream.analyze(image, "describe the meal") for _ in range(3)]
+            with self.assertRaisesRegex(ValueError, "upstream rejected"):
+                await replayed_upstream.analyze(image, "fail")
+            with self.assertRaises(CassetteMissError):
+                await replayed_upstream.analyze(image, "describe the drink")
+            return results
+        results = asyncio.run(replay())
+
+        self.assertEqual(results, [recorded[0], recorded[1], recorded[0]])  # 使い切ったら先頭から
+        self.assertEqual(replayed_upstream.calls, 0)
+
+    def test_replay_optionally_reproduces_recorded_latency(self):
+        self.use_cassette("record")
+        asyncio.run(FakeUpstream(delay=0.2).analyze(b"image", "describe the meal"))
+
+        for scale, expect_slow in ((0.0, False), (1.0, True)):
+            self.use_cassette("replay", latency_scale=scale)
+            started = time.perf_counter()
+            asyncio.run(FakeUpstream().analyze(b"image", "describe the meal"))
+            self.assertEqual(time.perf_counter() - started >= 0.18, expect_slow)
+
+
+    def test_second_recorder_cannot_overwrite_a_cassette_in_use(self):
+        path = os.path.join(self.cassette_dir, "shared.jsonl.gz")
+        interaction = store.Interaction(kind="fake.analyze", key="k", request={}, response={"call": 1})
+        first, second = Cassette(path, "record"), Cassette(path, "record")
+        first.record(interaction)
+
+        with self.assertRaises(CassetteInUseError):
+            second.record(interaction)
+        first.record(interaction)
+        first.close()
+
+        replayed = Cassette(path, "replay")
+        self.assertEqual(replayed.next_interaction("fake.analyze", "k", {}).response, {"call": 1})
+        self.assertEqual(len(replayed._interactions[("fake.analyze", "k")]), 2)
+
+        second.record(interaction)  # 記録が終われば上書きできる
+        second.close()
+
+
+class TestHTTPCassette(CassetteTestCase):
+    """requests（Elasticsearch）の記録・再生のテストケース"""
+
+    def test_requests_are_replayed_after_the_server_is_gone(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _EchoHandler)
+        server.calls = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = "http://127.0.0.1:%d/foods/_search" % server.server_address[1]
+        body = json.dumps({"query": {"match": {"search_name": "rice"}}})
+
+        self.use_cassette("record")
+        recorded = cassette_session().post(url, data=body, headers={"Content-Type": "application/json"}, timeout=5).json()
+        server.shutdown()
+        server.server_close()
+
+        self.use_cassette("replay")
+        response = cassette_session().post(url.replace("127.0.0.1", "localhost"), data=body, timeout=5)
+        response.raise_for_status()
+        self.assertEqual(response.json(), recorded)
+        self.assertEqual(response.headers["Content-Type"], "application/json")
+
+        self.use_cassette("off")
+        self.assertIsNone(get_cassette())
+        self.assertIsNone(cassette_session())
+
+
+class TestPipelineReplay(CassetteTestCase):
+    """食事・音声パイプライン全体の再生のテストケース"""
+
+    def test_pipelines_replay_offline_with_identical_results(self):
+        saved = dict(os.environ)
+        self.addCleanup(get_settings.cache_clear)
+        self.addCleanup(lambda: (os.environ.clear(), os.environ.update(saved)))
+        image, recording = load_images()[0][0], load_recordings()[0][0]
+        config = {"latency": {route: "constant:5" for route in DEFAULT_LATENCY}, "word_query": "fake", "seed": 0}
+
+        async def analyze(word_query_url):
+            meal = await meal_executor(False, word_query_url)(image)
+            voice = await voice_executor(word_query_url)(recording)
+            return [result["final_nutrition_result"]["total_nutrition"] for result in (meal, voice)]
+
+        with StandIns(config) as urls:
+            configure_environment(urls, stream_phase1=False)
+            self.use_cassette("record")
+            recorded = asyncio.run(analyze(urls["word_query_url"]))
+        self.assertGreater(recorded[0]["calories"], 0)
+
+        # 代替サーバーは停止済み（再生はネットワークに接続しない）
+        self.use_cassette("replay")
+        self.assertEqual(asyncio.run(analyze(urls["word_query_url"])), recorded)
+
+
+if __name__ == "__main__":
+    unittest.main()
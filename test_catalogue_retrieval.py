@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+音声NLUプロンプトのMyNetDiary食材名リスト絞り込み（shared/utils/mynetdiary_retrieval.py）のテスト
+
+語幹化・同義語・あいまい一致による候補検索の再現率と、絞り込んだプロンプトの構築
+（言及が見つからない場合・無効時のリスト全体へのフォールバック）を検証します。
+"""
+import unittest
+from unittest import mock
+
+from shared.config.prompts import VoicePrompts
+from shared.config.settings import get_settings
+from shared.services.nlu_service import _retrieve_catalogue_candidates, build_voice_system_prompt
+from shared.utils.mynetdiary_retrieval import CatalogueIndex, get_catalogue_index, load_synonyms, stem_token
+
+
+class TestCatalogueIndex(unittest.TestCase):
+    """CatalogueIndexのテストケース"""
+
+    def test_plurals_are_stemmed(self):
+        self.assertEqual([stem_token(word) for word in ["tomatoes", "berries", "eggs", "peaches", "hummus"]],
+                         ["tomato", "berry", "egg", "peach", "hummus"])
+
+    def test_mentions_keep_the_correct_name_in_the_top_k(self):
+        index = get_catalogue_index()
+        cases = [
+            ("I had scrambled eggs and toast with butter", ["Egg scrambled, with salt", "Toasted white bread", "Butter salted"]),
+            ("brown rice with steamed broccoli", ["Rice brown long grain cooked without salt", "Broccoli steamed"]),
+            ("grilled chiken brest and brocoli", ["Chicken breast grilled boneless skinless", "Broccoli raw"]),  # ASRの綴り揺れ
+            ("an aubergine and a coke", ["Eggplant raw", "Carbonated cola regular"]),  # 同義語
+        ]
+        for transcript, expected in cases:
+            names = index.candidate_names(transcript, top_k=12)
+            for name in expected:
+                self.assertIn(name, names, transcript)
+            self.assertLess(len(names), 60)
+
+    def test_every_food_in_a_multi_food_mention_gets_candidates(self):
+        index = CatalogueIndex(
+            ["Curry powder", "Curry paste red", "Chicken breast grilled", "Rice white cooked"],
+            load_synonyms()
+        )
+        [match] = index.retrieve("a chicken curry", top_k=2)
+        self.assertEqual(match.mention, "chicken curry")
+        self.assertIn("Chicken breast grilled", match.names)
+
+    def test_transcript_without_food_has_no_mentions(self):
+        self.assertEqual(get_catalogue_index().retrieve("I had it for dinner yesterday"), [])
+
+
+class TestVoiceSystemPrompt(unittest.TestCase):
+    """build_voice_system_prompt のテストケース"""
+
+    def setUp(self):
+        _retrieve_catalogue_candidates.cache_clear()
+        self.full_prompt = VoicePrompts.get_complete_prompt(use_mynetdiary_constraint=True, include_examples=True)
+
+    def test_prompt_lists_only_candidates_for_the_transcript(self):
+        prompt = build_voice_system_prompt("I had brown rice with steamed broccoli")
+        self.assertIn("Broccoli steamed", prompt)
+        self.assertNotIn("Almond butter with salt", prompt)
+        self.assertIn("(candidates selected for this input)", prompt)
+        self.assertLess(len(prompt), len(self.full_prompt) / 4)
+
+    def test_full_list_is_used_without_food_mentions_or_when_disabled(self):
+        self.assertEqual(build_voice_system_prompt("I had it for dinner"), self.full_prompt)
+        with mock.patch.object(get_settings(), "VOICE_NLU_CATALOGUE_RETRIEVAL_ENABLED", False):
+            self.assertEqual(build_voice_system_prompt("brown rice with steamed broccoli"), self.full_prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+LLMが出力した食材名のMyNetDiary食材名への補正（shared/utils/catalogue_snapping.py）のテスト
+
+段階ごとの補正（正規化・fuzzy）と閾値未満の名前の据え置き、パイプラインで栄養検索に
+補正後の食材名が使われることを検証します。
+"""
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from shared.config.settings import get_settings
+from shared.models import Phase1Output
+from shared.pipeline import MealAnalysisPipeline
+from shared.utils.catalogue_snapping import (
+    EXACT, FUZZY, NORMALIZED, UNMATCHED, CatalogueSnapper, get_catalogue_snapper, snap_ingredient_name,
+    snap_phase1_ingredients
+)
+from shared.utils.metrics import get_metrics_registry
+from test_phase1_streaming import _RecordingSearchComponent
+
+
+def _phase1_output(*ingredient_names):
+    return Phase1Output(
+        dishes=[{
+            "dish_name": "Breakfast plate",
+            "confidence": 0.9,
+            "ingredients": [{"ingredient_name": name, "weight_g": 50} for name in ingredient_names]
+        }],
+        analysis_confidence=0.9
+    )
+
+
+class TestCatalogueSnapper(unittest.TestCase):
+    """CatalogueSnapperのテストケース"""
+
+    def test_names_are_snapped_by_tier(self):
+        snapper = get_catalogue_snapper()
+        results = snapper.snap_many([
+            "Broccoli steamed",  # 完全一致
+            "apple with skin raw",  # 複数形・大文字小文字
+            "Raw eggplant",  # 語順
+            "Rice brown long grain without salt",  # "cooked" の欠落
+            "Egg whole boiled",
+        ])
+        self.assertEqual([(result.name, result.method) for result in results], [
+            ("Broccoli steamed", EXACT),
+            ("Apples with skin raw", NORMALIZED),
+            ("Eggplant raw", NORMALIZED),
+            ("Rice brown long grain cooked without salt", FUZZY),
+            ("Egg whole hard boiled", FUZZY),
+        ])
+        self.assertGreaterEqual(results[3].token_sort_score, snapper.min_token_sort)
+        self.assertGreaterEqual(results[3].jaro_winkler_score, snapper.min_jaro_winkler)
+
+    def test_names_below_the_thresholds_are_kept(self):
+        snapper = CatalogueSnapper(["Rice white cooked without salt", "Chicken breast grilled boneless skinless"])
+        results = snapper.snap_many(["Dragon fruit smoothie", "Rice white", "", "Chicken breast grilled"])
+
+        self.assertEqual([result.method for result in results], [UNMATCHED] * 4)
+        self.assertEqual([result.name for result in results], ["Dragon fruit smoothie", "Rice white", "", "Chicken breast grilled"])
+        self.assertFalse(any(result.changed for result in results))
+
+    def test_phase1_ingredients_are_replaced_in_place(self):
+        phase1_result = _phase1_output("Egg whole boiled", "Bananas raw", "Dragon fruit smoothie")
+        snapped = get_metrics_registry().counter("catalogue_snap_total")
+        fuzzy_before = snapped.get({"method": FUZZY})
+
+        results = snap_phase1_ingredients(phase1_result)
+
+        self.assertEqual(phase1_result.get_all_ingredient_names(), ["Egg whole hard boiled", "Bananas raw", "Dragon fruit smoothie"])
+        self.assertEqual([result.method for result in results], [FUZZY, EXACT, UNMATCHED])
+        self.assertEqual(snapped.get({"method": FUZZY}), fuzzy_before + 1)
+
+    def test_snapping_can_be_disabled(self):
+        with mock.patch.object(get_settings(), "CATALOGUE_SNAPPING_ENABLED", False):
+            phase1_result = _phase1_output("Egg whole boiled")
+            self.assertEqual(snap_phase1_ingredients(phase1_result), [])
+            self.assertEqual(phase1_result.get_all_ingredient_names(), ["Egg whole boiled"])
+            self.assertEqual(snap_ingredient_name("Egg whole boiled"), "Egg whole boiled")
+
+
+class TestPipelineSnapping(unittest.TestCase):
+    """パイプラインでの補正のテストケース"""
+
+    def setUp(self):
+        os.environ.setdefault("DEEPINFRA_API_KEY", "test-key")
+
+    def test_searches_use_snapped_names(self):
+        pipeline = MealAnalysisPipeline(model_id="google/gemma-3-27b-it")
+        pipeline.nutrition_search_component = _RecordingSearchComponent()
+
+        async def fake_phase1(phase1_input, execution_log=None, **kwargs):
+            return _phase1_output("Egg whole boiled", "apple with skin raw")
+
+        pipeline.phase1_component.execute = fake_phase1
+        result = asyncio.run(pipeline.execute_complete_analysis(
+            image_bytes=b"fake-image", image_mime_type="image/jpeg", save_detailed_logs=False, stream_phase1=False
+        ))
+
+        self.assertEqual(pipeline.nutrition_search_component.requested, ["Egg whole hard boiled", "Apples with skin raw"])
+        self.assertEqual([snap["original"] for snap in result["nutrition_search_result"]["catalogue_snaps"]],
+                         ["Egg whole boiled", "apple with skin raw"])
+
+
+if __name__ == "__main__":
+    unittest.main()
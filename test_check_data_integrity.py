@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+元データの並列・差分整合性確認（nutrition_db_experiment/check_data_integrity.py）のテスト
+
+シャードごとの確認結果が従来の check_*_data と一致すること、内容の変わらないファイルは再確認されず
+前回の結果が再利用されること、サマリーのエラー率で構築を中止すべきか判定できることを検証します。
+"""
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from nutrition_db_experiment import check_data_integrity
+from nutrition_db_experiment.check_data_integrity import (
+    check_integrity, integrity_failures, load_integrity_summary
+)
+
+
+def _write_item(raw, category, item_id, data):
+    processed_dir = Path(raw) / category / str(item_id) / "processed"
+    processed_dir.mkdir(parents=True, exist_ok=True)
+    (processed_dir / f"{item_id}.json").write_text(json.dumps(data), encoding="utf-8")
+
+
+def _food(item_id):
+    return {"id": item_id, "name": f"Food {item_id}", "description": "raw",
+            "nutrition": {"calories": 52, "proteinContent": 0.3, "fatContent": 0.2, "carbohydrateContent": 14},
+            "units": [{"description": "grams", "amount": 100}]}
+
+
+class TestIncrementalIntegrityCheck(unittest.TestCase):
+    """check_integrityのテストケース"""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.raw = Path(tmpdir.name) / "raw"
+        self.output = str(Path(tmpdir.name) / "integrity")
+        for i in range(20):
+            _write_item(self.raw, "food", i, _food(i))
+        _write_item(self.raw, "food", 99, {"id": 99, "name": "No nutrition", "description": "raw", "units": []})
+        for i in range(100, 104):
+            _write_item(self.raw, "recipe", i, {"id": i, "title": f"Dish {i}", "nutrients": {
+                "calories": 300, "proteinContent": 10, "fatContent": 5, "carbohydrateContent": 40,
+                "servingSize": "1 bowl" if i == 103 else "250 grams"}})
+        (self.raw / "recipe" / "104" / "processed").mkdir(parents=True)  # JSONのないIDディレクトリ
+
+    def test_results_match_sequential_checks_and_are_summarised(self):
+        summary = check_integrity(str(self.raw), self.output, workers=2, num_shards=3)
+
+        self.assertEqual(summary["categories"]["food"]["total"], 21)
+        self.assertEqual(summary["categories"]["food"]["errors"], 1)
+        self.assertEqual(summary["categories"]["recipe"]["warnings"], 1)
+        self.assertEqual(summary["categories"]["recipe"]["missing"], 1)
+        self.assertEqual(summary["categories"]["branded"]["total"], 0)
+        self.assertEqual(summary["error_samples"][0]["id"], "99")
+        self.assertEqual(summary["error_samples"][0]["errors"],
+                         check_data_integrity.check_food_data(
+                             json.loads((self.raw / "food" / "99" / "processed" / "99.json").read_text()))[0])
+        self.assertEqual(load_integrity_summary(self.output), summary)
+
+        self.assertEqual(integrity_failures(summary, max_error_rate=5.0), [])
+        self.assertEqual(len(integrity_failures(summary, max_error_rate=1.0)), 1)  # food: 1/21 = 4.8%
+
+    def test_unchanged_files_are_not_rechecked(self):
+        check_integrity(str(self.raw), self.output, workers=1, num_shards=3)
+
+        with mock.patch.object(check_data_integrity, "check_file", side_effect=AssertionError("rechecked")):
+            summary = check_integrity(str(self.raw), self.output, workers=None, num_shards=3)
+        self.assertEqual((summary["reused"], summary["checked"]), (25, 0))
+
+        # 書き直したが内容は同じファイルは再利用し、内容の変わったファイルだけを確認する
+        _write_item(self.raw, "food", 3, _food(3))
+        _write_item(self.raw, "food", 99, _food(99))
+        os.utime(self.raw / "food" / "3" / "processed" / "3.json", ns=(0, 0))
+        summary = check_integrity(str(self.raw), self.output, workers=1, num_shards=3)
+
+        self.assertEqual((summary["reused"], summary["checked"]), (24, 1))
+        self.assertEqual(summary["categories"]["food"]["errors"], 0)
+        self.assertEqual(summary["error_samples"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+長時間音声の分割並列文字起こし（shared/utils/audio_chunking.py, shared/services/chunked_transcription.py）のテスト
+
+無音を挟んだ合成音声で、無音位置での分割・並列文字起こしの同時実行数・重なり部分の重複除去、
+および文字起こし中に開始するセグメント単位のNLU処理を検証します。
+"""
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from shared.components.phase1_speech_component import Phase1SpeechComponent
+from shared.config.settings import get_settings
+from shared.models.voice_analysis_models import VoiceAnalysisInput
+from shared.services.chunked_transcription import transcribe_in_chunks
+from shared.services.nlu_service import NLUService, split_at_safe_boundary
+from shared.utils.audio_chunking import AudioChunk, split_audio_on_silence, stitch_transcripts
+from shared.utils.audio_normalization import decode_audio, encode_audio
+from shared.utils.metrics import MetricsRegistry
+
+SAMPLE_RATE = 16000
+# 周波数ごとに「話している内容」を決めた合成音声（各トーンの間に1秒の無音）
+SPOKEN_SENTENCES = {
+    300: "I had toast for breakfast.",
+    500: "It had butter and jam on it.",
+    700: "For lunch I ate ramen with pork.",
+    900: "Then I had an apple in the evening.",
+}
+
+
+def _recording(tone_seconds: float = 20.0, gap_seconds: float = 1.0) -> bytes:
+    """SPOKEN_SENTENCES の各周波数のトーンを無音を挟んで並べたWAV"""
+    t = np.arange(int(SAMPLE_RATE * tone_seconds)) / SAMPLE_RATE
+    gap = np.zeros(int(SAMPLE_RATE * gap_seconds), dtype=np.float32)
+    parts = [gap]
+    for frequency in SPOKEN_SENTENCES:
+        parts.extend([(0.3 * np.sin(2 * np.pi * frequency * t)).astype(np.float32), gap])
+    audio, _ = encode_audio(np.concatenate(parts), SAMPLE_RATE, "wav")
+    return audio
+
+
+def _dominant_frequency(audio_data: bytes) -> int:
+    samples, rate = decode_audio(audio_data)
+    spectrum = np.abs(np.fft.rfft(samples[:, 0]))
+    frequency = np.fft.rfftfreq(len(samples), 1 / rate)[int(np.argmax(spectrum))]
+    return min(SPOKEN_SENTENCES, key=lambda f: abs(f - frequency))
+
+
+class TestAudioChunking(unittest.TestCase):
+    """無音位置での分割と重複除去のテストケース"""
+
+    def test_long_audio_is_split_in_silence_with_overlap(self):
+        chunks = split_audio_on_silence(_recording(), max_chunk_seconds=30.0, overlap_seconds=1.0, codec="wav")
+
+        self.assertEqual(len(chunks), 4)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            cut = chunk.start_seconds + 1.0
+            self.assertAlmostEqual(previous.end_seconds, cut, places=2)
+            # 切れ目はトーンの間の無音（21n〜21n+1秒）にある
+            self.assertLess(cut % 21.0, 1.0)
+        self.assertTrue(all(chunk.duration_seconds <= 31.0 for chunk in chunks))
+        self.assertEqual([_dominant_frequency(chunk.audio_bytes) for chunk in chunks], list(SPOKEN_SENTENCES))
+
+    def test_short_audio_is_returned_unchanged(self):
+        audio = _recording(tone_seconds=5.0)
+        chunks = split_audio_on_silence(audio, max_chunk_seconds=30.0)
+        self.assertEqual(len(chunks), 1)
+        self.assertIs(chunks[0].audio_bytes, audio)
+        self.assertEqual(chunks[0].file_extension, "wav")
+
+    def test_overlapping_words_are_removed_when_stitching(self):
+        self.assertEqual(
+            stitch_transcripts(["I had rice and miso soup for", "Soup for breakfast, then coffee.", "coffee. With milk."]),
+            "I had rice and miso soup for breakfast, then coffee. With milk."
+        )
+        self.assertEqual(stitch_transcripts(["朝ごはんにご飯と味噌汁を", "味噌汁を食べました。"]), "朝ごはんにご飯と味噌汁を食べました。")
+        self.assertEqual(stitch_transcripts(["I had toast.", "", "Then an apple."]), "I had toast. Then an apple.")
+
+
+class TestChunkedTranscription(unittest.TestCase):
+    """transcribe_in_chunksのテストケース"""
+
+    def _chunks(self, count):
+        return [AudioChunk(i, i * 10.0, (i + 1) * 10.0, b"", "wav") for i in range(count)]
+
+    def test_concurrency_is_limited_and_text_is_stitched_in_order(self):
+        in_flight = []
+        stitched = []
+
+        async def transcribe(chunk):
+            in_flight.append(1)
+            self.assertLessEqual(len(in_flight), 3)
+            # 後ろのチャンクほど早く終わる
+            await asyncio.sleep(0.01 * (8 - chunk.index))
+            in_flight.pop()
+            return f"word{chunk.index} word{chunk.index + 1}"
+
+        result = asyncio.run(transcribe_in_chunks(
+            self._chunks(8), transcribe, max_concurrency=3, on_text=stitched.append, metrics=MetricsRegistry()
+        ))
+
+        self.assertEqual(result.transcript, " ".join(f"word{i}" for i in range(9)))
+        self.assertEqual("".join(stitched), result.transcript)
+        self.assertEqual([chunk.index for chunk in result.chunks], list(range(8)))
+        self.assertEqual(result.to_dict()["chunk_count"], 8)
+
+    def test_chunk_failure_cancels_remaining_chunks(self):
+        started = []
+
+        async def transcribe(chunk):
+            started.append(chunk.index)
+            if chunk.index == 1:
+                raise ValueError("rate limited")
+            await asyncio.sleep(0.05)
+            return "text"
+
+        with self.assertRaisesRegex(RuntimeError, "chunk 1 failed: rate limited"):
+            asyncio.run(transcribe_in_chunks(self._chunks(6), transcribe, max_concurrency=2, metrics=MetricsRegistry()))
+        self.assertLess(len(started), 6)
+
+
+class TestParallelNLUSegments(unittest.TestCase):
+    """文字起こし中に開始するセグメント単位のNLU処理のテストケース"""
+
+    def test_split_at_safe_boundary(self):
+        text = "I had toast. It had butter. Then I had coffee with milk. For lunch"
+        self.assertEqual(split_at_safe_boundary(text, 10), ("I had toast. It had butter. Then I had coffee with milk.", " For lunch"))
+        # 末尾の語が未確定の場合はその前の文末で分割する
+        self.assertEqual(split_at_safe_boundary(text[:-6], 10), ("I had toast. It had butter.", " Then I had coffee with milk. For"))
+        self.assertEqual(split_at_safe_boundary("I had toast. It had butter. Then", 10), ("", "I had toast. It had butter. Then"))
+        self.assertEqual(split_at_safe_boundary("朝はご飯。それに納豆。昼はラーメン", 3), ("朝はご飯。それに納豆。", "昼はラーメン"))
+
+    def test_merge_extraction_results(self):
+        merged = NLUService.merge_extraction_results([
+            {"dishes": [{"dish_name": "Toast", "ingredients": [{"ingredient_name": "bread", "weight_g": 60}]}]},
+            {"dishes": [{"dish_name": "toast", "ingredients": [{"ingredient_name": "butter", "weight_g": 10}]},
+                        {"dish_name": "Ramen", "ingredients": [{"ingredient_name": "noodles", "weight_g": 200}]}]},
+        ])
+        self.assertEqual([dish["dish_name"] for dish in merged["dishes"]], ["Toast", "Ramen"])
+        self.assertEqual([i["ingredient_name"] for i in merged["dishes"][0]["ingredients"]], ["bread", "butter"])
+
+    def test_component_starts_nlu_per_segment_while_transcribing(self):
+        os.environ.setdefault("DEEPINFRA_API_KEY", "test-key")
+        events = []
+
+        class FakeNLU:
+            async def extract_foods_from_text(self, text, model_id=None, temperature=None, seed=None):
+                events.append(("nlu", text))
+                return {"dishes": [{"dish_name": text.split()[-1].strip("."), "confidence": 0.9,
+                                    "ingredients": [{"ingredient_name": text.split()[2], "weight_g": 100}]}]}
+
+        component = Phase1SpeechComponent(speech_service_type="deepinfra_whisper", nlu_service=FakeNLU())
+
+        async def fake_transcribe(audio_data, audio_format, language_code, temperature):
+            sentence = SPOKEN_SENTENCES[_dominant_frequency(audio_data)]
+            await asyncio.sleep(0.02)
+            events.append(("transcribed", sentence))
+            return sentence
+
+        component.transcribe_audio = fake_transcribe
+        settings = get_settings()
+        with mock.patch.object(settings, "NLU_SEGMENT_MIN_CHARS", 10), \
+                mock.patch.object(settings, "SPEECH_CHUNK_MAX_CONCURRENCY", 1), \
+                mock.patch.object(settings, "AUDIO_OUTPUT_CODEC", "wav"), \
+                mock.patch.object(settings, "SPEECH_CACHE_ENABLED", False):
+            output = asyncio.run(component.process(VoiceAnalysisInput(audio_bytes=_recording(), audio_mime_type="audio/wav")))
+
+        nlu_texts = [text for kind, text in events if kind == "nlu"]
+        # "It had butter..." は直前の文を参照するため同じセグメントに入る
+        self.assertEqual(nlu_texts, [
+            "I had toast for breakfast. It had butter and jam on it.",
+            "For lunch I ate ramen with pork.",
+            "Then I had an apple in the evening.",
+        ])
+        # 最初のセグメントのNLUは残りのチャンクの文字起こしより先に始まる
+        self.assertLess(events.index(("nlu", nlu_texts[0])), events.index(("transcribed", SPOKEN_SENTENCES[900])))
+        self.assertEqual([dish.dish_name for dish in output.dishes], ["it", "pork", "evening"])
+        self.assertEqual(component.last_chunked_transcription["chunk_count"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Elasticsearchのストリーミング並列バルクインデックス（scripts/es_bulk_indexer.py）のテスト
+
+JSON配列/NDJSONの逐次読み込みと、_bulk・_settings を模したローカルサーバーに対する
+429（リクエスト全体・項目ごと）の再送、再送しないエラーの集計、ロード中の設定変更と復元を検証します。
+"""
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from scripts.es_bulk_indexer import AdaptiveBatchSizer, StreamingBulkIndexer, iter_json_documents
+
+
+class _FakeElasticsearchHandler(BaseHTTPRequestHandler):
+    """_bulk・_settings・_refresh だけを扱うハンドラ"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._send_json(200, {"foods": {"settings": {"index.number_of_replicas": "1", **self.server.settings}}})
+
+    def do_PUT(self):
+        self.server.settings_updates.append(self._read_json())
+        self._send_json(200, {"acknowledged": True})
+
+    def do_POST(self):
+        if self.path.endswith("/_refresh"):
+            self.server.refreshed = True
+            self._send_json(200, {})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        lines = self.rfile.read(length).decode("utf-8").splitlines()
+        with self.server.lock:
+            self.server.bulk_requests += 1
+            if self.server.bulk_requests == 1:
+                self._send_json(429, {"error": "es_rejected_execution_exception"})
+                return
+
+        items = []
+        for action_line, source_line in zip(lines[::2], lines[1::2]):
+            action, source = json.loads(action_line)["index"], json.loads(source_line)
+            with self.server.lock:
+                if source.get("reject_once") and action["_id"] not in self.server.rejected:
+                    self.server.rejected.add(action["_id"])
+                    items.append({"index": {"_id": action["_id"], "status": 429,
+                                            "error": {"type": "es_rejected_execution_exception"}}})
+                elif source.get("bad"):
+                    items.append({"index": {"_id": action["_id"], "status": 400,
+                                            "error": {"type": "mapper_parsing_exception", "reason": "bad field"}}})
+                else:
+                    self.server.documents[action["_id"]] = source
+                    items.append({"index": {"_id": action["_id"], "status": 201}})
+        self._send_json(200, {"errors": any("error" in item["index"] for item in items), "items": items})
+
+    def _read_json(self):
+        return json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class TestIterJsonDocuments(unittest.TestCase):
+    """iter_json_documentsのテストケース"""
+
+    def test_reads_arrays_and_ndjson_in_small_chunks(self):
+        documents = [{"id": i, "name": "food ]}{, \"" + str(i) + "\"", "tags": [i, {"nested": "[]"}]} for i in range(50)]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            array_path = Path(tmpdir) / "foods.json"
+            array_path.write_text(json.dumps(documents, indent=2), encoding="utf-8")
+            ndjson_path = Path(tmpdir) / "foods.ndjson"
+            ndjson_path.write_text("\n".join(json.dumps(document) for document in documents) + "\n", encoding="utf-8")
+
+            self.assertEqual(list(iter_json_documents(array_path, read_size=7)), documents)
+            self.assertEqual(list(iter_json_documents(ndjson_path, read_size=7)), documents)
+
+
+class TestStreamingBulkIndexer(unittest.TestCase):
+    """StreamingBulkIndexerのテストケース"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeElasticsearchHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.settings = {"index.refresh_interval": "30s"}
+        self.server.settings_updates = []
+        self.server.bulk_requests = 0
+        self.server.rejected = set()
+        self.server.documents = {}
+        self.server.refreshed = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_rejections_are_retried_and_settings_restored(self):
+        host, port = self.server.server_address[:2]
+        indexer = StreamingBulkIndexer(f"http://{host}:{port}", "foods", workers=3, backoff_seconds=0.01,
+                                       sizer=AdaptiveBatchSizer(initial_bytes=600, min_bytes=600, max_bytes=600))
+        documents = [{"id": i, "name": f"food {i}", "reject_once": i % 7 == 0, "bad": i == 5} for i in range(40)]
+
+        with indexer.bulk_load_settings() as original:
+            self.assertEqual(self.server.settings_updates, [{"index": {"refresh_interval": "-1", "number_of_replicas": 0}}])
+            stats = indexer.index_documents(iter(documents))
+
+        self.assertEqual(original, {"refresh_interval": "30s", "number_of_replicas": 1})
+        self.assertEqual(self.server.settings_updates[-1], {"index": original})
+        self.assertTrue(self.server.refreshed)
+
+        self.assertEqual(stats.indexed, 39)
+        self.assertEqual(stats.failed, 1)
+        self.assertEqual(stats.errors[0]["type"], "mapper_parsing_exception")
+        self.assertGreater(stats.retried, len(self.server.rejected))  # 全体の429と項目ごとの429
+        self.assertGreater(stats.batches, 3)
+        self.assertEqual(sorted(int(i) for i in self.server.documents), [i for i in range(40) if i != 5])
+        self.assertGreater(stats.docs_per_second, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+バージョン付きインデックスとエイリアス切り替え（scripts/es_versioned_index.py）のテスト
+
+インデックス・エイリアスのAPIを模したローカルサーバーで、旧来の同名インデックスからの移行、
+検証・ウォームアップ（新しい物理インデックスへの検索の再生）、原子的な切り替え、
+古いバージョンの削除とロールバックを検証します。
+"""
+import fnmatch
+import json
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import urlparse
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from apps.word_query_api.endpoints import nutrition_search
+from scripts import es_versioned_index
+from scripts.es_versioned_index import VersionedIndexManager, fetch_recent_queries
+from shared.config.settings import get_settings
+
+ALIAS = "foods"
+
+
+class _FakeElasticsearchHandler(BaseHTTPRequestHandler):
+    """インデックス・エイリアス・検索の最小限のAPI"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._send_json(200 if self._path() in self.server.indices else 404, None)
+
+    def do_PUT(self):
+        self._read_json()
+        self.server.indices[self._path()] = {"docs": [], "aliases": set()}
+        self._send_json(200, {"acknowledged": True})
+
+    def do_DELETE(self):
+        self.server.indices.pop(self._path(), None)
+        self._send_json(200, {"acknowledged": True})
+
+    def do_GET(self):
+        path = self._path()
+        indices = self.server.indices
+        if path.startswith("_cat/indices/"):
+            pattern = path.split("/", 2)[2]
+            self._send_json(200, [{"index": name} for name in indices if fnmatch.fnmatch(name, pattern)])
+        elif path.startswith("_alias/"):
+            aliased = {name: {"aliases": {ALIAS: {}}} for name, index in indices.items() if ALIAS in index["aliases"]}
+            self._send_json(200 if aliased else 404, aliased)
+        elif path.startswith("_cluster/health"):
+            self._send_json(200, {"status": "green"})
+        elif path.endswith("/_count"):
+            self._send_json(200, {"count": len(self._resolve(path.split("/")[0])["docs"])})
+        else:
+            self._send_json(404, {})
+
+    def do_POST(self):
+        path, body = self._path(), self._read_json()
+        self.server.requests.append(path)
+        if path == "_aliases":
+            with self.server.lock:
+                for action in body["actions"]:
+                    (kind, params), = action.items()
+                    if kind == "add":
+                        self.server.indices[params["index"]]["aliases"].add(params["alias"])
+                    elif kind == "remove":
+                        self.server.indices[params["index"]]["aliases"].discard(params["alias"])
+                    elif kind == "remove_index":
+                        del self.server.indices[params["index"]]
+            self._send_json(200, {"acknowledged": True})
+        elif path.endswith("/_search"):
+            index = self._resolve(path.split("/")[0])
+            query = json.dumps(body)
+            hits = [{"_score": 1.0, "_source": doc} for doc in index["docs"] if doc["original_name"].lower() in query]
+            self._send_json(200, {"hits": {"total": {"value": len(hits)}, "hits": hits}, "took": 1})
+        else:
+            self._send_json(200, {})
+
+    def _path(self):
+        return urlparse(self.path).path.strip("/")
+
+    def _resolve(self, name):
+        if name in self.server.indices:
+            return self.server.indices[name]
+        return next(index for index in self.server.indices.values() if name in index["aliases"])
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class TestVersionedIndexManager(unittest.TestCase):
+    """VersionedIndexManagerのテストケース"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeElasticsearchHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        # バージョン管理前の、エイリアスと同名の物理インデックス
+        self.server.indices = {ALIAS: {"docs": [{"original_name": "Apples raw"}] * 3, "aliases": set()}}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        host, port = self.server.server_address[:2]
+        self.manager = VersionedIndexManager(f"http://{host}:{port}", ALIAS, keep_versions=1)
+        names = iter(f"{ALIAS}_v2026101900000{i}" for i in range(10))
+        patcher = mock.patch.object(es_versioned_index, "versioned_index_name", lambda alias: next(names))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _build_version(self, documents):
+        index = self.manager.create_version({})
+        self.server.indices[index]["docs"] = documents
+        return index
+
+    def test_legacy_index_is_replaced_atomically_and_old_versions_are_pruned(self):
+        documents = [{"original_name": "Apples raw"}, {"original_name": "Bananas raw"}, {"original_name": "Honey"}]
+        self.assertTrue(self.manager.legacy_index_exists())
+
+        first = self._build_version(documents)
+        self.assertEqual(self.manager.verify(first, expected_count=3, sample_name="Bananas raw"), [])
+        self.assertIsNone(self.manager.swap_alias(first))
+        self.assertNotIn(ALIAS, self.server.indices)  # 旧来の物理インデックスはエイリアスの追加と同時に削除
+        self.assertEqual(self.manager.current_index(), first)
+
+        second, third = self._build_version(documents), self._build_version(documents)
+        self.assertEqual(self.manager.swap_alias(second), first)
+        self.assertEqual(self.manager.swap_alias(third), second)
+        self.assertEqual(self.manager.prune(), [first])  # 直前の1件（second）は残す
+        self.assertEqual(self.manager.list_versions(), [second, third])
+
+        self.assertEqual(self.manager.rollback(), second)
+        self.assertEqual(self.manager.aliased_indices(), [second])
+
+    def test_truncated_versions_fail_verification(self):
+        index = self._build_version([{"original_name": "Apples raw"}])
+
+        problems = self.manager.verify(index, expected_count=1, sample_name="Bananas raw")
+
+        self.assertEqual(len(problems), 2)  # 旧インデックス（3件）に対する件数比とexact match
+        self.assertTrue(self.manager.legacy_index_exists())
+
+    def test_warm_up_replays_queries_against_the_new_index(self):
+        index = self._build_version([{"original_name": "Apples raw"}])
+        queries = [{"q": "Apples raw", "search_context": "meal_analysis", "exclude_uncooked": True},
+                   {"q": "appl", "search_context": "word_search", "exclude_uncooked": False}]
+
+        result = self.manager.warm_up(index, queries)
+
+        self.assertEqual((result["replayed"], result["failed"]), (2, 0))
+        self.assertIn(f"{index}/_forcemerge", self.server.requests)
+        self.assertEqual(self.server.requests.count(f"{index}/_search"), 2)
+        self.assertNotIn(f"{ALIAS}/_search", self.server.requests)
+
+
+class TestRecentQueries(unittest.TestCase):
+    """/suggest/recent-queries（ウォームアップ用の直近の検索クエリ）のテストケース"""
+
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(nutrition_search.router, prefix="/api/v1/nutrition")
+        self.client = TestClient(app)
+        patcher = mock.patch.object(nutrition_search, "recent_queries", [{"q": "apple"}, {"q": "rice"}])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self, token=None, headers=None):
+        with mock.patch.object(get_settings(), "RECENT_QUERIES_TOKEN", token):
+            return self.client.get("/api/v1/nutrition/suggest/recent-queries", headers=headers or {})
+
+    def test_endpoint_is_disabled_without_a_token(self):
+        self.assertEqual(self._get(headers={"Authorization": "Bearer "}).status_code, 404)
+
+    def test_bearer_token_is_required(self):
+        self.assertEqual(self._get("s3cret").status_code, 401)
+        self.assertEqual(self._get("s3cret", {"Authorization": "Bearer wrong"}).status_code, 401)
+
+        response = self._get("s3cret", {"Authorization": "Bearer s3cret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"queries": [{"q": "rice"}, {"q": "apple"}]})
+
+    def test_fetch_sends_the_token_and_skips_without_one(self):
+        response = mock.Mock(**{"json.return_value": {"queries": [{"q": "rice"}]}})
+        with mock.patch.object(es_versioned_index.requests, "get", return_value=response) as get, \
+                mock.patch.dict("os.environ", {"RECENT_QUERIES_TOKEN": "s3cret"}):
+            self.assertEqual(fetch_recent_queries("http://word-query"), [{"q": "rice"}])
+            self.assertEqual(get.call_args.kwargs["headers"], {"Authorization": "Bearer s3cret"})
+
+            get.reset_mock()
+            del os.environ["RECENT_QUERIES_TOKEN"]
+            self.assertEqual(fetch_recent_queries("http://word-query"), [])
+            get.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+非同期ジョブキューのテスト
+
+SQLiteJobStore のリース／再配信と JobWorkerPool の再試行・Webhook送信先の検証、
+画像・音声分析ジョブの入力不正の扱いと詳細ログを検証します。
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from unittest import mock
+
+os.environ.setdefault("DEEPINFRA_API_KEY", "test-key")
+
+from fastapi import HTTPException  # noqa: E402
+
+from apps.meal_analysis_api.endpoints import jobs  # noqa: E402
+from shared.config.settings import get_settings  # noqa: E402
+from shared.jobs import JobStatus, JobWorkerPool, PermanentJobError, SQLiteJobStore, check_webhook_url  # noqa: E402
+from shared.pipeline import voice_orchestrator  # noqa: E402
+from shared.pipeline.result_manager import DetailedExecutionLog  # noqa: E402
+
+
+class TestSQLiteJobStore(unittest.TestCase):
+    """SQLiteJobStoreのテストケース"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "jobs.sqlite3")
+        self.store = SQLiteJobStore(self.db_path, visibility_timeout_seconds=0.2, max_attempts=2)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_enqueue_claim_complete(self):
+        job = self.store.enqueue("complete", {"seed": 1}, payload=b"img")
+        self.assertEqual(job.status, JobStatus.QUEUED)
+
+        claimed = self.store.claim("w1")
+        self.assertEqual(claimed.job_id, job.job_id)
+        self.assertEqual(claimed.payload, b"img")
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(self.store.claim("w2"))
+
+        self.assertTrue(self.store.complete(job.job_id, "w1", {"ok": True}))
+        done = self.store.get(job.job_id)
+        self.assertEqual(done.status, JobStatus.SUCCEEDED)
+        self.assertEqual(done.result, {"ok": True})
+
+    def test_expired_lease_is_redelivered_then_dead_lettered(self):
+        job = self.store.enqueue("voice", {})
+        self.store.claim("w1")
+        time.sleep(0.25)
+
+        redelivered = self.store.claim("w2")
+        self.assertEqual(redelivered.job_id, job.job_id)
+        self.assertEqual(redelivered.attempts, 2)
+        # 旧ワーカーのackは拒否される
+        self.assertFalse(self.store.complete(job.job_id, "w1", {}))
+
+        time.sleep(0.25)
+        self.assertIsNone(self.store.claim("w3"))
+        self.assertEqual(self.store.get(job.job_id).status, JobStatus.FAILED)
+
+    def test_durable_across_reopen(self):
+        job = self.store.enqueue("complete", {"a": 1})
+        reopened = SQLiteJobStore(self.db_path)
+        self.assertEqual(reopened.get(job.job_id).params, {"a": 1})
+        self.assertEqual(reopened.count_by_status()["queued"], 1)
+        reopened.close()
+
+
+class TestJobWorkerPool(unittest.TestCase):
+    """JobWorkerPoolのテストケース"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = SQLiteJobStore(os.path.join(self.tmpdir.name, "jobs.sqlite3"), max_attempts=3)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def _run_until_terminal(self, handlers, kind, webhook_url=None, **pool_options):
+        async def scenario():
+            pool = JobWorkerPool(self.store, handlers, concurrency=2,
+                                 poll_interval_seconds=0.01, retry_backoff_seconds=0.0, **pool_options)
+            await pool.start()
+            job = await pool.submit(kind, {"x": 1}, b"data", webhook_url)
+            for _ in range(500):
+                current = await pool.get_job(job.job_id)
+                if current.is_terminal and (webhook_url is None or current.webhook_status):
+                    break
+                await asyncio.sleep(0.01)
+            await pool.stop()
+            return current
+
+        return asyncio.run(scenario())
+
+    def test_retry_until_success(self):
+        calls = []
+
+        async def flaky(job):
+            calls.append(job.attempts)
+            if len(calls) < 2:
+                raise RuntimeError("transient")
+            return {"payload_size": len(job.payload)}
+
+        job = self._run_until_terminal({"flaky": flaky}, "flaky")
+        self.assertEqual(job.status, JobStatus.SUCCEEDED)
+        self.assertEqual(job.result, {"payload_size": 4})
+        self.assertEqual(calls, [1, 2])
+
+    def test_permanent_error_is_not_retried(self):
+        async def broken(job):
+            raise PermanentJobError("bad input")
+
+        job = self._run_until_terminal({"broken": broken}, "broken")
+        self.assertEqual(job.status, JobStatus.FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("bad input", job.error)
+
+    def test_webhook_is_only_posted_to_allowed_internal_hosts(self):
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+                self.send_response(204)
+                self.end_headers()
+
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        webhook_url = "http://127.0.0.1:%d/hook" % server.server_address[1]
+
+        async def ok(job):
+            return {"ok": True}
+
+        # 投入後に送信先がループバックに解決されるようになった場合（DNS rebinding）も送信しない
+        job = self._run_until_terminal({"ok": ok}, "ok", webhook_url)
+        self.assertTrue(job.webhook_status.startswith("failed:rejected:"))
+        self.assertEqual(received, [])
+
+        job = self._run_until_terminal({"ok": ok}, "ok", webhook_url, webhook_allowed_hosts=["127.0.0.1"])
+        self.assertEqual(job.webhook_status, "delivered:204")
+        self.assertEqual([body["result"] for body in received], [{"ok": True}])
+
+
+class TestWebhookURLValidation(unittest.TestCase):
+    """Webhook送信先の検証（SSRF対策）のテストケース"""
+
+    def test_internal_addresses_are_rejected(self):
+        for url in ["http://127.0.0.1:8001/hook", "http://localhost/hook", "http://10.0.0.5/hook",
+                    "https://192.168.1.10/hook", "http://169.254.169.254/latest/meta-data/",
+                    "http://[::1]/hook", "http://[fe80::1]/hook", "http://[::ffff:127.0.0.1]/hook",
+                    "http://0.0.0.0/hook", "ftp://example.com/hook", "/relative/hook"]:
+            with self.subTest(url=url):
+                with self.assertRaises(ValueError):
+                    check_webhook_url(url)
+                with self.assertRaises(HTTPException) as raised:
+                    asyncio.run(jobs._validate_webhook_url(url))
+                self.assertEqual(raised.exception.status_code, 400)
+
+    def test_hosts_resolving_to_internal_addresses_are_rejected(self):
+        resolved = [(2, 1, 6, "", ("93.184.216.34", 443)), (2, 1, 6, "", ("10.1.2.3", 443))]
+        with mock.patch("socket.getaddrinfo", return_value=resolved):
+            with self.assertRaisesRegex(ValueError, "private"):
+                check_webhook_url("https://hooks.example.com/meal")
+
+    def test_public_and_allowlisted_hosts_are_accepted(self):
+        check_webhook_url("https://93.184.216.34/hook")
+        check_webhook_url("http://hooks.internal:8080/hook", allowed_hosts=["Hooks.Internal"])
+        with mock.patch.object(get_settings(), "JOB_WEBHOOK_ALLOWED_HOSTS", ["127.0.0.1"]):
+            asyncio.run(jobs._validate_webhook_url("http://127.0.0.1:8001/hook"))
+
+
+class TestAnalysisJobHandlers(unittest.TestCase):
+    """画像・音声分析ジョブのハンドラーのテストケース"""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.store = SQLiteJobStore(os.path.join(tmpdir.name, "jobs.sqlite3"))
+        self.addCleanup(self.store.close)
+
+    def _job(self, kind, params, payload):
+        self.store.enqueue(kind, params, payload=payload)
+        return self.store.claim("test-worker")
+
+    def test_invalid_input_fails_permanently(self):
+        wav = (Path(__file__).parent / "test_audio" / "lunch.wav").read_bytes()
+        cases = [
+            ("voice", {"speech_service": "unknown"}, wav, "Invalid speech_service"),
+            ("voice", {"temperature": 2.0}, wav, "temperature"),
+            ("voice", {}, b"not audio at all", "unsupported audio format"),
+            ("voice", {}, b"RIFF\x64\x00\x00\x00WAVEfmt \x10\x00\x00\x00\x01\x00", "WAV header"),
+            ("complete", {"ai_model_id": "no-such-model"}, b"\x89PNG", "Unsupported ai_model_id"),
+            ("complete", {"image_mime_type": "text/plain"}, b"\x89PNG", "画像"),
+        ]
+        for kind, params, payload, message in cases:
+            with self.subTest(kind=kind, params=params):
+                with self.assertRaisesRegex(PermanentJobError, message):
+                    asyncio.run(jobs.JOB_HANDLERS[kind](self._job(kind, params, payload)))
+
+    def test_voice_job_detail_log_includes_transcript(self):
+        from test_phase1_streaming import _RecordingSearchComponent
+        from test_voice_websocket import _FakeNLU
+
+        def pipeline_factory(**kwargs):
+            pipeline = voice_orchestrator.VoiceAnalysisPipeline(**kwargs)
+            pipeline.phase1_speech_component.nlu_service = _FakeNLU()
+
+            async def transcribe_audio(audio_data, audio_format, language_code, temperature):
+                return "I ate grilled chicken salad"
+
+            pipeline.phase1_speech_component.transcribe_audio = transcribe_audio
+            pipeline.nutrition_search_component = _RecordingSearchComponent()
+            return pipeline
+
+        result_manager = mock.MagicMock()
+        result_manager.create_execution_log.side_effect = DetailedExecutionLog
+        with mock.patch.object(jobs, "VoiceAnalysisPipeline", side_effect=pipeline_factory), \
+                mock.patch.object(voice_orchestrator, "ResultManager", return_value=result_manager), \
+                mock.patch.object(get_settings(), "SPEECH_CACHE_ENABLED", False):
+            wav = (Path(__file__).parent / "test_audio" / "lunch.wav").read_bytes()
+            asyncio.run(jobs.JOB_HANDLERS["voice"](self._job("voice", {}, wav)))
+
+        phase1 = next(call.args[1] for call in result_manager.add_phase_result.call_args_list
+                      if call.args[0] == "Phase1SpeechComponent")
+        self.assertEqual(phase1["processing_details"]["speech_recognition_result"], "I ate grilled chicken salad")
+        self.assertEqual(phase1["detected_food_items"], [])
+        self.assertEqual([dish["attributes"] for dish in phase1["dishes"]], [[]])
+
+
+if __name__ == "__main__":
+    unittest.main()
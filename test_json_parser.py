@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+JSON抽出ユーティリティ（shared/utils/json_parser.py）のテスト
+
+コードフェンス・文字列内の括弧・途中で切れた出力の修復を検証します。
+"""
+import json
+import time
+import unittest
+
+from shared.utils.json_parser import extract_json_content, iter_json_object_spans, parse_json_from_string
+
+SAMPLE = {
+    "dishes": [
+        {"dish_name": "Curry {spicy}", "ingredients": [
+            {"ingredient_name": "Rice white cooked", "weight_g": 150},
+            {"ingredient_name": "Chicken \"thigh\" }", "weight_g": 80}
+        ]}
+    ]
+}
+
+
+class TestParseJsonFromString(unittest.TestCase):
+    """parse_json_from_stringのテストケース"""
+
+    def test_code_fence_and_surrounding_text(self):
+        text = "Here is the analysis:\n```json\n" + json.dumps(SAMPLE, indent=2) + "\n```\nLet me know {if} you need more."
+        self.assertEqual(parse_json_from_string(text), SAMPLE)
+        self.assertEqual(json.loads(extract_json_content(text)), SAMPLE)
+
+    def test_skips_invalid_candidates(self):
+        text = "Template: {dish_name} -> " + json.dumps(SAMPLE) + " {"
+        self.assertEqual(parse_json_from_string(text), SAMPLE)
+        self.assertEqual(len(list(iter_json_object_spans(text))), 2)
+
+    def test_unclosed_brace_in_prose_does_not_hide_later_objects(self):
+        text = 'Note: we use { for sets\n```json\n{"a": 1}\n```'
+        self.assertEqual(parse_json_from_string(text), {"a": 1})
+        self.assertEqual(extract_json_content(text), '{"a": 1}')
+
+        # 対応の崩れた候補・パースできない候補の内側のオブジェクト
+        self.assertEqual(parse_json_from_string('Items {x: [{"b": 1} }'), {"b": 1})
+        self.assertEqual(parse_json_from_string('{dish: {"dish_name": "Curry"} ok}'), {"dish_name": "Curry"})
+
+    def test_repairs_truncated_output_when_requested(self):
+        full = json.dumps(SAMPLE)
+        truncated = full[:full.index("Chicken") + 5]  # 文字列の途中で切れた出力
+
+        with self.assertRaises(ValueError):
+            parse_json_from_string(truncated)
+
+        repaired = parse_json_from_string(truncated, repair_truncated=True)
+        ingredients = repaired["dishes"][0]["ingredients"]
+        self.assertEqual(ingredients[0], {"ingredient_name": "Rice white cooked", "weight_g": 150})
+
+        # 書きかけのキーは捨てて閉じる
+        repaired = parse_json_from_string('{"a": 1, "b": [1, 2], "c', repair_truncated=True)
+        self.assertEqual(repaired, {"a": 1, "b": [1, 2]})
+
+    def test_adversarial_input_is_linear(self):
+        # 閉じ括弧のない大量の "{"（旧実装の貪欲な正規表現は二乗時間になる）
+        text = "{" * 200_000
+        started = time.perf_counter()
+        with self.assertRaises(ValueError):
+            parse_json_from_string(text)
+        self.assertLess(time.perf_counter() - started, 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
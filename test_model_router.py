@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+自動モデルルーティング（ai_model_id="auto"）のテスト
+
+レイテンシ統計の記録・予算に基づくモデル選択・除外したモデルの回復・タイムアウト時のフォールバックを検証します。
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+from shared.services.model_router import ModelLatencyTracker, RoutedVisionService, VisionModelRouter
+
+QWEN = "Qwen/Qwen2.5-VL-32B-Instruct"
+GEMMA = "google/gemma-3-27b-it"
+LLAMA = "meta-llama/Llama-3.2-90B-Vision-Instruct"
+
+
+class FakeVisionService:
+    """指定秒数待ってから応答するVisionサービス"""
+
+    def __init__(self, model_id, delay_seconds, calls):
+        self.model_id = model_id
+        self.delay_seconds = delay_seconds
+        self.calls = calls
+
+    async def analyze_image(self, image_bytes, image_mime_type, prompt, max_tokens=4096, temperature=0.0, seed=123456):
+        self.calls.append(self.model_id)
+        await asyncio.sleep(self.delay_seconds)
+        return '{"dishes": []}'
+
+
+def _expected_ewma(values, alpha):
+    ewma = values[0]
+    for value in values[1:]:
+        ewma = (1 - alpha) * ewma + alpha * value
+    return ewma
+
+
+class TestModelLatencyTracker(unittest.TestCase):
+    """ModelLatencyTrackerのテストケース"""
+
+    def test_ewma_percentile_and_error_rate(self):
+        tracker = ModelLatencyTracker(ewma_alpha=0.5, window_size=10)
+        for latency in (100, 200, 300, 400):
+            tracker.record(QWEN, latency, success=True)
+        tracker.record(QWEN, 50, success=False)
+
+        snapshot = tracker.snapshot()[QWEN]
+        self.assertEqual(snapshot["samples"], 4)  # エラー応答のレイテンシは記録しない
+        self.assertAlmostEqual(snapshot["ewma_latency_ms"], _expected_ewma([100, 200, 300, 400], 0.5))
+        self.assertEqual(tracker.percentile(QWEN, 50), 200)
+        self.assertEqual(tracker.percentile(QWEN, 90), 400)
+        self.assertAlmostEqual(tracker.error_rate(QWEN), 0.5)
+
+
+class TestVisionModelRouter(unittest.TestCase):
+    """VisionModelRouterのテストケース"""
+
+    def test_selects_most_accurate_model_within_budget(self):
+        router = VisionModelRouter(tracker=ModelLatencyTracker())
+
+        # 設定値（Qwen 12.5s / Gemma 30s / Llama 45s）で予測
+        plan = router.plan(latency_budget_ms=60000)
+        self.assertEqual(plan.primary.model_id, LLAMA)
+        self.assertEqual(plan.fallback.model_id, QWEN)
+        self.assertNotIn("microsoft/DialoGPT-large", [c.model_id for c in plan.candidates])
+
+        plan = router.plan(latency_budget_ms=20000)
+        self.assertEqual(plan.primary.model_id, QWEN)
+        self.assertIsNone(plan.fallback)
+
+    def test_observed_latency_overrides_configuration(self):
+        tracker = ModelLatencyTracker()
+        for _ in range(10):
+            tracker.record(LLAMA, 8000, success=True)
+        router = VisionModelRouter(tracker=tracker)
+
+        plan = router.plan(latency_budget_ms=10000)
+        self.assertEqual(plan.primary.model_id, LLAMA)
+        self.assertEqual(plan.primary.latency_source, "observed")
+
+        # エラー率が高いモデルは選択されない
+        for _ in range(10):
+            tracker.record(LLAMA, 0, success=False)
+        self.assertEqual(router.plan(latency_budget_ms=10000).primary.model_id, QWEN)
+
+    def test_excluded_model_is_probed_and_recovers(self):
+        clock = [1000.0]
+        with mock.patch("shared.services.model_router.time.monotonic", lambda: clock[0]):
+            tracker = ModelLatencyTracker()
+            for _ in range(10):
+                tracker.record(LLAMA, 8000, success=True)
+            for _ in range(10):
+                tracker.record(LLAMA, 0, success=False)
+            router = VisionModelRouter(tracker=tracker)
+            interval = router.settings.MODEL_ROUTER_PROBE_INTERVAL_SECONDS
+            self.assertEqual(router.plan(latency_budget_ms=10000).primary.model_id, QWEN)
+
+            # 一定時間ごとに1回だけ、除外中のモデルに回復確認のリクエストを送る
+            probes = 0
+            while tracker.error_rate(LLAMA) > router.settings.MODEL_ROUTER_MAX_ERROR_RATE:
+                clock[0] += interval
+                plan = router.plan(latency_budget_ms=10000)
+                self.assertEqual((plan.primary.model_id, plan.primary.probe), (LLAMA, True))
+                self.assertEqual(router.plan(latency_budget_ms=10000).primary.model_id, QWEN)
+                tracker.record(LLAMA, 8000, success=True)
+                probes += 1
+
+            self.assertLess(probes, 10)
+            plan = router.plan(latency_budget_ms=10000)
+            self.assertEqual((plan.primary.model_id, plan.primary.probe), (LLAMA, False))
+
+
+class TestRoutedVisionService(unittest.TestCase):
+    """RoutedVisionServiceのテストケース"""
+
+    def test_falls_back_to_faster_model_on_timeout(self):
+        tracker = ModelLatencyTracker()
+        for _ in range(10):
+            tracker.record(LLAMA, 20, success=True)
+            tracker.record(QWEN, 5, success=True)
+        calls = []
+        delays = {LLAMA: 1.0, QWEN: 0.0, GEMMA: 0.0}
+        service = RoutedVisionService(
+            latency_budget_ms=100,
+            router=VisionModelRouter(tracker=tracker),
+            service_factory=lambda model_id: FakeVisionService(model_id, delays[model_id], calls)
+        )
+
+        result = asyncio.run(service.analyze_image(b"img", "image/jpeg", "prompt"))
+
+        self.assertEqual(result, '{"dishes": []}')
+        self.assertEqual(calls, [LLAMA, QWEN])
+        self.assertEqual(service.model_id, QWEN)
+        decision = service.last_decision
+        self.assertEqual(decision["selected_model"], LLAMA)
+        self.assertEqual(decision["final_model"], QWEN)
+        self.assertTrue(decision["fell_back"])
+        self.assertEqual([a["outcome"] for a in decision["attempts"]], ["timeout", "success"])
+        self.assertEqual(tracker.snapshot()[LLAMA]["timeout_count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+栄養データベースのシャード並列・差分構築（nutrition_db_experiment/build_nutrition_db.py）のテスト
+
+シャードに書き出したレコードが従来の build() と同じになること、元ファイルの
+内容ハッシュが変わらないレコードは再利用され、変更のあったファイルだけが変換し直されることを検証します。
+"""
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from nutrition_db_experiment.build_nutrition_db import NutritionDBBuilder
+
+
+def _write_item(raw, category, item_id, data):
+    processed_dir = Path(raw) / category / str(item_id) / "processed"
+    processed_dir.mkdir(parents=True, exist_ok=True)
+    (processed_dir / f"{item_id}.json").write_text(json.dumps(data), encoding="utf-8")
+
+
+def _food(item_id, calories=52):
+    return {"id": item_id, "name": f"Food {item_id}", "description": "raw",
+            "nutrition": {"calories": calories, "proteinContent": 0.3, "fatContent": 0.2, "carbohydrateContent": 14},
+            "units": [{"description": "grams", "amount": 100}]}
+
+
+def _write_raw_tree(raw):
+    for i in range(30):
+        _write_item(raw, "food", i, _food(i))
+    for i in range(100, 110):
+        _write_item(raw, "recipe", i, {"id": i, "title": f"Dish {i}", "nutrients": {
+            "calories": 300, "proteinContent": 10, "fatContent": 5, "carbohydrateContent": 40,
+            "servingSize": "250 grams"}})
+    _write_item(raw, "recipe", 999, {"id": 999, "title": "Broken dish"})  # 栄養素がないため変換できない
+    _write_item(raw, "branded", 500, {"data": {"id": 500, "food_name": "Brand bar", "calories": 200, "proteins": 4,
+                                               "fats": 8, "carbs": 30,
+                                               "unit_weights": [{"description": "grams", "amount": 50}]}})
+
+
+def _shard_records(output):
+    records = []
+    for path in sorted((Path(output) / "shards").glob("*.jsonl")):
+        records.extend(json.loads(line) for line in path.read_text(encoding="utf-8").splitlines())
+    return records
+
+
+def _key(item):
+    return item["data_type"], item["id"]
+
+
+class TestShardedNutritionDBBuild(unittest.TestCase):
+    """NutritionDBBuilder.build_shardedのテストケース"""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.raw = Path(tmpdir.name) / "raw"
+        self.output = Path(tmpdir.name) / "nutrition_db"
+        _write_raw_tree(self.raw)
+
+    def test_sharded_build_matches_legacy_build(self):
+        legacy = NutritionDBBuilder(str(self.raw), str(Path(self.output.parent) / "legacy"))
+        legacy.build()
+
+        builder = NutritionDBBuilder(str(self.raw), str(self.output))
+        result = builder.build_sharded(workers=2, num_shards=4, merged_json=True)
+
+        self.assertEqual(result["skipped"], 0)
+        self.assertEqual(builder.stats, legacy.stats)
+        self.assertEqual(builder.stats["recipe"], {"processed": 10, "errors": 1})
+        self.assertEqual(sorted(_shard_records(self.output), key=_key), sorted(legacy.db_items, key=_key))
+        # 従来の build() と同じ順序・同じ内容
+        merged = (self.output / "eatthismuch_db.json").read_text(encoding="utf-8")
+        self.assertEqual(json.loads(merged), legacy.db_items)
+        self.assertEqual(merged, (self.output.parent / "legacy" / "eatthismuch_db.json").read_text(encoding="utf-8"))
+        stats = json.loads((self.output / "build_stats.json").read_text(encoding="utf-8"))
+        self.assertEqual(stats["database_counts"], {"dish": 10, "ingredient": 30, "branded": 1, "total": 41})
+
+    def test_incremental_build_only_converts_changed_files(self):
+        first = NutritionDBBuilder(str(self.raw), str(self.output)).build_sharded(workers=1, num_shards=4)
+        self.assertEqual((first["skipped"], first["reused"], first["converted"]), (0, 0, 42))
+
+        unchanged = NutritionDBBuilder(str(self.raw), str(self.output))
+        result = unchanged.build_sharded(workers=1, num_shards=4)
+        self.assertEqual((result["rebuilt"], result["skipped"], result["converted"]), (0, first["rebuilt"], 0))
+        self.assertEqual(unchanged.stats["recipe"], {"processed": 10, "errors": 1})
+
+        _write_item(self.raw, "food", 7, _food(7, calories=99))
+        _write_item(self.raw, "food", 8, _food(8))  # 書き直したが内容は同じ
+        result = NutritionDBBuilder(str(self.raw), str(self.output)).build_sharded(workers=1, num_shards=4)
+
+        self.assertEqual((result["converted"], result["reused"]), (1, 41))
+        food = next(item for item in _shard_records(self.output) if _key(item) == ("ingredient", 7))
+        self.assertEqual(food["nutrition"]["calories"], 99)
+        self.assertEqual(len(_shard_records(self.output)), 41)
+
+        # シャード数を変えると全件を再構築し、古いシャードファイルは削除する
+        result = NutritionDBBuilder(str(self.raw), str(self.output)).build_sharded(workers=1, num_shards=2)
+        self.assertEqual((result["skipped"], result["converted"]), (0, 42))
+        self.assertEqual(len(list((self.output / "shards").glob("*.jsonl"))), result["rebuilt"])
+        self.assertEqual(len(_shard_records(self.output)), 41)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Phase1ストリーミングのテスト
+
+ローカルのDeep Infra代替サーバー（scripts/fake_deepinfra_server.py）から記録済み応答をストリーミングし、
+食材オブジェクトが閉じた時点で栄養検索が先行投入されることを検証します。
+"""
+import asyncio
+import json
+import os
+import random
+import unittest
+from pathlib import Path
+
+from openai import AsyncOpenAI
+
+from scripts.fake_deepinfra_server import load_fixture, start_fake_server
+from shared.components.advanced_nutrition_search_component import AdvancedNutritionSearchComponent
+from shared.components.phase1_component import Phase1Component
+from shared.models import NutritionQueryInput, Phase1Input
+from shared.services.deepinfra_service import DeepInfraService
+from shared.utils.streaming_json import IncrementalIngredientParser
+
+FIXTURE_PATH = Path(__file__).parent / "test_fixtures" / "deepinfra" / "phase1_two_dishes.json"
+EXPECTED_INGREDIENTS = [
+    (0, 0, "Chicken breast grilled"),
+    (0, 1, "Lettuce romaine raw"),
+    (0, 2, "Tomatoes red raw"),
+    (1, 0, "Rice white cooked"),
+]
+
+
+class TestIncrementalIngredientParser(unittest.TestCase):
+    """IncrementalIngredientParserのテストケース"""
+
+    def test_emits_each_ingredient_once_regardless_of_chunking(self):
+        content = "```json\n" + load_fixture(FIXTURE_PATH)["content"] + "\n```"
+        rng = random.Random(0)
+        for _ in range(20):
+            parser = IncrementalIngredientParser()
+            emitted = []
+            position = 0
+            while position < len(content):
+                size = rng.randint(1, 9)
+                emitted.extend(parser.feed(content[position:position + size]))
+                position += size
+            self.assertEqual([(i.dish_index, i.ingredient_index, i.ingredient_name) for i in emitted], EXPECTED_INGREDIENTS)
+            self.assertTrue(parser.finished)
+            self.assertEqual(parser.text, content)
+
+    def test_ignores_braces_inside_strings_and_other_arrays(self):
+        parser = IncrementalIngredientParser()
+        text = json.dumps({
+            "detected_food_items": [{"item_name": "x", "ingredients": [{"ingredient_name": "not a dish"}]}],
+            "dishes": [{"dish_name": "Soup {hot}", "ingredients": [{"ingredient_name": "broth \"}]\" ", "weight_g": 10}]}]
+        })
+        emitted = parser.feed(text)
+        self.assertEqual([i.ingredient_name for i in emitted], ['broth "}]" '])
+
+
+class _RecordingSearchComponent(AdvancedNutritionSearchComponent):
+    """Word Query APIを呼ばずに検索順序を記録するコンポーネント"""
+
+    def __init__(self):
+        super().__init__(api_base_url="http://word-query.invalid")
+        self.requested = []
+
+    async def _validate_word_query_api_connection(self):
+        return None
+
+    async def _single_api_request_strict(self, client, term):
+        self.requested.append(term)
+        return {"suggestions": [{
+            "suggestion": term,
+            "rank": 1,
+            "match_type": "exact_match",
+            "confidence_score": 100,
+            "food_info": {"search_name": term, "description": ""},
+            "nutrition_preview": {"calories": 100, "protein": 1, "fat": 1, "carbohydrates": 10}
+        }]}
+
+
+class TestPhase1Streaming(unittest.TestCase):
+    """代替サーバーを使ったPhase1ストリーミングのテストケース"""
+
+    def setUp(self):
+        self.server = start_fake_server(FIXTURE_PATH)
+        os.environ.setdefault("DEEPINFRA_API_KEY", "test-key")
+        self.vision_service = DeepInfraService(model_id="google/gemma-3-27b-it")
+        self.vision_service.client = AsyncOpenAI(api_key="test-key", base_url=self.server.base_url)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_ingredients_are_searched_before_stream_ends(self):
+        async def scenario():
+            search_component = _RecordingSearchComponent()
+            phase1 = Phase1Component(vision_service=self.vision_service)
+            prefetched_during_stream = []
+
+            async with search_component.search_session() as session:
+                def on_ingredient(ingredient):
+                    session.submit(ingredient.ingredient_name)
+                    prefetched_during_stream.append(ingredient.ingredient_name)
+
+                phase1_result = await phase1.execute(
+                    Phase1Input(image_bytes=b"fake-image", image_mime_type="image/jpeg"),
+                    on_ingredient=on_ingredient
+                )
+                search_result = await session.finish(NutritionQueryInput(
+                    ingredient_names=phase1_result.get_all_ingredient_names(),
+                    dish_names=phase1_result.get_all_dish_names(),
+                    preferred_source="advanced_search"
+                ))
+            return phase1_result, search_result, prefetched_during_stream, search_component.requested
+
+        phase1_result, search_result, prefetched, requested = asyncio.run(scenario())
+
+        names = [name for _, _, name in EXPECTED_INGREDIENTS]
+        self.assertEqual(phase1_result.get_all_ingredient_names(), names)
+        self.assertEqual(prefetched, names)
+        self.assertEqual(requested, names)  # 各食材は1回だけ検索される
+        self.assertEqual(search_result.search_summary["prefetched_terms"], 4)
+        self.assertEqual(set(search_result.matches.keys()), set(names))
+        self.assertTrue(self.server.requests[0]["stream"])
+
+
+if __name__ == "__main__":
+    unittest.main()
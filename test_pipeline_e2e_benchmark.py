@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+オフラインのエンドツーエンド・ベンチマーク（benchmarks/bench_pipeline_e2e.py）のテスト
+
+ローカルの代替サーバー（Deep Infra・Word Query API）に対して食事・音声の両パイプラインが
+エラーなく完了することと、ベースラインとの比較で劣化を検出することを検証します。
+"""
+import asyncio
+import os
+import unittest
+
+os.environ.setdefault("DEEPINFRA_API_KEY", "test-key")
+
+from benchmarks.bench_pipeline_e2e import DEFAULT_LATENCY, StandIns, compare_to_baseline, configure_environment, run_suite  # noqa: E402
+from shared.config.settings import get_settings  # noqa: E402
+
+CONFIG = {
+    "pipelines": ["meal", "voice"],
+    "requests": 2,
+    "concurrency": 2,
+    "latency": {route: "constant:5" for route in DEFAULT_LATENCY},
+    "word_query": "fake",
+    "stream_phase1": False,
+    "seed": 0,
+}
+
+RESULT = {"requests": 24, "errors": 0, "p50_ms": 1000.0, "p95_ms": 1600.0, "p99_ms": 2000.0, "mean_ms": 1100.0,
+          "throughput_rps": 3.0, "peak_rss_mb": 150.0, "rss_growth_mb": 20.0}
+
+
+class TestPipelineEndToEndBenchmark(unittest.TestCase):
+    """オフラインのエンドツーエンド・ベンチマークのテストケース"""
+
+    def test_both_pipelines_complete_against_the_stand_ins(self):
+        saved = dict(os.environ)
+        self.addCleanup(get_settings.cache_clear)
+        self.addCleanup(lambda: (os.environ.clear(), os.environ.update(saved)))
+
+        with StandIns(CONFIG) as urls:
+            configure_environment(urls, stream_phase1=False)
+            results = asyncio.run(run_suite(CONFIG, urls))
+
+        for name in ("meal", "voice"):
+            self.assertEqual(results[name]["errors"], 0, results[name]["error_samples"])
+            self.assertGreater(results[name]["throughput_rps"], 0)
+            self.assertGreater(results[name]["peak_rss_mb"], 0)
+
+    def test_regressions_against_the_baseline_are_reported(self):
+        baseline = {"config": CONFIG, "results": {"meal": RESULT}}
+
+        self.assertEqual(compare_to_baseline({"meal": dict(RESULT, p50_ms=1200.0)}, baseline, CONFIG), [])
+
+        problems = compare_to_baseline(
+            {"meal": dict(RESULT, p95_ms=2100.0, throughput_rps=2.0, peak_rss_mb=210.0, errors=1)}, baseline, CONFIG
+        )
+        self.assertEqual(len(problems), 4)
+        self.assertTrue(all(problem.startswith("meal: ") for problem in problems))
+
+        other_config = dict(CONFIG, concurrency=8)
+        self.assertEqual(len(compare_to_baseline({"meal": RESULT}, baseline, other_config)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
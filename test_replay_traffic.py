@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+取得したリクエストの再生による負荷試験（scripts/replay_traffic.py, scripts/latency_histogram.py）のテスト
+
+ヒストグラムの精度・coordinated omission の補正・保存と比較、ローカルサーバーに対する
+開ループ（停止中の待ち時間が補正後のレイテンシに含まれること）と閉ループの再生を検証します。
+"""
+import asyncio
+import json
+import math
+import random
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from scripts.latency_histogram import LatencyHistogram, compare_histograms, format_percentile_report
+from scripts.replay_traffic import TrafficReplayer, compare_runs, load_capture, main, write_reports
+
+
+class _FakeAPIHandler(BaseHTTPRequestHandler):
+    """/complete・/voice（multipart）と /suggest の最小限のAPI"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        time.sleep(self.server.delays.pop(0) if self.server.delays else 0.001)
+        self._send_json(200 if self.path.startswith("/api/v1/nutrition/suggest?") else 404, {"suggestions": []})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.paths.append(self.path)
+        uploaded = self.server.upload in body and b'name="save_detailed_logs"' in body
+        self._send_json(200 if uploaded else 400, {"analysis_id": "test"})
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """LatencyHistogramのテストケース"""
+
+    def test_percentiles_are_within_the_configured_precision(self):
+        rng = random.Random(7)
+        values = sorted(int(rng.lognormvariate(10, 0.8)) for _ in range(5000))
+        histogram = LatencyHistogram(significant_figures=3)
+        for value in values:
+            histogram.record(value)
+
+        for percentile in (50, 90, 99, 99.9):
+            exact = values[math.ceil(round(len(values) * percentile / 100, 9)) - 1]
+            self.assertAlmostEqual(histogram.value_at_percentile(percentile), exact, delta=exact * 0.001 + 1)
+        self.assertEqual(histogram.value_at_percentile(100), values[-1])
+        self.assertAlmostEqual(histogram.mean, sum(values) / len(values))
+
+        restored = LatencyHistogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+        restored.add(histogram)
+        self.assertEqual(restored.total_count, 10000)
+        self.assertEqual(restored.value_at_percentile(99), histogram.value_at_percentile(99))
+
+    def test_corrected_recording_backfills_missed_intervals(self):
+        histogram = LatencyHistogram()
+        histogram.record_corrected(100_000, expected_interval=10_000)
+
+        self.assertEqual(histogram.total_count, 10)  # 100ms, 90ms, ..., 10ms
+        self.assertEqual(histogram.value_at_percentile(0), 10_000)
+        self.assertEqual(histogram.value_at_percentile(100), 100_000)
+
+    def test_percentile_report_and_comparison(self):
+        baseline, current = LatencyHistogram(), LatencyHistogram()
+        for value in range(1, 1001):
+            baseline.record(value * 1000)
+            current.record(value * 1200)
+
+        report = format_percentile_report(baseline).splitlines()
+        self.assertTrue(report[0].split() == ["Value", "Percentile", "TotalCount", "1/(1-Percentile)"])
+        self.assertEqual(report[-2].split()[-1], "1000]")
+        self.assertEqual(float(report[-4].split()[0]), 1000.0)  # 100%（ミリ秒）
+
+        p99 = next(row for row in compare_histograms(baseline, current) if row["percentile"] == 99.0)
+        self.assertAlmostEqual(p99["change"], 0.2, places=2)
+
+
+class TestTrafficReplay(unittest.TestCase):
+    """TrafficReplayerのテストケース"""
+
+    def _start_server(self, server_class, delays=()):
+        server = server_class(("127.0.0.1", 0), _FakeAPIHandler)
+        server.daemon_threads = True
+        server.paths, server.delays, server.upload = [], list(delays), b"RIFF-fake-wav"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return "http://%s:%d" % server.server_address[:2], server
+
+    def _capture(self, tmpdir, lines):
+        path = Path(tmpdir) / "capture.jsonl"
+        path.write_text("\n".join(json.dumps(line) for line in lines) + "\n", encoding="utf-8")
+        return load_capture(path)
+
+    def test_open_loop_counts_time_spent_waiting_behind_a_stall(self):
+        url, _ = self._start_server(HTTPServer, delays=[0.3])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            requests = self._capture(tmpdir, [{"endpoint": "suggest", "params": {"q": "rice", "exclude_uncooked": True}}])
+
+        replayer = TrafficReplayer(requests, {"meal": url, "word_query": url})
+        asyncio.run(replayer.run_open_loop(rate=50, count=10, max_in_flight=1))
+
+        stats = replayer.stats["suggest"]
+        self.assertEqual(stats.statuses, {"200": 10})
+        # 停止（300ms）の間に予定時刻を過ぎたリクエストは、補正後のレイテンシにだけ待ち時間が含まれる
+        self.assertLess(stats.uncorrected.value_at_percentile(50), 100_000)
+        self.assertGreater(stats.corrected.value_at_percentile(50), 100_000)
+
+    def test_errors_and_connection_failures_are_recorded_as_latency(self):
+        url, _ = self._start_server(ThreadingHTTPServer)
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            unreachable = "http://127.0.0.1:%d" % sock.getsockname()[1]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "lunch.jpg").write_bytes(b"not-the-expected-upload")
+            requests = self._capture(tmpdir, [
+                {"endpoint": "complete", "file": "lunch.jpg"},
+                {"endpoint": "suggest", "params": {"q": "rice"}},
+            ])
+
+        replayer = TrafficReplayer(requests, {"meal": url, "word_query": unreachable}, timeout=5)
+        asyncio.run(replayer.run_open_loop(rate=100, count=4))
+
+        self.assertEqual(replayer.stats["complete"].statuses, {"400": 2})
+        self.assertEqual(replayer.stats["suggest"].statuses, {"ConnectError": 2})
+        for stats in replayer.stats.values():
+            self.assertEqual(stats.errors, 2)
+            self.assertEqual(stats.corrected.total_count, 2)
+            self.assertEqual(stats.uncorrected.total_count, 2)
+
+    def test_run_rejects_invalid_pacing_and_fails_when_every_request_errors(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            unreachable = "http://127.0.0.1:%d" % sock.getsockname()[1]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            capture = Path(tmpdir) / "capture.jsonl"
+            capture.write_text(json.dumps({"endpoint": "suggest", "params": {"q": "rice"}}) + "\n", encoding="utf-8")
+            run = ["replay_traffic.py", "run", str(capture), "--word-query-api", unreachable]
+
+            for extra, message in (([], "no captured timing"), (["--rate", "5", "--speed", "0"], "--speed"),
+                                   (["--rate", "50", "--requests", "3"], "Every request failed")):
+                with self.subTest(args=extra):
+                    output = StringIO()
+                    with mock.patch("sys.argv", run + extra), redirect_stdout(output):
+                        self.assertFalse(main())
+                    self.assertIn(message, output.getvalue())
+                    self.assertNotIn("✅", output.getvalue())
+
+    def test_closed_loop_replays_all_endpoints_and_reports_regressions(self):
+        url, server = self._start_server(ThreadingHTTPServer)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "audio").mkdir()
+            (Path(tmpdir) / "audio" / "lunch.wav").write_bytes(server.upload)
+            (Path(tmpdir) / "lunch.jpg").write_bytes(server.upload)
+            requests = self._capture(tmpdir, [
+                {"endpoint": "complete", "file": "lunch.jpg", "form": {"seed": 123456}},
+                {"endpoint": "voice", "file": "audio/lunch.wav", "form": {"language_code": "en-US"}},
+                {"endpoint": "suggest", "params": {"q": "brown rice", "search_context": "word_search"}},
+            ])
+            self.assertEqual(requests[0].content_type, "image/jpeg")
+
+            replayer = TrafficReplayer(requests, {"meal": url, "word_query": url})
+            asyncio.run(replayer.run_closed_loop(concurrency=2, count=9))
+            results = replayer.results({"mode": "closed"})
+
+            self.assertEqual(sorted(results["endpoints"]), ["all", "complete", "suggest", "voice"])
+            self.assertEqual(results["endpoints"]["all"]["requests"], 9)
+            self.assertEqual(results["endpoints"]["all"]["errors"], 0)
+            self.assertEqual(server.paths.count("/api/v1/meal-analyses/voice"), 3)
+
+            json_path, hgrm_path = write_reports(results, Path(tmpdir) / "runs" / "after")
+            self.assertIn("# endpoint: all", hgrm_path.read_text(encoding="utf-8"))
+            saved = json.loads(json_path.read_text(encoding="utf-8"))
+
+        slower = json.loads(json.dumps(saved))
+        histogram = LatencyHistogram()
+        for _ in range(3):
+            histogram.record(5_000_000)
+        slower["endpoints"]["voice"]["corrected"] = histogram.to_dict()
+
+        self.assertEqual(compare_runs(saved, saved, fail_above=0.1), [])
+        regressions = compare_runs(saved, slower, fail_above=0.1)
+        self.assertTrue(regressions)
+        self.assertTrue(all(regression.startswith("voice p") for regression in regressions))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+文字起こし・NLU抽出結果のキャッシュ（shared/cache）のテスト
+
+LRUによるサイズ上限・SQLiteへの永続化・有効期限、Phase1SpeechComponentでの
+キャッシュヒット時の音声認識/LLM呼び出しの省略とヒット率メトリクスを検証します。
+"""
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from shared.cache import SQLiteCache, nlu_cache_key, speech
+from shared.components.phase1_speech_component import Phase1SpeechComponent
+from shared.config.settings import get_settings
+from shared.models.voice_analysis_models import VoiceAnalysisInput
+from shared.services.nlu_service import FALLBACK_DISH_NAME
+from shared.utils.metrics import get_metrics_registry
+
+
+class TestSQLiteCache(unittest.TestCase):
+    """SQLiteCacheのテストケース"""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.db_path = str(Path(tmpdir.name) / "cache" / "speech_cache.sqlite3")
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = SQLiteCache("transcript", db_path=self.db_path, max_entries=2)
+        cache.set("a", "first")
+        cache.set("b", "second")
+        time.sleep(0.01)
+        self.assertEqual(cache.get("a"), "first")  # "a" を参照したので "b" が最も古くなる
+        cache.set("c", "third")
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "third")
+        self.assertAlmostEqual(cache.hit_ratio, 2 / 3)
+
+    def test_entries_persist_across_instances_per_namespace(self):
+        SQLiteCache("nlu", db_path=self.db_path).set("key", {"dishes": [{"dish_name": "ramen"}]})
+
+        self.assertEqual(SQLiteCache("nlu", db_path=self.db_path).get("key"), {"dishes": [{"dish_name": "ramen"}]})
+        self.assertIsNone(SQLiteCache("transcript", db_path=self.db_path).get("key"))
+
+    def test_expired_entries_are_not_returned(self):
+        cache = SQLiteCache("transcript", db_path=self.db_path, ttl_seconds=0.05)
+        cache.set("a", "text")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_nlu_key_ignores_case_and_punctuation_but_not_inference_settings(self):
+        key = nlu_cache_key("Two eggs and toast.", "model", "prompt", 0.0, 123)
+        self.assertEqual(key, nlu_cache_key("two eggs, and  toast", "model", "prompt", 0.0, 123))
+        self.assertNotEqual(key, nlu_cache_key("Two eggs and toast.", "model", "prompt v2", 0.0, 123))
+        self.assertNotEqual(key, nlu_cache_key("Two eggs and toast.", "model", "prompt", 0.0, 7))
+
+
+class TestSpeechComponentCache(unittest.TestCase):
+    """Phase1SpeechComponentのキャッシュ利用のテストケース"""
+
+    def setUp(self):
+        os.environ.setdefault("DEEPINFRA_API_KEY", "test-key")
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        settings = get_settings()
+        for patcher in (
+            mock.patch.object(settings, "SPEECH_CACHE_ENABLED", True),
+            mock.patch.object(settings, "SPEECH_CACHE_DB_PATH", str(Path(tmpdir.name) / "speech_cache.sqlite3")),
+            mock.patch.object(settings, "AUDIO_NORMALIZATION_ENABLED", False),
+            mock.patch.dict(speech._caches, clear=True)
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.calls = []
+        self.nlu_result = {"dishes": [{"dish_name": "Toast", "confidence": 0.9,
+                                       "ingredients": [{"ingredient_name": "bread", "weight_g": 30}]}]}
+        test = self
+
+        class FakeNLU:
+            model_id = "test-model"
+
+            async def extract_foods_from_text(self, text, model_id=None, temperature=None, seed=None):
+                test.calls.append(("nlu", text))
+                return test.nlu_result
+
+        self.component = Phase1SpeechComponent(speech_service_type="deepinfra_whisper", nlu_service=FakeNLU())
+
+        async def fake_transcribe(audio_data, audio_format, language_code, temperature):
+            self.calls.append(("transcribe", audio_data))
+            return self.transcripts[audio_data]
+
+        self.component.transcribe_audio = fake_transcribe
+
+    def _process(self, audio: bytes):
+        return asyncio.run(self.component.process(VoiceAnalysisInput(audio_bytes=audio, audio_mime_type="audio/wav")))
+
+    def test_repeated_audio_and_utterances_skip_transcription_and_llm(self):
+        requests = get_metrics_registry().counter("speech_cache_requests_total")
+        hits_before = requests.get({"cache": "transcript", "result": "hit"})
+        self.transcripts = {b"retry": "I had toast.", b"again": "i had TOAST"}
+
+        self._process(b"retry")
+        self._process(b"retry")  # 再送された録音
+        output = self._process(b"again")  # 別の録音だが同じ発話
+
+        self.assertEqual(self.calls, [("transcribe", b"retry"), ("nlu", "I had toast."), ("transcribe", b"again")])
+        self.assertEqual([dish.dish_name for dish in output.dishes], ["Toast"])
+        self.assertEqual(requests.get({"cache": "transcript", "result": "hit"}), hits_before + 1)
+
+        ratios = get_metrics_registry().gauge("speech_cache_hit_ratio").snapshot()
+        self.assertGreater(ratios['{cache="nlu"}'], 0)
+        self.assertIn('speech_cache_entries{cache="transcript"} 2', get_metrics_registry().render_prometheus())
+
+    def test_cache_that_cannot_be_opened_is_skipped(self):
+        self.transcripts = {b"retry": "I had toast."}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "not-a-directory").write_text("")
+            # 親がファイル（ディレクトリを作成できない）・パスがディレクトリ（SQLiteで開けない）
+            for db_path in (str(Path(tmpdir) / "not-a-directory" / "cache.sqlite3"), tmpdir):
+                with self.subTest(db_path=db_path), mock.patch.object(get_settings(), "SPEECH_CACHE_DB_PATH", db_path):
+                    self.calls.clear()
+                    output = self._process(b"retry")
+
+                    self.assertEqual([dish.dish_name for dish in output.dishes], ["Toast"])
+                    self.assertEqual([kind for kind, _ in self.calls], ["transcribe", "nlu"])
+                    self.assertEqual(speech._caches, {})
+
+    def test_fallback_nlu_results_are_not_cached(self):
+        self.transcripts = {b"a": "some toast", b"b": "some toast"}
+        self.nlu_result = {"dishes": [{"dish_name": FALLBACK_DISH_NAME, "confidence": 0.5,
+                                       "ingredients": [{"ingredient_name": "toast", "weight_g": 30}]}]}
+
+        self._process(b"a")
+        self._process(b"b")
+
+        self.assertEqual([kind for kind, _ in self.calls], ["transcribe", "nlu", "transcribe", "nlu"])
+
+
+if __name__ == "__main__":
+    unittest.main()
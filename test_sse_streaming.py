@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+SSEストリーミング（/complete/stream）のテスト
+
+ローカルのDeep Infra代替サーバーと検索結果を記録するコンポーネントでパイプラインを実行し、
+段階イベントの順序・最終レスポンス・最初のイベントまでの時間の記録を検証します。
+"""
+import asyncio
+import json
+import os
+import unittest
+from pathlib import Path
+
+from openai import AsyncOpenAI
+
+from scripts.fake_deepinfra_server import start_fake_server
+from shared.pipeline import MealAnalysisPipeline
+from shared.services.deepinfra_service import DeepInfraService
+from shared.utils.metrics import MetricsRegistry
+from shared.utils.sse import AnalysisEventStream, format_sse_event
+from test_phase1_streaming import EXPECTED_INGREDIENTS, _RecordingSearchComponent
+
+FIXTURE_PATH = Path(__file__).parent / "test_fixtures" / "deepinfra" / "phase1_two_dishes.json"
+
+
+def _parse_sse(chunks):
+    """SSE文字列の列を (イベント名, データ) の一覧に変換"""
+    events = []
+    for block in "".join(chunks).split("\n\n"):
+        lines = [line for line in block.splitlines() if line and not line.startswith(":")]
+        if not lines:
+            continue
+        fields = {}
+        for line in lines:
+            key, _, value = line.partition(": ")
+            fields[key] = fields.get(key, "") + value
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class TestAnalysisEventStream(unittest.TestCase):
+    """AnalysisEventStreamのテストケース"""
+
+    def test_format_sse_event(self):
+        self.assertEqual(format_sse_event("final", {"a": "食"}, 3), 'id: 3\nevent: final\ndata: {"a": "食"}\n\n')
+
+    def test_error_event_and_first_event_metric(self):
+        metrics = MetricsRegistry()
+
+        async def failing_analysis(event_callback):
+            event_callback("phase1_detected", {"dishes": []})
+            raise RuntimeError("search failed")
+
+        async def collect():
+            stream = AnalysisEventStream("complete", keepalive_seconds=None, metrics=metrics)
+            return [chunk async for chunk in stream.run(failing_analysis)], stream
+
+        chunks, stream = asyncio.run(collect())
+        events = _parse_sse(chunks)
+        self.assertEqual([name for name, _ in events], ["phase1_detected", "error"])
+        self.assertEqual(events[1][1], {"status_code": 500, "detail": "search failed"})
+        self.assertIsNotNone(stream.first_event_seconds)
+        histogram = metrics.histogram("analysis_stream_first_event_seconds")
+        self.assertEqual(histogram.count({"endpoint": "complete", "event": "phase1_detected"}), 1)
+
+
+class TestPipelineEvents(unittest.TestCase):
+    """代替サーバーを使ったパイプラインの段階イベントのテストケース"""
+
+    def setUp(self):
+        self.server = start_fake_server(FIXTURE_PATH)
+        os.environ.setdefault("DEEPINFRA_API_KEY", "test-key")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _pipeline(self):
+        pipeline = MealAnalysisPipeline(model_id="google/gemma-3-27b-it")
+        vision_service = DeepInfraService(model_id="google/gemma-3-27b-it")
+        vision_service.client = AsyncOpenAI(api_key="test-key", base_url=self.server.base_url)
+        pipeline.vision_service = vision_service
+        pipeline.phase1_component.vision_service = vision_service
+        pipeline.nutrition_search_component = _RecordingSearchComponent()
+        return pipeline
+
+    def test_events_are_streamed_in_stage_order(self):
+        for stream_phase1 in (False, True):
+            with self.subTest(stream_phase1=stream_phase1):
+                pipeline = self._pipeline()
+
+                async def analysis(event_callback):
+                    return await pipeline.execute_complete_analysis(
+                        image_bytes=b"fake-image", image_mime_type="image/jpeg",
+                        save_detailed_logs=False, stream_phase1=stream_phase1,
+                        event_callback=event_callback
+                    )
+
+                async def collect():
+                    stream = AnalysisEventStream("complete", keepalive_seconds=None, metrics=MetricsRegistry())
+                    return [chunk async for chunk in stream.run(analysis)]
+
+                events = _parse_sse(asyncio.run(collect()))
+                names = [name for name, _ in events]
+                ingredient_names = [name for _, _, name in EXPECTED_INGREDIENTS]
+
+                self.assertEqual(names, ["phase1_detected"] + ["ingredient_matched"] * 4 + ["nutrition_calculated", "final"])
+                self.assertEqual(events[0][1]["total_ingredients"], 4)
+                self.assertEqual(sorted(data["ingredient_name"] for _, data in events[1:5]), sorted(ingredient_names))
+                self.assertTrue(all(data["matched"] for _, data in events[1:5]))
+                self.assertEqual(events[5][1]["total_nutrition"], events[6][1]["final_nutrition_result"]["total_nutrition"])
+                self.assertEqual(pipeline.nutrition_search_component.requested, ingredient_names)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+ストリーミング音声入力（/voice/ws, shared/pipeline/streaming_voice_session.py）のテスト
+
+無音を挟んだ合成音声をPCMフレームで送信し、発話区間ごとの逐次文字起こし・発話終了の検出・
+同じ接続での段階イベントと最終結果の送信、発話終了から結果までの時間の記録を検証します。
+"""
+import json
+import os
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from apps.meal_analysis_api.endpoints import voice_analysis
+from shared.config.settings import get_settings
+from shared.pipeline.voice_orchestrator import VoiceAnalysisPipeline
+from shared.utils.metrics import get_metrics_registry
+from shared.utils.voice_activity import VoiceActivityDetector
+from test_chunked_transcription import SPOKEN_SENTENCES, _dominant_frequency
+from test_phase1_streaming import _RecordingSearchComponent
+
+SAMPLE_RATE = 16000
+
+
+def _tone(frequency: int, seconds: float) -> np.ndarray:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def _silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(SAMPLE_RATE * seconds), dtype=np.float32)
+
+
+def _pcm_frames(samples: np.ndarray, frame_seconds: float = 0.1):
+    pcm = (samples * 32767).astype("<i2").tobytes()
+    size = int(SAMPLE_RATE * frame_seconds) * 2
+    return [pcm[i:i + size] for i in range(0, len(pcm), size)]
+
+
+class _FakeNLU:
+    """文ごとに1つの料理を返すNLU"""
+
+    async def extract_foods_from_text(self, text, model_id=None, temperature=None, seed=None):
+        return {"dishes": [
+            {"dish_name": sentence.split()[-1].strip("."), "confidence": 0.9,
+             "ingredients": [{"ingredient_name": sentence.split()[2], "weight_g": 100}]}
+            for sentence in text.split(". ")
+        ]}
+
+
+class TestVoiceActivityDetector(unittest.TestCase):
+    """VoiceActivityDetectorのテストケース"""
+
+    def test_segments_close_on_short_silence_and_speech_ends_on_long_silence(self):
+        vad = VoiceActivityDetector(SAMPLE_RATE, segment_silence_ms=400, end_of_speech_ms=1000, padding_ms=100)
+        audio = np.concatenate([_silence(0.5), _tone(300, 1.0), _silence(0.6), _tone(500, 1.0), _silence(2.0)])
+
+        segments, ended_at = [], None
+        for i in range(0, len(audio), 1600):
+            closed, end_of_speech = vad.push(audio[i:i + 1600])
+            segments.extend(closed)
+            if end_of_speech and ended_at is None:
+                ended_at = vad.processed_seconds
+
+        self.assertEqual(len(segments), 2)
+        self.assertAlmostEqual(segments[0].start_seconds, 0.4, delta=0.03)
+        self.assertAlmostEqual(segments[0].end_seconds, 1.6, delta=0.03)
+        self.assertAlmostEqual(segments[1].start_seconds, 2.0, delta=0.03)
+        self.assertAlmostEqual(ended_at, 4.1, delta=0.05)
+
+    def test_flush_closes_open_segment(self):
+        vad = VoiceActivityDetector(SAMPLE_RATE)
+        self.assertEqual(vad.push(_tone(300, 0.5)), ([], False))
+        segments = vad.flush()
+        self.assertEqual(len(segments), 1)
+        self.assertTrue(vad.end_of_speech)
+
+
+class TestVoiceWebSocket(unittest.TestCase):
+    """/voice/ws のテストケース"""
+
+    def setUp(self):
+        os.environ.setdefault("DEEPINFRA_API_KEY", "test-key")
+        self.transcribed = []
+        app = FastAPI()
+        app.include_router(voice_analysis.router, prefix="/api/v1/meal-analyses")
+        self.client = TestClient(app)
+
+        def pipeline_factory(**kwargs):
+            pipeline = VoiceAnalysisPipeline(**kwargs)
+            component = pipeline.phase1_speech_component
+            component.nlu_service = _FakeNLU()
+
+            async def transcribe_audio(audio_data, audio_format, language_code, temperature):
+                self.transcribed.append(audio_format)
+                return SPOKEN_SENTENCES[_dominant_frequency(audio_data)]
+
+            component.transcribe_audio = transcribe_audio
+            pipeline.nutrition_search_component = _RecordingSearchComponent()
+            return pipeline
+
+        for patcher in (
+            mock.patch.object(voice_analysis, "VoiceAnalysisPipeline", side_effect=pipeline_factory),
+            mock.patch.object(get_settings(), "SPEECH_CACHE_ENABLED", False)
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _receive_until_done(self, websocket):
+        messages = []
+        while not messages or messages[-1]["event"] not in ("final", "error"):
+            messages.append(websocket.receive_json())
+        return messages
+
+    def test_segments_are_transcribed_while_speaking_and_result_follows_end_of_speech(self):
+        histogram = get_metrics_registry().histogram("voice_stream_end_of_speech_to_result_seconds")
+        before = histogram.count()
+        audio = np.concatenate([_tone(700, 1.5), _silence(0.6), _tone(900, 1.5), _silence(1.5)])
+
+        with self.client.websocket_connect("/api/v1/meal-analyses/voice/ws?save_detailed_logs=false") as websocket:
+            for frame in _pcm_frames(audio):
+                websocket.send_bytes(frame)
+                time.sleep(0.02)  # 話している間に閉じた区間の文字起こしが進むよう、フレームを間隔をあけて送る
+            messages = self._receive_until_done(websocket)
+
+        events = [message["event"] for message in messages]
+        self.assertEqual(events[:3], ["partial_transcript", "partial_transcript", "end_of_speech"])
+        self.assertEqual(events[3], "phase1_detected")
+        self.assertEqual(events[-2:], ["nutrition_calculated", "final"])
+        self.assertEqual(events.count("ingredient_matched"), 2)
+        self.assertEqual(messages[1]["data"]["transcript"], f"{SPOKEN_SENTENCES[700]} {SPOKEN_SENTENCES[900]}")
+
+        final = messages[-1]["data"]
+        self.assertEqual([dish["dish_name"] for dish in final["result"]["dishes"]], ["pork", "evening"])
+        self.assertGreaterEqual(final["end_of_speech_to_result_ms"], 0)
+        self.assertEqual(histogram.count(), before + 1)
+        self.assertEqual(self.transcribed, ["flac", "flac"])
+
+    def test_client_end_message_closes_open_segment(self):
+        with self.client.websocket_connect("/api/v1/meal-analyses/voice/ws?save_detailed_logs=false") as websocket:
+            for frame in _pcm_frames(_tone(300, 1.0)):
+                websocket.send_bytes(frame)
+            websocket.send_text(json.dumps({"type": "end"}))
+            messages = self._receive_until_done(websocket)
+
+        partials = [message["data"] for message in messages if message["event"] == "partial_transcript"]
+        self.assertEqual([partial["text"] for partial in partials], [SPOKEN_SENTENCES[300]])
+        self.assertEqual(messages[-1]["event"], "final")
+
+    def test_silence_only_returns_error(self):
+        with self.client.websocket_connect("/api/v1/meal-analyses/voice/ws?save_detailed_logs=false") as websocket:
+            websocket.send_bytes(_pcm_frames(_silence(0.5))[0])
+            websocket.send_text(json.dumps({"type": "end"}))
+            messages = self._receive_until_done(websocket)
+
+        self.assertEqual(messages[-1], {"event": "error", "data": {"status_code": 400, "detail": "No speech detected in audio stream"}})
+
+    def test_malformed_text_messages_return_client_error(self):
+        for text in ("end", '"end"', "[]", "1"):
+            with self.subTest(text=text):
+                with self.client.websocket_connect("/api/v1/meal-analyses/voice/ws?save_detailed_logs=false") as websocket:
+                    websocket.send_text(text)
+                    messages = self._receive_until_done(websocket)
+
+                self.assertEqual(messages[-1]["event"], "error")
+                self.assertEqual(messages[-1]["data"]["status_code"], 400)
+                self.assertIn("JSON objects", messages[-1]["data"]["detail"])
+
+    def test_invalid_parameters_close_the_connection(self):
+        with self.assertRaises(WebSocketDisconnect) as context:
+            with self.client.websocket_connect("/api/v1/meal-analyses/voice/ws?speech_service=unknown") as websocket:
+                websocket.receive_json()
+        self.assertEqual(context.exception.code, 1008)
+
+
+if __name__ == "__main__":
+    unittest.main()
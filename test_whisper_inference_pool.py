@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+ローカルWhisper推論プール（shared/services/whisper_inference_pool.py）のテスト
+
+モデルのロードと推論は差し替え可能な関数で代替し、
+モデルの常駐（1回だけロード）と同時リクエストのマイクロバッチ化、同じモデルの推論が重ならないことを検証します。
+"""
+import asyncio
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from shared.services import whisper_inference_pool
+from shared.services.whisper_inference_pool import WhisperInferencePool, WhisperModelRegistry, resolve_device
+from shared.services.whisper_speech_service import WhisperBackend, WhisperModel, WhisperSpeechService
+
+
+class _FakeWhisper:
+    """ロード回数とバッチサイズを記録する代替モデル"""
+
+    def __init__(self, inference_seconds: float = 0.05):
+        self.inference_seconds = inference_seconds
+        self.loads = []
+        self.batches = []
+        self.lock = threading.Lock()
+        self.running = {}
+        self.max_running = {}
+
+    def load(self, model_name, device):
+        time.sleep(0.05)  # 並行ロードが重複しないことを確認するため
+        with self.lock:
+            self.loads.append((model_name, device))
+        return f"model:{model_name}"
+
+    def transcribe_batch(self, model, audios, key):
+        with self.lock:
+            self.running[model] = self.running.get(model, 0) + 1
+            self.max_running[model] = max(self.max_running.get(model, 0), self.running[model])
+        time.sleep(self.inference_seconds)
+        with self.lock:
+            self.running[model] -= 1
+            self.batches.append((model, len(audios), key.language))
+        return [f"{key.language or 'auto'}:{len(audio)}" for audio in audios]
+
+
+class TestWhisperInferencePool(unittest.TestCase):
+    """WhisperInferencePoolのテストケース"""
+
+    def setUp(self):
+        self.fake = _FakeWhisper()
+        self.registry = WhisperModelRegistry(loader=self.fake.load)
+
+    def _pool(self, **kwargs):
+        pool = WhisperInferencePool(registry=self.registry, batch_transcriber=self.fake.transcribe_batch, **kwargs)
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def test_concurrent_requests_are_micro_batched(self):
+        pool = self._pool(workers=1, max_batch_size=4, batch_wait_ms=50)
+
+        async def scenario():
+            return await asyncio.gather(*(
+                pool.transcribe(np.zeros(1000 + i, dtype=np.float32), "tiny", device="cpu")
+                for i in range(6)
+            ))
+
+        transcripts = asyncio.run(scenario())
+        self.assertEqual(transcripts, [f"auto:{1000 + i}" for i in range(6)])
+        self.assertEqual([size for _, size, _ in self.fake.batches], [4, 2])
+        self.assertEqual(self.fake.loads, [("tiny", "cpu")])
+        self.assertEqual(pool.queue_depth(), {})
+
+    def test_requests_with_different_options_are_not_mixed(self):
+        pool = self._pool(workers=2, max_batch_size=8, batch_wait_ms=30)
+
+        async def scenario():
+            return await asyncio.gather(*(
+                pool.transcribe(np.zeros(10, dtype=np.float32), "tiny", device="cpu", language=language)
+                for language in ("ja", "fr", "ja", "fr")
+            ))
+
+        self.assertEqual(asyncio.run(scenario()), ["ja:10", "fr:10", "ja:10", "fr:10"])
+        self.assertEqual(sorted((language, size) for _, size, language in self.fake.batches), [("fr", 2), ("ja", 2)])
+
+    def test_inference_on_a_shared_model_is_serialized(self):
+        pool = self._pool(workers=4, max_batch_size=8, batch_wait_ms=10)
+
+        async def scenario():
+            return await asyncio.gather(*(
+                pool.transcribe(np.zeros(10, dtype=np.float32), model_name, device="cpu", language=language)
+                for model_name in ("tiny", "base") for language in ("ja", "fr")
+            ))
+
+        self.assertEqual(asyncio.run(scenario()), ["ja:10", "fr:10", "ja:10", "fr:10"])
+        # 同じモデルの推論は重ならない（kv-cache のフックが混ざるため）。異なるモデルは並行に推論できる
+        self.assertEqual(self.fake.max_running, {"model:tiny": 1, "model:base": 1})
+        self.assertEqual(len(self.fake.batches), 4)
+
+    def test_model_is_loaded_once_per_model_and_device(self):
+        threads = [threading.Thread(target=self.registry.get_model, args=("base", "cpu")) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.registry.get_model("base", "cuda")
+
+        self.assertEqual(self.fake.loads, [("base", "cpu"), ("base", "cuda")])
+        self.assertEqual(sorted(self.registry.loaded_models()), [("base", "cpu"), ("base", "cuda")])
+
+    def test_inference_errors_are_raised_to_every_caller(self):
+        def failing(model, audios, key):
+            raise ValueError("out of memory")
+
+        pool = WhisperInferencePool(registry=self.registry, batch_transcriber=failing, batch_wait_ms=20)
+        self.addCleanup(pool.shutdown)
+
+        async def scenario():
+            return await asyncio.gather(
+                *(pool.transcribe(np.zeros(10, dtype=np.float32), "tiny", device="cpu") for _ in range(2)),
+                return_exceptions=True
+            )
+
+        errors = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(error, RuntimeError) and "out of memory" in str(error) for error in errors))
+
+    def test_local_whisper_service_instances_share_the_pool(self):
+        pool = self._pool(workers=1, batch_wait_ms=30)
+        audio_data = (Path(__file__).parent / "test_audio" / "breakfast.wav").read_bytes()
+
+        async def scenario():
+            services = [WhisperSpeechService(backend=WhisperBackend.LOCAL_WHISPER) for _ in range(3)]
+            return await asyncio.gather(*(
+                service.transcribe_audio(audio_data, language_code="ja-JP", model=WhisperModel.TINY)
+                for service in services
+            ))
+
+        with mock.patch.object(whisper_inference_pool, "_whisper_inference_pool", pool), \
+                mock.patch.object(whisper_inference_pool, "_whisper_model_registry", self.registry):
+            transcripts = asyncio.run(scenario())
+
+        # 4.752秒の24kHz音声は16kHzに変換されてから推論される
+        self.assertEqual(transcripts, ["ja:76032"] * 3)
+        self.assertEqual(self.fake.loads, [("tiny", resolve_device("auto"))])
+        self.assertEqual([size for _, size, _ in self.fake.batches], [3])
+
+
+if __name__ == "__main__":
+    unittest.main()